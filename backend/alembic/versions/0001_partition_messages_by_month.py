@@ -0,0 +1,128 @@
+"""Partition messages and message_history by created_at month
+
+Revision ID: 0001_partition_messages
+Revises:
+Create Date: 2026-10-19 09:00:00
+
+Converts existing plain tables in place: the old table is renamed, a
+partitioned parent with the same columns is created, monthly partitions
+covering the existing rows are added, rows are copied across and the old
+table is dropped. Both primary keys become (id, created_at), and the
+message_history -> messages foreign key is dropped because messages.id
+alone is no longer unique. Tables that do not exist yet are left to
+create_all, which builds them partitioned from the models.
+
+The copy runs in the migration's transaction and holds an exclusive lock
+on both tables for its duration; schedule it in a maintenance window.
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.services.partitions import create_partitions, is_partitioned
+
+# revision identifiers, used by Alembic.
+revision = '0001_partition_messages'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+PREMAKE_MONTHS = 3
+
+TABLES = {
+    "messages": {
+        "indexes": ["id", "contact_id", "occasion_type", "status", "scheduled_for", "created_at"],
+        "foreign_keys": {"contact_id": "contacts", "created_by": "users", "approved_by": "users"},
+    },
+    "message_history": {
+        "indexes": ["id", "message_id"],
+        "foreign_keys": {"user_id": "users"},
+    },
+}
+
+
+def _table_exists(conn, table: str) -> bool:
+    return conn.execute(sa.text("SELECT to_regclass(:table)"), {"table": table}).scalar() is not None
+
+
+def _drop_history_foreign_key(conn) -> None:
+    names = conn.execute(sa.text(
+        """
+        SELECT conname FROM pg_constraint
+        WHERE contype = 'f'
+          AND conrelid = 'message_history'::regclass
+          AND confrelid = 'messages'::regclass
+        """
+    )).scalars().all()
+    for name in names:
+        op.execute(f'ALTER TABLE message_history DROP CONSTRAINT "{name}"')
+
+
+def _partition(conn, table: str, indexes: list, foreign_keys: dict) -> None:
+    old = f"{table}_unpartitioned"
+    op.execute(f"ALTER TABLE {table} RENAME TO {old}")
+    op.execute(f"ALTER TABLE {old} RENAME CONSTRAINT {table}_pkey TO {old}_pkey")
+    for column in indexes:
+        op.execute(f"DROP INDEX IF EXISTS ix_{table}_{column}")
+
+    op.execute(
+        f"CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+        f"PARTITION BY RANGE (created_at)"
+    )
+    op.execute(f"ALTER TABLE {table} ADD PRIMARY KEY (id, created_at)")
+    for column, referenced in foreign_keys.items():
+        op.execute(f"ALTER TABLE {table} ADD FOREIGN KEY ({column}) REFERENCES {referenced} (id)")
+
+    oldest = conn.execute(sa.text(f"SELECT min(created_at) FROM {old}")).scalar()
+    create_partitions(conn, table, (oldest or datetime.utcnow()).date(), PREMAKE_MONTHS)
+
+    op.execute(f"INSERT INTO {table} SELECT * FROM {old}")
+    op.execute(f"DROP TABLE {old}")
+
+    # Built after the copy: one index build per partition beats maintaining them row by row
+    for column in indexes:
+        op.execute(f"CREATE INDEX ix_{table}_{column} ON {table} ({column})")
+    op.execute(f"ANALYZE {table}")
+
+
+def _unpartition(conn, table: str, indexes: list, foreign_keys: dict) -> None:
+    old = f"{table}_partitioned"
+    op.execute(f"ALTER TABLE {table} RENAME TO {old}")
+    op.execute(f"ALTER TABLE {old} RENAME CONSTRAINT {table}_pkey TO {old}_pkey")
+    for column in indexes:
+        op.execute(f"DROP INDEX IF EXISTS ix_{table}_{column}")
+
+    op.execute(f"CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    op.execute(f"INSERT INTO {table} SELECT * FROM {old}")
+    op.execute(f"DROP TABLE {old}")  # Drops its partitions too
+
+    op.execute(f"ALTER TABLE {table} ADD PRIMARY KEY (id)")
+    for column, referenced in foreign_keys.items():
+        op.execute(f"ALTER TABLE {table} ADD FOREIGN KEY ({column}) REFERENCES {referenced} (id)")
+    for column in indexes:
+        if column != "created_at":  # Only needed for per-partition ordering
+            op.execute(f"CREATE INDEX ix_{table}_{column} ON {table} ({column})")
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    if not all(_table_exists(conn, table) for table in TABLES):
+        return
+    if all(is_partitioned(conn, table) for table in TABLES):
+        return
+
+    _drop_history_foreign_key(conn)
+    for table, spec in TABLES.items():
+        if not is_partitioned(conn, table):
+            _partition(conn, table, spec["indexes"], spec["foreign_keys"])
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    for table, spec in TABLES.items():
+        if _table_exists(conn, table) and is_partitioned(conn, table):
+            _unpartition(conn, table, spec["indexes"], spec["foreign_keys"])
+
+    if _table_exists(conn, "message_history"):
+        op.execute("ALTER TABLE message_history ADD FOREIGN KEY (message_id) REFERENCES messages (id)")
@@ -0,0 +1,52 @@
+"""Sharded campaign stat counters and messages.campaign_id
+
+Revision ID: 0002_campaign_stat_counters
+Revises: 0001_partition_messages
+Create Date: 2026-10-19 11:00:00
+
+Existing Campaign.stats values are copied into shard 0, so campaigns keep
+the numbers they showed until their counters are reconciled.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+# revision identifiers, used by Alembic.
+revision = '0002_campaign_stat_counters'
+down_revision = '0001_partition_messages'
+branch_labels = None
+depends_on = None
+
+METRICS = ("generated_count", "sent_count", "failed_count")
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("campaigns") or not inspector.has_table("messages"):
+        return  # Fresh database; create_all builds the current schema
+
+    op.create_table(
+        "campaign_stat_counters",
+        sa.Column("campaign_id", UUID(as_uuid=True), sa.ForeignKey("campaigns.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("metric", sa.String(), primary_key=True),
+        sa.Column("shard", sa.SmallInteger(), primary_key=True),
+        sa.Column("value", sa.BigInteger(), nullable=False, server_default="0"),
+    )
+    op.execute(
+        f"""
+        INSERT INTO campaign_stat_counters (campaign_id, metric, shard, value)
+        SELECT campaigns.id, stat.key, 0, stat.value::bigint
+        FROM campaigns, jsonb_each_text(coalesce(campaigns.stats, '{{}}'::jsonb)) AS stat
+        WHERE stat.key IN {METRICS} AND stat.value ~ '^-?[0-9]+$'
+        """
+    )
+
+    op.add_column("messages", sa.Column("campaign_id", UUID(as_uuid=True), nullable=True))
+    op.create_foreign_key(None, "messages", "campaigns", ["campaign_id"], ["id"], ondelete="SET NULL")
+    op.create_index("ix_messages_campaign_id", "messages", ["campaign_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_messages_campaign_id", table_name="messages")
+    op.drop_column("messages", "campaign_id")
+    op.drop_table("campaign_stat_counters")
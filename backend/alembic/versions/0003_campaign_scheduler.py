@@ -0,0 +1,51 @@
+"""Campaign timezones and campaign_runs for the recurring scheduler
+
+Revision ID: 0003_campaign_scheduler
+Revises: 0002_campaign_stat_counters
+Create Date: 2026-10-19 14:00:00
+
+Existing campaigns get the UTC timezone, which is how their schedules were
+meant to be read until now.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import ENUM, UUID
+
+# revision identifiers, used by Alembic.
+revision = '0003_campaign_scheduler'
+down_revision = '0002_campaign_stat_counters'
+branch_labels = None
+depends_on = None
+
+RUN_STATUS = ENUM("QUEUED", "RUNNING", "COMPLETED", "FAILED", name="campaignrunstatus", create_type=False)
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("campaigns"):
+        return  # Fresh database; create_all builds the current schema
+
+    op.add_column("campaigns", sa.Column("timezone", sa.String(), nullable=False, server_default="UTC"))
+    op.create_index("ix_campaigns_updated_at", "campaigns", ["updated_at"])
+
+    RUN_STATUS.create(op.get_bind(), checkfirst=True)
+    op.create_table(
+        "campaign_runs",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True),
+        sa.Column("campaign_id", UUID(as_uuid=True), sa.ForeignKey("campaigns.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("scheduled_for", sa.DateTime(), nullable=False),
+        sa.Column("trigger", sa.String(), nullable=False),
+        sa.Column("status", RUN_STATUS, nullable=False),
+        sa.Column("test_mode", sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.UniqueConstraint("campaign_id", "scheduled_for", name="uq_campaign_runs_campaign_id_scheduled_for"),
+    )
+    op.create_index("ix_campaign_runs_status", "campaign_runs", ["status"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_campaign_runs_status", table_name="campaign_runs")
+    op.drop_table("campaign_runs")
+    RUN_STATUS.drop(op.get_bind(), checkfirst=True)
+    op.drop_index("ix_campaigns_updated_at", table_name="campaigns")
+    op.drop_column("campaigns", "timezone")
@@ -0,0 +1,40 @@
+"""Indexes for compiled segment filters on contacts
+
+Revision ID: 0004_contact_segment_indexes
+Revises: 0003_campaign_scheduler
+Create Date: 2026-10-19 16:00:00
+
+Built CONCURRENTLY, outside the migration transaction, so contacts stay
+writable while a large table is indexed.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0004_contact_segment_indexes'
+down_revision = '0003_campaign_scheduler'
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    "ix_contacts_tags": "USING gin (tags jsonb_path_ops)",
+    "ix_contacts_custom_fields": "USING gin (custom_fields jsonb_path_ops)",
+    # Must match app.models.contact.birthday_month_day exactly
+    "ix_contacts_birthday_month_day": "((EXTRACT(month FROM birthday) * 100 + EXTRACT(day FROM birthday)))",
+    "ix_contacts_last_interaction_date": "(last_interaction_date)",
+}
+
+
+def upgrade() -> None:
+    if not sa.inspect(op.get_bind()).has_table("contacts"):
+        return  # Fresh database; create_all builds the current schema
+
+    with op.get_context().autocommit_block():
+        for name, definition in INDEXES.items():
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON contacts {definition}")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name in INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
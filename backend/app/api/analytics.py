@@ -1,24 +1,35 @@
 """Analytics API endpoints"""
 
-from typing import Annotated
+from typing import Annotated, Any, Dict
 from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 from datetime import datetime, timedelta
 
-from app.config.database import get_db
+from app.config.database import get_read_db
 from app.models.message import Message, MessageStatus, OccasionType, GeneratedBy
 from app.models.contact import Contact, ContactSegment
 from app.models.campaign import Campaign, CampaignStatus
 from app.api.deps import CurrentUser
+from app.config.settings import settings
+from app.services import campaign_stats
+from app.utils.http_cache import ConditionalGet, conditional, short_lived
 
 router = APIRouter(prefix="/analytics", tags=["Analytics"])
 
+# Aggregates may be up to this many seconds old; time-dependent ones (this month, last N days) included
+AnalyticsCache = Annotated[ConditionalGet, Depends(conditional(
+    "analytics",
+    cache_control=short_lived(settings.HTTP_CACHE_ANALYTICS_MAX_AGE_SECONDS),
+    ttl=settings.HTTP_CACHE_ANALYTICS_MAX_AGE_SECONDS,
+))]
+
 
 @router.get("/dashboard")
 async def get_dashboard_stats(
-    db: Annotated[AsyncSession, Depends(get_db)],
-    current_user: CurrentUser
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    current_user: CurrentUser,
+    cache: AnalyticsCache
 ):
     """Get dashboard statistics"""
 
@@ -59,7 +70,7 @@ async def get_dashboard_stats(
     )
     messages_this_month = messages_this_month_result.scalar()
 
-    return {
+    return await cache.respond({
         "total_contacts": total_contacts,
         "total_messages": total_messages,
         "pending_approval": pending_approval,
@@ -68,13 +79,14 @@ async def get_dashboard_stats(
         "active_campaigns": active_campaigns,
         "messages_this_month": messages_this_month,
         "generated_at": datetime.utcnow().isoformat()
-    }
+    })
 
 
 @router.get("/messages-by-status")
 async def get_messages_by_status(
-    db: Annotated[AsyncSession, Depends(get_db)],
-    current_user: CurrentUser
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    current_user: CurrentUser,
+    cache: AnalyticsCache
 ):
     """Get message counts grouped by status"""
 
@@ -85,13 +97,14 @@ async def get_messages_by_status(
 
     data = [{"status": status.value, "count": count} for status, count in result.all()]
 
-    return {"data": data}
+    return await cache.respond({"data": data})
 
 
 @router.get("/messages-by-occasion")
 async def get_messages_by_occasion(
-    db: Annotated[AsyncSession, Depends(get_db)],
-    current_user: CurrentUser
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    current_user: CurrentUser,
+    cache: AnalyticsCache
 ):
     """Get message counts grouped by occasion type"""
 
@@ -102,13 +115,14 @@ async def get_messages_by_occasion(
 
     data = [{"occasion_type": occasion.value, "count": count} for occasion, count in result.all()]
 
-    return {"data": data}
+    return await cache.respond({"data": data})
 
 
 @router.get("/ai-usage-stats")
 async def get_ai_usage_stats(
-    db: Annotated[AsyncSession, Depends(get_db)],
-    current_user: CurrentUser
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    current_user: CurrentUser,
+    cache: AnalyticsCache
 ):
     """Get AI usage statistics"""
 
@@ -126,69 +140,121 @@ async def get_ai_usage_stats(
 
     # Get recent AI messages with metadata for token stats
     recent_ai_messages_result = await db.execute(
-        select(Message.metadata)
+        select(Message.message_metadata)
         .where(Message.generated_by == GeneratedBy.AI)
-        .where(Message.metadata.isnot(None))
+        .where(Message.message_metadata.isnot(None))
         .limit(100)
     )
 
     total_tokens = 0
     total_cost = 0.0
     message_count = 0
+    input_tokens = 0
+    cached_tokens = 0
+    with_variants = 0
+    variant_swaps = 0
+    wait_saved_ms = 0
+    routes: Dict[str, Dict[str, Any]] = {}
 
     for (metadata,) in recent_ai_messages_result.all():
         if metadata:
             total_tokens += metadata.get("total_tokens", 0)
             total_cost += metadata.get("cost_usd", 0.0)
             message_count += 1
+            if not metadata.get("coalesced"):
+                # Coalesced messages repeat another message's usage
+                input_tokens += metadata.get("input_tokens", 0)
+                cached_tokens += metadata.get("cached_tokens", 0)
+
+            if metadata.get("variants"):
+                with_variants += 1
+                # Each swap replaced a regeneration, which would have taken about as long as the first call
+                variant_swaps += metadata.get("variant_swaps", 0)
+                wait_saved_ms += metadata.get("variant_swaps", 0) * metadata.get("latency_ms", 0)
+
+            # Messages generated before model routing have no route
+            route = routes.setdefault(metadata.get("route", "default"), {
+                "model": metadata.get("model"), "messages": 0, "cost_usd": 0.0, "latency_ms": 0, "timed": 0,
+            })
+            route["messages"] += 1
+            route["cost_usd"] += metadata.get("cost_usd", 0.0)
+            if "latency_ms" in metadata:
+                route["latency_ms"] += metadata["latency_ms"]
+                route["timed"] += 1
 
     avg_tokens = total_tokens / message_count if message_count > 0 else 0
     avg_cost = total_cost / message_count if message_count > 0 else 0
 
-    return {
+    return await cache.respond({
         "ai_generated": ai_messages,
         "manual": manual_messages,
         "total_tokens_used": total_tokens,
         "total_cost_usd": round(total_cost, 4),
         "avg_tokens_per_message": round(avg_tokens, 2),
-        "avg_cost_per_message": round(avg_cost, 6)
-    }
+        "avg_cost_per_message": round(avg_cost, 6),
+        # Share of input tokens the provider served from its prompt cache
+        "prompt_cache_hit_ratio": round(cached_tokens / input_tokens, 4) if input_tokens else 0.0,
+        "variants": {
+            "messages_with_variants": with_variants,
+            "regenerations_avoided": variant_swaps,
+            "reviewer_wait_saved_ms": wait_saved_ms,
+        },
+        "by_route": {
+            name: {
+                "model": route["model"],
+                "messages": route["messages"],
+                "total_cost_usd": round(route["cost_usd"], 4),
+                "avg_cost_per_message": round(route["cost_usd"] / route["messages"], 6),
+                "avg_latency_ms": round(route["latency_ms"] / route["timed"]) if route["timed"] else None,
+            }
+            for name, route in routes.items()
+        },
+    })
 
 
 @router.get("/campaign-performance")
 async def get_campaign_performance(
-    db: Annotated[AsyncSession, Depends(get_db)],
-    current_user: CurrentUser
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    current_user: CurrentUser,
+    cache: AnalyticsCache
 ):
     """Get campaign performance metrics"""
 
-    # Get all campaigns with their stats
+    # Latest campaigns with their stats summed from the counter shards, in one query
     result = await db.execute(
-        select(Campaign).order_by(Campaign.created_at.desc()).limit(10)
+        select(
+            Campaign.id,
+            Campaign.name,
+            Campaign.status,
+            Campaign.occasion_type,
+            Campaign.created_at,
+            campaign_stats.stats_expression().label("stats"),
+        )
+        .order_by(Campaign.created_at.desc())
+        .limit(10)
     )
-    campaigns = result.scalars().all()
 
     data = []
-    for campaign in campaigns:
-        stats = campaign.stats or {}
+    for campaign in result.all():
         data.append({
             "id": str(campaign.id),
             "name": campaign.name,
             "status": campaign.status.value,
             "occasion_type": campaign.occasion_type.value,
-            "generated_count": stats.get("generated_count", 0),
-            "sent_count": stats.get("sent_count", 0),
-            "failed_count": stats.get("failed_count", 0),
+            "generated_count": campaign.stats["generated_count"],
+            "sent_count": campaign.stats["sent_count"],
+            "failed_count": campaign.stats["failed_count"],
             "created_at": campaign.created_at.isoformat()
         })
 
-    return {"data": data}
+    return await cache.respond({"data": data})
 
 
 @router.get("/contacts-by-segment")
 async def get_contacts_by_segment(
-    db: Annotated[AsyncSession, Depends(get_db)],
-    current_user: CurrentUser
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    current_user: CurrentUser,
+    cache: AnalyticsCache
 ):
     """Get contact counts grouped by segment"""
 
@@ -199,13 +265,14 @@ async def get_contacts_by_segment(
 
     data = [{"segment": segment.value, "count": count} for segment, count in result.all()]
 
-    return {"data": data}
+    return await cache.respond({"data": data})
 
 
 @router.get("/messages-timeline")
 async def get_messages_timeline(
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_read_db)],
     current_user: CurrentUser,
+    cache: AnalyticsCache,
     days: int = 30,
 ):
     """Get message creation timeline for the last N days"""
@@ -226,4 +293,4 @@ async def get_messages_timeline(
 
     data = [{"date": str(date), "count": count} for date, count in result.all()]
 
-    return {"data": data, "days": days}
+    return await cache.respond({"data": data, "days": days})
@@ -1,29 +1,58 @@
 """Campaigns API endpoints"""
 
-from typing import Annotated
+from datetime import datetime
+from typing import Annotated, List
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 
-from app.config.database import get_db
-from app.models.campaign import Campaign
+from app.config.database import get_db, get_read_db
+from app.config.settings import settings
+from app.models.campaign import Campaign, CampaignRun
+from app.models.contact import Contact
 from app.schemas.campaign import (
     CampaignCreate,
     CampaignUpdate,
     CampaignResponse,
     CampaignListResponse,
-    CampaignExecute
+    CampaignExecute,
+    CampaignRunResponse,
+    AudiencePreviewRequest,
+    AudiencePreviewResponse,
+    PregenerationPlanResponse,
+    CampaignEstimateResponse,
 )
+from app.schemas.contact import ContactListResponse
+from app.api.contacts import CONTACT_RESPONSE_COLUMNS
 from app.api.deps import CurrentUser, ManagerUser
+from app.services import audience, campaign_estimate, campaign_stats, pregeneration
+from app.services.events import broker, campaign_run_event, campaign_status_event
+from app.services.segments import SegmentFilterError, compile_segment_filter
+from app.utils.serialization import response_columns, list_response
+from app.utils.http_cache import ConditionalGet, conditional, invalidate
 
 router = APIRouter(prefix="/campaigns", tags=["Campaigns"])
 
+CAMPAIGN_RESPONSE_COLUMNS = response_columns(
+    CampaignResponse,
+    Campaign,
+    defaults={"segment_filter": {}},
+    computed={"stats": campaign_stats.stats_expression()},
+)
+
+
+async def campaign_response(db: AsyncSession, campaign: Campaign) -> CampaignResponse:
+    """Response for one campaign, with live stats from its counters"""
+    stats = await campaign_stats.read_stats(db, [campaign.id])
+    return CampaignResponse.model_validate(campaign).model_copy(update={"stats": stats[campaign.id]})
+
 
 @router.get("", response_model=CampaignListResponse)
 async def list_campaigns(
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_read_db)],
     current_user: CurrentUser,
+    cache: Annotated[ConditionalGet, Depends(conditional("campaigns"))],
     status: str | None = None,
     occasion_type: str | None = None,
     skip: int = 0,
@@ -31,31 +60,29 @@ async def list_campaigns(
 ):
     """List campaigns with filtering and pagination"""
 
-    query = select(Campaign)
+    filters = []
 
     if status:
-        query = query.where(Campaign.status == status)
+        filters.append(Campaign.status == status)
 
     if occasion_type:
-        query = query.where(Campaign.occasion_type == occasion_type)
+        filters.append(Campaign.occasion_type == occasion_type)
 
     # Get total
-    count_query = select(func.count()).select_from(query.subquery())
-    total_result = await db.execute(count_query)
+    total_result = await db.execute(select(func.count(Campaign.id)).where(*filters))
     total = total_result.scalar()
 
-    # Apply pagination
-    query = query.offset(skip).limit(limit).order_by(Campaign.created_at.desc())
-
+    # Fetch the page as response-shaped rows
+    query = (
+        select(*CAMPAIGN_RESPONSE_COLUMNS)
+        .where(*filters)
+        .order_by(Campaign.created_at.desc())
+        .offset(skip)
+        .limit(limit)
+    )
     result = await db.execute(query)
-    campaigns = result.scalars().all()
 
-    return CampaignListResponse(
-        items=[CampaignResponse.model_validate(c) for c in campaigns],
-        total=total,
-        skip=skip,
-        limit=limit
-    )
+    return await cache.respond(list_response(result.mappings().all(), total=total, skip=skip, limit=limit))
 
 
 @router.post("", response_model=CampaignResponse, status_code=status.HTTP_201_CREATED)
@@ -69,34 +96,66 @@ async def create_campaign(
     campaign = Campaign(
         **campaign_data.model_dump(),
         created_by=current_user.id,
-        stats={"generated_count": 0, "sent_count": 0, "failed_count": 0}
+        stats=dict.fromkeys(campaign_stats.METRICS, 0)
     )
 
     db.add(campaign)
     await db.commit()
     await db.refresh(campaign)
 
+    await invalidate("campaigns", "analytics")
+
     return CampaignResponse.model_validate(campaign)
 
 
+@router.post("/audience-preview", response_model=AudiencePreviewResponse)
+async def preview_audience(
+    preview_data: AudiencePreviewRequest,
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    current_user: CurrentUser
+):
+    """Size, language breakdown, cost and sample of a segment filter's audience, exact or estimated"""
+
+    return await audience.preview(db, preview_data.segment_filter)
+
+
+@router.get("/pregeneration/plan", response_model=PregenerationPlanResponse)
+async def preview_pregeneration(
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    current_user: CurrentUser,
+    days: int = Query(settings.PREGENERATION_HORIZON_DAYS, ge=1, le=366),
+):
+    """Dry run of birthday and holiday pre-generation: demand, placement and the projected hourly load"""
+
+    plan = await pregeneration.build_plan(db, days=days)
+    return plan.as_dict()
+
+
 @router.get("/{campaign_id}", response_model=CampaignResponse)
 async def get_campaign(
     campaign_id: UUID,
-    db: Annotated[AsyncSession, Depends(get_db)],
-    current_user: CurrentUser
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    current_user: CurrentUser,
+    cache: Annotated[ConditionalGet, Depends(conditional("campaigns:{campaign_id}"))]
 ):
     """Get a specific campaign"""
 
-    result = await db.execute(select(Campaign).where(Campaign.id == campaign_id))
-    campaign = result.scalar_one_or_none()
+    result = await db.execute(
+        select(Campaign, campaign_stats.stats_expression().label("stats")).where(Campaign.id == campaign_id)
+    )
+    row = result.one_or_none()
 
-    if not campaign:
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Campaign not found"
         )
 
-    return CampaignResponse.model_validate(campaign)
+    # Stats change without touching updated_at; the content hash covers them
+    return await cache.respond(
+        CampaignResponse.model_validate(row.Campaign).model_copy(update={"stats": row.stats}),
+        version=row.Campaign.updated_at,
+    )
 
 
 @router.put("/{campaign_id}", response_model=CampaignResponse)
@@ -117,6 +176,7 @@ async def update_campaign(
             detail="Campaign not found"
         )
 
+    previous_status = campaign.status
     update_data = campaign_data.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(campaign, key, value)
@@ -124,7 +184,11 @@ async def update_campaign(
     await db.commit()
     await db.refresh(campaign)
 
-    return CampaignResponse.model_validate(campaign)
+    await invalidate("campaigns", f"campaigns:{campaign_id}", "analytics")
+    if campaign.status != previous_status:
+        await broker.publish(campaign_status_event(campaign))
+
+    return await campaign_response(db, campaign)
 
 
 @router.delete("/{campaign_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -147,9 +211,84 @@ async def delete_campaign(
     await db.delete(campaign)
     await db.commit()
 
+    # Its messages lose their campaign_id
+    await invalidate("campaigns", f"campaigns:{campaign_id}", "messages", "analytics")
+
     return None
 
 
+@router.get("/{campaign_id}/audience", response_model=ContactListResponse)
+async def list_campaign_audience(
+    campaign_id: UUID,
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    current_user: CurrentUser,
+    skip: int = 0,
+    limit: int = 20,
+):
+    """Contacts the campaign's segment filter selects today"""
+
+    result = await db.execute(select(Campaign.segment_filter).where(Campaign.id == campaign_id))
+    segment_filter = result.one_or_none()
+
+    if segment_filter is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Campaign not found"
+        )
+
+    try:
+        audience = compile_segment_filter(segment_filter[0])
+    except SegmentFilterError as e:
+        # Stored before filters were validated
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Invalid segment filter: {e}"
+        )
+
+    total_result = await db.execute(select(func.count(Contact.id)).where(audience))
+    total = total_result.scalar()
+
+    query = (
+        select(*CONTACT_RESPONSE_COLUMNS)
+        .where(audience)
+        .order_by(Contact.created_at.desc())
+        .offset(skip)
+        .limit(limit)
+    )
+    result = await db.execute(query)
+
+    return list_response(result.mappings().all(), total=total, skip=skip, limit=limit)
+
+
+@router.get("/{campaign_id}/estimate", response_model=CampaignEstimateResponse)
+async def estimate_campaign(
+    campaign_id: UUID,
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    current_user: CurrentUser,
+    tone: str = Query("professional_friendly", max_length=50),
+    custom_context: str | None = Query(None, max_length=500),
+):
+    """Dry run of the campaign's generation: tokens, cost, duration and peak rate, without calling the provider"""
+
+    result = await db.execute(select(Campaign).where(Campaign.id == campaign_id))
+    campaign = result.scalar_one_or_none()
+
+    if not campaign:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Campaign not found"
+        )
+
+    try:
+        return await campaign_estimate.estimate_campaign(db, campaign, tone, custom_context)
+    except SegmentFilterError as e:
+        # Stored before filters were validated
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Invalid segment filter: {e}"
+        )
+
+
 @router.post("/{campaign_id}/execute")
 async def execute_campaign(
     campaign_id: UUID,
@@ -168,16 +307,44 @@ async def execute_campaign(
             detail="Campaign not found"
         )
 
-    # TODO: Queue campaign execution with Celery
-    # For now, return placeholder response
+    # Recorded like a scheduled fire; processing picks runs up from campaign_runs
+    run = CampaignRun(
+        campaign_id=campaign_id,
+        scheduled_for=datetime.utcnow(),
+        trigger="manual",
+        test_mode=execute_data.test_mode,
+    )
+    db.add(run)
+    await db.commit()
+
+    await broker.publish(campaign_run_event(run.id, campaign_id, run.scheduled_for, run.trigger))
 
     return {
         "message": "Campaign execution queued",
         "campaign_id": str(campaign_id),
+        "run_id": str(run.id),
         "test_mode": execute_data.test_mode
     }
 
 
+@router.get("/{campaign_id}/runs", response_model=List[CampaignRunResponse])
+async def list_campaign_runs(
+    campaign_id: UUID,
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    current_user: CurrentUser,
+    limit: int = 50
+):
+    """Recent scheduled and manual runs of a campaign, newest first"""
+
+    result = await db.execute(
+        select(CampaignRun)
+        .where(CampaignRun.campaign_id == campaign_id)
+        .order_by(CampaignRun.scheduled_for.desc())
+        .limit(min(limit, 500))
+    )
+    return result.scalars().all()
+
+
 @router.post("/{campaign_id}/pause")
 async def pause_campaign(
     campaign_id: UUID,
@@ -201,7 +368,10 @@ async def pause_campaign(
     await db.commit()
     await db.refresh(campaign)
 
-    return CampaignResponse.model_validate(campaign)
+    await invalidate("campaigns", f"campaigns:{campaign_id}", "analytics")
+    await broker.publish(campaign_status_event(campaign))
+
+    return await campaign_response(db, campaign)
 
 
 @router.post("/{campaign_id}/resume")
@@ -227,4 +397,32 @@ async def resume_campaign(
     await db.commit()
     await db.refresh(campaign)
 
-    return CampaignResponse.model_validate(campaign)
+    await invalidate("campaigns", f"campaigns:{campaign_id}", "analytics")
+    await broker.publish(campaign_status_event(campaign))
+
+    return await campaign_response(db, campaign)
+
+
+@router.post("/{campaign_id}/stats/reconcile", response_model=CampaignResponse)
+async def reconcile_campaign_stats(
+    campaign_id: UUID,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: ManagerUser
+):
+    """Recount a campaign's statistics from its messages and correct the counters"""
+
+    result = await db.execute(select(Campaign).where(Campaign.id == campaign_id))
+    campaign = result.scalar_one_or_none()
+
+    if not campaign:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Campaign not found"
+        )
+
+    stats = await campaign_stats.reconcile(db, campaign_id)
+    await db.commit()
+
+    await invalidate("campaigns", f"campaigns:{campaign_id}", "analytics")
+
+    return CampaignResponse.model_validate(campaign).model_copy(update={"stats": stats})
@@ -2,29 +2,43 @@
 
 from typing import Annotated
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, UploadFile, File
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, or_, extract
 from datetime import datetime
 
-from app.config.database import get_db
+from app.config.database import AsyncSessionLocal, get_db, get_read_db
 from app.models.contact import Contact
 from app.schemas.contact import (
     ContactCreate,
     ContactUpdate,
     ContactResponse,
     ContactListResponse,
-    ContactFilter
+    ContactFilter,
+    ContactMerge,
+    ContactMergeResponse,
+    DuplicateReport,
 )
-from app.api.deps import CurrentUser
+from app.api.deps import CurrentUser, ManagerUser
+from app.services import dedupe
+from app.utils.serialization import response_columns, list_response
+from app.services.audience import invalidate_previews
+from app.utils.http_cache import ConditionalGet, conditional, invalidate
 
 router = APIRouter(prefix="/contacts", tags=["Contacts"])
 
+CONTACT_RESPONSE_COLUMNS = response_columns(
+    ContactResponse,
+    Contact,
+    defaults={"tags": [], "custom_fields": {}},
+)
+
 
 @router.get("", response_model=ContactListResponse)
 async def list_contacts(
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_read_db)],
     current_user: CurrentUser,
+    cache: Annotated[ConditionalGet, Depends(conditional("contacts"))],
     segment: str | None = None,
     language: str | None = None,
     search: str | None = None,
@@ -34,19 +48,18 @@ async def list_contacts(
 ):
     """List contacts with filtering and pagination"""
 
-    # Build query
-    query = select(Contact)
+    # Build filters
+    filters = []
 
-    # Apply filters
     if segment:
-        query = query.where(Contact.segment == segment)
+        filters.append(Contact.segment == segment)
 
     if language:
-        query = query.where(Contact.language == language)
+        filters.append(Contact.language == language)
 
     if search:
         search_pattern = f"%{search}%"
-        query = query.where(
+        filters.append(
             or_(
                 Contact.name.ilike(search_pattern),
                 Contact.email.ilike(search_pattern),
@@ -56,26 +69,23 @@ async def list_contacts(
 
     if has_birthday_this_month:
         current_month = datetime.utcnow().month
-        query = query.where(extract('month', Contact.birthday) == current_month)
+        filters.append(extract('month', Contact.birthday) == current_month)
 
     # Get total count
-    count_query = select(func.count()).select_from(query.subquery())
-    total_result = await db.execute(count_query)
+    total_result = await db.execute(select(func.count(Contact.id)).where(*filters))
     total = total_result.scalar()
 
-    # Apply pagination
-    query = query.offset(skip).limit(limit).order_by(Contact.created_at.desc())
-
-    # Execute query
+    # Fetch the page as response-shaped rows
+    query = (
+        select(*CONTACT_RESPONSE_COLUMNS)
+        .where(*filters)
+        .order_by(Contact.created_at.desc())
+        .offset(skip)
+        .limit(limit)
+    )
     result = await db.execute(query)
-    contacts = result.scalars().all()
 
-    return ContactListResponse(
-        items=[ContactResponse.model_validate(contact) for contact in contacts],
-        total=total,
-        skip=skip,
-        limit=limit
-    )
+    return await cache.respond(list_response(result.mappings().all(), total=total, skip=skip, limit=limit))
 
 
 @router.post("", response_model=ContactResponse, status_code=status.HTTP_201_CREATED)
@@ -106,14 +116,90 @@ async def create_contact(
     await db.commit()
     await db.refresh(contact)
 
+    await invalidate("contacts", "analytics")
+    await invalidate_previews()
+
     return ContactResponse.model_validate(contact)
 
 
+@router.get("/duplicates", response_model=DuplicateReport)
+async def get_duplicate_report(
+    current_user: CurrentUser
+):
+    """Likely duplicate contacts found by the latest scan"""
+
+    try:
+        report = await dedupe.latest_report()
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Duplicate reports are unavailable"
+        )
+
+    if report is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No duplicate scan has run yet"
+        )
+
+    return report
+
+
+@router.post("/duplicates/scan", status_code=status.HTTP_202_ACCEPTED)
+async def scan_duplicates(
+    background_tasks: BackgroundTasks,
+    current_user: ManagerUser
+):
+    """Start a duplicate scan; its report replaces the current one when done"""
+
+    background_tasks.add_task(dedupe.scan, AsyncSessionLocal)
+
+    return {"message": "Duplicate scan started"}
+
+
+@router.post("/{contact_id}/merge", response_model=ContactMergeResponse)
+async def merge_contacts(
+    contact_id: UUID,
+    merge_data: ContactMerge,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: ManagerUser
+):
+    """Merge duplicates into a contact, moving their messages to it"""
+
+    try:
+        contact, merged_ids, moved_ids = await dedupe.merge_contacts(db, contact_id, merge_data.duplicate_ids)
+    except LookupError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+
+    await db.commit()
+    await db.refresh(contact)
+
+    await invalidate(
+        "contacts",
+        f"contacts:{contact_id}",
+        *(f"contacts:{merged_id}" for merged_id in merged_ids),
+        "messages",
+        *(f"messages:{message_id}" for message_id in moved_ids),
+        "analytics",
+    )
+    await invalidate_previews()
+
+    return ContactMergeResponse(
+        contact=ContactResponse.model_validate(contact),
+        merged_ids=merged_ids,
+        messages_moved=len(moved_ids),
+    )
+
+
 @router.get("/{contact_id}", response_model=ContactResponse)
 async def get_contact(
     contact_id: UUID,
-    db: Annotated[AsyncSession, Depends(get_db)],
-    current_user: CurrentUser
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    current_user: CurrentUser,
+    cache: Annotated[ConditionalGet, Depends(conditional("contacts:{contact_id}"))]
 ):
     """Get a specific contact by ID"""
 
@@ -126,7 +212,7 @@ async def get_contact(
             detail="Contact not found"
         )
 
-    return ContactResponse.model_validate(contact)
+    return await cache.respond(ContactResponse.model_validate(contact), version=contact.updated_at)
 
 
 @router.put("/{contact_id}", response_model=ContactResponse)
@@ -167,6 +253,9 @@ async def update_contact(
     await db.commit()
     await db.refresh(contact)
 
+    await invalidate("contacts", f"contacts:{contact_id}", "analytics")
+    await invalidate_previews()
+
     return ContactResponse.model_validate(contact)
 
 
@@ -190,6 +279,9 @@ async def delete_contact(
     await db.delete(contact)
     await db.commit()
 
+    await invalidate("contacts", f"contacts:{contact_id}", "analytics")
+    await invalidate_previews()
+
     return None
 
 
@@ -219,7 +311,7 @@ async def import_contacts(
 
 @router.get("/export/csv")
 async def export_contacts(
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_read_db)],
     current_user: CurrentUser
 ):
     """Export contacts to CSV (placeholder)"""
@@ -1,28 +1,23 @@
 """FastAPI dependencies for authentication and authorization"""
 
 from typing import Annotated
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from uuid import UUID
 
-from app.config.database import get_db
+from app.config.database import read_session
 from app.models.user import User, UserRole
 from app.utils.auth import decode_token
 
 # Security scheme
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
 
-async def get_current_user(
-    credentials: Annotated[HTTPAuthorizationCredentials, Depends(security)],
-    db: Annotated[AsyncSession, Depends(get_db)]
-) -> User:
-    """Get current authenticated user from JWT token"""
-
-    # Extract token
-    token = credentials.credentials
+async def authenticate_token(token: str, db: AsyncSession) -> User:
+    """User for an access token, or 401"""
 
     # Decode token
     payload = decode_token(token)
@@ -65,6 +60,37 @@ async def get_current_user(
     return user
 
 
+async def get_current_user(
+    request: Request,
+    credentials: Annotated[HTTPAuthorizationCredentials, Depends(security)],
+) -> User:
+    """
+    Get current authenticated user from JWT token
+
+    The lookup's read session is closed before the endpoint runs, so an
+    endpoint on get_db does not also hold a read connection throughout.
+    """
+    async with read_session(request) as db:
+        return await authenticate_token(credentials.credentials, db)
+
+
+async def get_stream_user(
+    request: Request,
+    credentials: Annotated[HTTPAuthorizationCredentials | None, Depends(optional_security)],
+    access_token: Annotated[str | None, Query(description="For EventSource clients, which cannot send headers")] = None,
+) -> User:
+    """Authenticated user for streaming endpoints: bearer header or access_token query parameter"""
+    token = credentials.credentials if credentials else access_token
+    if token is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    async with read_session(request) as db:
+        return await authenticate_token(token, db)
+
+
 async def get_current_active_user(
     current_user: Annotated[User, Depends(get_current_user)]
 ) -> User:
@@ -100,3 +126,4 @@ async def require_manager_or_admin(
 CurrentUser = Annotated[User, Depends(get_current_active_user)]
 AdminUser = Annotated[User, Depends(require_admin)]
 ManagerUser = Annotated[User, Depends(require_manager_or_admin)]
+StreamUser = Annotated[User, Depends(get_stream_user)]
@@ -0,0 +1,53 @@
+"""Real-time events API (server-sent events)"""
+
+from uuid import UUID
+from fastapi import APIRouter, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+
+from app.config.settings import settings
+from app.api.deps import StreamUser
+from app.services.events import TOPICS, broker
+
+router = APIRouter(prefix="/events", tags=["Events"])
+
+
+@router.get("/stream")
+async def stream_events(
+    current_user: StreamUser,
+    topics: str = Query("messages,campaigns", description="Comma-separated: messages, campaigns"),
+    campaign_id: UUID | None = Query(None, description="Only events for this campaign"),
+    mine: bool = Query(False, description="Only messages created by the current user"),
+):
+    """
+    Stream message state changes and campaign progress as server-sent events
+
+    Events: message.created, message.edited, message.approved, message.rejected,
+    message.sent, message.deleted, campaign.progress, campaign.status. A
+    `resync` event means events were missed: refetch, then reconnect.
+    """
+
+    if not settings.EVENTS_ENABLED:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Real-time events are disabled"
+        )
+
+    requested = frozenset(topic.strip() for topic in topics.split(",") if topic.strip())
+    if not requested or not requested <= TOPICS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Topics must be among: {', '.join(sorted(TOPICS))}"
+        )
+
+    if len(broker.subscriptions) >= settings.EVENTS_MAX_SUBSCRIBERS:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many event streams on this worker",
+            headers={"Retry-After": str(settings.EVENTS_RETRY_MS // 1000 or 1)},
+        )
+
+    return StreamingResponse(
+        broker.stream(current_user.id, requested, campaign_id=campaign_id, mine=mine),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -7,7 +7,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, or_
 from datetime import datetime
 
-from app.config.database import get_db
+from app.config.database import get_db, get_read_db
+from app.models.campaign import Campaign
 from app.models.contact import Contact
 from app.models.message import Message, MessageHistory, MessageStatus, GeneratedBy
 from app.schemas.message import (
@@ -21,18 +22,63 @@ from app.schemas.message import (
     MessageReject
 )
 from app.services.ai_generator import ai_generator
+from app.services.generation_scheduler import INTERACTIVE
+from app.services import campaign_stats
+from app.services.events import broker, message_event, campaign_progress_event
 from app.api.deps import CurrentUser
+from app.utils.serialization import response_columns, list_response
+from app.utils.http_cache import ConditionalGet, conditional, invalidate
+from app.utils.idempotency import IdempotentRequest, idempotent
+from app.utils.metrics import GENERATION_CANDIDATES, MESSAGE_VARIANT_SWAPS, MESSAGE_VARIANT_WAIT_SAVED
 
 router = APIRouter(prefix="/messages", tags=["Messages"])
 
+MESSAGE_RESPONSE_COLUMNS = response_columns(
+    MessageResponse,
+    Message,
+    renamed={"metadata": "message_metadata"},
+    defaults={"metadata": {}},
+)
+
+
+async def ensure_campaign_exists(db: AsyncSession, campaign_id: UUID | None) -> None:
+    """404 for an unknown campaign_id, instead of a foreign key violation at commit"""
+    if campaign_id is None:
+        return
+
+    result = await db.execute(select(Campaign.id).where(Campaign.id == campaign_id))
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Campaign not found"
+        )
+
+
+def campaign_events(message: Message, deltas: dict) -> list[dict]:
+    """Progress event for the message's campaign, if it belongs to one"""
+    return [campaign_progress_event(message.campaign_id, deltas)] if message.campaign_id else []
+
+
+async def message_changed(message_id: UUID, campaign_id: UUID | None, *events: dict) -> None:
+    """After a committed change: forget the cached validators it affects and notify event streams"""
+    scopes = ["messages", f"messages:{message_id}", "analytics"]
+    if campaign_id:
+        scopes += ["campaigns", f"campaigns:{campaign_id}"]
+    await invalidate(*scopes)
+    await broker.publish(*events)
+
 
 @router.post("/generate", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
 async def generate_message(
     message_data: MessageGenerate,
     db: Annotated[AsyncSession, Depends(get_db)],
-    current_user: CurrentUser
+    current_user: CurrentUser,
+    idempotency: Annotated[IdempotentRequest, Depends(idempotent("messages:generate"))]
 ):
-    """Generate a personalized message using AI"""
+    """Generate a personalized message using AI; retries with the same Idempotency-Key get the first result"""
+
+    if idempotency.replay is not None:
+        return idempotency.replay
 
     # Get contact
     contact_result = await db.execute(
@@ -46,12 +92,18 @@ async def generate_message(
             detail="Contact not found"
         )
 
+    await ensure_campaign_exists(db, message_data.campaign_id)
+
     # Generate message with AI
-    generation_result = ai_generator.generate_personalized_message(
+    GENERATION_CANDIDATES.observe(message_data.candidates)
+    generation_result = await ai_generator.generate_personalized_message(
         contact=contact,
         occasion_type=message_data.occasion_type,
         custom_context=message_data.custom_context,
-        tone=message_data.tone
+        tone=message_data.tone,
+        lane=INTERACTIVE,
+        owner=str(current_user.id),
+        candidates=message_data.candidates,
     )
 
     if not generation_result["success"]:
@@ -71,29 +123,35 @@ async def generate_message(
     # Create message
     message = Message(
         contact_id=contact.id,
+        campaign_id=message_data.campaign_id,
         occasion_type=message_data.occasion_type,
         content=content,
         status=MessageStatus.PENDING_APPROVAL,
         generated_by=GeneratedBy.AI,
         created_by=current_user.id,
-        metadata=metadata
+        message_metadata=metadata
     )
 
     db.add(message)
 
     # Create history entry
     history = MessageHistory(
-        message_id=message.id,
+        message=message,
         action="created",
         user_id=current_user.id,
         new_content=content
     )
     db.add(history)
 
+    if message.campaign_id:
+        await campaign_stats.increment(db, message.campaign_id, {"generated_count": 1})
+
     await db.commit()
     await db.refresh(message)
 
-    return MessageResponse.model_validate(message)
+    await message_changed(message.id, message.campaign_id, message_event(message, "created"), *campaign_events(message, {"generated_count": 1}))
+
+    return await idempotency.respond(MessageResponse.model_validate(message), status.HTTP_201_CREATED)
 
 
 @router.post("", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
@@ -116,86 +174,104 @@ async def create_message_manually(
             detail="Contact not found"
         )
 
+    await ensure_campaign_exists(db, message_data.campaign_id)
+
     # Create message
     message = Message(
         **message_data.model_dump(),
         status=MessageStatus.DRAFT,
         generated_by=GeneratedBy.MANUAL,
         created_by=current_user.id,
-        metadata={"created_manually": True}
+        message_metadata={"created_manually": True}
     )
 
     db.add(message)
 
     # Create history
     history = MessageHistory(
-        message_id=message.id,
+        message=message,
         action="created",
         user_id=current_user.id,
         new_content=message.content
     )
     db.add(history)
 
+    if message.campaign_id:
+        await campaign_stats.increment(db, message.campaign_id, {"generated_count": 1})
+
     await db.commit()
     await db.refresh(message)
 
+    await message_changed(message.id, message.campaign_id, message_event(message, "created"), *campaign_events(message, {"generated_count": 1}))
+
     return MessageResponse.model_validate(message)
 
 
 @router.get("", response_model=MessageListResponse)
 async def list_messages(
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_read_db)],
     current_user: CurrentUser,
+    cache: Annotated[ConditionalGet, Depends(conditional("messages"))],
     status: str | None = None,
     occasion_type: str | None = None,
     contact_id: UUID | None = None,
+    campaign_id: UUID | None = None,
     generated_by: str | None = None,
+    created_after: datetime | None = None,
+    created_before: datetime | None = None,
     skip: int = 0,
     limit: int = 20,
 ):
     """List messages with filtering and pagination"""
 
-    # Build query
-    query = select(Message)
+    # Build filters
+    filters = []
 
-    # Apply filters
     if status:
-        query = query.where(Message.status == status)
+        filters.append(Message.status == status)
 
     if occasion_type:
-        query = query.where(Message.occasion_type == occasion_type)
+        filters.append(Message.occasion_type == occasion_type)
 
     if contact_id:
-        query = query.where(Message.contact_id == contact_id)
+        filters.append(Message.contact_id == contact_id)
+
+    if campaign_id:
+        filters.append(Message.campaign_id == campaign_id)
 
     if generated_by:
-        query = query.where(Message.generated_by == generated_by)
+        filters.append(Message.generated_by == generated_by)
+
+    # Date bounds let Postgres skip whole monthly partitions
+    if created_after:
+        filters.append(Message.created_at >= created_after)
+
+    if created_before:
+        filters.append(Message.created_at < created_before)
 
     # Get total count
-    count_query = select(func.count()).select_from(query.subquery())
-    total_result = await db.execute(count_query)
+    total_result = await db.execute(select(func.count(Message.id)).where(*filters))
     total = total_result.scalar()
 
-    # Apply pagination
-    query = query.offset(skip).limit(limit).order_by(Message.created_at.desc())
-
-    # Execute query
+    # Fetch the page as response-shaped rows
+    query = (
+        select(*MESSAGE_RESPONSE_COLUMNS)
+        .where(*filters)
+        .order_by(Message.created_at.desc())
+        .offset(skip)
+        .limit(limit)
+    )
     result = await db.execute(query)
-    messages = result.scalars().all()
 
-    return MessageListResponse(
-        items=[MessageResponse.model_validate(msg) for msg in messages],
-        total=total,
-        skip=skip,
-        limit=limit
-    )
+    return await cache.respond(list_response(result.mappings().all(), total=total, skip=skip, limit=limit))
 
 
 @router.get("/{message_id}", response_model=MessageResponse)
 async def get_message(
     message_id: UUID,
-    db: Annotated[AsyncSession, Depends(get_db)],
-    current_user: CurrentUser
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    current_user: CurrentUser,
+    cache: Annotated[ConditionalGet, Depends(conditional("messages:{message_id}"))]
 ):
     """Get a specific message by ID"""
 
@@ -208,7 +284,7 @@ async def get_message(
             detail="Message not found"
         )
 
-    return MessageResponse.model_validate(message)
+    return await cache.respond(MessageResponse.model_validate(message), version=message.updated_at)
 
 
 @router.patch("/{message_id}", response_model=MessageResponse)
@@ -239,6 +315,7 @@ async def update_message(
 
     # Store old content for history
     old_content = message.content
+    previous_status = message.status
 
     # Update message
     update_data = message_data.model_dump(exclude_unset=True)
@@ -259,6 +336,82 @@ async def update_message(
     await db.commit()
     await db.refresh(message)
 
+    await message_changed(message.id, message.campaign_id, message_event(message, "edited", previous_status))
+
+    return MessageResponse.model_validate(message)
+
+
+@router.post("/{message_id}/variants/{index}", response_model=MessageResponse)
+async def select_variant(
+    message_id: UUID,
+    index: int,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: CurrentUser
+):
+    """Make another generated candidate the message content, without a new generation call"""
+
+    # Get message
+    result = await db.execute(select(Message).where(Message.id == message_id))
+    message = result.scalar_one_or_none()
+
+    if not message:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Message not found"
+        )
+
+    metadata = message.message_metadata or {}
+    variants = metadata.get("variants") or []
+    if not 0 <= index < len(variants):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Variant not found"
+        )
+
+    if message.status in [MessageStatus.SENT, MessageStatus.FAILED]:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cannot edit sent or failed messages"
+        )
+
+    if index == metadata.get("active_variant", 0) and message.content == variants[index]:
+        # Already showing it: no swap to record, and nothing new to review
+        return MessageResponse.model_validate(message)
+
+    old_content = message.content
+    previous_status = message.status
+    message.content = variants[index]
+    # Reassign so the JSONB change is detected
+    message.message_metadata = {
+        **metadata,
+        "active_variant": index,
+        "variant_swaps": metadata.get("variant_swaps", 0) + 1,
+    }
+
+    # The new content has not been reviewed
+    if message.status in [MessageStatus.APPROVED, MessageStatus.REJECTED]:
+        message.status = MessageStatus.PENDING_APPROVAL
+        message.approved_by = None
+        message.approved_at = None
+
+    # Create history
+    history = MessageHistory(
+        message_id=message.id,
+        action="variant_selected",
+        user_id=current_user.id,
+        old_content=old_content,
+        new_content=message.content
+    )
+    db.add(history)
+
+    await db.commit()
+    await db.refresh(message)
+
+    MESSAGE_VARIANT_SWAPS.inc()
+    MESSAGE_VARIANT_WAIT_SAVED.inc(metadata.get("latency_ms", 0) / 1000)
+
+    await message_changed(message.id, message.campaign_id, message_event(message, "edited", previous_status))
+
     return MessageResponse.model_validate(message)
 
 
@@ -288,6 +441,7 @@ async def approve_message(
         )
 
     # Update message
+    previous_status = message.status
     message.status = MessageStatus.APPROVED
     message.approved_by = current_user.id
     message.approved_at = datetime.utcnow()
@@ -303,6 +457,8 @@ async def approve_message(
     await db.commit()
     await db.refresh(message)
 
+    await message_changed(message.id, message.campaign_id, message_event(message, "approved", previous_status))
+
     return MessageResponse.model_validate(message)
 
 
@@ -326,9 +482,11 @@ async def reject_message(
         )
 
     # Update message
+    previous_status = message.status
     message.status = MessageStatus.REJECTED
     if reject_data.reason:
-        message.metadata["rejection_reason"] = reject_data.reason
+        # Reassign so the JSONB change is detected
+        message.message_metadata = {**(message.message_metadata or {}), "rejection_reason": reject_data.reason}
 
     # Create history
     history = MessageHistory(
@@ -341,6 +499,8 @@ async def reject_message(
     await db.commit()
     await db.refresh(message)
 
+    await message_changed(message.id, message.campaign_id, message_event(message, "rejected", previous_status))
+
     return MessageResponse.model_validate(message)
 
 
@@ -349,9 +509,13 @@ async def send_message(
     message_id: UUID,
     background_tasks: BackgroundTasks,
     db: Annotated[AsyncSession, Depends(get_db)],
-    current_user: CurrentUser
+    current_user: CurrentUser,
+    idempotency: Annotated[IdempotentRequest, Depends(idempotent("messages:send"))]
 ):
-    """Send a message (mock implementation for demo)"""
+    """Send a message (mock implementation for demo); retries with the same Idempotency-Key get the first result"""
+
+    if idempotency.replay is not None:
+        return idempotency.replay
 
     # Get message
     result = await db.execute(select(Message).where(Message.id == message_id))
@@ -382,17 +546,28 @@ async def send_message(
     )
     db.add(history)
 
+    if message.campaign_id:
+        await campaign_stats.increment(db, message.campaign_id, {"sent_count": 1})
+
     await db.commit()
     await db.refresh(message)
 
-    return MessageResponse.model_validate(message)
+    await message_changed(
+        message.id,
+        message.campaign_id,
+        message_event(message, "sent", MessageStatus.APPROVED),
+        *campaign_events(message, {"sent_count": 1}),
+    )
+
+    return await idempotency.respond(MessageResponse.model_validate(message))
 
 
 @router.get("/{message_id}/history", response_model=list[MessageHistoryResponse])
 async def get_message_history(
     message_id: UUID,
-    db: Annotated[AsyncSession, Depends(get_db)],
-    current_user: CurrentUser
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    current_user: CurrentUser,
+    cache: Annotated[ConditionalGet, Depends(conditional("messages:{message_id}"))]
 ):
     """Get audit trail for a message"""
 
@@ -406,15 +581,16 @@ async def get_message_history(
             detail="Message not found"
         )
 
-    # Get history
+    # Get history; entries never predate their message, which prunes older partitions
     history_result = await db.execute(
         select(MessageHistory)
         .where(MessageHistory.message_id == message_id)
+        .where(MessageHistory.created_at >= message.created_at)
         .order_by(MessageHistory.created_at.desc())
     )
     history_entries = history_result.scalars().all()
 
-    return [MessageHistoryResponse.model_validate(entry) for entry in history_entries]
+    return await cache.respond([MessageHistoryResponse.model_validate(entry) for entry in history_entries])
 
 
 @router.delete("/{message_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -441,7 +617,18 @@ async def delete_message(
             detail="Cannot delete sent messages"
         )
 
+    deltas = {"generated_count": -1}
+    if message.status == MessageStatus.FAILED:
+        deltas["failed_count"] = -1
+    if message.campaign_id:
+        await campaign_stats.increment(db, message.campaign_id, deltas)
+
+    # Built before the delete; the instance is unusable after commit
+    campaign_id = message.campaign_id
+    deleted_events = [message_event(message, "deleted"), *campaign_events(message, deltas)]
     await db.delete(message)
     await db.commit()
 
+    await message_changed(message_id, campaign_id, *deleted_events)
+
     return None
@@ -1,52 +1,236 @@
-from sqlalchemy import create_engine
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+from uuid import uuid4
+
+from fastapi import Request, Response
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 
 from app.config.settings import settings
+from app.config.pool_metrics import PoolMetrics, InstrumentedAsyncQueuePool, InstrumentedQueuePool
+from app.utils.sql_profiler import install_profiler
 
 # Convert postgresql:// to postgresql+asyncpg:// for async engine
 async_database_url = settings.DATABASE_URL.replace(
     "postgresql://", "postgresql+asyncpg://"
 )
+async_replica_url = (
+    settings.DATABASE_REPLICA_URL.replace("postgresql://", "postgresql+asyncpg://")
+    if settings.DATABASE_REPLICA_URL
+    else None
+)
+
+# Cookie that pins a client's reads to the primary right after it wrote
+READ_YOUR_WRITES_COOKIE = "crm_primary_until"
+
+
+def _pool_options() -> dict:
+    """Pool sizing shared by the async and sync engines"""
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+def _asyncpg_connect_args() -> dict:
+    """asyncpg connection arguments for statement caching and timeouts"""
+    if settings.DB_PGBOUNCER_MODE:
+        # Transaction pooling hands each transaction to an arbitrary server
+        # connection, so named prepared statements must not be reused and
+        # startup parameters such as statement_timeout are rejected.
+        return {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+        }
+
+    connect_args = {"prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE}
+    if settings.DB_STATEMENT_TIMEOUT_MS:
+        connect_args["server_settings"] = {"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)}
+    return connect_args
+
+
+def _read_only_connect_args() -> dict:
+    """asyncpg connection arguments for read-only pools"""
+    connect_args = _asyncpg_connect_args()
+    if not settings.DB_PGBOUNCER_MODE:
+        # Every implicit per-statement transaction on these connections is READ ONLY
+        server_settings = dict(connect_args.get("server_settings", {}))
+        server_settings["default_transaction_read_only"] = "on"
+        connect_args["server_settings"] = server_settings
+    return connect_args
+
+
+def _create_read_engine(url: str):
+    """Autocommit engine for reads: no BEGIN/COMMIT round-trips around queries"""
+    return create_async_engine(
+        url,
+        echo=settings.DEBUG,
+        poolclass=InstrumentedAsyncQueuePool,
+        connect_args=_read_only_connect_args(),
+        isolation_level="AUTOCOMMIT",
+        **_pool_options(),
+    )
+
+
+def _psycopg2_connect_args() -> dict:
+    """psycopg2 connection arguments for statement timeouts"""
+    if settings.DB_STATEMENT_TIMEOUT_MS and not settings.DB_PGBOUNCER_MODE:
+        return {"options": f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"}
+    return {}
+
+
+def _apply_transaction_statement_timeout(engine) -> None:
+    """Set statement_timeout per transaction where startup parameters are unavailable"""
+
+    @event.listens_for(engine, "begin")
+    def set_local_statement_timeout(conn):
+        conn.exec_driver_sql(f"SET LOCAL statement_timeout = {int(settings.DB_STATEMENT_TIMEOUT_MS)}")
+
 
 # Async engine for FastAPI endpoints
 async_engine = create_async_engine(
     async_database_url,
     echo=settings.DEBUG,
-    pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20,
+    poolclass=InstrumentedAsyncQueuePool,
+    connect_args=_asyncpg_connect_args(),
+    **_pool_options(),
 )
 
+
+class WriteTrackingSession(Session):
+    """Session that remembers whether it flushed any changes"""
+
+
+@event.listens_for(WriteTrackingSession, "after_flush")
+def _mark_session_wrote(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(WriteTrackingSession, "after_commit")
+def _pin_reads_to_primary(session):
+    response = session.info.get("response")
+    if response is not None and session.info.pop("wrote", False):
+        # Replica lag would otherwise hide the client's own write from its next read
+        response.set_cookie(
+            READ_YOUR_WRITES_COOKIE,
+            str(int(time.time()) + settings.READ_YOUR_WRITES_SECONDS),
+            max_age=settings.READ_YOUR_WRITES_SECONDS,
+            httponly=True,
+            samesite="lax",
+        )
+
+
 AsyncSessionLocal = async_sessionmaker(
     async_engine,
     class_=AsyncSession,
+    sync_session_class=WriteTrackingSession,
     expire_on_commit=False,
     autocommit=False,
     autoflush=False,
 )
 
-# Sync engine for Alembic migrations and Celery tasks
-sync_engine = create_engine(
-    settings.DATABASE_URL,
-    echo=settings.DEBUG,
-    pool_pre_ping=True,
-)
+# Read-only engines: the primary always, plus the replica when configured
+read_engine = _create_read_engine(async_database_url)
+replica_engine = _create_read_engine(async_replica_url) if async_replica_url else None
 
-SyncSessionLocal = sessionmaker(
-    autocommit=False,
+ReadSessionLocal = async_sessionmaker(
+    read_engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
     autoflush=False,
-    bind=sync_engine,
 )
+ReplicaSessionLocal = (
+    async_sessionmaker(
+        replica_engine,
+        class_=AsyncSession,
+        expire_on_commit=False,
+        autoflush=False,
+    )
+    if replica_engine is not None
+    else None
+)
+
+# Replica is skipped until this monotonic time after a connection failure
+_replica_retry_at = 0.0
+
+if settings.DB_PGBOUNCER_MODE and settings.DB_STATEMENT_TIMEOUT_MS:
+    # Costs one extra round-trip per transaction; prefer ALTER ROLE ... SET statement_timeout
+    _apply_transaction_statement_timeout(async_engine.sync_engine)
+
+# Pool metrics, exposed through /health/pool
+async_pool_metrics = PoolMetrics("async")
+async_pool_metrics.attach(async_engine.sync_engine.pool)
+read_pool_metrics = PoolMetrics("read")
+read_pool_metrics.attach(read_engine.sync_engine.pool)
+replica_pool_metrics = PoolMetrics("replica") if replica_engine is not None else None
+if replica_pool_metrics is not None:
+    replica_pool_metrics.attach(replica_engine.sync_engine.pool)
+sync_pool_metrics = PoolMetrics("sync")  # attached when the sync engine is first used
+
+# Query profiling hooks; inactive unless a profile is running
+for _engine in (async_engine.sync_engine, read_engine.sync_engine):
+    install_profiler(_engine)
+if replica_engine is not None:
+    install_profiler(replica_engine.sync_engine)
+
+# Sync engine for Alembic migrations, Celery tasks and scripts. Built on first
+# access (module __getattr__ below): API workers never use it, and creating it
+# imports psycopg2.
+_sync_engine = None
+_SyncSessionLocal = None
+
+
+def _get_sync_engine():
+    """Create the sync engine and session factory on first use"""
+    global _sync_engine, _SyncSessionLocal
+
+    if _sync_engine is None:
+        engine = create_engine(
+            settings.DATABASE_URL,
+            echo=settings.DEBUG,
+            poolclass=InstrumentedQueuePool,
+            connect_args=_psycopg2_connect_args(),
+            **_pool_options(),
+        )
+        if settings.DB_PGBOUNCER_MODE and settings.DB_STATEMENT_TIMEOUT_MS:
+            _apply_transaction_statement_timeout(engine)
+        sync_pool_metrics.attach(engine.pool)
+        install_profiler(engine)
+
+        _SyncSessionLocal = sessionmaker(
+            autocommit=False,
+            autoflush=False,
+            bind=engine,
+        )
+        _sync_engine = engine
+
+    return _sync_engine
+
+
+def __getattr__(name: str):
+    if name == "sync_engine":
+        return _get_sync_engine()
+    if name == "SyncSessionLocal":
+        _get_sync_engine()
+        return _SyncSessionLocal
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Base class for models
 Base = declarative_base()
 
 
-async def get_db() -> AsyncSession:
+async def get_db(response: Response) -> AsyncSession:
     """Dependency for getting async database session"""
     async with AsyncSessionLocal() as session:
+        session.sync_session.info["response"] = response
         try:
             yield session
             await session.commit()
@@ -57,9 +241,61 @@ async def get_db() -> AsyncSession:
             await session.close()
 
 
+def _reads_pinned_to_primary(request: Request) -> bool:
+    """Whether the client wrote recently enough that a replica may not have its change"""
+    pinned_until = request.cookies.get(READ_YOUR_WRITES_COOKIE)
+    try:
+        return pinned_until is not None and float(pinned_until) > time.time()
+    except ValueError:
+        return False
+
+
+@asynccontextmanager
+async def read_session(request: Request) -> AsyncIterator[AsyncSession]:
+    """
+    Read-only session for a request, closed when the block ends
+
+    Sessions run in autocommit mode on connections whose transactions default
+    to READ ONLY, so a read pays no BEGIN/COMMIT round-trips. Each statement
+    sees its own snapshot. Reads go to the replica when one is configured,
+    unless it is unreachable or the client wrote within
+    READ_YOUR_WRITES_SECONDS, in which case they use the primary.
+    """
+    global _replica_retry_at
+
+    session = None
+    if (
+        ReplicaSessionLocal is not None
+        and time.monotonic() >= _replica_retry_at
+        and not _reads_pinned_to_primary(request)
+    ):
+        session = ReplicaSessionLocal()
+        try:
+            await session.connection()
+        except (DBAPIError, OSError):
+            await session.close()
+            session = None
+            _replica_retry_at = time.monotonic() + settings.REPLICA_RETRY_SECONDS
+
+    if session is None:
+        session = ReadSessionLocal()
+
+    try:
+        yield session
+    finally:
+        await session.close()
+
+
+async def get_read_db(request: Request) -> AsyncSession:
+    """Dependency for read-only endpoints: a read_session held for the request"""
+    async with read_session(request) as session:
+        yield session
+
+
 def get_sync_db():
     """Get sync database session for Celery tasks"""
-    db = SyncSessionLocal()
+    _get_sync_engine()
+    db = _SyncSessionLocal()
     try:
         yield db
         db.commit()
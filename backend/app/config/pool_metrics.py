@@ -0,0 +1,160 @@
+"""Connection pool instrumentation for the SQLAlchemy engines"""
+
+import threading
+import time
+from typing import Any, Dict, Sequence
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+# Bucket upper bounds in seconds
+WAIT_BUCKETS: Sequence[float] = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+AGE_BUCKETS: Sequence[float] = (1, 10, 60, 300, 900, 1800, 3600, 7200, 21600, 86400)
+
+
+class Histogram:
+    """Minimal cumulative histogram with fixed bucket bounds"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        """Record a single observation"""
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return cumulative bucket counts, Prometheus style"""
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        buckets["+Inf"] = self.count
+        return {"buckets": buckets, "sum": round(self.sum, 6), "count": self.count}
+
+
+class PoolMetrics:
+    """Counters and histograms collected from pool events"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.pool = None
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.max_overflow_seen = 0
+        self.wait_time = Histogram(WAIT_BUCKETS)
+        self.connection_age = Histogram(AGE_BUCKETS)
+
+    def observe_wait(self, seconds: float, timed_out: bool = False) -> None:
+        """Record how long a caller waited for a pooled connection"""
+        with self._lock:
+            self.wait_time.observe(seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def attach(self, pool) -> None:
+        """Register event listeners on a pool"""
+        self.pool = pool
+        if isinstance(pool, InstrumentedPoolMixin):
+            pool.metrics = self
+
+        @event.listens_for(pool, "connect")
+        def on_connect(dbapi_connection, connection_record):
+            connection_record.info["connected_at"] = time.monotonic()
+            with self._lock:
+                self.connects += 1
+
+        @event.listens_for(pool, "checkout")
+        def on_checkout(dbapi_connection, connection_record, connection_proxy):
+            connected_at = connection_record.info.get("connected_at")
+            overflow = max(self.pool.overflow(), 0) if hasattr(self.pool, "overflow") else 0
+            with self._lock:
+                self.checkouts += 1
+                if connected_at is not None:
+                    self.connection_age.observe(time.monotonic() - connected_at)
+                if overflow > self.max_overflow_seen:
+                    self.max_overflow_seen = overflow
+
+        @event.listens_for(pool, "checkin")
+        def on_checkin(dbapi_connection, connection_record):
+            with self._lock:
+                self.checkins += 1
+
+        @event.listens_for(pool, "invalidate")
+        def on_invalidate(dbapi_connection, connection_record, exception):
+            with self._lock:
+                self.invalidations += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the current pool state and collected metrics"""
+        pool = self.pool
+        state: Dict[str, Any] = {"pool": self.name}
+        if isinstance(pool, QueuePool):
+            state.update({
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "idle": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+                "max_overflow": pool._max_overflow,
+            })
+        with self._lock:
+            state.update({
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "max_overflow_seen": self.max_overflow_seen,
+                "wait_seconds": self.wait_time.snapshot(),
+                "connection_age_seconds": self.connection_age.snapshot(),
+            })
+        return state
+
+
+class InstrumentedPoolMixin:
+    """Times the blocking part of a checkout, where callers queue for a connection"""
+
+    metrics: PoolMetrics | None = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            if self.metrics is not None:
+                self.metrics.observe_wait(time.perf_counter() - start, timed_out=timed_out)
+
+    def recreate(self):
+        # engine.dispose() swaps in a fresh pool; keep reporting into the same metrics
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        if self.metrics is not None:
+            self.metrics.pool = pool
+        return pool
+
+
+class InstrumentedQueuePool(InstrumentedPoolMixin, QueuePool):
+    """QueuePool with checkout wait timing"""
+
+
+class InstrumentedAsyncQueuePool(InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool with checkout wait timing"""
@@ -0,0 +1,28 @@
+"""Shared Redis client"""
+
+from app.config.settings import settings
+
+_client = None
+
+
+def get_redis():
+    """
+    Process-wide redis.asyncio client, created on first use
+
+    redis.asyncio costs ~0.1s to import, so workers only pay for it when a
+    feature actually talks to Redis.
+    """
+    global _client
+    if _client is None:
+        from redis import asyncio as aioredis
+
+        _client = aioredis.from_url(settings.REDIS_URL, health_check_interval=30)
+    return _client
+
+
+async def close_redis() -> None:
+    """Close the shared client's connections, if it was ever created"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -1,4 +1,4 @@
-from typing import List
+from typing import Any, Dict, List, Tuple
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -12,6 +12,25 @@ class Settings(BaseSettings):
 
     # Database
     DATABASE_URL: str
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30.0  # Seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = -1  # Seconds before a connection is replaced, -1 disables
+    DB_POOL_PRE_PING: bool = True  # Ping on every checkout; disable when relying on DB_POOL_RECYCLE
+    DB_STATEMENT_CACHE_SIZE: int = 100  # asyncpg prepared statements cached per connection
+    DB_STATEMENT_TIMEOUT_MS: int = 0  # Server-side statement_timeout, 0 disables
+    DB_PGBOUNCER_MODE: bool = False  # PgBouncer transaction pooling compatibility
+    DATABASE_REPLICA_URL: str | None = None  # Optional read replica for read-only endpoints
+    REPLICA_RETRY_SECONDS: int = 30  # How long to skip an unreachable replica
+    READ_YOUR_WRITES_SECONDS: int = 5  # Reads stay on the primary this long after a write
+    DB_CREATE_TABLES_ON_STARTUP: bool = False  # Development only: create_all instead of migrations
+
+    # Monthly partitions of messages and message_history
+    PARTITION_MAINTENANCE_ENABLED: bool = True  # Workers create upcoming partitions in the background
+    PARTITION_MAINTENANCE_INTERVAL_SECONDS: float = 6 * 3600
+    PARTITION_PREMAKE_MONTHS: int = 3  # Months ahead of the current one to keep partitions for
+    PARTITION_RETENTION_MONTHS: int = 24  # Older partitions are archive candidates
+    PARTITION_ARCHIVE_DIR: str = "archive"
 
     # Redis
     REDIS_URL: str
@@ -24,9 +43,45 @@ class Settings(BaseSettings):
 
     # OpenAI API
     OPENAI_API_KEY: str
+    OPENAI_BASE_URL: str | None = None  # e.g. a local stub for load tests
     DEFAULT_AI_MODEL: str = "gpt-4o"
     MAX_TOKENS: int = 1000
     AI_TEMPERATURE: float = 0.7
+    AI_BACKEND: str = "openai"  # openai | mock
+
+    # Model routing (see app/services/model_routing.py); JSON in the environment
+    AI_ROUTES: Dict[str, Dict[str, Any]] = {
+        "premium": {"model": "gpt-4o", "temperature": 0.7, "max_tokens": 1000},
+        "standard": {"model": "gpt-4o-mini", "temperature": 0.7, "max_tokens": 600},
+    }
+    AI_ROUTING_RULES: List[Dict[str, Any]] = [  # First match wins; keys: segment, occasion, lane, route, pinned
+        {"segment": ["VIP", "partner"], "route": "premium", "pinned": True},
+        {"lane": "interactive", "route": "premium"},
+    ]
+    AI_DEFAULT_ROUTE: str = "standard"
+    AI_ROUTE_DOWNGRADES: Dict[str, str] = {"premium": "standard"}  # Applied under quota pressure
+    AI_ROUTING_PRESSURE_QUEUE_DEPTH: int = 16  # Interactive calls waiting for a slot
+    AI_ROUTING_PRESSURE_RATE_LIMITS: int = 5  # Rate-limit errors in the last minute
+    AI_MODEL_PRICING: Dict[str, Tuple[float, ...]] = {  # USD per 1M input, output, cached input tokens
+        "gpt-4o": (2.5, 10.0, 1.25),
+        "gpt-4o-mini": (0.15, 0.6, 0.075),
+    }
+    AI_RATE_LIMITS: Dict[str, Tuple[int, int]] = {  # Provider requests and tokens per minute, for campaign estimates
+        "gpt-4o": (5000, 800_000),
+        "gpt-4o-mini": (5000, 4_000_000),
+    }
+    CAMPAIGN_ESTIMATE_TIKTOKEN: bool = True  # Load tiktoken encodings at startup; set TIKTOKEN_CACHE_DIR offline
+    CAMPAIGN_ESTIMATE_OUTPUT_TOKENS: int = 120  # Per message, until routes have generation history
+    CAMPAIGN_ESTIMATE_LATENCY_SECONDS: float = 2.5  # Per call, until routes have generation history
+
+    # Mock LLM backend (AI_BACKEND=mock) for offline load and soak tests
+    MOCK_LLM_LATENCY_MS: float = 800.0  # median
+    MOCK_LLM_LATENCY_DISTRIBUTION: str = "lognormal"  # fixed | uniform | normal | lognormal
+    MOCK_LLM_LATENCY_SIGMA: float = 0.5
+    MOCK_LLM_OUTPUT_TOKENS: int = 120
+    MOCK_LLM_ERROR_RATE: float = 0.0
+    MOCK_LLM_RATE_LIMIT_RATE: float = 0.0  # fraction of calls answered with 429
+    MOCK_LLM_SEED: int = 42
 
     # Celery
     CELERY_BROKER_URL: str
@@ -42,6 +97,102 @@ class Settings(BaseSettings):
     # CORS
     CORS_ORIGINS: str = "http://localhost:5173,http://localhost:3000"
 
+    # Metrics
+    METRICS_ENABLED: bool = True
+    METRICS_SAMPLE_INTERVAL_SECONDS: float = 15.0  # Queue depth sampling period
+    EVENT_LOOP_LAG_INTERVAL_SECONDS: float = 0.5
+
+    # SQL profiling (development and staging)
+    SQL_PROFILING_ENABLED: bool = False
+    SLOW_QUERY_MS: float = 200.0
+    SQL_EXPLAIN_SLOW_QUERIES: bool = False  # Re-runs slow SELECTs under EXPLAIN (ANALYZE, BUFFERS)
+    SQL_N_PLUS_ONE_THRESHOLD: int = 5  # Same SELECT shape this many times in one request
+
+    # Real-time events (server-sent events fanned out through Redis pub/sub)
+    EVENTS_ENABLED: bool = True
+    EVENTS_QUEUE_SIZE: int = 256  # Events buffered per stream before a slow client is dropped
+    EVENTS_MAX_SUBSCRIBERS: int = 5000  # Streams per worker
+    EVENTS_KEEPALIVE_SECONDS: float = 15.0  # Comment frame on idle streams, so proxies keep them open
+    EVENTS_RETRY_MS: int = 3000  # Client reconnect delay
+
+    # HTTP caching (ETags and conditional GETs)
+    HTTP_CACHE_ENABLED: bool = True  # Remember ETags in Redis to answer 304 without querying
+    HTTP_CACHE_VALIDATOR_TTL_SECONDS: int = 3600  # Upper bound on serving a validator after an uninvalidated write
+    HTTP_CACHE_ANALYTICS_MAX_AGE_SECONDS: int = 30
+
+    # Campaign scheduler (recurring and scheduled campaigns)
+    SCHEDULER_ENABLED: bool = True  # Every worker may run it; runs are claimed exactly once in the database
+    SCHEDULER_SYNC_SECONDS: float = 30.0  # How often campaign changes are picked up
+    SCHEDULER_FULL_SYNC_SECONDS: float = 3600.0  # Rebuild the schedule, dropping deleted campaigns
+    SCHEDULER_CATCHUP_SECONDS: int = 300  # Fires missed while no scheduler ran are still run if this recent
+
+    # Audience preview
+    AUDIENCE_PREVIEW_EXACT_THRESHOLD: int = 20000  # Count exactly when the planner expects fewer matches
+    AUDIENCE_PREVIEW_SAMPLE_PERCENT: float = 1.0  # Share of contact pages read to estimate larger audiences
+    AUDIENCE_PREVIEW_MIN_SAMPLE_MATCHES: int = 200  # Below this many sampled matches, count exactly instead
+    AUDIENCE_PREVIEW_SAMPLE_SIZE: int = 10  # Matching contacts returned with a preview
+    AUDIENCE_PREVIEW_CACHE_SECONDS: int = 300  # Contact writes also clear cached previews
+    AUDIENCE_PREVIEW_DEFAULT_MESSAGE_COST_USD: float = 0.002  # Used until AI messages have been generated
+
+    # Contact deduplication
+    DEDUPE_MATCH_THRESHOLD: float = 0.8  # Pairs scoring at least this are reported as the same person
+    DEDUPE_MAX_BLOCK_SIZE: int = 200  # Larger blocks are compared by sorted neighbourhood, not all pairs
+    DEDUPE_WINDOW: int = 10  # Neighbours each contact is compared with in a large block
+    DEDUPE_BATCH_SIZE: int = 5000  # Contacts fetched per round trip while scanning
+    DEDUPE_REPORT_MAX_CLUSTERS: int = 1000
+
+    # Idempotency keys (POST /messages/generate and /messages/{id}/send)
+    IDEMPOTENCY_ENABLED: bool = True
+    IDEMPOTENCY_TTL_SECONDS: int = 86400  # How long a completed response is replayed for its key
+    IDEMPOTENCY_LOCK_SECONDS: int = 120  # In-progress claim; outlives the slowest request, expires if a worker dies
+    IDEMPOTENCY_WAIT_SECONDS: float = 30.0  # A duplicate waits this long for the first request, then gets 409
+    IDEMPOTENCY_POLL_SECONDS: float = 0.05
+
+    # Generation coalescing (identical in-flight prompts share one upstream call)
+    GENERATION_COALESCING_ENABLED: bool = True
+    GENERATION_COALESCING_REDIS: bool = False  # Also across workers, through a Redis lock per prompt
+    GENERATION_COALESCING_LOCK_SECONDS: float = 60.0  # Outlives the slowest call; expires if its worker dies
+    GENERATION_COALESCING_RESULT_SECONDS: float = 10.0  # Published results are kept this long for pollers
+    GENERATION_COALESCING_POLL_SECONDS: float = 0.05
+
+    # Generation circuit breaker and hedged requests
+    AI_REQUEST_TIMEOUT_SECONDS: float = 30.0  # Per upstream call
+    AI_BREAKER_ENABLED: bool = True
+    AI_BREAKER_WINDOW: int = 20  # Recent calls the error and slow rates are taken over
+    AI_BREAKER_MIN_CALLS: int = 10  # Calls in the window before the circuit may open
+    AI_BREAKER_ERROR_RATE: float = 0.5  # Failed share of the window that opens the circuit
+    AI_BREAKER_SLOW_RATE: float = 0.8  # Slow share of the window that opens the circuit
+    AI_BREAKER_SLOW_CALL_SECONDS: float = 15.0
+    AI_BREAKER_OPEN_SECONDS: float = 30.0  # Calls fail fast to the fallback message, then one probe is tried
+    AI_HEDGING_ENABLED: bool = False
+    AI_HEDGE_QUANTILE: float = 0.95  # A call still running after this latency quantile gets a second call
+    AI_HEDGE_MIN_SAMPLES: int = 20  # Successful calls observed before hedging starts
+    AI_HEDGE_LATENCY_WINDOW: int = 200
+    AI_HEDGE_BUDGET_PERCENT: float = 5.0  # Most of the last AI_HEDGE_BUDGET_WINDOW calls that may be hedged
+    AI_HEDGE_BUDGET_WINDOW: int = 100
+
+    # Generation lanes (interactive before bulk, fair share within each)
+    GENERATION_CONCURRENCY: int = 64  # Upstream generation calls in flight per worker
+    GENERATION_INTERACTIVE_RESERVED: int = 8  # Of those, slots campaign (bulk) generations never take
+    GENERATION_MAX_CANDIDATES: int = 5  # Variants one generate request may ask for, in a single call
+
+    # Pre-generation of birthday and holiday messages (see app/services/pregeneration.py)
+    PREGENERATION_ENABLED: bool = False
+    PREGENERATION_USER_EMAIL: str = ""  # Pre-generated messages are created by this user
+    PREGENERATION_TIMEZONE: str = "Asia/Tashkent"  # Local days, send hour and off-peak hours
+    PREGENERATION_HORIZON_DAYS: int = 45
+    PREGENERATION_MAX_ADVANCE_DAYS: int = 30  # Generated at most this long before sending
+    PREGENERATION_LEAD_DAYS: int = 3  # Waiting for approval at least this long before sending
+    PREGENERATION_SEND_HOUR: int = 9
+    PREGENERATION_OFF_PEAK_HOURS: List[int] = [0, 1, 2, 3, 4, 5, 6, 22, 23]
+    PREGENERATION_HOURLY_QUOTA: int = 2000  # Generations an hour, a share of the provider rate limit
+    PREGENERATION_BATCH_SIZE: int = 50
+    PREGENERATION_CALENDARS: Dict[str, List[str]] = {"ru": ["RU"], "uz": ["UZ"], "en": []}  # Holidays by language
+    PREGENERATION_EXTRA_HOLIDAYS: List[Dict[str, str]] = []  # {"date": "2027-03-10", "name": ..., "calendar": "UZ"}
+
+    # Campaign statistics
+    CAMPAIGN_STAT_SHARDS: int = 16  # Counter rows per statistic; more shards, less lock contention
+
     # Pagination
     DEFAULT_PAGE_SIZE: int = 20
     MAX_PAGE_SIZE: int = 100
@@ -1,15 +1,42 @@
 """Main FastAPI application"""
 
-from fastapi import FastAPI
+import asyncio
+
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
 from app.config.settings import settings
-from app.config.database import async_engine
+from app.config.database import (
+    async_engine,
+    read_engine,
+    replica_engine,
+    async_pool_metrics,
+    read_pool_metrics,
+    replica_pool_metrics,
+    sync_pool_metrics,
+    ReadSessionLocal,
+    AsyncSessionLocal,
+)
 from app.models import Base
+from app.utils.metrics import (
+    PrometheusMiddleware,
+    track_queries,
+    register_pool_metrics,
+    monitor_event_loop_lag,
+    sample_queue_depths,
+)
+from app.utils.sql_profiler import SQLProfilerMiddleware
+from app.config.redis import close_redis
+from app.services.partitions import maintain_partitions
+from app.services.events import broker
+from app.services.scheduler import CampaignScheduler
+from app.services.pregeneration import Pregenerator
+from app.services.campaign_estimate import load_tokenizers
 
 # Import routers
-from app.api import auth, contacts, messages, campaigns, analytics
+from app.api import auth, contacts, messages, campaigns, analytics, events
 
 
 @asynccontextmanager
@@ -20,16 +47,43 @@ async def lifespan(app: FastAPI):
     print(f"Environment: {settings.ENVIRONMENT}")
 
     # Create tables (in production, use Alembic migrations)
-    if settings.DEBUG:
+    if settings.DB_CREATE_TABLES_ON_STARTUP:
         async with async_engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
         print("Database tables created")
 
+    background_tasks = []
+    if settings.METRICS_ENABLED:
+        background_tasks += [
+            asyncio.create_task(monitor_event_loop_lag(settings.EVENT_LOOP_LAG_INTERVAL_SECONDS)),
+            asyncio.create_task(sample_queue_depths(ReadSessionLocal, settings.METRICS_SAMPLE_INTERVAL_SECONDS)),
+        ]
+    if settings.PARTITION_MAINTENANCE_ENABLED:
+        background_tasks.append(
+            asyncio.create_task(maintain_partitions(async_engine, settings.PARTITION_MAINTENANCE_INTERVAL_SECONDS))
+        )
+    if settings.EVENTS_ENABLED:
+        background_tasks.append(asyncio.create_task(broker.listen()))
+    if settings.SCHEDULER_ENABLED:
+        background_tasks.append(asyncio.create_task(CampaignScheduler(AsyncSessionLocal).run()))
+    if settings.PREGENERATION_ENABLED:
+        background_tasks.append(asyncio.create_task(Pregenerator(AsyncSessionLocal).run()))
+    if settings.CAMPAIGN_ESTIMATE_TIKTOKEN:
+        # May download the encoding files; estimates count approximately until it is done
+        background_tasks.append(asyncio.create_task(asyncio.to_thread(load_tokenizers)))
+
     yield
 
     # Shutdown
     print("Shutting down...")
+    for task in background_tasks:
+        task.cancel()
+    broker.resync_all()  # End open event streams so the server can stop
+    await close_redis()
     await async_engine.dispose()
+    await read_engine.dispose()
+    if replica_engine is not None:
+        await replica_engine.dispose()
 
 
 # Create FastAPI app
@@ -50,8 +104,19 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
+if settings.METRICS_ENABLED:
+    app.add_middleware(PrometheusMiddleware)
+    for engine in (async_engine, read_engine, replica_engine):
+        if engine is not None:
+            track_queries(engine.sync_engine)
+    register_pool_metrics(async_pool_metrics, read_pool_metrics, replica_pool_metrics, sync_pool_metrics)
+
+if settings.SQL_PROFILING_ENABLED:
+    app.add_middleware(SQLProfilerMiddleware)
+
 
 # Health check endpoint
 @app.get("/")
@@ -74,12 +139,30 @@ async def health_check():
     }
 
 
+@app.get("/health/pool")
+async def pool_health():
+    """Database connection pool metrics"""
+    return {
+        "async": async_pool_metrics.snapshot(),
+        "read": read_pool_metrics.snapshot(),
+        "replica": replica_pool_metrics.snapshot() if replica_pool_metrics else None,
+        "sync": sync_pool_metrics.snapshot(),
+    }
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
 # Include routers
 app.include_router(auth.router, prefix="/api")
 app.include_router(contacts.router, prefix="/api")
 app.include_router(messages.router, prefix="/api")
 app.include_router(campaigns.router, prefix="/api")
 app.include_router(analytics.router, prefix="/api")
+app.include_router(events.router, prefix="/api")
 
 
 if __name__ == "__main__":
@@ -4,7 +4,9 @@ from app.config.database import Base
 from app.models.user import User, UserRole
 from app.models.contact import Contact, ContactSegment, Language
 from app.models.message import Message, MessageHistory, MessageStatus, OccasionType, GeneratedBy
-from app.models.campaign import Campaign, CampaignStatus, ScheduleType
+from app.models.campaign import (
+    Campaign, CampaignRun, CampaignRunStatus, CampaignStatCounter, CampaignStatus, ScheduleType
+)
 from app.models.template import Template
 
 __all__ = [
@@ -20,6 +22,9 @@ __all__ = [
     "OccasionType",
     "GeneratedBy",
     "Campaign",
+    "CampaignRun",
+    "CampaignRunStatus",
+    "CampaignStatCounter",
     "CampaignStatus",
     "ScheduleType",
     "Template",
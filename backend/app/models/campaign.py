@@ -1,6 +1,8 @@
 from datetime import datetime
 from uuid import uuid4
-from sqlalchemy import Column, String, DateTime, ForeignKey, Enum, Text
+from sqlalchemy import (
+    Column, String, DateTime, ForeignKey, Enum, Text, BigInteger, SmallInteger, Boolean, UniqueConstraint
+)
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
 import enum
@@ -24,6 +26,14 @@ class CampaignStatus(str, enum.Enum):
     COMPLETED = "completed"
 
 
+class CampaignRunStatus(str, enum.Enum):
+    """Campaign run status"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
 class Campaign(Base):
     """Campaign model for bulk message operations"""
 
@@ -37,14 +47,60 @@ class Campaign(Base):
     schedule_type = Column(Enum(ScheduleType), default=ScheduleType.IMMEDIATE, nullable=False)
     scheduled_at = Column(DateTime, nullable=True)
     recurrence_rule = Column(String, nullable=True)  # Cron expression
+    timezone = Column(String, default="UTC", nullable=False)  # IANA zone recurrence_rule is evaluated in
     status = Column(Enum(CampaignStatus), default=CampaignStatus.DRAFT, nullable=False, index=True)
     created_by = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
-    stats = Column(JSONB, default=dict, nullable=True)  # generated_count, sent_count, etc.
+    stats = Column(JSONB, default=dict, nullable=True)  # Legacy snapshot; live counts are in campaign_stat_counters
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    # Indexed for the scheduler's incremental sync
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False, index=True)
 
     # Relationships
     creator = relationship("User", foreign_keys=[created_by])
 
     def __repr__(self):
         return f"<Campaign {self.name} - {self.status}>"
+
+
+class CampaignStatCounter(Base):
+    """
+    One shard of a campaign statistic (generated_count, sent_count, ...)
+
+    Writers add to a random shard, so concurrent increments rarely wait on
+    the same row lock; the statistic is the sum over its shards.
+    """
+
+    __tablename__ = "campaign_stat_counters"
+
+    campaign_id = Column(UUID(as_uuid=True), ForeignKey("campaigns.id", ondelete="CASCADE"), primary_key=True)
+    metric = Column(String, primary_key=True)
+    shard = Column(SmallInteger, primary_key=True)
+    value = Column(BigInteger, default=0, nullable=False)
+
+    def __repr__(self):
+        return f"<CampaignStatCounter {self.campaign_id} {self.metric}[{self.shard}] = {self.value}>"
+
+
+class CampaignRun(Base):
+    """
+    One execution of a campaign, fired by the scheduler or started manually
+
+    The unique (campaign_id, scheduled_for) pair is what makes scheduled
+    fires exactly-once: every scheduler replica tries the insert, one wins.
+    """
+
+    __tablename__ = "campaign_runs"
+    __table_args__ = (
+        UniqueConstraint("campaign_id", "scheduled_for", name="uq_campaign_runs_campaign_id_scheduled_for"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4)
+    campaign_id = Column(UUID(as_uuid=True), ForeignKey("campaigns.id", ondelete="CASCADE"), nullable=False)
+    scheduled_for = Column(DateTime, nullable=False)  # UTC fire time; request time for manual runs
+    trigger = Column(String, nullable=False)  # schedule | manual
+    status = Column(Enum(CampaignRunStatus), default=CampaignRunStatus.QUEUED, nullable=False, index=True)
+    test_mode = Column(Boolean, default=False, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<CampaignRun {self.campaign_id} @ {self.scheduled_for} - {self.status}>"
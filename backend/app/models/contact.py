@@ -1,6 +1,6 @@
 from datetime import datetime, date
 from uuid import uuid4
-from sqlalchemy import Column, String, DateTime, Date, ForeignKey, Enum
+from sqlalchemy import Column, String, DateTime, Date, ForeignKey, Enum, Index, extract, literal
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
 import enum
@@ -39,7 +39,7 @@ class Contact(Base):
     language = Column(Enum(Language), default=Language.RU, nullable=False)
     tags = Column(JSONB, default=list, nullable=True)
     custom_fields = Column(JSONB, default=dict, nullable=True)
-    last_interaction_date = Column(DateTime, nullable=True)
+    last_interaction_date = Column(DateTime, nullable=True, index=True)
     created_by = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
@@ -49,3 +49,20 @@ class Contact(Base):
 
     def __repr__(self):
         return f"<Contact {self.name} ({self.email})>"
+
+
+# Birthday as month * 100 + day, so windows across years are integer ranges.
+# The 100 is rendered inline: as a bound parameter, queries would not match the index.
+birthday_month_day = (
+    extract("month", Contact.birthday) * literal(100, literal_execute=True) + extract("day", Contact.birthday)
+)
+
+# Segment filters (app.services.segments) are written to be answered by these
+Index("ix_contacts_birthday_month_day", birthday_month_day)
+Index("ix_contacts_tags", Contact.tags, postgresql_using="gin", postgresql_ops={"tags": "jsonb_path_ops"})
+Index(
+    "ix_contacts_custom_fields",
+    Contact.custom_fields,
+    postgresql_using="gin",
+    postgresql_ops={"custom_fields": "jsonb_path_ops"},
+)
@@ -34,12 +34,14 @@ class GeneratedBy(str, enum.Enum):
 
 
 class Message(Base):
-    """Message model for CRM communications"""
+    """Message model for CRM communications, range-partitioned by created_at month"""
 
     __tablename__ = "messages"
+    __table_args__ = {"postgresql_partition_by": "RANGE (created_at)"}
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4, index=True)
     contact_id = Column(UUID(as_uuid=True), ForeignKey("contacts.id"), nullable=False, index=True)
+    campaign_id = Column(UUID(as_uuid=True), ForeignKey("campaigns.id", ondelete="SET NULL"), nullable=True, index=True)
     occasion_type = Column(Enum(OccasionType), nullable=False, index=True)
     content = Column(Text, nullable=False)
     status = Column(Enum(MessageStatus), default=MessageStatus.DRAFT, nullable=False, index=True)
@@ -50,7 +52,8 @@ class Message(Base):
     approved_at = Column(DateTime, nullable=True)
     scheduled_for = Column(DateTime, nullable=True, index=True)
     message_metadata = Column(JSONB, default=dict, nullable=True)  # AI model version, tokens, etc.
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Partition key; unique constraints on a partitioned table must include it
+    created_at = Column(DateTime, default=datetime.utcnow, primary_key=True, index=True)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
     # Relationships
@@ -63,21 +66,24 @@ class Message(Base):
 
 
 class MessageHistory(Base):
-    """Message audit trail"""
+    """Message audit trail, range-partitioned by created_at month"""
 
     __tablename__ = "message_history"
+    __table_args__ = {"postgresql_partition_by": "RANGE (created_at)"}
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4, index=True)
-    message_id = Column(UUID(as_uuid=True), ForeignKey("messages.id"), nullable=False, index=True)
+    # No foreign key: messages.id alone is not unique across partitions
+    message_id = Column(UUID(as_uuid=True), nullable=False, index=True)
     action = Column(String, nullable=False)  # created, edited, approved, rejected, sent
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
     old_content = Column(Text, nullable=True)
     new_content = Column(Text, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, primary_key=True)
 
     # Relationships
-    message = relationship("Message", foreign_keys=[message_id])
+    message = relationship("Message", primaryjoin="foreign(MessageHistory.message_id) == Message.id")
     user = relationship("User", foreign_keys=[user_id])
 
     def __repr__(self):
         return f"<MessageHistory {self.action} - {self.created_at}>"
+
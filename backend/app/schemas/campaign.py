@@ -1,10 +1,26 @@
-from datetime import datetime
+from datetime import date, datetime
 from uuid import UUID
 from typing import Dict, List, Any
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator, model_validator
 
-from app.models.campaign import ScheduleType, CampaignStatus
+from app.models.campaign import ScheduleType, CampaignStatus, CampaignRunStatus
+from app.models.contact import ContactSegment, Language
 from app.models.message import OccasionType
+from app.services.cron import CronError, get_timezone, parse_cron
+from app.services.segments import validate_segment_filter
+
+
+def validate_recurrence_rule(value: str | None) -> str | None:
+    """Reject cron expressions the scheduler could not evaluate, or that never fire"""
+    if value is not None and parse_cron(value).next_fire(datetime.utcnow(), get_timezone("UTC")) is None:
+        raise CronError(f"{value!r} never fires")
+    return value
+
+
+def validate_timezone(value: str | None) -> str | None:
+    if value is not None:
+        get_timezone(value)
+    return value
 
 
 # Request schemas
@@ -17,6 +33,19 @@ class CampaignCreate(BaseModel):
     schedule_type: ScheduleType = ScheduleType.IMMEDIATE
     scheduled_at: datetime | None = None
     recurrence_rule: str | None = Field(None, max_length=100)
+    timezone: str = Field("UTC", max_length=64)  # IANA zone, e.g. Asia/Tashkent
+
+    _check_segment_filter = field_validator("segment_filter")(validate_segment_filter)
+    _check_recurrence_rule = field_validator("recurrence_rule")(validate_recurrence_rule)
+    _check_timezone = field_validator("timezone")(validate_timezone)
+
+    @model_validator(mode="after")
+    def check_schedule(self):
+        if self.schedule_type == ScheduleType.RECURRING and not self.recurrence_rule:
+            raise ValueError("Recurring campaigns need a recurrence_rule")
+        if self.schedule_type == ScheduleType.SCHEDULED and self.scheduled_at is None:
+            raise ValueError("Scheduled campaigns need a scheduled_at")
+        return self
 
 
 class CampaignUpdate(BaseModel):
@@ -28,8 +57,13 @@ class CampaignUpdate(BaseModel):
     schedule_type: ScheduleType | None = None
     scheduled_at: datetime | None = None
     recurrence_rule: str | None = Field(None, max_length=100)
+    timezone: str | None = Field(None, max_length=64)
     status: CampaignStatus | None = None
 
+    _check_segment_filter = field_validator("segment_filter")(validate_segment_filter)
+    _check_recurrence_rule = field_validator("recurrence_rule")(validate_recurrence_rule)
+    _check_timezone = field_validator("timezone")(validate_timezone)
+
 
 class CampaignFilter(BaseModel):
     """Schema for filtering campaigns"""
@@ -50,6 +84,7 @@ class CampaignResponse(BaseModel):
     schedule_type: ScheduleType
     scheduled_at: datetime | None
     recurrence_rule: str | None
+    timezone: str
     status: CampaignStatus
     created_by: UUID
     stats: Dict[str, Any]
@@ -70,3 +105,115 @@ class CampaignListResponse(BaseModel):
 class CampaignExecute(BaseModel):
     """Schema for executing a campaign"""
     test_mode: bool = False  # If True, only generate but don't send
+
+
+class CampaignRunResponse(BaseModel):
+    """Schema for a campaign run"""
+    id: UUID
+    campaign_id: UUID
+    scheduled_for: datetime
+    trigger: str
+    status: CampaignRunStatus
+    test_mode: bool
+    created_at: datetime
+
+    model_config = {"from_attributes": True}
+
+
+class AudiencePreviewRequest(BaseModel):
+    """Schema for previewing a segment filter's audience"""
+    segment_filter: Dict[str, Any] = Field(default_factory=dict)
+
+    _check_segment_filter = field_validator("segment_filter")(validate_segment_filter)
+
+
+class AudienceContact(BaseModel):
+    """A matching contact shown with a preview"""
+    id: UUID
+    name: str
+    email: str
+    segment: ContactSegment
+    language: Language
+
+
+class AudiencePreviewResponse(BaseModel):
+    """Schema for an audience preview"""
+    total: int
+    exact: bool  # False when scaled up from a sample
+    method: str  # exact | sample
+    planner_estimate: int
+    by_language: Dict[str, int]
+    estimated_cost_usd: float
+    sample: List[AudienceContact]
+    computed_at: datetime
+    cached: bool
+
+
+class PregenerationOccasion(BaseModel):
+    """One occasion's demand and how much of it the plan places"""
+    name: str
+    occasion_type: OccasionType
+    language: Language
+    send_at: datetime
+    ready_by: datetime
+    count: int
+    scheduled: int
+    late: int  # Placed after ready_by, in any hour
+    unscheduled: int
+
+
+class PregenerationDay(BaseModel):
+    day: date  # In the plan's timezone
+    generations: int
+
+
+class PregenerationHour(BaseModel):
+    hour: datetime
+    generations: int
+    off_peak: bool
+
+
+class PregenerationPlanResponse(BaseModel):
+    """Dry run of birthday and holiday pre-generation: nothing is generated"""
+    start: datetime
+    end: datetime
+    timezone: str
+    hourly_quota: int
+    demand: int
+    scheduled: int
+    late: int
+    unscheduled: int
+    peak_hour_load: int
+    on_demand_peak: int  # Busiest send time, if everything were generated when due
+    occasions: List[PregenerationOccasion]
+    daily: List[PregenerationDay]
+    load_curve: List[PregenerationHour]
+
+
+class CampaignEstimateModel(BaseModel):
+    """Estimated calls, tokens and cost of one model"""
+    model: str
+    calls: int
+    input_tokens: int
+    cached_tokens: int
+    output_tokens: int
+    cost_usd: float
+
+
+class CampaignEstimateResponse(BaseModel):
+    """Dry run of a campaign's generation: nothing is generated"""
+    campaign_id: UUID
+    occasion_type: OccasionType
+    tone: str
+    tokenizer: Dict[str, str]  # Per model: tiktoken encoding, or approximate
+    contacts: int
+    input_tokens: int
+    cached_tokens: int
+    output_tokens: int
+    cost_usd: float
+    concurrency: int  # Bulk generation slots of one worker
+    duration_seconds: float
+    peak_rpm: int
+    peak_tpm: int
+    limited_by: str | None  # concurrency, or a model's requests or tokens per minute
+    by_model: List[CampaignEstimateModel]
@@ -35,6 +35,11 @@ class ContactUpdate(BaseModel):
     custom_fields: Dict[str, Any] | None = None
 
 
+class ContactMerge(BaseModel):
+    """Schema for merging duplicates into a contact"""
+    duplicate_ids: List[UUID] = Field(..., min_length=1, max_length=100)
+
+
 class ContactFilter(BaseModel):
     """Schema for filtering contacts"""
     segment: ContactSegment | None = None
@@ -73,3 +78,27 @@ class ContactListResponse(BaseModel):
     total: int
     skip: int
     limit: int
+
+
+class ContactMergeResponse(BaseModel):
+    """Schema for a completed merge"""
+    contact: ContactResponse
+    merged_ids: List[UUID]
+    messages_moved: int
+
+
+class DuplicateCluster(BaseModel):
+    """Contacts that are likely the same person"""
+    contact_ids: List[UUID]
+    score: float  # Weakest pairwise match in the cluster
+    suggested_primary: UUID
+
+
+class DuplicateReport(BaseModel):
+    """Schema for the latest duplicate scan"""
+    generated_at: datetime
+    contacts_scanned: int
+    cluster_count: int
+    duplicate_contacts: int
+    duration_seconds: float
+    clusters: List[DuplicateCluster]
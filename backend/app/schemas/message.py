@@ -1,8 +1,9 @@
 from datetime import datetime
 from uuid import UUID
 from typing import Dict, List, Any
-from pydantic import BaseModel, Field
+from pydantic import AliasChoices, BaseModel, Field
 
+from app.config.settings import settings
 from app.models.message import OccasionType, MessageStatus, GeneratedBy
 
 
@@ -10,14 +11,18 @@ from app.models.message import OccasionType, MessageStatus, GeneratedBy
 class MessageGenerate(BaseModel):
     """Schema for generating a new message with AI"""
     contact_id: UUID
+    campaign_id: UUID | None = None
     occasion_type: OccasionType
     custom_context: str | None = Field(None, max_length=500)
     tone: str = Field("professional_friendly", max_length=50)
+    # Alternates are kept in metadata["variants"] for POST /messages/{id}/variants/{index}
+    candidates: int = Field(1, ge=1, le=settings.GENERATION_MAX_CANDIDATES)
 
 
 class MessageCreate(BaseModel):
     """Schema for manually creating a message"""
     contact_id: UUID
+    campaign_id: UUID | None = None
     occasion_type: OccasionType
     content: str = Field(..., min_length=10, max_length=2000)
 
@@ -33,6 +38,7 @@ class MessageFilter(BaseModel):
     status: MessageStatus | None = None
     occasion_type: OccasionType | None = None
     contact_id: UUID | None = None
+    campaign_id: UUID | None = None
     generated_by: GeneratedBy | None = None
     search: str | None = None
     skip: int = Field(0, ge=0)
@@ -44,6 +50,7 @@ class MessageResponse(BaseModel):
     """Schema for message response"""
     id: UUID
     contact_id: UUID
+    campaign_id: UUID | None = None
     occasion_type: OccasionType
     content: str
     status: MessageStatus
@@ -53,7 +60,8 @@ class MessageResponse(BaseModel):
     sent_at: datetime | None
     approved_at: datetime | None
     scheduled_for: datetime | None
-    metadata: Dict[str, Any]
+    # The ORM column is message_metadata; Base.metadata is SQLAlchemy's MetaData
+    metadata: Dict[str, Any] = Field(validation_alias=AliasChoices("message_metadata", "metadata"))
     created_at: datetime
     updated_at: datetime
 
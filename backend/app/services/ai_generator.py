@@ -1,30 +1,123 @@
-"""AI message generation service using OpenAI API"""
+"""AI message generation service"""
 
-from openai import OpenAI
-from typing import Dict, Any, List
+import asyncio
+import dataclasses
+import hashlib
+import time
+from typing import Dict, Any, List, Tuple
 from datetime import datetime
 
 from app.config.settings import settings
 from app.models.contact import Contact
 from app.models.message import OccasionType
+from app.services.coalescing import SingleFlight
+from app.services.generation_scheduler import BULK, INTERACTIVE, GenerationScheduler
+from app.services.llm_backends import Completion, GenerationBackend, get_generation_backend
+from app.services.llm_resilience import ResilientBackend
+from app.services.model_routing import ModelRoute, ModelRouter, model_cost
 from app.utils.prompts import get_system_prompt, build_message_prompt
+from app.utils.metrics import OPENAI_REQUEST_DURATION, OPENAI_TOKENS, OPENAI_ERRORS
 
 
 class AIMessageGenerator:
-    """Service for generating personalized messages using OpenAI"""
+    """Service for generating personalized messages with the configured backend"""
 
-    def __init__(self):
-        self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
-        self.model = settings.DEFAULT_AI_MODEL
-        self.max_tokens = settings.MAX_TOKENS
-        self.temperature = settings.AI_TEMPERATURE
+    def __init__(self, backend: GenerationBackend | None = None, scheduler: GenerationScheduler | None = None):
+        self.backend = backend or get_generation_backend()
+        self.scheduler = scheduler or GenerationScheduler()
+        self.router = ModelRouter(self.scheduler)
+        if isinstance(self.backend, ResilientBackend):
+            # A hedge is a second upstream call; it needs a slot of its own
+            self.backend.scheduler = self.scheduler
+        self.flights = SingleFlight("generation", dataclasses.asdict, lambda data: Completion(**data))
 
-    def generate_personalized_message(
+    def prompt_key(
+        self, system_prompt: str, user_prompt: str, route: ModelRoute, n: int = 1, lane: str = INTERACTIVE
+    ) -> str:
+        """
+        Identity of a completion request: identical keys may share one upstream call
+
+        The lane is part of it: an interactive request must not wait for a
+        call queued behind a campaign in the bulk lane.
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        for part in (self.backend.name, lane, route.model, str(route.max_tokens), str(route.temperature), str(n),
+                     system_prompt, user_prompt):
+            digest.update(part.encode() + b"\0")
+        return digest.hexdigest()
+
+    async def complete(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        route: ModelRoute | None = None,
+        lane: str = INTERACTIVE,
+        owner: str = "",
+        n: int = 1,
+    ) -> Tuple[Completion, bool]:
+        """
+        Completion for a prompt pair, sharing any identical call already in flight
+
+        Args:
+            route: Model parameters; by default the route for `lane` alone
+            lane: Scheduler lane the upstream call waits in
+            owner: Fair-share key within the lane (user or campaign id)
+            n: Candidates to sample in the one call
+
+        Returns:
+            The completion, and whether it came from another caller's call
+        """
+        route = route or self.router.route(lane=lane)
+        if not settings.GENERATION_COALESCING_ENABLED:
+            return await self._call_backend(system_prompt, user_prompt, route, lane, owner, n), False
+        return await self.flights.do(
+            self.prompt_key(system_prompt, user_prompt, route, n, lane),
+            lambda: self._call_backend(system_prompt, user_prompt, route, lane, owner, n),
+        )
+
+    async def _call_backend(
+        self, system_prompt: str, user_prompt: str, route: ModelRoute, lane: str, owner: str, n: int = 1
+    ) -> Completion:
+        """One upstream call in its scheduler lane, with its latency, token and error metrics"""
+        async with self.scheduler.slot(lane, owner):
+            return await self._timed_call(system_prompt, user_prompt, route, n)
+
+    async def _timed_call(self, system_prompt: str, user_prompt: str, route: ModelRoute, n: int = 1) -> Completion:
+        start = time.perf_counter()
+        try:
+            completion = await self.backend.complete(
+                system_prompt,
+                user_prompt,
+                model=route.model,
+                max_tokens=route.max_tokens,
+                temperature=route.temperature,
+                n=n,
+            )
+        except Exception as e:
+            seconds = time.perf_counter() - start
+            OPENAI_REQUEST_DURATION.labels(route.model, "error").observe(seconds)
+            OPENAI_ERRORS.labels(route.model, type(e).__name__).inc()
+            self.router.observe(route, seconds, error=e)
+            raise
+
+        seconds = time.perf_counter() - start
+        OPENAI_REQUEST_DURATION.labels(route.model, "success").observe(seconds)
+        OPENAI_TOKENS.labels(route.model, "prompt").inc(completion.input_tokens)
+        OPENAI_TOKENS.labels(route.model, "completion").inc(completion.output_tokens)
+        OPENAI_TOKENS.labels(route.model, "cached").inc(completion.cached_tokens)
+        cost = model_cost(route.model, completion.input_tokens, completion.output_tokens, completion.cached_tokens)
+        self.router.observe(route, seconds, cost)
+        return completion
+
+    async def generate_personalized_message(
         self,
         contact: Contact,
         occasion_type: OccasionType,
         custom_context: str | None = None,
         tone: str = "professional_friendly",
+        lane: str = INTERACTIVE,
+        owner: str = "",
+        candidates: int = 1,
     ) -> Dict[str, Any]:
         """
         Generate a personalized message for a contact
@@ -34,6 +127,10 @@ class AIMessageGenerator:
             occasion_type: Type of occasion
             custom_context: Additional context for generation
             tone: Desired tone of the message
+            lane: INTERACTIVE for a user waiting on the result, BULK for campaigns
+            owner: Fair-share key within the lane (user or campaign id)
+            candidates: Variants to generate in one call; all of them are
+                listed in metadata["variants"], the first is the content
 
         Returns:
             Dictionary with generated message and metadata
@@ -51,35 +148,27 @@ class AIMessageGenerator:
                 language=contact.language
             )
 
-            # Call OpenAI API
-            response = self.client.chat.completions.create(
-                model=self.model,
-                max_tokens=self.max_tokens,
-                temperature=self.temperature,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ]
-            )
-
-            # Extract message content
-            message_content = response.choices[0].message.content.strip()
-
-            # Calculate cost estimate (approximate)
-            input_tokens = response.usage.prompt_tokens
-            output_tokens = response.usage.completion_tokens
+            route = self.router.route(contact.segment, occasion_type, lane)
+            started = time.perf_counter()
+            completion, coalesced = await self.complete(system_prompt, user_prompt, route, lane, owner, candidates)
+            latency_ms = round((time.perf_counter() - started) * 1000)
 
-            # Approximate costs (USD per 1M tokens) for GPT-4o
-            # GPT-4o: $2.50 input, $10.00 output (as of 2024)
-            input_cost = (input_tokens / 1_000_000) * 2.5
-            output_cost = (output_tokens / 1_000_000) * 10.0
-            total_cost = input_cost + output_cost
+            # Calculate cost estimate (AI_MODEL_PRICING)
+            message_content = completion.content
+            input_tokens = completion.input_tokens
+            output_tokens = completion.output_tokens
+            cached_tokens = completion.cached_tokens
+            total_cost = model_cost(route.model, input_tokens, output_tokens, cached_tokens)
 
             # Build metadata
             metadata = {
-                "model": self.model,
+                "model": route.model,
+                "route": route.name,
+                "latency_ms": latency_ms,
+                "backend": self.backend.name,
                 "input_tokens": input_tokens,
                 "output_tokens": output_tokens,
+                "cached_tokens": cached_tokens,
                 "total_tokens": input_tokens + output_tokens,
                 "cost_usd": round(total_cost, 6),
                 "tone": tone,
@@ -87,6 +176,15 @@ class AIMessageGenerator:
                 "generated_at": datetime.utcnow().isoformat(),
                 "occasion_type": occasion_type.value,
             }
+            if completion.alternates:
+                metadata["variants"] = [message_content, *completion.alternates]
+                metadata["active_variant"] = 0
+            if route.downgraded_from:
+                metadata["downgraded_from"] = route.downgraded_from
+            if coalesced:
+                # Shared another request's call: the tokens were billed once, there
+                metadata["coalesced"] = True
+                metadata["cost_usd"] = 0.0
 
             return {
                 "success": True,
@@ -99,46 +197,54 @@ class AIMessageGenerator:
             return {
                 "success": False,
                 "content": None,
-                "metadata": {"error_type": "api_error"},
-                "error": f"OpenAI API error: {str(e)}"
+                "metadata": {"error_type": "api_error", "exception": type(e).__name__},
+                "error": f"{self.backend.name} API error: {str(e)}"
             }
 
-    def batch_generate(
+    async def batch_generate(
         self,
         contacts: List[Contact],
         occasion_type: OccasionType,
         custom_context: str | None = None,
         tone: str = "professional_friendly",
+        owner: str = "",
     ) -> List[Dict[str, Any]]:
         """
-        Generate messages for multiple contacts
+        Generate messages for multiple contacts in the bulk lane
+
+        Calls run concurrently; the scheduler bounds them and keeps the
+        interactive lane ahead.
 
         Args:
             contacts: List of Contact objects
             occasion_type: Type of occasion
             custom_context: Additional context for generation
             tone: Desired tone of the message
+            owner: Fair-share key, usually the campaign id
 
         Returns:
-            List of dictionaries with results for each contact
+            List of dictionaries with results for each contact, in order
         """
-        results = []
-
-        for contact in contacts:
-            result = self.generate_personalized_message(
+        results = await asyncio.gather(*(
+            self.generate_personalized_message(
                 contact=contact,
                 occasion_type=occasion_type,
                 custom_context=custom_context,
-                tone=tone
+                tone=tone,
+                lane=BULK,
+                owner=owner,
             )
+            for contact in contacts
+        ))
 
-            results.append({
+        return [
+            {
                 "contact_id": str(contact.id),
                 "contact_name": contact.name,
                 **result
-            })
-
-        return results
+            }
+            for contact, result in zip(contacts, results)
+        ]
 
     def get_fallback_message(
         self,
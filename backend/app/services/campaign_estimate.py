@@ -0,0 +1,360 @@
+"""
+Campaign dry run: tokens, cost and wall-clock time, without calling the provider
+
+The campaign's audience is read and every contact's prompt is built the way
+AIMessageGenerator builds it, then counted with a local tokenizer: the
+tiktoken encodings load_tokenizers() loaded at startup, or about four
+characters a token while they are not loaded (tiktoken is not installed, or
+its encoding files could not be read or fetched; set TIKTOKEN_CACHE_DIR on
+hosts without internet access). Nothing is fetched during an estimate. The
+system prompt and static prefix are counted once per language; only the
+contact part is counted per contact, which keeps 100k contacts to a few
+seconds, off the event loop.
+
+Output tokens and latency per route come from recent generations, with
+CAMPAIGN_ESTIMATE_OUTPUT_TOKENS and CAMPAIGN_ESTIMATE_LATENCY_SECONDS until
+there is history. The calls are then replayed through a discrete-event
+simulation of one worker's bulk generation slots and the per-model
+AI_RATE_LIMITS (requests and tokens per minute, refilled continuously like
+the provider's limiter), giving the duration, peak RPM/TPM and what limits
+the run. The estimate assumes no quota pressure, so no route is downgraded.
+"""
+
+import asyncio
+import heapq
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config.settings import settings
+from app.models.campaign import Campaign
+from app.models.contact import Contact
+from app.models.message import GeneratedBy, Message, OccasionType
+from app.services.generation_scheduler import BULK
+from app.services.model_routing import ModelRouter, model_cost
+from app.services.segments import audience_query
+from app.utils.prompts import build_message_prompt, build_prompt_prefix, get_system_prompt
+
+# Chat format tokens around the system and user messages and the reply
+_CHAT_OVERHEAD_TOKENS = 7
+# The provider caches prompt prefixes from this length, in blocks of this size
+_CACHE_MIN_TOKENS = 1024
+_CACHE_BLOCK_TOKENS = 128
+_HISTORY = 1000
+
+
+# tiktoken encodings by model, filled by load_tokenizers()
+_encodings: Dict[str, Any] = {}
+
+
+def load_tokenizers() -> None:
+    """
+    Load the tiktoken encodings of the routed models
+
+    The first load reads the encoding file from TIKTOKEN_CACHE_DIR, or
+    downloads it; this blocks, so it runs in a thread at startup. Models
+    whose encoding cannot be loaded keep the approximate count.
+    """
+    try:
+        import tiktoken
+    except ImportError:
+        return
+
+    for model in {route.get("model", settings.DEFAULT_AI_MODEL) for route in settings.AI_ROUTES.values()}:
+        try:
+            try:
+                encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                encoding = tiktoken.get_encoding("o200k_base")
+            _encodings[model] = encoding
+        except Exception as e:
+            print(f"tiktoken encoding for {model} unavailable: {e}")
+
+
+class TokenCounter:
+    """
+    Counts prompt tokens for a model
+
+    Uses the model's tiktoken encoding once load_tokenizers() has loaded
+    it, otherwise approximates four characters a token; `name` says which.
+    """
+
+    def __init__(self, model: str):
+        encoding = _encodings.get(model)
+        self._encode = encoding.encode_ordinary if encoding is not None else None
+        self.name = f"tiktoken:{encoding.name}" if encoding is not None else "approximate"
+
+    def count(self, text: str) -> int:
+        if self._encode is not None:
+            return len(self._encode(text))
+        return (len(text) + 3) // 4
+
+
+@dataclass
+class PlannedCall:
+    """One generation call of the campaign, as the estimate expects it"""
+    model: str
+    input_tokens: int
+    cached_tokens: int
+    output_tokens: int
+    max_tokens: int
+    latency_seconds: float
+
+
+def cacheable_tokens(prefix_tokens: int) -> int:
+    """Tokens of a shared prefix the provider serves from its prompt cache"""
+    if prefix_tokens < _CACHE_MIN_TOKENS:
+        return 0
+    return prefix_tokens // _CACHE_BLOCK_TOKENS * _CACHE_BLOCK_TOKENS
+
+
+def plan_calls(
+    contacts: Iterable[Sequence[Any]],
+    occasion_type: OccasionType,
+    tone: str = "professional_friendly",
+    custom_context: str | None = None,
+    history: Dict[str, Tuple[float, float]] | None = None,
+) -> Tuple[List[PlannedCall], Dict[str, str]]:
+    """
+    Route and count the call each contact would make
+
+    Args:
+        contacts: (name, company, position, language, segment) rows
+        occasion_type: The campaign's occasion
+        tone: Message tone
+        custom_context: Additional context added to every prompt
+        history: Average (output_tokens, latency_seconds) by route name
+
+    Returns:
+        The calls in audience order, and the tokenizer used per model
+    """
+    history = history or {}
+    router = ModelRouter()
+    counters: Dict[str, TokenCounter] = {}
+    prefixes: Dict[Tuple[str, str], Tuple[str, int]] = {}
+    warm: set = set()
+    calls = []
+
+    for name, company, position, language, segment in contacts:
+        route = router.route(segment, occasion_type, BULK)
+        counter = counters.get(route.model)
+        if counter is None:
+            counter = counters[route.model] = TokenCounter(route.model)
+
+        # The system prompt and static prefix are the same for the language
+        key = (route.model, language.value)
+        if key not in prefixes:
+            prefix = build_prompt_prefix(occasion_type, tone, language.value)
+            prefixes[key] = prefix, counter.count(get_system_prompt(language.value)) + counter.count(prefix)
+        prefix, prefix_tokens = prefixes[key]
+
+        prompt = build_message_prompt(
+            contact_name=name,
+            occasion_type=occasion_type,
+            contact_company=company,
+            contact_position=position,
+            custom_context=custom_context,
+            tone=tone,
+            language=language,
+        )
+        if prompt.startswith(prefix):
+            input_tokens = prefix_tokens + counter.count(prompt[len(prefix):])
+        else:
+            input_tokens = counter.count(get_system_prompt(language.value)) + counter.count(prompt)
+        input_tokens += _CHAT_OVERHEAD_TOKENS
+
+        # The first call with a prefix puts it in the cache
+        cached_tokens = cacheable_tokens(prefix_tokens) if key in warm else 0
+        warm.add(key)
+
+        output_tokens, latency = history.get(
+            route.name, (settings.CAMPAIGN_ESTIMATE_OUTPUT_TOKENS, settings.CAMPAIGN_ESTIMATE_LATENCY_SECONDS)
+        )
+        calls.append(PlannedCall(
+            model=route.model,
+            input_tokens=input_tokens,
+            cached_tokens=cached_tokens,
+            output_tokens=min(round(output_tokens), route.max_tokens),
+            max_tokens=route.max_tokens,
+            latency_seconds=latency,
+        ))
+
+    return calls, {model: counter.name for model, counter in counters.items()}
+
+
+class _RateBucket:
+    """A per-minute limit refilled continuously, holding at most a second's worth"""
+
+    def __init__(self, per_minute: int):
+        self.rate = per_minute / 60.0
+        self.capacity = max(self.rate, 1.0)
+        self.level = self.capacity
+        self.at = 0.0
+
+    def ready(self, amount: float, now: float) -> float:
+        """Earliest time from now the bucket holds amount"""
+        amount = min(amount, self.capacity)
+        level = min(self.capacity, self.level + (now - self.at) * self.rate)
+        return now if level >= amount else now + (amount - level) / self.rate
+
+    def take(self, amount: float, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.at) * self.rate) - min(amount, self.capacity)
+        self.at = now
+
+
+def simulate(calls: Sequence[PlannedCall], concurrency: int,
+             rate_limits: Dict[str, Sequence[int]] | None = None) -> Dict[str, Any]:
+    """
+    Replay the calls through concurrency slots and per-model rate limits
+
+    Calls start in order, each when a slot is free and its model's request
+    and token buckets allow; tokens are charged as input plus max_tokens,
+    as the provider reserves them.
+
+    Args:
+        calls: The campaign's calls, in the order they are dispatched
+        concurrency: Calls in flight at once
+        rate_limits: (requests, tokens) per minute by model; unlisted
+            models are unlimited
+
+    Returns:
+        duration_seconds, peak_rpm, peak_tpm (by starts per minute of the
+        run) and limited_by: "concurrency", or the model and limit that
+        bounds the duration
+    """
+    rate_limits = settings.AI_RATE_LIMITS if rate_limits is None else rate_limits
+    concurrency = max(concurrency, 1)
+    slots = [0.0] * concurrency
+    buckets: Dict[str, Tuple[_RateBucket, _RateBucket]] = {
+        model: (_RateBucket(rpm), _RateBucket(tpm)) for model, (rpm, tpm) in rate_limits.items()
+    }
+    requests: Dict[int, int] = defaultdict(int)
+    tokens: Dict[int, int] = defaultdict(int)
+    charged: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+    last_start = finish = busy = 0.0
+
+    for call in calls:
+        start = max(heapq.heappop(slots), last_start)
+        limits = buckets.get(call.model)
+        charge = call.input_tokens + call.max_tokens
+        if limits is not None:
+            rpm, tpm = limits
+            start = max(start, rpm.ready(1, start), tpm.ready(charge, start))
+            rpm.take(1, start)
+            tpm.take(charge, start)
+        end = start + call.latency_seconds
+        heapq.heappush(slots, end)
+        last_start, finish = start, max(finish, end)
+
+        busy += call.latency_seconds
+        minute = int(start // 60)
+        requests[minute] += 1
+        tokens[minute] += call.input_tokens + call.output_tokens
+        charged[call.model][0] += 1
+        charged[call.model][1] += charge
+
+    # Whichever constraint alone would take longest
+    bounds = {"concurrency": busy / concurrency}
+    for model, (count, charge) in charged.items():
+        if model in rate_limits:
+            rpm, tpm = rate_limits[model]
+            bounds[f"{model} requests per minute"] = count * 60.0 / rpm
+            bounds[f"{model} tokens per minute"] = charge * 60.0 / tpm
+
+    return {
+        "duration_seconds": round(finish, 1),
+        "peak_rpm": max(requests.values(), default=0),
+        "peak_tpm": max(tokens.values(), default=0),
+        "limited_by": max(bounds, key=bounds.get) if calls else None,
+    }
+
+
+def summarize(calls: Sequence[PlannedCall], concurrency: int) -> Dict[str, Any]:
+    """Token, cost and timing totals of planned calls, overall and per model"""
+    by_model: Dict[str, Dict[str, Any]] = {}
+    for call in calls:
+        model = by_model.setdefault(call.model, {
+            "model": call.model, "calls": 0, "input_tokens": 0, "cached_tokens": 0, "output_tokens": 0,
+        })
+        model["calls"] += 1
+        model["input_tokens"] += call.input_tokens
+        model["cached_tokens"] += call.cached_tokens
+        model["output_tokens"] += call.output_tokens
+
+    for model in by_model.values():
+        model["cost_usd"] = round(
+            model_cost(model["model"], model["input_tokens"], model["output_tokens"], model["cached_tokens"]), 4
+        )
+
+    models = list(by_model.values())
+    return {
+        "contacts": len(calls),
+        "input_tokens": sum(model["input_tokens"] for model in models),
+        "cached_tokens": sum(model["cached_tokens"] for model in models),
+        "output_tokens": sum(model["output_tokens"] for model in models),
+        "cost_usd": round(sum(model["cost_usd"] for model in models), 4),
+        "concurrency": concurrency,
+        **simulate(calls, concurrency),
+        "by_model": models,
+    }
+
+
+async def route_history(db: AsyncSession) -> Dict[str, Tuple[float, float]]:
+    """Average output tokens and latency in seconds of one call per route, over recent generations"""
+    recent = (
+        select(Message.message_metadata.label("metadata"))
+        .where(Message.generated_by == GeneratedBy.AI, Message.message_metadata.is_not(None))
+        .order_by(Message.created_at.desc())
+        .limit(_HISTORY)
+        .subquery()
+    )
+    metadata = recent.c.metadata
+    route = metadata["route"].astext
+    result = await db.execute(
+        select(route, func.avg(metadata["output_tokens"].as_float()), func.avg(metadata["latency_ms"].as_float()))
+        # Coalesced generations waited on another call; variant calls wrote several messages' worth
+        .where(metadata.has_key("route"), ~metadata.has_key("coalesced"), ~metadata.has_key("variants"))
+        .group_by(route)
+    )
+    return {
+        name: (float(output_tokens), float(latency_ms) / 1000)
+        for name, output_tokens, latency_ms in result.all()
+        if output_tokens is not None and latency_ms is not None
+    }
+
+
+async def estimate_campaign(
+    db: AsyncSession,
+    campaign: Campaign,
+    tone: str = "professional_friendly",
+    custom_context: str | None = None,
+) -> Dict[str, Any]:
+    """
+    Dry run of a campaign's generation; no provider calls are made
+
+    Raises:
+        SegmentFilterError: The campaign's stored filter does not compile
+    """
+    query = audience_query(
+        campaign.segment_filter, Contact.name, Contact.company, Contact.position, Contact.language, Contact.segment
+    )
+    history = await route_history(db)
+    # Read sessions autocommit, and asyncpg cursors need a transaction: fetch the rows at once
+    contacts = (await db.execute(query)).all()
+
+    # Tokenizing and the simulation are CPU-bound; keep them off the event loop
+    concurrency = settings.GENERATION_CONCURRENCY - settings.GENERATION_INTERACTIVE_RESERVED
+
+    def estimate() -> Dict[str, Any]:
+        calls, tokenizers = plan_calls(contacts, campaign.occasion_type, tone, custom_context, history)
+        return {"tokenizer": tokenizers, **summarize(calls, concurrency)}
+
+    return {
+        "campaign_id": campaign.id,
+        "occasion_type": campaign.occasion_type,
+        "tone": tone,
+        **await asyncio.to_thread(estimate),
+    }
@@ -0,0 +1,128 @@
+"""Campaign statistics on sharded counters"""
+
+import random
+from typing import Dict, Iterable
+from uuid import UUID
+
+from sqlalchemy import func, literal, select
+from sqlalchemy.dialects.postgresql import JSONB, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config.settings import settings
+from app.models.campaign import Campaign, CampaignStatCounter
+from app.models.message import Message, MessageStatus
+
+METRICS = ("generated_count", "sent_count", "failed_count")
+
+
+async def increment(db: AsyncSession, campaign_id: UUID, deltas: Dict[str, int], shard: int | None = None) -> None:
+    """
+    Atomically add to campaign statistics in the caller's transaction
+
+    Each delta lands on one randomly chosen shard row via INSERT ... ON
+    CONFLICT DO UPDATE, so there is no read-modify-write to lose updates and
+    concurrent writers spread their row locks across the shards.
+
+    Args:
+        db: Session whose transaction also records the change being counted
+        campaign_id: Campaign to update
+        deltas: Metric name -> amount, e.g. {"sent_count": 1}
+        shard: Fixed shard, for reconciliation; random when omitted
+    """
+    rows = [
+        {
+            "campaign_id": campaign_id,
+            "metric": metric,
+            "shard": random.randrange(settings.CAMPAIGN_STAT_SHARDS) if shard is None else shard,
+            "value": amount,
+        }
+        for metric, amount in deltas.items()
+        if amount
+    ]
+    if not rows:
+        return
+
+    statement = insert(CampaignStatCounter).values(rows)
+    await db.execute(statement.on_conflict_do_update(
+        index_elements=[CampaignStatCounter.campaign_id, CampaignStatCounter.metric, CampaignStatCounter.shard],
+        set_={"value": CampaignStatCounter.value + statement.excluded.value},
+    ))
+
+
+def stats_expression(campaign_id=Campaign.id):
+    """
+    Correlated scalar subquery building a campaign's stats JSON from its shards
+
+    Always yields every metric in METRICS, zero when nothing was counted.
+    """
+    pairs = []
+    for metric in METRICS:
+        total = func.sum(CampaignStatCounter.value).filter(CampaignStatCounter.metric == metric)
+        pairs += [literal(metric), func.coalesce(total, 0)]
+
+    return (
+        select(func.jsonb_build_object(*pairs, type_=JSONB))
+        .where(CampaignStatCounter.campaign_id == campaign_id)
+        .scalar_subquery()
+        .correlate(Campaign)
+    )
+
+
+async def read_stats(db: AsyncSession, campaign_ids: Iterable[UUID]) -> Dict[UUID, Dict[str, int]]:
+    """Current statistics for several campaigns in one query"""
+    campaign_ids = list(campaign_ids)
+    stats = {campaign_id: dict.fromkeys(METRICS, 0) for campaign_id in campaign_ids}
+    if not campaign_ids:
+        return stats
+
+    result = await db.execute(
+        select(CampaignStatCounter.campaign_id, CampaignStatCounter.metric, func.sum(CampaignStatCounter.value))
+        .where(CampaignStatCounter.campaign_id.in_(campaign_ids))
+        .group_by(CampaignStatCounter.campaign_id, CampaignStatCounter.metric)
+    )
+    for campaign_id, metric, total in result.all():
+        stats[campaign_id][metric] = int(total)
+    return stats
+
+
+async def reconcile(db: AsyncSession, campaign_id: UUID) -> Dict[str, int]:
+    """
+    Correct a campaign's counters to the exact counts in messages
+
+    The true counts and the counter sums are read in one statement, hence
+    one snapshot, and the difference is added to shard 0. Writers keep
+    incrementing meanwhile: anything they commit later is on top of both
+    numbers, so applying the difference is still exact. An advisory lock
+    keeps two reconciliations of one campaign from applying it twice.
+
+    Returns:
+        The reconciled statistics
+    """
+    await db.execute(select(func.pg_advisory_xact_lock(func.hashtext(f"campaign_stats:{campaign_id}"))))
+
+    truth = (
+        select(
+            func.count(Message.id).label("generated_count"),
+            func.count(Message.id).filter(Message.status == MessageStatus.SENT).label("sent_count"),
+            func.count(Message.id).filter(Message.status == MessageStatus.FAILED).label("failed_count"),
+        )
+        .where(Message.campaign_id == campaign_id)
+        .subquery()
+    )
+    counted = (
+        select(*(
+            func.coalesce(func.sum(CampaignStatCounter.value).filter(CampaignStatCounter.metric == metric), 0)
+            .label(metric)
+            for metric in METRICS
+        ))
+        .where(CampaignStatCounter.campaign_id == campaign_id)
+        .subquery()
+    )
+    row = (await db.execute(
+        select(*(truth.c[metric] for metric in METRICS), *(counted.c[metric] for metric in METRICS))
+    )).one()
+
+    exact = dict(zip(METRICS, row[:len(METRICS)]))
+    current = dict(zip(METRICS, row[len(METRICS):]))
+    await increment(db, campaign_id, {metric: exact[metric] - current[metric] for metric in METRICS}, shard=0)
+    return exact
@@ -0,0 +1,149 @@
+"""
+Single-flight coalescing of identical in-flight calls
+
+When several callers ask for the same thing at once (reviewers clicking
+"regenerate" on one contact, a campaign and a manual request overlapping),
+only the first call runs; the rest wait for it and share its result or its
+exception. Nothing is cached: a call that starts after the first finished
+runs again.
+
+Within a worker, callers with the same key share one asyncio task. Across
+workers (GENERATION_COALESCING_REDIS) the task first takes a Redis lock on
+the key. A worker that finds the lock held polls for the result the holder
+publishes under its lock token, and runs the call itself only if the holder
+goes away without publishing one. Without Redis, calls just run.
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Generic, Tuple, TypeVar
+from uuid import uuid4
+
+import orjson
+
+from app.config.redis import get_redis
+from app.config.settings import settings
+from app.utils.metrics import COALESCED_CALLS
+
+T = TypeVar("T")
+
+_CLAIMED = object()
+
+# Publish the outcome, then release the lock if this call still holds it
+_PUBLISH = """
+redis.call('SET', KEYS[2], ARGV[2], 'PX', ARGV[3])
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('DEL', KEYS[1])
+end
+return 1
+"""
+
+
+class CoalescedCallError(Exception):
+    """The call another worker ran for this key failed"""
+
+
+class SingleFlight(Generic[T]):
+    """
+    Deduplicates concurrent calls with the same key
+
+    Args:
+        name: Namespace of the keys, also the metrics label
+        encode: Result to JSON-serializable data, for sharing across workers
+        decode: The reverse of encode
+    """
+
+    def __init__(self, name: str, encode: Callable[[T], Any], decode: Callable[[Any], T]):
+        self.name = name
+        self.encode = encode
+        self.decode = decode
+        self._flights: Dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, call: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """
+        Result of `call`, or of the identical call already in flight
+
+        Returns:
+            The result, and whether it came from another caller's call
+        """
+        flight = self._flights.get(key)
+        if flight is not None:
+            COALESCED_CALLS.labels(self.name, "worker").inc()
+            # Shielded, so a waiter that is cancelled does not cancel the call
+            result, _ = await asyncio.shield(flight)
+            return result, True
+
+        flight = asyncio.ensure_future(self._run(key, call))
+        self._flights[key] = flight
+        flight.add_done_callback(lambda _: self._flights.pop(key, None))
+        return await asyncio.shield(flight)
+
+    async def _run(self, key: str, call: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        if not settings.GENERATION_COALESCING_REDIS:
+            return await call(), False
+
+        lock_key = f"singleflight:{self.name}:{key}"
+        token = uuid4().hex
+        try:
+            outcome = await self._claim_or_wait(lock_key, token)
+        except Exception as e:
+            print(f"Coalescing lock unavailable: {e}")
+            return await call(), False
+
+        if outcome is _CLAIMED:
+            return await self._lead(lock_key, token, call), False
+        if outcome is None:
+            # Waited out a holder that never finished
+            return await call(), False
+        COALESCED_CALLS.labels(self.name, "cluster").inc()
+        if "error" in outcome:
+            raise CoalescedCallError(outcome["error"])
+        return self.decode(outcome["result"]), True
+
+    async def _claim_or_wait(self, lock_key: str, token: str) -> Any:
+        """_CLAIMED, the outcome another worker published, or None after the lock timeout"""
+        redis = get_redis()
+        lock_ms = int(settings.GENERATION_COALESCING_LOCK_SECONDS * 1000)
+        deadline = time.monotonic() + settings.GENERATION_COALESCING_LOCK_SECONDS
+
+        while time.monotonic() < deadline:
+            if await redis.set(lock_key, token, nx=True, px=lock_ms):
+                return _CLAIMED
+            holder = await redis.get(lock_key)
+            if holder is None:
+                continue
+
+            result_key = f"{lock_key}:result:{holder.decode()}"
+            while time.monotonic() < deadline:
+                await asyncio.sleep(settings.GENERATION_COALESCING_POLL_SECONDS)
+                published, current = await redis.mget(result_key, lock_key)
+                if published is not None:
+                    return orjson.loads(published)
+                if current != holder:
+                    # The holder went away without a result: try to take over
+                    break
+        return None
+
+    async def _lead(self, lock_key: str, token: str, call: Callable[[], Awaitable[T]]) -> T:
+        """Run the call under the lock and publish the outcome for other workers"""
+        outcome = {"error": "CancelledError: the call was cancelled"}
+        try:
+            result = await call()
+            outcome = {"result": self.encode(result)}
+            return result
+        except Exception as e:
+            outcome = {"error": f"{type(e).__name__}: {e}"}
+            raise
+        finally:
+            try:
+                await get_redis().eval(
+                    _PUBLISH,
+                    2,
+                    lock_key,
+                    f"{lock_key}:result:{token}",
+                    token,
+                    orjson.dumps(outcome),
+                    int(settings.GENERATION_COALESCING_RESULT_SECONDS * 1000),
+                )
+            except Exception as e:
+                print(f"Coalescing lock unavailable: {e}")
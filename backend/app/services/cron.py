@@ -0,0 +1,207 @@
+"""
+Cron expressions for recurring campaigns
+
+Standard five-field syntax (minute hour day-of-month month day-of-week) with
+lists, ranges, steps, month and weekday names, and the @yearly, @monthly,
+@weekly, @daily and @hourly shortcuts. As in Vixie cron, when both
+day-of-month and day-of-week are restricted a day matching either one fires.
+
+Rules are evaluated in the campaign's timezone, on wall-clock time:
+    - a time skipped by a spring-forward transition fires when the clocks
+      jump, shifted forward by the gap (02:30 becomes 03:30)
+    - a time repeated by a fall-back transition fires once, at its first
+      occurrence
+"""
+
+from bisect import bisect_left
+from datetime import MAXYEAR, date, datetime, timezone
+from functools import lru_cache
+from typing import Dict, Iterator, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+MACROS = {
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+    "@monthly": "0 0 1 * *",
+    "@weekly": "0 0 * * 0",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@hourly": "0 * * * *",
+}
+
+MONTH_NAMES = {name: index for index, name in enumerate(
+    ("JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"), start=1
+)}
+WEEKDAY_NAMES = {name: index for index, name in enumerate(("SUN", "MON", "TUE", "WED", "THU", "FRI", "SAT"))}
+
+# No valid rule goes longer than this without firing (Feb 29 on a given weekday: 28 years)
+_SEARCH_YEARS = 30
+
+
+def _days_in_month(year: int, month: int) -> int:
+    if month == 2:
+        return 29 if year % 4 == 0 and (year % 100 != 0 or year % 400 == 0) else 28
+    return 30 if month in (4, 6, 9, 11) else 31
+
+
+class CronError(ValueError):
+    """Invalid cron expression or timezone"""
+
+
+def _parse_field(text: str, low: int, high: int, names: dict | None = None) -> Tuple[int, ...]:
+    values = set()
+    for part in text.upper().split(","):
+        part, slash, step_text = part.partition("/")
+        step = 1
+        if slash:
+            if not step_text.isdigit() or int(step_text) == 0:
+                raise CronError(f"Invalid step in {text!r}")
+            step = int(step_text)
+
+        if part == "*":
+            start, end = low, high
+        else:
+            bounds = [_parse_value(bound, names) for bound in part.split("-", 1)]
+            start, end = bounds[0], bounds[-1]
+            if slash and len(bounds) == 1:
+                end = high  # "5/15" means from 5 to the end, every 15
+
+        if not (low <= start <= high and low <= end <= high) or start > end:
+            raise CronError(f"{text!r} is outside {low}-{high}")
+        values.update(range(start, end + 1, step))
+    return tuple(sorted(values))
+
+
+def _parse_value(text: str, names: dict | None) -> int:
+    if names and text in names:
+        return names[text]
+    if not text.isdigit():
+        raise CronError(f"Invalid value {text!r}")
+    return int(text)
+
+
+class CronExpression:
+    """A parsed cron rule; build through parse_cron, which caches"""
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        fields = MACROS.get(expression.strip().lower(), expression).split()
+        if len(fields) != 5:
+            raise CronError(f"Expected 5 fields, got {len(fields)} in {expression!r}")
+
+        minute, hour, day, month, weekday = fields
+        self.minutes = _parse_field(minute, 0, 59)
+        self.hours = _parse_field(hour, 0, 23)
+        self.days = frozenset(_parse_field(day, 1, 31))
+        self.months = frozenset(_parse_field(month, 1, 12, MONTH_NAMES))
+        # 7 is also Sunday
+        self.weekdays = frozenset(value % 7 for value in _parse_field(weekday, 0, 7, WEEKDAY_NAMES))
+        self.day_restricted = day != "*"
+        self.weekday_restricted = weekday != "*"
+        self._month_days: Dict[Tuple[int, int], Tuple[int, ...]] = {}
+
+    def __repr__(self):
+        return f"<CronExpression {self.expression!r}>"
+
+    def day_matches(self, day: int, weekday: int) -> bool:
+        """Whether a day of the month (1-31) falling on a weekday (0 = Sunday) fires"""
+        day_ok = day in self.days
+        weekday_ok = weekday in self.weekdays
+        if self.day_restricted and self.weekday_restricted:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+
+    def matching_days(self, year: int, month: int) -> Tuple[int, ...]:
+        """Days of a month that fire, memoized per rule (campaigns share parsed rules)"""
+        days = self._month_days.get((year, month))
+        if days is None:
+            # Cron weekday (0 = Sunday) of the 1st of the month
+            first_weekday = (date(year, month, 1).weekday() + 1) % 7
+            days = tuple(
+                day for day in range(1, _days_in_month(year, month) + 1)
+                if self.day_matches(day, (first_weekday + day - 1) % 7)
+            )
+            self._month_days[(year, month)] = days
+        return days
+
+    def time_on_or_after(self, hour: int, minute: int) -> Tuple[int, int] | None:
+        """First matching (hour, minute) of a day at or after the given time, if any"""
+        index = bisect_left(self.hours, hour)
+        if index < len(self.hours) and self.hours[index] == hour:
+            minute_index = bisect_left(self.minutes, minute)
+            if minute_index < len(self.minutes):
+                return hour, self.minutes[minute_index]
+            index += 1
+        if index < len(self.hours):
+            return self.hours[index], self.minutes[0]
+        return None
+
+    def next_wall_time(self, after: datetime) -> datetime:
+        """First matching naive wall-clock minute strictly after `after`"""
+        # Integer arithmetic throughout: this runs for every fire of every campaign
+        year, month, day, hour, minute = after.year, after.month, after.day, after.hour, after.minute + 1
+        limit = min(after.year + _SEARCH_YEARS, MAXYEAR)
+
+        while year <= limit:
+            if month in self.months:
+                days = self.matching_days(year, month)
+                index = bisect_left(days, day)
+                if index < len(days) and days[index] == day:
+                    time_of_day = self.time_on_or_after(hour, minute)
+                    if time_of_day is not None:
+                        return datetime(year, month, day, *time_of_day)
+                    index += 1
+                if index < len(days):
+                    return datetime(year, month, days[index], self.hours[0], self.minutes[0])
+
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+            day, hour, minute = 1, 0, 0
+
+        raise CronError(f"{self.expression!r} never fires")
+
+    def iter_fires(self, after: datetime, tz: ZoneInfo) -> Iterator[datetime]:
+        """
+        Successive fire times strictly after `after`
+
+        Steps through wall-clock time and converts each match to UTC with a
+        single offset lookup; only the starting point needs a full UTC to
+        local conversion.
+
+        Args:
+            after: Naive UTC datetime
+            tz: Timezone the rule's wall-clock times are in
+
+        Yields:
+            Naive UTC datetimes, increasing; none at all for a rule that
+            never fires, like "0 0 30 2 *"
+        """
+        wall = after.replace(tzinfo=timezone.utc).astimezone(tz).replace(tzinfo=None)
+        while True:
+            try:
+                wall = self.next_wall_time(wall)
+            except CronError:
+                return
+            # Naive wall time has fold=0: the first occurrence of a repeated
+            # time, and the pre-transition offset for a skipped one
+            fire = wall - tz.utcoffset(wall)
+            if fire > after:
+                after = fire
+                yield fire
+
+    def next_fire(self, after: datetime, tz: ZoneInfo) -> datetime | None:
+        """Next fire time (naive UTC) strictly after `after` (naive UTC), if there is one"""
+        return next(self.iter_fires(after, tz), None)
+
+
+@lru_cache(maxsize=4096)
+def parse_cron(expression: str) -> CronExpression:
+    """Parse a cron expression once; campaigns sharing a rule share the parsed form"""
+    return CronExpression(expression)
+
+
+@lru_cache(maxsize=512)
+def get_timezone(name: str) -> ZoneInfo:
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise CronError(f"Unknown timezone {name!r}")
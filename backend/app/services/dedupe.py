@@ -0,0 +1,397 @@
+"""
+Contact deduplication and merging
+
+Finding duplicates never compares all pairs. Each contact gets a few
+blocking keys, and only contacts sharing a key are scored:
+
+    - phone: its last 9 digits, which drops country codes and trunk prefixes
+      (+998 90 123 45 67, 8 (90) 123-45-67)
+    - email: lowercased, without "+tags"
+    - name: the transliterated, phonetically normalized name tokens, sorted
+      (Иван Петров, Ivan Petrov and Petrov Ivan share one)
+    - name prefixes: the first four letters of each token, sorted, with the
+      company; this catches Aleksandr / Alexander at the same firm
+
+A key shared by more than DEDUPE_MAX_BLOCK_SIZE contacts (a common name,
+a switchboard number) is not compared all-pairs: its members are sorted by
+name and each is only compared with its next DEDUPE_WINDOW neighbours.
+
+Pairs scoring at least DEDUPE_MATCH_THRESHOLD are joined into clusters with
+union-find. The scan runs on demand through the API or from the command line
+and stores its report in Redis:
+
+    python -m app.services.dedupe
+"""
+
+import asyncio
+import re
+import time
+import unicodedata
+from dataclasses import dataclass
+from datetime import date, datetime
+from itertools import combinations
+from typing import Dict, Iterable, List, Sequence, Set, Tuple
+from uuid import UUID
+
+import orjson
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config.redis import get_redis
+from app.config.settings import settings
+from app.models.contact import Contact
+from app.models.message import Message
+
+REPORT_KEY = "dedupe:report"
+
+# Russian and Uzbek Cyrillic
+CYRILLIC_TO_LATIN = str.maketrans({
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "yo", "ж": "zh", "з": "z", "и": "i",
+    "й": "y", "к": "k", "л": "l", "м": "m", "н": "n", "о": "o", "п": "p", "р": "r", "с": "s", "т": "t",
+    "у": "u", "ф": "f", "х": "kh", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "shch", "ъ": "", "ы": "y", "ь": "",
+    "э": "e", "ю": "yu", "я": "ya", "ў": "o", "қ": "q", "ғ": "g", "ҳ": "h",
+})
+
+# Spelling variants of one sound, applied in order to each transliterated token
+PHONETIC_RULES = [
+    # Uzbek Latin x is Cyrillic х (Xolmatov, Shuxrat); before a vowel it is
+    # more often the ks of Alexander or Maxim
+    (re.compile(r"^x|x(?![aeiouy])"), "h"),
+    (re.compile(r"x"), "ks"),
+    (re.compile(r"shch|sch"), "sh"),
+    (re.compile(r"kh"), "h"),
+    (re.compile(r"ph"), "f"),
+    (re.compile(r"w"), "v"),
+    (re.compile(r"q|ck"), "k"),
+    (re.compile(r"tz|ts"), "c"),
+    (re.compile(r"^(ye|yo|jo)"), "e"),  # Yevgeny / Evgeny
+    (re.compile(r"(iy|yi|ii|yy)$"), "i"),  # Dmitriy / Dmitrii / Dmitry
+    (re.compile(r"[yj]"), "i"),  # Yuliya / Julia
+    (re.compile(r"(.)\1+"), r"\1"),
+]
+
+# Legal forms dropped from company names: ООО Ромашка == Romashka LLC
+_COMPANY_FORMS = {"ooo", "oao", "zao", "pao", "ao", "ip", "llc", "ltd", "inc", "mchj", "xk", "ok"}
+
+_APOSTROPHES = re.compile(r"['‘’ʻʼ`]")
+_NON_LETTERS = re.compile(r"[^a-z0-9]+")
+
+
+def transliterate(text: str) -> str:
+    """Lowercase ASCII form of a Cyrillic or Latin name, without accents or punctuation"""
+    text = _APOSTROPHES.sub("", text.lower().translate(CYRILLIC_TO_LATIN))  # O'g'li -> ogli
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+    return _NON_LETTERS.sub(" ", text).strip()
+
+
+def name_tokens(name: str) -> List[str]:
+    """Phonetically normalized name tokens, sorted so word order does not matter"""
+    tokens = []
+    for token in transliterate(name).split():
+        for pattern, replacement in PHONETIC_RULES:
+            token = pattern.sub(replacement, token)
+        tokens.append(token)
+    return sorted(tokens)
+
+
+def normalize_phone(phone: str | None) -> str | None:
+    """Last 9 digits: the subscriber number without country code or trunk prefix"""
+    digits = re.sub(r"\D", "", phone or "")
+    return digits[-9:] if len(digits) >= 9 else None
+
+
+def normalize_email(email: str | None) -> str | None:
+    if not email or "@" not in email:
+        return None
+    local, _, domain = email.strip().lower().rpartition("@")
+    return f"{local.split('+', 1)[0]}@{domain}"
+
+
+def normalize_company(company: str | None) -> str | None:
+    if not company:
+        return None
+    words = [word for word in transliterate(company).split() if word not in _COMPANY_FORMS]
+    return " ".join(words) or None
+
+
+@dataclass(slots=True)
+class DedupeRecord:
+    """The normalized fields of a contact that matching looks at"""
+    id: UUID
+    name: str  # Normalized tokens joined with spaces
+    phone: str | None
+    email: str | None
+    company: str | None
+    birthday: date | None
+    created_at: datetime | None = None
+
+    @classmethod
+    def from_contact(cls, contact) -> "DedupeRecord":
+        return cls(
+            id=contact.id,
+            name=" ".join(name_tokens(contact.name)),
+            phone=normalize_phone(contact.phone),
+            email=normalize_email(contact.email),
+            company=normalize_company(contact.company),
+            birthday=contact.birthday,
+            created_at=getattr(contact, "created_at", None),
+        )
+
+    def blocking_keys(self) -> List[str]:
+        keys = []
+        if self.phone:
+            keys.append(f"p:{self.phone}")
+        if self.email:
+            keys.append(f"e:{self.email}")
+        if self.name:
+            keys.append(f"n:{self.name}")
+            if self.company:
+                prefixes = " ".join(sorted(token[:4] for token in self.name.split()))
+                keys.append(f"c:{prefixes}|{self.company}")
+        return keys
+
+
+def jaro_winkler(a: str, b: str) -> float:
+    """Jaro-Winkler similarity, 0-1"""
+    if a == b:
+        return 1.0
+    if not a or not b:
+        return 0.0
+
+    window = max(len(a), len(b)) // 2 - 1
+    b_matched = [False] * len(b)
+    a_matches = []
+    for i, char in enumerate(a):
+        for j in range(max(0, i - window), min(len(b), i + window + 1)):
+            if not b_matched[j] and b[j] == char:
+                b_matched[j] = True
+                a_matches.append(char)
+                break
+    if not a_matches:
+        return 0.0
+
+    b_matches = [char for char, matched in zip(b, b_matched) if matched]
+    transpositions = sum(x != y for x, y in zip(a_matches, b_matches)) / 2
+    m = len(a_matches)
+    jaro = (m / len(a) + m / len(b) + (m - transpositions) / m) / 3
+
+    prefix = 0
+    for x, y in zip(a[:4], b[:4]):
+        if x != y:
+            break
+        prefix += 1
+    return jaro + prefix * 0.1 * (1 - jaro)
+
+
+def match_score(a: DedupeRecord, b: DedupeRecord) -> float:
+    """
+    How likely two contacts are the same person, 0-1
+
+    The name carries most of the weight; a shared phone, email, company or
+    birthday adds to it. Different birthdays rule a match out.
+    """
+    if a.birthday and b.birthday and a.birthday != b.birthday:
+        return 0.0
+
+    score = 0.7 * jaro_winkler(a.name, b.name)
+    if a.phone and a.phone == b.phone:
+        score += 0.25
+    if a.email and a.email == b.email:
+        score += 0.25
+    if a.company and a.company == b.company:
+        score += 0.15
+    if a.birthday and a.birthday == b.birthday:
+        score += 0.1
+    return min(score, 1.0)
+
+
+def candidate_pairs(records: Sequence[DedupeRecord], max_block_size: int, window: int) -> Set[Tuple[int, int]]:
+    """Index pairs sharing a blocking key, each once"""
+    blocks: Dict[str, List[int]] = {}
+    for index, record in enumerate(records):
+        for key in record.blocking_keys():
+            blocks.setdefault(key, []).append(index)
+
+    pairs = set()
+    for members in blocks.values():
+        if len(members) < 2:
+            continue
+        if len(members) <= max_block_size:
+            pairs.update(combinations(members, 2))
+            continue
+        # Sorted neighbourhood: similar names end up close together
+        members = sorted(members, key=lambda index: records[index].name)
+        for position, index in enumerate(members):
+            for other in members[position + 1:position + 1 + window]:
+                pairs.add((index, other) if index < other else (other, index))
+    return pairs
+
+
+def find_clusters(records: Sequence[DedupeRecord], threshold: float | None = None,
+                  max_block_size: int | None = None, window: int | None = None) -> List[Dict]:
+    """
+    Clusters of likely duplicates, largest first
+
+    Returns:
+        [{"contact_ids": [...], "score": weakest link, "suggested_primary": id}]
+        where the suggested primary is the oldest contact
+    """
+    threshold = settings.DEDUPE_MATCH_THRESHOLD if threshold is None else threshold
+    pairs = candidate_pairs(
+        records,
+        max_block_size or settings.DEDUPE_MAX_BLOCK_SIZE,
+        window or settings.DEDUPE_WINDOW,
+    )
+
+    parent = list(range(len(records)))
+
+    def root(index: int) -> int:
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    link_scores: Dict[Tuple[int, int], float] = {}
+    for a, b in pairs:
+        score = match_score(records[a], records[b])
+        if score >= threshold:
+            link_scores[(a, b)] = score
+            parent[root(a)] = root(b)
+
+    members: Dict[int, List[int]] = {}
+    for index in {index for pair in link_scores for index in pair}:
+        members.setdefault(root(index), []).append(index)
+    weakest: Dict[int, float] = {}
+    for (a, _), score in link_scores.items():
+        cluster = root(a)
+        weakest[cluster] = min(weakest.get(cluster, 1.0), score)
+
+    clusters = []
+    for cluster, indexes in members.items():
+        cluster_records = [records[index] for index in indexes]
+        primary = min(cluster_records, key=lambda record: (record.created_at or datetime.max, str(record.id)))
+        clusters.append({
+            "contact_ids": [record.id for record in cluster_records],
+            "score": round(weakest[cluster], 3),
+            "suggested_primary": primary.id,
+        })
+    clusters.sort(key=lambda cluster: (-len(cluster["contact_ids"]), -cluster["score"]))
+    return clusters
+
+
+async def load_records(db: AsyncSession) -> List[DedupeRecord]:
+    """Every contact's matching fields, streamed in batches"""
+    result = await db.stream(
+        select(Contact.id, Contact.name, Contact.phone, Contact.email, Contact.company,
+               Contact.birthday, Contact.created_at)
+        .execution_options(yield_per=settings.DEDUPE_BATCH_SIZE)
+    )
+    return [DedupeRecord.from_contact(row) async for row in result]
+
+
+async def scan(session_factory) -> Dict:
+    """Find duplicate clusters across all contacts and store the report in Redis"""
+    started = time.perf_counter()
+    async with session_factory() as db:
+        records = await load_records(db)
+    # Pure Python and CPU-bound; keep the event loop free while it runs
+    clusters = await asyncio.to_thread(find_clusters, records)
+
+    report = {
+        "generated_at": datetime.utcnow(),
+        "contacts_scanned": len(records),
+        "cluster_count": len(clusters),
+        "duplicate_contacts": sum(len(cluster["contact_ids"]) - 1 for cluster in clusters),
+        "duration_seconds": round(time.perf_counter() - started, 2),
+        "clusters": clusters[:settings.DEDUPE_REPORT_MAX_CLUSTERS],
+    }
+    try:
+        await get_redis().set(REPORT_KEY, orjson.dumps(report))
+    except Exception as e:
+        print(f"Could not store the duplicate report: {e}")
+    return report
+
+
+async def latest_report() -> Dict | None:
+    value = await get_redis().get(REPORT_KEY)
+    return orjson.loads(value) if value is not None else None
+
+
+async def merge_contacts(
+    db: AsyncSession, primary_id: UUID, duplicate_ids: Iterable[UUID]
+) -> Tuple[Contact, List[UUID], List[UUID]]:
+    """
+    Fold duplicates into a primary contact in the caller's transaction
+
+    Messages are re-pointed with one UPDATE. The primary keeps its own
+    values and takes the duplicates' for anything it lacks; tags are
+    combined, and the duplicates' emails are kept in custom_fields
+    ["merged_emails"] before the duplicates are deleted.
+
+    Returns:
+        The primary contact, the merged contact ids, and the ids of the
+        messages that moved to the primary
+
+    Raises:
+        LookupError: The primary or a duplicate does not exist
+    """
+    duplicate_ids = list(dict.fromkeys(duplicate_id for duplicate_id in duplicate_ids if duplicate_id != primary_id))
+    result = await db.execute(
+        select(Contact)
+        .where(Contact.id.in_([primary_id, *duplicate_ids]))
+        .order_by(Contact.created_at)
+        .with_for_update()
+    )
+    contacts = {contact.id: contact for contact in result.scalars()}
+    missing = [str(contact_id) for contact_id in [primary_id, *duplicate_ids] if contact_id not in contacts]
+    if missing:
+        raise LookupError(f"Contacts not found: {', '.join(missing)}")
+
+    primary = contacts.pop(primary_id)
+    duplicates = list(contacts.values())
+
+    for field in ("phone", "birthday", "company", "position"):
+        if getattr(primary, field) is None:
+            setattr(primary, field, next((getattr(d, field) for d in duplicates if getattr(d, field)), None))
+    primary.tags = list(dict.fromkeys([*(primary.tags or []), *(tag for d in duplicates for tag in d.tags or [])]))
+
+    custom_fields = {}
+    for duplicate in reversed(duplicates):
+        custom_fields.update(duplicate.custom_fields or {})
+    custom_fields.update(primary.custom_fields or {})
+    merged_emails = {*custom_fields.get("merged_emails", []), *(d.email for d in duplicates)}
+    custom_fields["merged_emails"] = sorted(merged_emails - {primary.email})
+    primary.custom_fields = custom_fields
+
+    interactions = [c.last_interaction_date for c in (primary, *duplicates) if c.last_interaction_date]
+    primary.last_interaction_date = max(interactions, default=None)
+
+    moved = await db.execute(
+        update(Message)
+        .where(Message.contact_id.in_(duplicate_ids))
+        .values(contact_id=primary_id)
+        .returning(Message.id)
+        .execution_options(synchronize_session=False)
+    )
+    moved_ids = list(moved.scalars())
+
+    await db.execute(
+        delete(Contact).where(Contact.id.in_(duplicate_ids)).execution_options(synchronize_session=False)
+    )
+    return primary, duplicate_ids, moved_ids
+
+
+async def main():
+    from app.config.database import AsyncSessionLocal
+    from app.config.redis import close_redis
+
+    report = await scan(AsyncSessionLocal)
+    print(f"Scanned {report['contacts_scanned']:,} contacts in {report['duration_seconds']}s: "
+          f"{report['cluster_count']:,} clusters, {report['duplicate_contacts']:,} duplicates")
+    for cluster in report["clusters"][:20]:
+        print(f"  {cluster['score']:.2f}  {', '.join(str(contact_id) for contact_id in cluster['contact_ids'])}")
+    await close_redis()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,237 @@
+"""
+Real-time events for the approval queue and campaign progress
+
+Endpoints publish events to one Redis pub/sub channel after committing.
+Every API worker runs a single listener on that channel and fans each event
+out to the server-sent event streams connected to it, so a change made on
+one worker reaches subscribers on all of them.
+
+Each stream has a bounded queue. A client that cannot keep up is not allowed
+to buffer without limit: when its queue overflows it gets a final `resync`
+event and is disconnected, and is expected to refetch the lists it shows
+and reconnect.
+"""
+
+import asyncio
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import AsyncIterator, Dict, FrozenSet, Optional, Set
+from uuid import UUID
+
+import orjson
+
+from app.config.redis import get_redis
+from app.config.settings import settings
+from app.models.campaign import Campaign
+from app.models.message import Message, MessageStatus
+from app.utils.metrics import EVENTS_DROPPED_SUBSCRIBERS, EVENTS_PUBLISHED, EVENTS_SUBSCRIBERS
+
+TOPICS = frozenset({"messages", "campaigns"})
+
+# Frame telling a client its view is stale: refetch, then reconnect
+RESYNC_FRAME = b'event: resync\ndata: {}\n\n'
+
+
+@dataclass(eq=False)
+class Subscription:
+    """One connected event stream and what it asked to receive"""
+    user_id: UUID
+    topics: FrozenSet[str]
+    campaign_id: Optional[UUID] = None
+    mine: bool = False  # Only messages this user created
+    # Unbounded: offer() enforces EVENTS_QUEUE_SIZE, so close() always has room for its frames
+    queue: asyncio.Queue = field(default_factory=asyncio.Queue)
+
+    def wants(self, event: Dict) -> bool:
+        if event.get("topic") not in self.topics:
+            return False
+        if self.campaign_id is not None and event.get("campaign_id") != str(self.campaign_id):
+            return False
+        if self.mine and event.get("created_by") != str(self.user_id):
+            return False
+        return True
+
+    def offer(self, frame: bytes) -> bool:
+        """
+        Queue a frame without waiting
+
+        Returns:
+            False if the queue was full; the subscription is then left holding
+            only the resync frame and an end-of-stream marker
+        """
+        if self.queue.qsize() >= settings.EVENTS_QUEUE_SIZE:
+            self.close(resync=True)
+            return False
+        self.queue.put_nowait(frame)
+        return True
+
+    def close(self, resync: bool = False) -> None:
+        """Discard pending frames and end the stream"""
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        if resync:
+            self.queue.put_nowait(RESYNC_FRAME)
+        self.queue.put_nowait(None)
+
+
+class EventBroker:
+    """Publishes events to Redis and relays them to this worker's streams"""
+
+    def __init__(self, channel: str = "crm:events"):
+        self.channel = channel
+        self.subscriptions: Set[Subscription] = set()
+
+    def subscribe(self, user_id: UUID, topics: FrozenSet[str], campaign_id: UUID | None = None,
+                  mine: bool = False) -> Subscription:
+        subscription = Subscription(user_id=user_id, topics=topics, campaign_id=campaign_id, mine=mine)
+        self.subscriptions.add(subscription)
+        EVENTS_SUBSCRIBERS.set(len(self.subscriptions))
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self.subscriptions.discard(subscription)
+        EVENTS_SUBSCRIBERS.set(len(self.subscriptions))
+
+    def dispatch(self, data: bytes) -> None:
+        """Deliver one published event to every matching local subscription"""
+        event = orjson.loads(data)
+        # Framed once; every subscriber queues the same bytes
+        frame = b"event: " + event["type"].encode() + b"\ndata: " + data + b"\n\n"
+
+        for subscription in list(self.subscriptions):
+            if subscription.wants(event) and not subscription.offer(frame):
+                self.unsubscribe(subscription)
+                EVENTS_DROPPED_SUBSCRIBERS.labels("overflow").inc()
+
+    def resync_all(self) -> None:
+        """Tell every local stream it may have missed events"""
+        for subscription in list(self.subscriptions):
+            subscription.close(resync=True)
+            self.unsubscribe(subscription)
+            EVENTS_DROPPED_SUBSCRIBERS.labels("resync").inc()
+
+    async def publish(self, *events: Dict) -> None:
+        """
+        Publish events to all workers; call after the change is committed
+
+        Never raises: if Redis is unavailable the events still reach this
+        worker's own subscribers, and the request that caused them succeeds.
+        """
+        if not settings.EVENTS_ENABLED or not events:
+            return
+
+        payloads = [orjson.dumps(event) for event in events]
+        try:
+            async with get_redis().pipeline(transaction=False) as pipe:
+                for data in payloads:
+                    pipe.publish(self.channel, data)
+                await pipe.execute()
+        except Exception as e:
+            print(f"Event publish failed, delivering to this worker only: {e}")
+            for data in payloads:
+                self.dispatch(data)
+        EVENTS_PUBLISHED.inc(len(payloads))
+
+    async def listen(self, reconnect_seconds: float = 1.0) -> None:
+        """Relay the Redis channel to local subscriptions; reconnects until cancelled"""
+        interrupted = False
+        while True:
+            pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.channel)
+                if interrupted:
+                    # Anything published while we were away is lost
+                    self.resync_all()
+                    interrupted = False
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self.dispatch(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Event listener disconnected: {e}")
+                interrupted = True
+            finally:
+                await pubsub.aclose()
+
+            await asyncio.sleep(reconnect_seconds)
+
+    async def stream(self, user_id: UUID, topics: FrozenSet[str], campaign_id: UUID | None = None,
+                     mine: bool = False) -> AsyncIterator[bytes]:
+        """
+        Server-sent event frames for a new subscription, with keepalives while idle
+
+        The subscription exists only while the response is being streamed,
+        and is removed however the stream ends.
+        """
+        subscription = self.subscribe(user_id, topics, campaign_id=campaign_id, mine=mine)
+        try:
+            yield f"retry: {settings.EVENTS_RETRY_MS}\nevent: ready\ndata: {{}}\n\n".encode()
+            while True:
+                try:
+                    frame = await asyncio.wait_for(subscription.queue.get(), settings.EVENTS_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                if frame is None:
+                    return
+                yield frame
+        finally:
+            self.unsubscribe(subscription)
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat()
+
+
+def message_event(message: Message, action: str, previous_status: MessageStatus | None = None) -> Dict:
+    """A message was created, edited, moved through the workflow or deleted"""
+    return {
+        "topic": "messages",
+        "type": f"message.{action}",
+        "message_id": str(message.id),
+        "contact_id": str(message.contact_id),
+        "campaign_id": str(message.campaign_id) if message.campaign_id else None,
+        "created_by": str(message.created_by),
+        "status": message.status.value,
+        "previous_status": previous_status.value if previous_status else None,
+        "at": _now(),
+    }
+
+
+def campaign_progress_event(campaign_id: UUID, deltas: Dict[str, int]) -> Dict:
+    """Campaign statistics changed by the given amounts"""
+    return {
+        "topic": "campaigns",
+        "type": "campaign.progress",
+        "campaign_id": str(campaign_id),
+        "deltas": deltas,
+        "at": _now(),
+    }
+
+
+def campaign_status_event(campaign: Campaign) -> Dict:
+    """A campaign was paused, resumed or otherwise changed status"""
+    return {
+        "topic": "campaigns",
+        "type": "campaign.status",
+        "campaign_id": str(campaign.id),
+        "status": campaign.status.value,
+        "at": _now(),
+    }
+
+
+def campaign_run_event(run_id: UUID, campaign_id: UUID, scheduled_for: datetime, trigger: str) -> Dict:
+    """A campaign run was queued by the scheduler or manually"""
+    return {
+        "topic": "campaigns",
+        "type": "campaign.run",
+        "campaign_id": str(campaign_id),
+        "run_id": str(run_id),
+        "scheduled_for": scheduled_for.isoformat(),
+        "trigger": trigger,
+        "at": _now(),
+    }
+
+
+broker = EventBroker()
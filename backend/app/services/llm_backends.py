@@ -0,0 +1,260 @@
+"""Pluggable text generation backends for AIMessageGenerator"""
+
+import asyncio
+import hashlib
+import itertools
+import math
+import random
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import List
+
+from app.config.settings import settings
+
+
+@dataclass
+class Completion:
+    """Text returned by a backend, with the usage it was billed for"""
+    content: str
+    model: str
+    input_tokens: int
+    output_tokens: int  # Of all candidates
+    cached_tokens: int = 0  # Of input_tokens, served from the provider's prompt cache
+    alternates: List[str] = field(default_factory=list)  # Candidates after the first, when n > 1
+
+
+class GenerationBackend(ABC):
+    """Chat completion provider"""
+
+    name: str
+
+    @abstractmethod
+    async def complete(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        model: str,
+        max_tokens: int,
+        temperature: float,
+        n: int = 1,
+    ) -> Completion:
+        """
+        Generate a reply to a system + user prompt pair
+
+        With n > 1 the provider samples n candidates from one prompt; the
+        input is billed once. The first is the content, the rest alternates.
+
+        Raises:
+            openai.APIError: Provider failures, including RateLimitError on 429
+        """
+
+
+class OpenAIBackend(GenerationBackend):
+    """OpenAI chat completions API"""
+
+    name = "openai"
+
+    def __init__(self, api_key: str, base_url: str | None = None):
+        self.api_key = api_key
+        self.base_url = base_url
+        self._client = None
+
+    @property
+    def client(self):
+        """AsyncOpenAI client, created on first use: importing openai costs ~0.2s of worker boot"""
+        if self._client is None:
+            from openai import AsyncOpenAI
+
+            self._client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url)
+        return self._client
+
+    async def complete(self, system_prompt, user_prompt, model, max_tokens, temperature, n=1) -> Completion:
+        response = await self.client.chat.completions.create(
+            model=model,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            n=n,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ]
+        )
+        contents = [choice.message.content.strip() for choice in sorted(response.choices, key=lambda c: c.index)]
+        return Completion(
+            content=contents[0],
+            alternates=contents[1:],
+            model=model,
+            input_tokens=response.usage.prompt_tokens,
+            output_tokens=response.usage.completion_tokens,
+            cached_tokens=_cached_tokens(response.usage),
+        )
+
+
+def _cached_tokens(usage) -> int:
+    """usage.prompt_tokens_details.cached_tokens; absent from older models and compatible APIs"""
+    details = getattr(usage, "prompt_tokens_details", None)
+    if isinstance(details, dict):
+        return details.get("cached_tokens") or 0
+    return getattr(details, "cached_tokens", None) or 0
+
+
+MOCK_REPLIES = [
+    "Поздравляем Вас и желаем успехов, здоровья и процветания! Спасибо за многолетнее сотрудничество.",
+    "Sizni chin qalbimizdan tabriklaymiz! Omad, sog'lik va farovonlik tilaymiz.",
+    "Warmest congratulations! Thank you for your trust and partnership, and best wishes for the year ahead.",
+    "От всей команды примите искренние поздравления! Пусть каждый день приносит новые достижения.",
+]
+
+
+class MockLLMBackend(GenerationBackend):
+    """
+    Local stand-in for a provider, for load and soak tests
+
+    The reply text and token counts depend only on the prompt and seed, so
+    runs are reproducible. Latency, errors and 429s are drawn per call from a
+    generator seeded with (seed, call number): the same sequence of calls
+    sees the same latencies and failures on every run.
+
+    Prompt caching works like OpenAI's: prompts sharing a prefix of at least
+    CACHE_MIN_TOKENS with an earlier one report that prefix as cached_tokens,
+    in CACHE_BLOCK_TOKENS increments.
+
+    Latency distributions, parameterized by latency_ms (the median) and
+    latency_sigma:
+        fixed      always latency_ms
+        uniform    latency_ms * [1 - sigma, 1 + sigma]
+        normal     N(latency_ms, latency_ms * sigma), floored at 0
+        lognormal  median latency_ms with log-space sigma; a long right tail
+                   like real completion latency
+    """
+
+    name = "mock"
+
+    DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal")
+    CACHE_MIN_TOKENS = 1024
+    CACHE_BLOCK_TOKENS = 128
+    CACHE_MAX_BLOCKS = 100_000
+
+    def __init__(
+        self,
+        latency_ms: float = 800.0,
+        latency_distribution: str = "lognormal",
+        latency_sigma: float = 0.5,
+        output_tokens: int = 120,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        seed: int = 42,
+    ):
+        if latency_distribution not in self.DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution {latency_distribution!r}")
+        self.latency_ms = latency_ms
+        self.latency_distribution = latency_distribution
+        self.latency_sigma = latency_sigma
+        self.output_tokens = output_tokens
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.seed = seed
+        self._calls = itertools.count()
+        self._cached_blocks: set[bytes] = set()
+
+    def sample_latency(self, rng: random.Random) -> float:
+        """Latency in seconds for one call"""
+        median, sigma = self.latency_ms, self.latency_sigma
+        if self.latency_distribution == "fixed":
+            latency = median
+        elif self.latency_distribution == "uniform":
+            latency = rng.uniform(median * (1 - sigma), median * (1 + sigma))
+        elif self.latency_distribution == "normal":
+            latency = rng.gauss(median, median * sigma)
+        else:
+            latency = median * math.exp(rng.gauss(0, sigma))
+        return max(latency, 0.0) / 1000
+
+    async def complete(self, system_prompt, user_prompt, model, max_tokens, temperature, n=1) -> Completion:
+        rng = random.Random(f"{self.seed}:{next(self._calls)}")
+        await asyncio.sleep(self.sample_latency(rng))
+
+        roll = rng.random()
+        if roll < self.rate_limit_rate + self.error_rate:
+            # Raised as the real client's exception types, so callers' handling is exercised
+            from openai import InternalServerError, RateLimitError
+
+            if roll < self.rate_limit_rate:
+                raise RateLimitError(
+                    "Rate limit reached (mock)",
+                    response=_mock_response(429),
+                    body={"error": {"type": "rate_limit_exceeded"}},
+                )
+            raise InternalServerError(
+                "Upstream failure (mock)",
+                response=_mock_response(500),
+                body={"error": {"type": "server_error"}},
+            )
+
+        cached_tokens = self.cache_prompt(model, system_prompt + user_prompt)
+        digest = hashlib.blake2b(f"{self.seed}:{model}:{system_prompt}:{user_prompt}".encode(), digest_size=8).digest()
+        prompt_hash = int.from_bytes(digest, "big")
+        spread = max(self.output_tokens // 4, 1)
+        replies = [MOCK_REPLIES[(prompt_hash + index) % len(MOCK_REPLIES)] for index in range(n)]
+        return Completion(
+            content=replies[0],
+            alternates=replies[1:],
+            model=model,
+            # Roughly four characters per token, as with OpenAI tokenizers
+            input_tokens=(len(system_prompt) + len(user_prompt)) // 4,
+            output_tokens=n * min(self.output_tokens - spread // 2 + prompt_hash % spread, max_tokens),
+            cached_tokens=cached_tokens,
+        )
+
+    def cache_prompt(self, model: str, prompt: str) -> int:
+        """Tokens of the prompt's prefix already in the cache; the whole prompt is cached afterwards"""
+        block_chars = self.CACHE_BLOCK_TOKENS * 4
+        blocks, hits, missed = [], 0, False
+        chain = model.encode()
+        for end in range(block_chars, len(prompt) + 1, block_chars):
+            chain = hashlib.blake2b(chain + prompt[end - block_chars:end].encode(), digest_size=16).digest()
+            blocks.append(chain)
+            if not missed and chain in self._cached_blocks:
+                hits += 1
+            else:
+                missed = True
+
+        if len(self._cached_blocks) + len(blocks) > self.CACHE_MAX_BLOCKS:
+            self._cached_blocks.clear()  # Evicted wholesale, like a cold provider cache
+        self._cached_blocks.update(blocks)
+
+        cached = hits * self.CACHE_BLOCK_TOKENS
+        return cached if cached >= self.CACHE_MIN_TOKENS else 0
+
+
+def _mock_response(status_code: int):
+    """HTTP response the openai exceptions expect to wrap"""
+    import httpx
+
+    return httpx.Response(status_code, request=httpx.Request("POST", "http://mock-llm/v1/chat/completions"))
+
+
+def get_generation_backend() -> GenerationBackend:
+    """Backend selected by settings.AI_BACKEND, behind the circuit breaker unless it is disabled"""
+    backend = _provider_backend()
+    if settings.AI_BREAKER_ENABLED:
+        from app.services.llm_resilience import ResilientBackend
+
+        backend = ResilientBackend(backend)
+    return backend
+
+
+def _provider_backend() -> GenerationBackend:
+    if settings.AI_BACKEND == "mock":
+        return MockLLMBackend(
+            latency_ms=settings.MOCK_LLM_LATENCY_MS,
+            latency_distribution=settings.MOCK_LLM_LATENCY_DISTRIBUTION,
+            latency_sigma=settings.MOCK_LLM_LATENCY_SIGMA,
+            output_tokens=settings.MOCK_LLM_OUTPUT_TOKENS,
+            error_rate=settings.MOCK_LLM_ERROR_RATE,
+            rate_limit_rate=settings.MOCK_LLM_RATE_LIMIT_RATE,
+            seed=settings.MOCK_LLM_SEED,
+        )
+    if settings.AI_BACKEND == "openai":
+        return OpenAIBackend(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL or None)
+    raise ValueError(f"Unknown AI_BACKEND {settings.AI_BACKEND!r}")
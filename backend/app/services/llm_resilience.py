@@ -0,0 +1,236 @@
+"""
+Circuit breaker and hedged requests around a generation backend
+
+ResilientBackend wraps the configured backend (see get_generation_backend):
+
+    - Every upstream call gets AI_REQUEST_TIMEOUT_SECONDS. The circuit
+      breaker watches the last AI_BREAKER_WINDOW calls and opens when too
+      many of them failed or were slower than AI_BREAKER_SLOW_CALL_SECONDS.
+      While open, calls fail at once with CircuitOpenError and callers use
+      get_fallback_message, instead of each waiting out the timeout. After
+      AI_BREAKER_OPEN_SECONDS one probe call is let through: success closes
+      the circuit, failure opens it again.
+    - With hedging on, a call still running after the observed p95 latency
+      gets a second, identical call; whichever answers first wins and the
+      other is cancelled. At most AI_HEDGE_BUDGET_PERCENT of recent calls
+      are hedged, so a slow provider does not get twice the traffic. A hedge
+      is a call of its own: it needs a free bulk-lane slot of the
+      generation scheduler, or the call is not hedged.
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Deque
+
+from app.config.settings import settings
+from app.services.generation_scheduler import BULK, GenerationScheduler
+from app.services.llm_backends import Completion, GenerationBackend
+from app.utils.metrics import AI_CIRCUIT_REJECTED, AI_CIRCUIT_STATE, AI_HEDGED_REQUESTS
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(Exception):
+    """The provider is failing; the call was not attempted"""
+
+
+class CircuitBreaker:
+    """
+    Error- and latency-rate circuit breaker over a window of recent calls
+
+    Args:
+        window: Calls the rates are computed over
+        min_calls: Calls needed in the window before it may open
+        error_rate: Failed share of the window that opens the circuit
+        slow_rate: Slow share of the window that opens the circuit
+        slow_call_seconds: Calls slower than this count as slow
+        open_seconds: Time calls are rejected before a probe is let through
+    """
+
+    def __init__(self, window: int, min_calls: int, error_rate: float, slow_rate: float,
+                 slow_call_seconds: float, open_seconds: float):
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.outcomes: Deque[tuple[bool, bool]] = deque(maxlen=window)  # (failed, slow)
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probing = False
+        AI_CIRCUIT_STATE.set(0)
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream now; a half-open circuit lets one probe through"""
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.open_seconds:
+                return False
+            self._set_state(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            if self.probing:
+                return False
+            self.probing = True
+        return True
+
+    def record(self, failed: bool, seconds: float) -> None:
+        """Outcome of a call that allow() let through"""
+        slow = seconds > self.slow_call_seconds
+        if self.state == HALF_OPEN:
+            self.probing = False
+            if failed or slow:
+                self._open()
+            else:
+                self.outcomes.clear()
+                self._set_state(CLOSED)
+            return
+
+        self.outcomes.append((failed, slow))
+        if self.state == CLOSED and len(self.outcomes) >= self.min_calls:
+            calls = len(self.outcomes)
+            failures = sum(failed for failed, _ in self.outcomes)
+            slow_calls = sum(slow for _, slow in self.outcomes)
+            if failures / calls >= self.error_rate or slow_calls / calls >= self.slow_rate:
+                self._open()
+
+    def release(self) -> None:
+        """A call that allow() let through ended without an outcome (cancelled)"""
+        if self.state == HALF_OPEN:
+            self.probing = False
+
+    def _open(self) -> None:
+        self.opened_at = time.monotonic()
+        self._set_state(OPEN)
+
+    def _set_state(self, state: str) -> None:
+        if state != self.state:
+            print(f"AI circuit breaker {self.state} -> {state}")
+        self.state = state
+        AI_CIRCUIT_STATE.set({CLOSED: 0, HALF_OPEN: 1, OPEN: 2}[state])
+
+
+class LatencyWindow:
+    """Latencies of recent successful calls"""
+
+    def __init__(self, size: int):
+        self.samples: Deque[float] = deque(maxlen=size)
+
+    def add(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def quantile(self, q: float) -> float | None:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class ResilientBackend(GenerationBackend):
+    """
+    A backend behind a circuit breaker, with optional hedged requests
+
+    Args:
+        backend: The provider backend
+        breaker: Circuit breaker; by default from the AI_BREAKER_* settings
+        hedging: Whether to hedge; by default AI_HEDGING_ENABLED
+        scheduler: GenerationScheduler hedges take a slot from; the
+            AIMessageGenerator using this backend sets its own
+    """
+
+    def __init__(self, backend: GenerationBackend, breaker: CircuitBreaker | None = None,
+                 hedging: bool | None = None, scheduler: GenerationScheduler | None = None):
+        self.backend = backend
+        self.scheduler = scheduler
+        self.name = backend.name
+        self.breaker = breaker or CircuitBreaker(
+            window=settings.AI_BREAKER_WINDOW,
+            min_calls=settings.AI_BREAKER_MIN_CALLS,
+            error_rate=settings.AI_BREAKER_ERROR_RATE,
+            slow_rate=settings.AI_BREAKER_SLOW_RATE,
+            slow_call_seconds=settings.AI_BREAKER_SLOW_CALL_SECONDS,
+            open_seconds=settings.AI_BREAKER_OPEN_SECONDS,
+        )
+        self.hedging = settings.AI_HEDGING_ENABLED if hedging is None else hedging
+        self.latencies = LatencyWindow(settings.AI_HEDGE_LATENCY_WINDOW)
+        self.hedged: Deque[bool] = deque(maxlen=settings.AI_HEDGE_BUDGET_WINDOW)
+
+    async def complete(self, system_prompt, user_prompt, model, max_tokens, temperature, n=1) -> Completion:
+        if not self.breaker.allow():
+            AI_CIRCUIT_REJECTED.inc()
+            raise CircuitOpenError(f"{self.name} circuit is open; not calling the provider")
+
+        primary = asyncio.ensure_future(self._attempt(system_prompt, user_prompt, model, max_tokens, temperature, n))
+        delay = self.hedge_delay()
+        if delay is None:
+            self.hedged.append(False)
+            return await primary
+
+        try:
+            await asyncio.wait({primary}, timeout=delay)
+        except asyncio.CancelledError:
+            primary.cancel()
+            raise
+        if primary.done() or not self.hedge_allowed() or not self._take_hedge_slot():
+            self.hedged.append(False)
+            return await primary
+
+        self.hedged.append(True)
+        try:
+            hedge = asyncio.ensure_future(
+                self._attempt(system_prompt, user_prompt, model, max_tokens, temperature, n)
+            )
+            return await self._first_success(primary, hedge)
+        finally:
+            if self.scheduler is not None:
+                self.scheduler.release(BULK)
+
+    def hedge_delay(self) -> float | None:
+        """Seconds to wait before hedging a call, or None to never hedge it"""
+        if not self.hedging or len(self.latencies.samples) < settings.AI_HEDGE_MIN_SAMPLES:
+            return None
+        return self.latencies.quantile(settings.AI_HEDGE_QUANTILE)
+
+    def hedge_allowed(self) -> bool:
+        """Whether hedging this call keeps the hedged share of the recorded calls, this one included, in budget"""
+        budget = settings.AI_HEDGE_BUDGET_PERCENT / 100 * (len(self.hedged) + 1)
+        return sum(self.hedged) + 1 <= budget and self.breaker.state == CLOSED
+
+    def _take_hedge_slot(self) -> bool:
+        # Hedges count against GENERATION_CONCURRENCY, and never take the interactive reserve
+        return self.scheduler is None or self.scheduler.try_acquire(BULK)
+
+    async def _first_success(self, primary: asyncio.Future, hedge: asyncio.Future) -> Completion:
+        """The first of two calls to succeed; the other is cancelled. If both fail, the primary's error"""
+        pending = {primary, hedge}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        AI_HEDGED_REQUESTS.labels("hedge_won" if task is hedge else "primary_won").inc()
+                        return task.result()
+            AI_HEDGED_REQUESTS.labels("both_failed").inc()
+            return primary.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _attempt(self, system_prompt, user_prompt, model, max_tokens, temperature, n) -> Completion:
+        """One upstream call, timed out and reported to the breaker and latency window"""
+        start = time.perf_counter()
+        try:
+            completion = await asyncio.wait_for(
+                self.backend.complete(system_prompt, user_prompt, model, max_tokens, temperature, n),
+                settings.AI_REQUEST_TIMEOUT_SECONDS,
+            )
+        except asyncio.CancelledError:
+            self.breaker.release()
+            raise
+        except Exception:
+            self.breaker.record(failed=True, seconds=time.perf_counter() - start)
+            raise
+
+        seconds = time.perf_counter() - start
+        self.breaker.record(failed=False, seconds=seconds)
+        self.latencies.add(seconds)
+        return completion
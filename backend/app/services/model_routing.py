@@ -0,0 +1,139 @@
+"""
+Model routing: which model, temperature and max_tokens a generation uses
+
+Routes are named parameter sets (AI_ROUTES). AI_ROUTING_RULES pick one
+per call from the contact segment, the occasion and the scheduler lane;
+the first rule whose conditions all match wins, and AI_DEFAULT_ROUTE
+covers the rest:
+
+    AI_ROUTING_RULES=[{"segment": ["VIP", "partner"], "route": "premium"},
+                      {"lane": "interactive", "route": "premium"}]
+
+Under quota pressure (recent rate limiting, or interactive calls queueing
+for a slot) routes listed in AI_ROUTE_DOWNGRADES are swapped for their cheaper
+target, unless the matching rule is "pinned". Costs come from
+AI_MODEL_PRICING, in USD per million input, output and cached input
+tokens.
+"""
+
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict
+
+from app.config.settings import settings
+from app.services.generation_scheduler import INTERACTIVE
+from app.utils.metrics import AI_ROUTE_COST, AI_ROUTE_DOWNGRADES, AI_ROUTE_DURATION
+
+# Seconds a rate-limit error counts towards quota pressure
+_RATE_LIMIT_WINDOW_SECONDS = 60.0
+
+
+@dataclass(frozen=True)
+class ModelRoute:
+    """Generation parameters chosen for one call"""
+    name: str
+    model: str
+    temperature: float
+    max_tokens: int
+    downgraded_from: str | None = None
+
+
+def model_cost(model: str, input_tokens: int, output_tokens: int, cached_tokens: int = 0) -> float:
+    """
+    USD cost of a call by AI_MODEL_PRICING; 0 for a model without a price
+
+    cached_tokens are the part of input_tokens served from the prompt cache,
+    billed at the cached input price (the full input price if none is set).
+    """
+    pricing = settings.AI_MODEL_PRICING.get(model)
+    if pricing is None:
+        return 0.0
+    input_price, output_price = pricing[:2]
+    cached_price = pricing[2] if len(pricing) > 2 else input_price
+    return (
+        (input_tokens - cached_tokens) * input_price + cached_tokens * cached_price + output_tokens * output_price
+    ) / 1_000_000
+
+
+class ModelRouter:
+    """
+    Applies the routing rules and watches for quota pressure
+
+    Args:
+        scheduler: GenerationScheduler whose interactive queue signals pressure
+    """
+
+    def __init__(self, scheduler=None):
+        self.scheduler = scheduler
+        self.rate_limited: Deque[float] = deque()
+
+        # Misconfiguration should stop the worker, not fail every generation
+        named = {settings.AI_DEFAULT_ROUTE, *settings.AI_ROUTE_DOWNGRADES, *settings.AI_ROUTE_DOWNGRADES.values(),
+                 *(rule.get("route", settings.AI_DEFAULT_ROUTE) for rule in settings.AI_ROUTING_RULES)}
+        unknown = named - set(settings.AI_ROUTES)
+        if unknown:
+            raise ValueError(f"AI routing refers to undefined routes: {', '.join(sorted(unknown))}")
+
+    def route(self, segment: Any = None, occasion: Any = None, lane: str | None = None) -> ModelRoute:
+        """Route for a call; enum arguments are matched by value"""
+        values = {"segment": _value(segment), "occasion": _value(occasion), "lane": lane}
+        rule = next((rule for rule in settings.AI_ROUTING_RULES if _matches(rule, values)), {})
+        name = rule.get("route", settings.AI_DEFAULT_ROUTE)
+
+        downgraded_from = None
+        target = settings.AI_ROUTE_DOWNGRADES.get(name)
+        if target and not rule.get("pinned") and self.under_pressure():
+            AI_ROUTE_DOWNGRADES.labels(name, target).inc()
+            name, downgraded_from = target, name
+        return self.build(name, downgraded_from)
+
+    def build(self, name: str, downgraded_from: str | None = None) -> ModelRoute:
+        """ModelRoute for a configured route name"""
+        params = settings.AI_ROUTES.get(name)
+        if params is None:
+            raise ValueError(f"Unknown AI route {name!r}")
+        return ModelRoute(
+            name=name,
+            model=params.get("model", settings.DEFAULT_AI_MODEL),
+            temperature=params.get("temperature", settings.AI_TEMPERATURE),
+            max_tokens=params.get("max_tokens", settings.MAX_TOKENS),
+            downgraded_from=downgraded_from,
+        )
+
+    def under_pressure(self) -> bool:
+        """
+        Several rate-limit errors in the last minute, or a deep interactive queue
+
+        The bulk queue is left out: a campaign queues its whole audience at
+        once, which measures the concurrency cap rather than the quota.
+        """
+        if self.scheduler is not None:
+            if len(self.scheduler.queues[INTERACTIVE]) >= settings.AI_ROUTING_PRESSURE_QUEUE_DEPTH:
+                return True
+        cutoff = time.monotonic() - _RATE_LIMIT_WINDOW_SECONDS
+        while self.rate_limited and self.rate_limited[0] < cutoff:
+            self.rate_limited.popleft()
+        return len(self.rate_limited) >= settings.AI_ROUTING_PRESSURE_RATE_LIMITS
+
+    def observe(self, route: ModelRoute, seconds: float, cost: float = 0.0, error: Exception | None = None) -> None:
+        """Record a finished call against its route"""
+        AI_ROUTE_DURATION.labels(route.name, route.model, "error" if error else "success").observe(seconds)
+        if cost:
+            AI_ROUTE_COST.labels(route.name, route.model).inc(cost)
+        if error is not None and type(error).__name__ == "RateLimitError":
+            self.rate_limited.append(time.monotonic())
+
+
+def _value(value: Any) -> Any:
+    return getattr(value, "value", value)
+
+
+def _matches(rule: Dict[str, Any], values: Dict[str, Any]) -> bool:
+    for key, value in values.items():
+        if key not in rule:
+            continue
+        allowed = rule[key] if isinstance(rule[key], list) else [rule[key]]
+        if value not in allowed:
+            return False
+    return True
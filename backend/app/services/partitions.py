@@ -0,0 +1,312 @@
+"""
+Monthly range partitions for messages and message_history
+
+Both tables are partitioned by created_at month (messages_p2026_01, ...) with
+a DEFAULT partition catching anything outside the created ranges. Future
+partitions are created ahead of time by the API's maintenance task or the
+CLI, and by Base.metadata.create_all once this module is imported; cold
+partitions are detached, archived to gzipped CSV and dropped:
+
+    python -m app.services.partitions list
+    python -m app.services.partitions ensure --months-ahead 3
+    python -m app.services.partitions archive --older-than-months 24
+    python -m app.services.partitions restore archive/messages_p2023_01.csv.gz
+"""
+
+import argparse
+import asyncio
+import gzip
+import re
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, List
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Connection
+
+from app.config.database import Base
+from app.config.settings import settings
+
+PARTITIONED_TABLES = ("messages", "message_history")
+
+_PARTITION_NAME = re.compile(r"^(?P<table>\w+)_p(?P<year>\d{4})_(?P<month>\d{2})$")
+
+# Serializes partition DDL across API workers and CLI runs
+_MAINTENANCE_LOCK_KEY = 0x6D736770  # "msgp"
+
+
+def month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month.year:04d}_{month.month:02d}"
+
+
+def default_partition_name(table: str) -> str:
+    return f"{table}_default"
+
+
+def is_partitioned(conn: Connection, table: str) -> bool:
+    """Whether a table exists as a partitioned (relkind 'p') table"""
+    return conn.execute(
+        text("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(:table)"),
+        {"table": table},
+    ).scalar() is True
+
+
+def list_partitions(conn: Connection, table: str) -> Dict[str, date | None]:
+    """Attached partitions of a table: name -> month (None for the default partition)"""
+    rows = conn.execute(
+        text(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = :table
+            ORDER BY child.relname
+            """
+        ),
+        {"table": table},
+    ).scalars()
+
+    partitions = {}
+    for name in rows:
+        match = _PARTITION_NAME.match(name)
+        partitions[name] = date(int(match["year"]), int(match["month"]), 1) if match else None
+    return partitions
+
+
+def create_default_partition(conn: Connection, table: str) -> None:
+    conn.exec_driver_sql(
+        f"CREATE TABLE IF NOT EXISTS {default_partition_name(table)} PARTITION OF {table} DEFAULT"
+    )
+
+
+def create_month_partition(conn: Connection, table: str, month: date) -> bool:
+    """
+    Create the partition for one month, if missing
+
+    Rows already sitting in the default partition for that month are moved
+    into the new partition; Postgres refuses to attach it otherwise.
+
+    Returns:
+        True if the partition was created
+    """
+    name = partition_name(table, month)
+    if conn.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar() is not None:
+        return False
+
+    start, end = month, add_months(month, 1)
+    default = default_partition_name(table)
+    has_default = conn.execute(text("SELECT to_regclass(:name)"), {"name": default}).scalar() is not None
+    stray_rows = has_default and conn.execute(
+        text(f"SELECT EXISTS (SELECT 1 FROM {default} WHERE created_at >= :start AND created_at < :end)"),
+        {"start": start, "end": end},
+    ).scalar()
+
+    if stray_rows:
+        conn.exec_driver_sql(f"ALTER TABLE {table} DETACH PARTITION {default}")
+
+    conn.exec_driver_sql(
+        f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES FROM ('{start}') TO ('{end}')"
+    )
+
+    if stray_rows:
+        conn.execute(
+            text(f"INSERT INTO {name} SELECT * FROM {default} WHERE created_at >= :start AND created_at < :end"),
+            {"start": start, "end": end},
+        )
+        conn.execute(
+            text(f"DELETE FROM {default} WHERE created_at >= :start AND created_at < :end"),
+            {"start": start, "end": end},
+        )
+        conn.exec_driver_sql(f"ALTER TABLE {table} ATTACH PARTITION {default} DEFAULT")
+
+    return True
+
+
+def create_partitions(conn: Connection, table: str, start: date, months_ahead: int) -> List[str]:
+    """
+    Create the default partition and monthly partitions of one table, from
+    `start` through `months_ahead` months past the current month
+
+    Returns:
+        Names of the partitions created
+    """
+    create_default_partition(conn, table)
+
+    created = []
+    last = add_months(month_start(datetime.utcnow().date()), months_ahead)
+    month = month_start(start)
+    while month <= last:
+        if create_month_partition(conn, table, month):
+            created.append(partition_name(table, month))
+        month = add_months(month, 1)
+    return created
+
+
+def ensure_partitions(conn: Connection, start: date, months_ahead: int) -> List[str]:
+    """
+    Create missing partitions of every partitioned table; see create_partitions
+
+    Returns:
+        Names of the partitions created
+    """
+    if not conn.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": _MAINTENANCE_LOCK_KEY}).scalar():
+        return []  # Another worker is doing the same thing right now
+
+    created = []
+    for table in PARTITIONED_TABLES:
+        if is_partitioned(conn, table):
+            created += create_partitions(conn, table, start, months_ahead)
+    return created
+
+
+def ensure_future_partitions(conn: Connection, months_ahead: int | None = None) -> List[str]:
+    """Make sure the current month and the next `months_ahead` months have partitions"""
+    months_ahead = settings.PARTITION_PREMAKE_MONTHS if months_ahead is None else months_ahead
+    return ensure_partitions(conn, datetime.utcnow().date(), months_ahead)
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_initial_partitions(metadata, connection, tables=(), **kw):
+    """create_all makes partitioned parents; give them somewhere to put rows"""
+    for table in tables:
+        if table.name in PARTITIONED_TABLES:
+            create_partitions(connection, table.name, datetime.utcnow().date(), settings.PARTITION_PREMAKE_MONTHS)
+
+
+def detach_partition(conn: Connection, table: str, name: str) -> None:
+    """Detach a partition; it stays a regular table until archived"""
+    conn.exec_driver_sql(f"ALTER TABLE {table} DETACH PARTITION {name}")
+
+
+def archive_partition(conn: Connection, table: str, name: str, directory: Path) -> Path:
+    """
+    Detach a partition, write it to <directory>/<name>.csv.gz and drop it
+
+    Needs a psycopg2 connection (COPY TO STDOUT); use the sync engine.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{name}.csv.gz"
+
+    if name in list_partitions(conn, table):
+        detach_partition(conn, table, name)
+
+    cursor = conn.connection.cursor()
+    try:
+        with gzip.open(path, "wb") as archive:
+            cursor.copy_expert(f"COPY {name} TO STDOUT WITH (FORMAT csv, HEADER)", archive)
+    finally:
+        cursor.close()
+
+    conn.exec_driver_sql(f"DROP TABLE {name}")
+    return path
+
+
+def restore_partition(conn: Connection, path: Path) -> str:
+    """Load an archived partition back and re-attach it"""
+    name = path.name.removesuffix(".csv.gz")
+    match = _PARTITION_NAME.match(name)
+    if match is None:
+        raise ValueError(f"{path} is not a monthly partition archive")
+
+    table = match["table"]
+    month = date(int(match["year"]), int(match["month"]), 1)
+    conn.exec_driver_sql(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+
+    cursor = conn.connection.cursor()
+    try:
+        with gzip.open(path, "rb") as archive:
+            cursor.copy_expert(f"COPY {name} FROM STDIN WITH (FORMAT csv, HEADER)", archive)
+    finally:
+        cursor.close()
+
+    conn.exec_driver_sql(
+        f"ALTER TABLE {table} ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{month}') TO ('{add_months(month, 1)}')"
+    )
+    return name
+
+
+def cold_partitions(conn: Connection, older_than_months: int) -> List[tuple[str, str]]:
+    """(table, partition) pairs whose whole month is older than the retention window"""
+    cutoff = add_months(month_start(datetime.utcnow().date()), -older_than_months)
+    return [
+        (table, name)
+        for table in PARTITIONED_TABLES
+        for name, month in list_partitions(conn, table).items()
+        if month is not None and month < cutoff
+    ]
+
+
+async def maintain_partitions(engine, interval: float) -> None:
+    """Create upcoming partitions now and then every `interval` seconds; runs until cancelled"""
+    while True:
+        try:
+            async with engine.begin() as conn:
+                created = await conn.run_sync(ensure_future_partitions)
+            if created:
+                print(f"Created partitions: {', '.join(created)}")
+        except Exception as e:
+            print(f"Partition maintenance failed: {e}")
+
+        await asyncio.sleep(interval)
+
+
+def main():
+    from app.config.database import sync_engine
+
+    parser = argparse.ArgumentParser(description="Manage monthly partitions of messages and message_history")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="Show attached partitions")
+    ensure = commands.add_parser("ensure", help="Create partitions up to N months ahead")
+    ensure.add_argument("--months-ahead", type=int, default=settings.PARTITION_PREMAKE_MONTHS)
+    archive = commands.add_parser("archive", help="Detach, export and drop cold partitions")
+    archive.add_argument("--older-than-months", type=int, default=settings.PARTITION_RETENTION_MONTHS)
+    archive.add_argument("--directory", type=Path, default=Path(settings.PARTITION_ARCHIVE_DIR))
+    archive.add_argument("--dry-run", action="store_true")
+    restore = commands.add_parser("restore", help="Re-attach an archived partition")
+    restore.add_argument("path", type=Path)
+    args = parser.parse_args()
+
+    if args.command == "list":
+        with sync_engine.connect() as conn:
+            for table in PARTITIONED_TABLES:
+                partitions = list_partitions(conn, table)
+                print(f"{table}: {len(partitions)} partitions")
+                for name in partitions:
+                    print(f"  {name}")
+
+    elif args.command == "ensure":
+        with sync_engine.begin() as conn:
+            created = ensure_future_partitions(conn, args.months_ahead)
+        print(f"✓ Created {len(created)} partitions" + (f": {', '.join(created)}" if created else ""))
+
+    elif args.command == "archive":
+        with sync_engine.connect() as conn:
+            candidates = cold_partitions(conn, args.older_than_months)
+        for table, name in candidates:
+            if args.dry_run:
+                print(f"  would archive {name}")
+                continue
+            # One transaction per partition, so a failure leaves earlier archives in place
+            with sync_engine.begin() as conn:
+                path = archive_partition(conn, table, name, args.directory)
+            print(f"✓ Archived {name} to {path}")
+
+    elif args.command == "restore":
+        with sync_engine.begin() as conn:
+            name = restore_partition(conn, args.path)
+        print(f"✓ Restored {name}")
+
+
+if __name__ == "__main__":
+    main()
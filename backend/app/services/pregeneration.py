@@ -0,0 +1,535 @@
+"""
+Ahead-of-time generation for predictable occasions
+
+Birthdays and public holidays are known long before the day, but generating
+their messages on the day turns 1 January into a spike against the provider's
+rate limits. The planner looks PREGENERATION_HORIZON_DAYS ahead:
+
+    - Demand: contacts with a birthday on each day, and for each holiday in
+      the RU and UZ calendars (plus PREGENERATION_EXTRA_HOLIDAYS, for moveable
+      feasts) the contacts whose language follows that calendar, less those
+      already holding a message for the occasion.
+    - Deadlines: a message is sent at PREGENERATION_SEND_HOUR local time on
+      the day, and should be waiting in PENDING_APPROVAL PREGENERATION_LEAD_DAYS
+      before that; it is not generated more than PREGENERATION_MAX_ADVANCE_DAYS
+      ahead, so it reflects the contact as it is close to the day.
+    - Placement: occasions are placed earliest deadline first into the
+      off-peak hours of their window, filling the least loaded hours first
+      (water-filling), at most PREGENERATION_HOURLY_QUOTA generations an
+      hour. What does not fit goes into any hour before the send time, and
+      is reported as late; what still does not fit is reported as
+      unscheduled.
+
+The plan is pure arithmetic over the demand, so a dry run (GET
+/api/campaigns/pregeneration/plan, or `python -m app.services.pregeneration`)
+shows the projected hourly load curve without generating anything. With
+PREGENERATION_ENABLED, every worker runs a Pregenerator: each hour one of
+them claims the hour in Redis, recomputes the plan and generates that hour's
+share in the bulk lane, paced across the hour. Demand is
+recounted every hour, so failures and new contacts are picked up on the
+next one.
+"""
+
+import asyncio
+import bisect
+from dataclasses import dataclass, field
+from datetime import date, datetime, time as clock_time, timedelta, timezone
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import exists, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config.redis import get_redis
+from app.config.settings import settings
+from app.models.contact import Contact, Language, birthday_month_day
+from app.models.message import GeneratedBy, Message, MessageHistory, MessageStatus, OccasionType
+from app.models.user import User
+from app.services.cron import get_timezone
+from app.services.events import broker, message_event
+from app.utils.http_cache import invalidate
+from app.utils.metrics import PREGENERATED_MESSAGES
+
+BIRTHDAY = "birthday"
+_HOUR = timedelta(hours=1)
+
+
+@dataclass(frozen=True)
+class Holiday:
+    """A fixed-date public holiday"""
+    month: int
+    day: int
+    name: str
+    occasion_type: OccasionType = OccasionType.HOLIDAY
+
+
+# Holidays worth a greeting; moveable ones (Ramazon and Qurbon hayit) go in PREGENERATION_EXTRA_HOLIDAYS
+HOLIDAY_CALENDARS: Dict[str, List[Holiday]] = {
+    "RU": [
+        Holiday(1, 1, "New Year", OccasionType.NEW_YEAR),
+        Holiday(2, 23, "Defender of the Fatherland Day"),
+        Holiday(3, 8, "International Women's Day"),
+        Holiday(5, 9, "Victory Day"),
+        Holiday(6, 12, "Russia Day"),
+        Holiday(11, 4, "National Unity Day"),
+    ],
+    "UZ": [
+        Holiday(1, 1, "New Year", OccasionType.NEW_YEAR),
+        Holiday(1, 14, "Defenders of the Motherland Day"),
+        Holiday(3, 8, "International Women's Day"),
+        Holiday(3, 21, "Navruz"),
+        Holiday(5, 9, "Day of Remembrance and Honour"),
+        Holiday(9, 1, "Independence Day"),
+        Holiday(10, 1, "Teachers' and Mentors' Day"),
+        Holiday(12, 8, "Constitution Day"),
+    ],
+}
+
+
+@dataclass(eq=False)
+class Occasion:
+    """Messages one group of contacts needs for one send time"""
+    name: str  # BIRTHDAY or the holiday's name
+    occasion_type: OccasionType
+    language: Language
+    day: date
+    send_at: datetime  # Naive UTC
+    count: int = 0  # Contacts still without a message
+    birthday_keys: Tuple[int, ...] = ()  # month * 100 + day, for birthdays
+
+    @property
+    def ready_by(self) -> datetime:
+        """When its messages should be waiting for approval"""
+        return self.send_at - timedelta(days=settings.PREGENERATION_LEAD_DAYS)
+
+    @property
+    def earliest(self) -> datetime:
+        return self.send_at - timedelta(days=settings.PREGENERATION_MAX_ADVANCE_DAYS)
+
+
+@dataclass
+class PregenerationPlan:
+    """Generations per hour, by occasion"""
+    start: datetime
+    end: datetime
+    hourly_quota: int
+    occasions: List[Occasion]
+    slots: Dict[datetime, List[Tuple[Occasion, int]]] = field(default_factory=dict)
+    late: Dict[int, int] = field(default_factory=dict)  # id(occasion) -> generations after ready_by
+    unscheduled: Dict[int, int] = field(default_factory=dict)  # id(occasion) -> generations that do not fit
+
+    def load(self, hour: datetime) -> int:
+        return sum(count for _, count in self.slots.get(hour, []))
+
+    def scheduled(self, occasion: Occasion) -> int:
+        return occasion.count - self.unscheduled.get(id(occasion), 0)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """The dry-run report: totals, per-occasion placement and the hourly load curve"""
+        tz = get_timezone(settings.PREGENERATION_TIMEZONE)
+        hours = []
+        hour = self.start
+        while hour < self.end:
+            hours.append(hour)
+            hour += _HOUR
+        daily: Dict[date, int] = {}
+        for hour in hours:
+            day = _local(hour, tz).date()
+            daily[day] = daily.get(day, 0) + self.load(hour)
+
+        # Without pre-generation each send time's messages are generated when they are due
+        on_demand: Dict[datetime, int] = {}
+        for occasion in self.occasions:
+            on_demand[occasion.send_at] = on_demand.get(occasion.send_at, 0) + occasion.count
+
+        return {
+            "start": self.start,
+            "end": self.end,
+            "timezone": settings.PREGENERATION_TIMEZONE,
+            "hourly_quota": self.hourly_quota,
+            "demand": sum(occasion.count for occasion in self.occasions),
+            "scheduled": sum(self.scheduled(occasion) for occasion in self.occasions),
+            "late": sum(self.late.values()),
+            "unscheduled": sum(self.unscheduled.values()),
+            "peak_hour_load": max((self.load(hour) for hour in hours), default=0),
+            "on_demand_peak": max(on_demand.values(), default=0),
+            "occasions": [
+                {
+                    "name": occasion.name,
+                    "occasion_type": occasion.occasion_type.value,
+                    "language": occasion.language.value,
+                    "send_at": occasion.send_at,
+                    "ready_by": occasion.ready_by,
+                    "count": occasion.count,
+                    "scheduled": self.scheduled(occasion),
+                    "late": self.late.get(id(occasion), 0),
+                    "unscheduled": self.unscheduled.get(id(occasion), 0),
+                }
+                for occasion in sorted(self.occasions, key=lambda occasion: occasion.send_at)
+                if occasion.count
+            ],
+            "daily": [{"day": day, "generations": count} for day, count in daily.items()],
+            "load_curve": [
+                {"hour": hour, "generations": self.load(hour), "off_peak": is_off_peak(hour, tz)}
+                for hour in hours
+            ],
+        }
+
+
+def _local(moment: datetime, tz) -> datetime:
+    return moment.replace(tzinfo=timezone.utc).astimezone(tz)
+
+
+def is_off_peak(hour: datetime, tz=None) -> bool:
+    """Whether a naive UTC hour is in PREGENERATION_OFF_PEAK_HOURS, local time"""
+    tz = tz or get_timezone(settings.PREGENERATION_TIMEZONE)
+    return _local(hour, tz).hour in settings.PREGENERATION_OFF_PEAK_HOURS
+
+
+def send_time(day: date) -> datetime:
+    """Naive UTC time messages for a local day are sent at"""
+    tz = get_timezone(settings.PREGENERATION_TIMEZONE)
+    local = datetime.combine(day, clock_time(settings.PREGENERATION_SEND_HOUR), tzinfo=tz)
+    return local.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def birthday_keys(day: date) -> Tuple[int, ...]:
+    """Birthday keys greeted on a day; 29 February birthdays are greeted on the 28th in common years"""
+    keys = (day.month * 100 + day.day,)
+    if day.month == 2 and day.day == 28 and not _is_leap(day.year):
+        keys += (229,)
+    return keys
+
+
+def _is_leap(year: int) -> bool:
+    return year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+
+
+def holidays_on(day: date, calendars: List[str]) -> List[Holiday]:
+    """Holidays of the given calendars on a day, each name once"""
+    found: Dict[str, Holiday] = {}
+    for calendar in calendars:
+        for holiday in HOLIDAY_CALENDARS.get(calendar, []):
+            if (holiday.month, holiday.day) == (day.month, day.day):
+                found.setdefault(holiday.name, holiday)
+    for extra in settings.PREGENERATION_EXTRA_HOLIDAYS:
+        if extra.get("calendar") in calendars and date.fromisoformat(extra["date"]) == day:
+            found.setdefault(extra["name"], Holiday(day.month, day.day, extra["name"]))
+    return list(found.values())
+
+
+def upcoming_occasions(start: datetime, days: int) -> List[Occasion]:
+    """Every birthday and holiday occasion sent in the next `days` days, with no counts yet"""
+    tz = get_timezone(settings.PREGENERATION_TIMEZONE)
+    first = _local(start, tz).date()
+    occasions = []
+    for offset in range(days + 1):
+        day = first + timedelta(days=offset)
+        send_at = send_time(day)
+        if send_at <= start:
+            continue
+        for language in Language:
+            occasions.append(Occasion(BIRTHDAY, OccasionType.BIRTHDAY, language, day, send_at,
+                                      birthday_keys=birthday_keys(day)))
+            for holiday in holidays_on(day, settings.PREGENERATION_CALENDARS.get(language.value, [])):
+                occasions.append(Occasion(holiday.name, holiday.occasion_type, language, day, send_at))
+    return occasions
+
+
+def plan_generation(occasions: List[Occasion], start: datetime, hourly_quota: int | None = None) -> PregenerationPlan:
+    """
+    Place each occasion's generations into hours from `start`
+
+    Args:
+        occasions: Occasions with their counts
+        start: Naive UTC; the first hour planned is the one containing it
+        hourly_quota: Most generations in one hour
+
+    Returns:
+        The plan; pure, so it serves dry runs as well
+    """
+    quota = settings.PREGENERATION_HOURLY_QUOTA if hourly_quota is None else hourly_quota
+    first = start.replace(minute=0, second=0, microsecond=0)
+    end = max((occasion.send_at for occasion in occasions), default=first)
+    hours = []
+    hour = first
+    while hour < end:
+        hours.append(hour)
+        hour += _HOUR
+
+    tz = get_timezone(settings.PREGENERATION_TIMEZONE)
+    off_peak = [hour for hour in hours if is_off_peak(hour, tz)]
+    loads = {hour: 0 for hour in hours}
+    plan = PregenerationPlan(start=first, end=end, hourly_quota=quota, occasions=occasions)
+
+    def place(occasion: Occasion, candidates: List[datetime], window_start: datetime, window_end: datetime,
+              amount: int) -> int:
+        window = candidates[bisect.bisect_left(candidates, window_start):bisect.bisect_left(candidates, window_end)]
+        placed = 0
+        for hour, count in zip(window, water_fill([loads[hour] for hour in window], amount, quota)):
+            if count:
+                loads[hour] += count
+                plan.slots.setdefault(hour, []).append((occasion, count))
+                placed += count
+        return placed
+
+    # Off-peak hours before each deadline first, earliest deadline first
+    remaining = {}
+    by_deadline = sorted((occasion for occasion in occasions if occasion.count), key=lambda o: (o.ready_by, o.name))
+    for occasion in by_deadline:
+        remaining[id(occasion)] = occasion.count - place(
+            occasion, off_peak, max(occasion.earliest, first), occasion.ready_by, occasion.count
+        )
+
+    # Then any hour before the send time
+    for occasion in by_deadline:
+        left = remaining[id(occasion)]
+        if left:
+            late = place(occasion, hours, max(occasion.earliest, first), occasion.send_at - _HOUR, left)
+            if late:
+                plan.late[id(occasion)] = late
+            if left - late:
+                plan.unscheduled[id(occasion)] = left - late
+
+    for slot in plan.slots.values():
+        slot.sort(key=lambda placed: placed[0].ready_by)
+    return plan
+
+
+def water_fill(loads: List[int], amount: int, cap: int) -> List[int]:
+    """
+    Split `amount` over hours with the given loads, raising the least loaded
+    first and none above `cap`
+
+    Returns:
+        Amount per hour; their sum is less than `amount` when the hours are full
+    """
+    if not loads or amount <= 0:
+        return [0] * len(loads)
+
+    def added(level: int) -> int:
+        return sum(max(0, level - load) for load in loads)
+
+    # Highest level the amount reaches
+    low, high = 0, cap
+    while low < high:
+        middle = (low + high + 1) // 2
+        if added(middle) <= amount:
+            low = middle
+        else:
+            high = middle - 1
+    level = low
+
+    shares = [max(0, level - load) for load in loads]
+    extra = amount - sum(shares)
+    if level < cap:
+        # Fewer than the hours at the level, or the next level would have fit
+        for index, load in enumerate(loads):
+            if extra == 0:
+                break
+            if max(load, level) == level:
+                shares[index] += 1
+                extra -= 1
+    return shares
+
+
+async def load_demand(db: AsyncSession, start: datetime, days: int | None = None) -> List[Occasion]:
+    """Upcoming occasions with the number of contacts still needing a message for each"""
+    days = settings.PREGENERATION_HORIZON_DAYS if days is None else days
+    occasions = upcoming_occasions(start, days)
+    if not occasions:
+        return occasions
+
+    keys = sorted({key for occasion in occasions for key in occasion.birthday_keys})
+    birthdays = {
+        (key, language): count
+        for key, language, count in (await db.execute(
+            select(birthday_month_day, Contact.language, func.count())
+            .where(birthday_month_day.in_(keys))
+            .group_by(birthday_month_day, Contact.language)
+        )).all()
+    }
+    by_language = dict((await db.execute(select(Contact.language, func.count()).group_by(Contact.language))).all())
+
+    last_send = max(occasion.send_at for occasion in occasions)
+    existing = {
+        (occasion_type, scheduled_for, language): count
+        for occasion_type, scheduled_for, language, count in (await db.execute(
+            select(Message.occasion_type, Message.scheduled_for, Contact.language, func.count())
+            .join(Contact, Contact.id == Message.contact_id)
+            .where(
+                Message.scheduled_for.between(start, last_send),
+                # Nothing is generated earlier than this, which prunes older partitions
+                Message.created_at >= start - timedelta(days=settings.PREGENERATION_MAX_ADVANCE_DAYS + 1),
+            )
+            .group_by(Message.occasion_type, Message.scheduled_for, Contact.language)
+        )).all()
+    }
+
+    for occasion in occasions:
+        if occasion.birthday_keys:
+            needed = sum(birthdays.get((key, occasion.language), 0) for key in occasion.birthday_keys)
+        else:
+            needed = by_language.get(occasion.language, 0)
+        done = existing.get((occasion.occasion_type, occasion.send_at, occasion.language), 0)
+        occasion.count = max(needed - done, 0)
+    return occasions
+
+
+async def build_plan(db: AsyncSession, start: datetime | None = None, days: int | None = None) -> PregenerationPlan:
+    """Plan from the current demand; nothing is generated"""
+    start = start or datetime.utcnow()
+    return plan_generation(await load_demand(db, start, days), start)
+
+
+def _audience(occasion: Occasion):
+    """Contacts of an occasion that do not yet have its message"""
+    criteria = [Contact.language == occasion.language]
+    if occasion.birthday_keys:
+        criteria.append(birthday_month_day.in_(occasion.birthday_keys))
+    has_message = exists().where(
+        Message.contact_id == Contact.id,
+        Message.occasion_type == occasion.occasion_type,
+        Message.scheduled_for == occasion.send_at,
+        Message.created_at >= occasion.earliest - timedelta(days=1),
+    )
+    return select(Contact).where(*criteria, ~has_message).order_by(Contact.id)
+
+
+class Pregenerator:
+    """Generates each off-peak hour's share of the plan, once across workers"""
+
+    def __init__(self, session_factory, generator=None):
+        self.session_factory = session_factory
+        if generator is None:
+            from app.services.ai_generator import ai_generator as generator
+        self.generator = generator
+
+    async def claim(self, hour: datetime) -> bool:
+        """Whether this worker runs the hour; without Redis, every worker does"""
+        try:
+            key = f"pregeneration:{hour:%Y%m%d%H}"
+            return bool(await get_redis().set(key, "1", nx=True, ex=int(_HOUR.total_seconds()) * 2))
+        except Exception as e:
+            print(f"Pre-generation hour claims unavailable: {e}")
+            return True
+
+    async def run_hour(self, hour: datetime) -> int:
+        """
+        Generate the plan's share for the hour containing `hour`
+
+        Returns:
+            Messages created
+        """
+        hour = hour.replace(minute=0, second=0, microsecond=0)
+        if not await self.claim(hour):
+            return 0
+
+        async with self.session_factory() as db:
+            plan = await build_plan(db, hour)
+            user_id = await self.owner_id(db)
+        if user_id is None:
+            return 0
+
+        batches = [
+            (occasion, size)
+            for occasion, count in plan.slots.get(hour, [])
+            for size in _batch_sizes(count, settings.PREGENERATION_BATCH_SIZE)
+        ]
+        created = 0
+        deadline = hour + _HOUR
+        for index, (occasion, size) in enumerate(batches):
+            created += await self.generate(occasion, size, user_id)
+            # Spread the rest over what is left of the hour
+            left = (deadline - datetime.utcnow()).total_seconds()
+            if index + 1 < len(batches) and left > 0:
+                await asyncio.sleep(left / (len(batches) - index))
+        return created
+
+    async def owner_id(self, db: AsyncSession):
+        """The user pre-generated messages are created by"""
+        user_id = (await db.execute(
+            select(User.id).where(User.email == settings.PREGENERATION_USER_EMAIL)
+        )).scalar_one_or_none()
+        if user_id is None:
+            print(f"Pre-generation skipped: no user {settings.PREGENERATION_USER_EMAIL!r} (PREGENERATION_USER_EMAIL)")
+        return user_id
+
+    async def generate(self, occasion: Occasion, count: int, user_id) -> int:
+        """Messages for up to `count` contacts of an occasion, waiting for approval"""
+        async with self.session_factory() as db:
+            contacts = list((await db.execute(_audience(occasion).limit(count))).scalars())
+        if not contacts:
+            return 0
+
+        # No connection is held while the provider answers
+        results = await self.generator.batch_generate(
+            contacts,
+            occasion.occasion_type,
+            custom_context=None if occasion.name == BIRTHDAY else occasion.name,
+            owner="pregeneration",
+        )
+        async with self.session_factory() as db:
+            messages = []
+            for contact, result in zip(contacts, results):
+                if not result["success"]:
+                    continue  # Still counted as demand, so the next hour retries it
+                message = Message(
+                    contact_id=contact.id,
+                    occasion_type=occasion.occasion_type,
+                    content=result["content"],
+                    status=MessageStatus.PENDING_APPROVAL,
+                    generated_by=GeneratedBy.AI,
+                    created_by=user_id,
+                    scheduled_for=occasion.send_at,
+                    message_metadata={**result["metadata"], "pregenerated": True, "occasion_name": occasion.name},
+                )
+                db.add(message)
+                db.add(MessageHistory(message=message, action="created", user_id=user_id,
+                                      new_content=message.content))
+                messages.append(message)
+            await db.flush()
+            events = [message_event(message, "created") for message in messages]
+            await db.commit()
+
+        if messages:
+            PREGENERATED_MESSAGES.labels(occasion.occasion_type.value).inc(len(messages))
+            await invalidate("messages", "analytics")
+            # Reviewers' event streams show the new approvals like any other created message
+            await broker.publish(*events)
+        return len(messages)
+
+    async def run(self) -> None:
+        """Run each hour's share until cancelled; outside off-peak hours there is only late work"""
+        while True:
+            hour = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+            try:
+                created = await self.run_hour(hour)
+                if created:
+                    print(f"Pre-generated {created} messages in the {hour:%Y-%m-%d %H}:00 UTC hour")
+            except Exception as e:
+                print(f"Pre-generation failed: {e}")
+            await asyncio.sleep(max((hour + _HOUR - datetime.utcnow()).total_seconds(), 1.0))
+
+
+def _batch_sizes(count: int, size: int) -> List[int]:
+    return [min(size, count - offset) for offset in range(0, count, size)]
+
+
+async def main():
+    from app.config.database import ReadSessionLocal
+
+    async with ReadSessionLocal() as db:
+        report = (await build_plan(db)).as_dict()
+    print(f"Pre-generation plan, {report['start']:%Y-%m-%d %H}:00 to {report['end']:%Y-%m-%d %H}:00 UTC "
+          f"(quota {report['hourly_quota']:,}/hour)")
+    print(f"  {report['demand']:,} messages: {report['scheduled']:,} scheduled, {report['late']:,} late, "
+          f"{report['unscheduled']:,} unscheduled")
+    print(f"  Peak hour {report['peak_hour_load']:,} generations; on demand it would be {report['on_demand_peak']:,}")
+    busiest = max((day["generations"] for day in report["daily"]), default=0)
+    for day in report["daily"]:
+        if day["generations"]:
+            print(f"  {day['day']}  {day['generations']:>8,}  {'#' * (day['generations'] * 60 // busiest)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
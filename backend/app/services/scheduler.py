@@ -0,0 +1,354 @@
+"""
+Scheduler for recurring and scheduled campaigns
+
+Each scheduler keeps the next fire time of every active RECURRING and
+SCHEDULED campaign in a min-heap, so a tick only touches the campaigns that
+are due instead of scanning the table, and computes each rule's fire times
+once however many campaigns share it. Campaign changes are picked up incrementally by
+updated_at; a periodic full sync drops campaigns deleted in the meantime.
+
+Any number of schedulers may run (one per API worker, or standalone with
+`python -m app.services.scheduler`). A fire is claimed by inserting its
+campaign_runs row; the unique (campaign_id, scheduled_for) constraint lets
+exactly one replica win, and the insert only happens while the campaign is
+still active with the same rule, so a stale heap never fires an outdated
+schedule.
+"""
+
+import asyncio
+import heapq
+from bisect import bisect_right
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Tuple
+from uuid import UUID, uuid4
+
+from sqlalchemy import literal, select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.config.settings import settings
+from app.models.campaign import Campaign, CampaignRun, CampaignRunStatus, CampaignStatus, ScheduleType
+from app.services.cron import CronError, get_timezone, parse_cron
+from app.services.events import broker, campaign_run_event
+
+# Rows updated this long before the last sync are read again, in case their
+# transaction committed after it
+_SYNC_SLACK = timedelta(seconds=60)
+
+
+@dataclass(eq=False)
+class ScheduleEntry:
+    """A campaign's upcoming fire times"""
+    campaign_id: UUID
+    fires: Iterator[datetime]  # Increasing naive UTC datetimes
+    recurrence_rule: str | None = None
+    timezone: str = "UTC"
+    version: datetime | None = None  # campaigns.updated_at it was built from
+    cancelled: bool = False  # Replaced or removed; its heap item is skipped
+
+
+class ScheduleHeap:
+    """
+    Campaigns' next fire times: a min-heap of distinct times, each with the
+    bucket of entries firing then
+
+    Cron rules fire on whole minutes, so campaigns sharing a rule and
+    timezone share a bucket; a fire costs a list append, and the heap only
+    orders distinct times.
+
+    Replacing or removing a campaign's entry does not touch the heap: the
+    old entry is marked cancelled and skipped when its bucket comes due.
+    """
+
+    def __init__(self):
+        self._heap: List[datetime] = []
+        self._buckets: Dict[datetime, List[ScheduleEntry]] = {}
+        self._entries: Dict[UUID, ScheduleEntry] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, campaign_id: UUID) -> ScheduleEntry | None:
+        return self._entries.get(campaign_id)
+
+    def schedule(self, entry: ScheduleEntry) -> None:
+        """Track a campaign, replacing its previous entry"""
+        self.remove(entry.campaign_id)
+        self._entries[entry.campaign_id] = entry
+        self._push(entry)
+
+    def remove(self, campaign_id: UUID) -> None:
+        entry = self._entries.pop(campaign_id, None)
+        if entry is not None:
+            entry.cancelled = True
+
+    def clear(self) -> None:
+        for entry in self._entries.values():
+            entry.cancelled = True
+        self._heap.clear()
+        self._buckets.clear()
+        self._entries.clear()
+
+    def _push(self, entry: ScheduleEntry) -> None:
+        fire = next(entry.fires, None)
+        if fire is None:
+            self.remove(entry.campaign_id)  # One-off schedule already fired
+            return
+        bucket = self._buckets.get(fire)
+        if bucket is None:
+            self._buckets[fire] = [entry]
+            heapq.heappush(self._heap, fire)
+        else:
+            bucket.append(entry)
+
+    def next_fire_at(self) -> datetime | None:
+        """Earliest pending fire time, if anything is scheduled"""
+        while self._heap:
+            fire = self._heap[0]
+            if not all(entry.cancelled for entry in self._buckets[fire]):
+                return fire
+            heapq.heappop(self._heap)
+            del self._buckets[fire]
+        return None
+
+    def pop_due(self, now: datetime) -> List[Tuple[datetime, ScheduleEntry]]:
+        """Remove and return every fire at or before `now`, scheduling each entry's next one"""
+        due = []
+        while self._heap and self._heap[0] <= now:
+            fire = heapq.heappop(self._heap)
+            for entry in self._buckets.pop(fire):
+                if not entry.cancelled:
+                    due.append((fire, entry))
+                    self._push(entry)
+        return due
+
+
+class FireSeries:
+    """
+    Fire times of one rule in one timezone, computed once and read by every
+    campaign using that schedule
+
+    Grows only as far as the furthest campaign has fired; the scheduler
+    starts new series on each full sync, which bounds it.
+    """
+
+    def __init__(self, rule: str, timezone: str, start: datetime):
+        self.start = start
+        self.times: List[datetime] = []
+        self._source = parse_cron(rule).iter_fires(start, get_timezone(timezone))
+
+    def iter_after(self, after: datetime) -> Iterator[datetime]:
+        """Fire times strictly after `after`, which must not precede the series start"""
+        times = self.times
+        index = bisect_right(times, after)
+        while True:
+            if index == len(times):
+                fire = next(self._source, None)
+                if fire is None:
+                    return
+                times.append(fire)
+            yield times[index]
+            index += 1
+
+
+def schedule_entry(campaign, after: datetime,
+                   series: Dict[Tuple[str, str], FireSeries] | None = None) -> ScheduleEntry | None:
+    """
+    Entry for a campaign row, or None if it has nothing to fire after `after`
+
+    Args:
+        campaign: Row with id, status, schedule_type, scheduled_at,
+            recurrence_rule, timezone and updated_at
+        after: Naive UTC time; only later fires are scheduled
+        series: Shared fire series by (rule, timezone), filled in as needed
+    """
+    if campaign.status != CampaignStatus.ACTIVE:
+        return None
+
+    if campaign.schedule_type == ScheduleType.RECURRING and campaign.recurrence_rule:
+        # scheduled_at, when set, is when the recurrence starts
+        start = after
+        if campaign.scheduled_at is not None:
+            start = max(after, campaign.scheduled_at - timedelta(microseconds=1))
+
+        key = (campaign.recurrence_rule, campaign.timezone)
+        shared = series.get(key) if series is not None else None
+        if shared is None or shared.start > start:
+            shared = FireSeries(campaign.recurrence_rule, campaign.timezone, start)
+            if series is not None and key not in series:
+                series[key] = shared
+        return ScheduleEntry(
+            campaign_id=campaign.id,
+            fires=shared.iter_after(start),
+            recurrence_rule=campaign.recurrence_rule,
+            timezone=campaign.timezone,
+            version=campaign.updated_at,
+        )
+
+    if campaign.schedule_type == ScheduleType.SCHEDULED and campaign.scheduled_at is not None:
+        if campaign.scheduled_at <= after:
+            return None
+        return ScheduleEntry(campaign_id=campaign.id, fires=iter([campaign.scheduled_at]), version=campaign.updated_at)
+
+    return None
+
+
+class CampaignScheduler:
+    """Keeps a ScheduleHeap in sync with the campaigns table and claims due fires as campaign_runs"""
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+        self.heap = ScheduleHeap()
+        self.series: Dict[Tuple[str, str], FireSeries] = {}
+        self.synced_until: datetime | None = None
+        self.next_sync = 0.0
+        self.next_full_sync = 0.0
+
+    async def sync(self, full: bool = False) -> None:
+        """Load campaigns changed since the last sync, or all schedulable campaigns"""
+        started = datetime.utcnow()
+        catchup_from = started - timedelta(seconds=settings.SCHEDULER_CATCHUP_SECONDS)
+
+        query = select(
+            Campaign.id,
+            Campaign.status,
+            Campaign.schedule_type,
+            Campaign.scheduled_at,
+            Campaign.recurrence_rule,
+            Campaign.timezone,
+            Campaign.updated_at,
+        )
+        if full or self.synced_until is None:
+            query = query.where(
+                Campaign.status == CampaignStatus.ACTIVE,
+                Campaign.schedule_type.in_([ScheduleType.RECURRING, ScheduleType.SCHEDULED]),
+            )
+        else:
+            # Any change, including one that stops a campaign from being scheduled
+            query = query.where(Campaign.updated_at > self.synced_until - _SYNC_SLACK)
+
+        async with self.session_factory() as db:
+            rows = (await db.execute(query)).all()
+
+        if full or self.synced_until is None:
+            self.heap.clear()
+            self.series.clear()
+
+        for campaign in rows:
+            current = self.heap.get(campaign.id)
+            if current is not None and current.version == campaign.updated_at:
+                continue
+            try:
+                entry = schedule_entry(campaign, after=catchup_from, series=self.series)
+            except CronError as e:
+                print(f"Campaign {campaign.id} has an invalid schedule: {e}")
+                entry = None
+            if entry is None:
+                self.heap.remove(campaign.id)
+            else:
+                self.heap.schedule(entry)
+
+        self.synced_until = started
+
+    async def claim(self, due: List[Tuple[datetime, ScheduleEntry]]) -> List[Tuple[UUID, UUID, datetime]]:
+        """
+        Insert a campaign_runs row for each due fire that no other replica claimed first
+
+        Returns:
+            (run id, campaign id, fire time) for the fires this scheduler won
+        """
+        claimed = []
+        async with self.session_factory() as db:
+            for fire, entry in due:
+                still_scheduled = [Campaign.id == entry.campaign_id, Campaign.status == CampaignStatus.ACTIVE]
+                if entry.recurrence_rule is not None:
+                    still_scheduled += [
+                        Campaign.recurrence_rule == entry.recurrence_rule,
+                        Campaign.timezone == entry.timezone,
+                    ]
+                else:
+                    still_scheduled.append(Campaign.scheduled_at == fire)
+
+                run_id = uuid4()
+                statement = (
+                    insert(CampaignRun)
+                    .from_select(
+                        ["id", "campaign_id", "scheduled_for", "trigger", "status", "test_mode", "created_at"],
+                        select(
+                            literal(run_id, CampaignRun.id.type),
+                            Campaign.id,
+                            literal(fire, CampaignRun.scheduled_for.type),
+                            literal("schedule"),
+                            literal(CampaignRunStatus.QUEUED, CampaignRun.status.type),
+                            literal(False),
+                            literal(datetime.utcnow(), CampaignRun.created_at.type),
+                        ).where(*still_scheduled),
+                    )
+                    .on_conflict_do_nothing(index_elements=[CampaignRun.campaign_id, CampaignRun.scheduled_for])
+                    .returning(CampaignRun.id)
+                )
+                if (await db.execute(statement)).scalar_one_or_none() is not None:
+                    claimed.append((run_id, entry.campaign_id, fire))
+            await db.commit()
+        return claimed
+
+    async def tick(self) -> float:
+        """
+        Sync if due, then claim everything due now
+
+        Returns:
+            Seconds until the next fire or sync
+        """
+        monotonic = time.monotonic()
+        if monotonic >= self.next_full_sync:
+            await self.sync(full=True)
+            self.next_full_sync = monotonic + settings.SCHEDULER_FULL_SYNC_SECONDS
+            self.next_sync = monotonic + settings.SCHEDULER_SYNC_SECONDS
+        elif monotonic >= self.next_sync:
+            await self.sync()
+            self.next_sync = monotonic + settings.SCHEDULER_SYNC_SECONDS
+
+        now = datetime.utcnow()
+        due = self.heap.pop_due(now)
+        if due:
+            claimed = await self.claim(due)
+            if claimed:
+                await self.announce(claimed)
+
+        wait = self.next_sync - time.monotonic()
+        next_fire = self.heap.next_fire_at()
+        if next_fire is not None:
+            wait = min(wait, (next_fire - datetime.utcnow()).total_seconds())
+        return max(wait, 0.0)
+
+    async def announce(self, claimed: List[Tuple[UUID, UUID, datetime]]) -> None:
+        await broker.publish(*(
+            campaign_run_event(run_id, campaign_id, fire, "schedule") for run_id, campaign_id, fire in claimed
+        ))
+        for run_id, campaign_id, fire in claimed:
+            print(f"Campaign {campaign_id} run {run_id} queued for {fire:%Y-%m-%d %H:%M} UTC")
+
+    async def run(self) -> None:
+        """Fire campaigns until cancelled"""
+        while True:
+            try:
+                wait = await self.tick()
+            except Exception as e:
+                print(f"Campaign scheduler failed: {e}")
+                # Rebuild from the catch-up window: fires lost with the failed
+                # claim are retried, and the unique constraint drops repeats
+                self.next_full_sync = 0.0
+                wait = settings.SCHEDULER_SYNC_SECONDS
+            await asyncio.sleep(wait)
+
+
+async def main():
+    from app.config.database import AsyncSessionLocal
+
+    print(f"Campaign scheduler started (sync every {settings.SCHEDULER_SYNC_SECONDS:g}s)")
+    await CampaignScheduler(AsyncSessionLocal).run()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,273 @@
+"""
+Campaign segment filters compiled to SQL
+
+A segment filter is the JSON stored in Campaign.segment_filter. Each key
+narrows the audience (keys are ANDed), and {} targets every contact:
+
+    {
+        "segment": "VIP" | ["VIP", "partner"],
+        "language": "ru" | ["ru", "uz"],
+        "tags": ["a", "b"] | {"all": [...], "any": [...], "none": [...]},
+        "custom_fields": {
+            "city": "Tashkent",                   # equals
+            "tier": {"in": ["gold", "silver"]},
+            "score": {"gte": 5, "lt": 10},        # also gt, lte; numbers or strings
+            "referrer": {"exists": true},
+        },
+        "birthday": {"within_days": 7} | {"month": 5} | {"from": "12-20", "to": "01-10"},
+        "last_interaction": {"within_days": 30} | {"older_than_days": 90}
+                            | {"after": "2024-01-01", "before": "2024-07-01"} | {"never": true},
+        "any": [filter, ...],                     # at least one sub-filter matches
+    }
+
+Every predicate is written so an index can answer it: tag and custom-field
+tests are jsonb containment (@>) or jsonpath (@?) against the GIN
+jsonb_path_ops indexes, birthday windows are ranges on the month-day
+expression index, and segment and last interaction use their btree indexes.
+The whole filter becomes a single WHERE clause.
+
+Relative windows count days from the start of `today` (UTC by default), so
+a compiled filter is reused for the rest of the day.
+"""
+
+import json
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Any, Dict, List
+
+import orjson
+from sqlalchemy import ColumnElement, and_, cast, false, func, not_, or_, select, true
+from sqlalchemy.dialects.postgresql import JSONB, JSONPATH
+
+from app.models.contact import Contact, ContactSegment, Language, birthday_month_day
+
+FILTER_KEYS = {"segment", "language", "tags", "custom_fields", "birthday", "last_interaction", "any"}
+COMPARISONS = {"gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+
+class SegmentFilterError(ValueError):
+    """Segment filter that cannot be compiled"""
+
+
+def compile_segment_filter(segment_filter: Dict[str, Any] | None, today: date | None = None) -> ColumnElement[bool]:
+    """
+    WHERE clause on Contact selecting a segment filter's audience
+
+    Compiled clauses are cached per filter and day; they hold bound
+    parameters only, so every use shares SQLAlchemy's statement cache too.
+
+    Args:
+        segment_filter: Filter JSON, as stored in Campaign.segment_filter
+        today: Day relative windows count from; defaults to today (UTC)
+
+    Raises:
+        SegmentFilterError: Unknown key, operator or value
+    """
+    canonical = orjson.dumps(segment_filter or {}, option=orjson.OPT_SORT_KEYS)
+    return _compile_cached(canonical, today or datetime.utcnow().date())
+
+
+def audience_query(segment_filter: Dict[str, Any] | None, *columns, today: date | None = None):
+    """SELECT of the given Contact columns (the whole contact by default) for a filter's audience"""
+    return select(*(columns or (Contact,))).where(compile_segment_filter(segment_filter, today))
+
+
+def validate_segment_filter(segment_filter: Dict[str, Any] | None) -> Dict[str, Any] | None:
+    """Schema validator: the filter as given, if it compiles"""
+    if segment_filter is not None:
+        compile_segment_filter(segment_filter)
+    return segment_filter
+
+
+@lru_cache(maxsize=1024)
+def _compile_cached(canonical: bytes, today: date) -> ColumnElement[bool]:
+    return _compile(orjson.loads(canonical), today)
+
+
+def _compile(segment_filter: Any, today: date) -> ColumnElement[bool]:
+    if not isinstance(segment_filter, dict):
+        raise SegmentFilterError("A segment filter is a JSON object")
+    unknown = set(segment_filter) - FILTER_KEYS
+    if unknown:
+        raise SegmentFilterError(f"Unknown segment filter keys: {', '.join(sorted(unknown))}")
+
+    clauses = []
+    if "segment" in segment_filter:
+        clauses.append(Contact.segment.in_(_enum_values(segment_filter["segment"], ContactSegment, "segment")))
+    if "language" in segment_filter:
+        clauses.append(Contact.language.in_(_enum_values(segment_filter["language"], Language, "language")))
+    if "tags" in segment_filter:
+        clauses.append(_tags(segment_filter["tags"]))
+    if "custom_fields" in segment_filter:
+        clauses.append(_custom_fields(segment_filter["custom_fields"]))
+    if "birthday" in segment_filter:
+        clauses.append(_birthday(segment_filter["birthday"], today))
+    if "last_interaction" in segment_filter:
+        clauses.append(_last_interaction(segment_filter["last_interaction"], today))
+    if "any" in segment_filter:
+        alternatives = segment_filter["any"]
+        if not isinstance(alternatives, list) or not alternatives:
+            raise SegmentFilterError("'any' takes a non-empty list of filters")
+        clauses.append(or_(*(_compile(alternative, today) for alternative in alternatives)))
+
+    return and_(*clauses) if clauses else true()
+
+
+def _as_list(value: Any, name: str) -> List[Any]:
+    values = value if isinstance(value, list) else [value]
+    if not values:
+        raise SegmentFilterError(f"'{name}' needs at least one value")
+    return values
+
+
+def _enum_values(value: Any, enum_type, name: str) -> List[Any]:
+    try:
+        return [enum_type(item) for item in _as_list(value, name)]
+    except ValueError:
+        allowed = ", ".join(member.value for member in enum_type)
+        raise SegmentFilterError(f"'{name}' must be one of: {allowed}")
+
+
+def _none_of(clauses: List[ColumnElement[bool]]) -> ColumnElement[bool]:
+    # A NULL column matches none of them
+    return not_(func.coalesce(or_(*clauses), false()))
+
+
+def _contains(column, value: Any) -> ColumnElement[bool]:
+    return column.op("@>")(cast(value, JSONB))
+
+
+def _tags(spec: Any) -> ColumnElement[bool]:
+    if isinstance(spec, list):
+        spec = {"all": spec}
+    if not isinstance(spec, dict) or not spec or set(spec) - {"all", "any", "none"}:
+        raise SegmentFilterError("'tags' takes a list, or an object with all, any and none lists")
+
+    clauses = []
+    for mode, tags in spec.items():
+        tags = _as_list(tags, f"tags.{mode}")
+        if not all(isinstance(tag, str) for tag in tags):
+            raise SegmentFilterError("Tags are strings")
+        if mode == "all":
+            clauses.append(_contains(Contact.tags, tags))
+        elif mode == "any":
+            clauses.append(or_(*(_contains(Contact.tags, [tag]) for tag in tags)))
+        else:
+            clauses.append(_none_of([_contains(Contact.tags, [tag]) for tag in tags]))
+    return and_(*clauses)
+
+
+def _jsonpath(key: str, condition: str | None = None) -> ColumnElement[bool]:
+    path = f"$.{json.dumps(key)}"
+    if condition is not None:
+        path += f" ? ({condition})"
+    return Contact.custom_fields.op("@?")(cast(path, JSONPATH))
+
+
+def _custom_fields(spec: Any) -> ColumnElement[bool]:
+    if not isinstance(spec, dict) or not spec:
+        raise SegmentFilterError("'custom_fields' takes an object of field predicates")
+
+    clauses = []
+    for key, predicate in spec.items():
+        if not isinstance(predicate, dict):
+            clauses.append(_contains(Contact.custom_fields, {key: predicate}))
+            continue
+
+        unknown = set(predicate) - {"in", "exists", *COMPARISONS}
+        if unknown or not predicate:
+            raise SegmentFilterError(f"Unknown operators for custom field {key!r}: {', '.join(sorted(unknown))}")
+
+        if "in" in predicate:
+            values = _as_list(predicate["in"], f"custom_fields.{key}.in")
+            clauses.append(or_(*(_contains(Contact.custom_fields, {key: value}) for value in values)))
+
+        if "exists" in predicate:
+            exists = _jsonpath(key)
+            clauses.append(exists if predicate["exists"] else _none_of([exists]))
+
+        comparisons = []
+        for operator, symbol in COMPARISONS.items():
+            if operator not in predicate:
+                continue
+            value = predicate[operator]
+            if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+                raise SegmentFilterError(f"Custom field {key!r} compares with numbers or strings")
+            comparisons.append(f"@ {symbol} {json.dumps(value)}")
+        if comparisons:
+            # Values of another type compare as unknown, so they just don't match
+            clauses.append(_jsonpath(key, " && ".join(comparisons)))
+
+    return and_(*clauses)
+
+
+def _month_day(text: Any, name: str) -> int:
+    try:
+        month, day = (int(part) for part in str(text).split("-"))
+        date(2000, month, day)  # Leap year, so 02-29 is valid
+    except ValueError:
+        raise SegmentFilterError(f"'{name}' is a MM-DD date")
+    return month * 100 + day
+
+
+def _birthday(spec: Any, today: date) -> ColumnElement[bool]:
+    if not isinstance(spec, dict) or set(spec) not in ({"within_days"}, {"month"}, {"from", "to"}):
+        raise SegmentFilterError("'birthday' takes within_days, month, or from and to")
+
+    if "within_days" in spec:
+        days = spec["within_days"]
+        if isinstance(days, bool) or not isinstance(days, int) or not 0 <= days <= 366:
+            raise SegmentFilterError("'birthday.within_days' is a whole number of days, 0-366")
+        if days >= 365:
+            return Contact.birthday.is_not(None)
+        end = today + timedelta(days=days)
+        start_key, end_key = today.month * 100 + today.day, end.month * 100 + end.day
+        if end.year == today.year:
+            return birthday_month_day.between(start_key, end_key)
+        return or_(birthday_month_day >= start_key, birthday_month_day <= end_key)
+
+    if "month" in spec:
+        months = _as_list(spec["month"], "birthday.month")
+        if not all(type(month) is int and 1 <= month <= 12 for month in months):
+            raise SegmentFilterError("'birthday.month' is 1-12")
+        return or_(*(birthday_month_day.between(month * 100 + 1, month * 100 + 31) for month in months))
+
+    start_key = _month_day(spec["from"], "birthday.from")
+    end_key = _month_day(spec["to"], "birthday.to")
+    if start_key <= end_key:
+        return birthday_month_day.between(start_key, end_key)
+    return or_(birthday_month_day >= start_key, birthday_month_day <= end_key)
+
+
+def _datetime(value: Any, name: str) -> datetime:
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        raise SegmentFilterError(f"'{name}' is an ISO 8601 date or datetime")
+
+
+def _days(value: Any, name: str) -> int:
+    if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+        raise SegmentFilterError(f"'{name}' is a whole number of days")
+    return value
+
+
+def _last_interaction(spec: Any, today: date) -> ColumnElement[bool]:
+    allowed = {"within_days", "older_than_days", "after", "before", "never"}
+    if not isinstance(spec, dict) or not spec or set(spec) - allowed:
+        raise SegmentFilterError(f"'last_interaction' takes {', '.join(sorted(allowed))}")
+
+    start_of_today = datetime(today.year, today.month, today.day)
+    column = Contact.last_interaction_date
+    clauses = []
+    if "never" in spec:
+        clauses.append(column.is_(None) if spec["never"] else column.is_not(None))
+    if "within_days" in spec:
+        clauses.append(column >= start_of_today - timedelta(days=_days(spec["within_days"], "within_days")))
+    if "older_than_days" in spec:
+        clauses.append(column < start_of_today - timedelta(days=_days(spec["older_than_days"], "older_than_days")))
+    if "after" in spec:
+        clauses.append(column >= _datetime(spec["after"], "last_interaction.after"))
+    if "before" in spec:
+        clauses.append(column < _datetime(spec["before"], "last_interaction.before"))
+    return and_(*clauses)
@@ -0,0 +1,221 @@
+"""
+Strong ETags, conditional GETs and Cache-Control policies for read endpoints
+
+A read endpoint takes a `conditional(scope)` dependency and returns
+`cache.respond(payload)`. The ETag is a hash of the exact response bytes,
+prefixed with the resource's updated_at when there is one, so it is strong:
+equal ETags mean byte-identical bodies.
+
+Every ETag handed out is also remembered in Redis, in one hash per scope
+("contacts", "contacts:<id>", "analytics", ...). When a request's
+If-None-Match matches the remembered ETag, the dependency answers 304 before
+the endpoint runs a single query. Writers call `invalidate(scope, ...)` after
+committing, which forgets every validator in those scopes; the next request
+recomputes the body and still answers 304 if it hashes the same.
+
+A request may have read the old rows (from a lagging replica, or just
+before the writer committed) and only finish after the invalidation. Each
+scope therefore has a generation that `invalidate` bumps: the dependency
+reads it before the endpoint queries, and the ETag is remembered only if
+the generation is still the same, so a stale body is never remembered.
+
+Remembered validators also expire after a TTL, which bounds how long a write
+that skipped invalidation, or a time-dependent body like the analytics
+dashboard, can be answered from the cache.
+"""
+
+import hashlib
+import time
+from typing import Any
+
+import orjson
+from fastapi import HTTPException, Request, Response, status
+from pydantic import BaseModel
+
+from app.config.redis import get_redis
+from app.config.settings import settings
+from app.utils.metrics import HTTP_CACHE_BYTES_SAVED, HTTP_CONDITIONAL_REQUESTS
+
+# Cache-Control policies
+REVALIDATE = "private, no-cache"  # Clients may store, but must revalidate every use
+
+
+def short_lived(seconds: int) -> str:
+    """Clients reuse the response without asking for `seconds`, then revalidate"""
+    return f"private, max-age={seconds}"
+
+
+# Remember the validator only while the scope's generation is the one read before the query
+_REMEMBER_IF_CURRENT = """
+if (redis.call('GET', KEYS[1]) or '') ~= ARGV[1] then
+    return 0
+end
+redis.call('HSET', KEYS[2], ARGV[2], ARGV[3])
+redis.call('EXPIRE', KEYS[2], ARGV[4])
+return 1
+"""
+
+
+def _scope_key(scope: str) -> str:
+    return f"etag:{scope}"
+
+
+def _generation_key(scope: str) -> str:
+    return f"etag-generation:{scope}"
+
+
+def _request_key(request: Request) -> str:
+    query = "&".join(sorted(request.url.query.split("&"))) if request.url.query else ""
+    return f"{request.url.path}?{query}"
+
+
+def _route(request: Request) -> str:
+    route = request.scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+def parse_if_none_match(header: str | None) -> set[str]:
+    """Entity tags in an If-None-Match header; weak tags compare equal to strong ones here"""
+    if not header:
+        return set()
+    return {tag.strip().removeprefix("W/") for tag in header.split(",") if tag.strip()}
+
+
+def _encode_model(value: Any) -> Any:
+    """orjson fallback for Pydantic models nested in a payload"""
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def make_etag(body: bytes, version: Any = None) -> str:
+    """Strong entity tag for a response body, optionally prefixed with the resource version"""
+    digest = hashlib.blake2b(body, digest_size=12).hexdigest()
+    if version is None:
+        return f'"{digest}"'
+    if hasattr(version, "timestamp"):
+        version = f"{int(version.timestamp() * 1_000_000):x}"
+    return f'"{version}-{digest}"'
+
+
+class ConditionalGet:
+    """Handed to the endpoint by `conditional`; turns its payload into a cacheable response"""
+
+    def __init__(self, request: Request, scope: str, cache_control: str, ttl: int):
+        self.request = request
+        self.scope = scope
+        self.cache_control = cache_control
+        self.ttl = ttl
+        self.if_none_match = parse_if_none_match(request.headers.get("if-none-match"))
+        self.generation: str | None = None
+
+    def headers(self, etag: str) -> dict:
+        return {"ETag": etag, "Cache-Control": self.cache_control}
+
+    async def respond(self, content: Any, version: Any = None) -> Response:
+        """
+        200 with ETag and Cache-Control, or a bodiless 304 if the client already has it
+
+        Args:
+            content: Pydantic model, JSON-serializable data, or a Response
+                whose body is used as-is (e.g. from list_response)
+            version: The resource's updated_at or version number, if any
+        """
+        if isinstance(content, Response):
+            body = content.body
+        elif isinstance(content, BaseModel):
+            body = content.model_dump_json().encode()
+        else:
+            body = orjson.dumps(content, default=_encode_model)
+
+        etag = make_etag(body, version)
+        await self.remember(etag)
+
+        if etag in self.if_none_match or "*" in self.if_none_match:
+            HTTP_CONDITIONAL_REQUESTS.labels(_route(self.request), "not_modified").inc()
+            HTTP_CACHE_BYTES_SAVED.labels(_route(self.request)).inc(len(body))
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=self.headers(etag))
+
+        HTTP_CONDITIONAL_REQUESTS.labels(_route(self.request), "full").inc()
+        return Response(body, media_type="application/json", headers=self.headers(etag))
+
+    async def remember(self, etag: str) -> None:
+        if not settings.HTTP_CACHE_ENABLED or self.generation is None:
+            return
+        try:
+            await get_redis().eval(
+                _REMEMBER_IF_CURRENT, 2, _generation_key(self.scope), _scope_key(self.scope),
+                self.generation, _request_key(self.request), f"{etag}|{time.time() + self.ttl:.0f}", self.ttl,
+            )
+        except Exception as e:
+            print(f"ETag validator cache unavailable: {e}")
+
+    async def load(self) -> str | None:
+        """
+        Read the scope's generation, before the endpoint queries
+
+        Returns:
+            The ETag remembered for this request, if the client sent validators
+            and it has not expired
+        """
+        if not settings.HTTP_CACHE_ENABLED:
+            return None
+        try:
+            async with get_redis().pipeline(transaction=False) as pipe:
+                pipe.get(_generation_key(self.scope))
+                pipe.hget(_scope_key(self.scope), _request_key(self.request))
+                generation, value = await pipe.execute()
+        except Exception as e:
+            print(f"ETag validator cache unavailable: {e}")
+            return None
+
+        self.generation = generation.decode() if generation is not None else ""
+        if value is None or not self.if_none_match:
+            return None
+
+        etag, _, expires_at = value.decode().rpartition("|")
+        return etag if float(expires_at) > time.time() else None
+
+
+def conditional(scope: str, cache_control: str = REVALIDATE, ttl: int | None = None):
+    """
+    Dependency for a conditional GET endpoint
+
+    Declare it after the auth dependency, so a 304 is never served to an
+    unauthenticated request.
+
+    Args:
+        scope: Validator scope, formatted with the path parameters,
+            e.g. "contacts:{contact_id}"
+        cache_control: Cache-Control header for 200 and 304 responses
+        ttl: Seconds a remembered validator stays usable;
+            defaults to settings.HTTP_CACHE_VALIDATOR_TTL_SECONDS
+    """
+    ttl = ttl or settings.HTTP_CACHE_VALIDATOR_TTL_SECONDS
+
+    async def dependency(request: Request) -> ConditionalGet:
+        cache = ConditionalGet(request, scope.format(**request.path_params), cache_control, ttl)
+        etag = await cache.load()
+        if etag is not None and (etag in cache.if_none_match or "*" in cache.if_none_match):
+            HTTP_CONDITIONAL_REQUESTS.labels(_route(request), "not_modified_cached").inc()
+            # Bodiless: the exception handler sends it as a plain 304
+            raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache.headers(etag))
+        return cache
+
+    return dependency
+
+
+async def invalidate(*scopes: str) -> None:
+    """Forget the remembered validators of these scopes; call after committing a write"""
+    if not settings.HTTP_CACHE_ENABLED or not scopes:
+        return
+    try:
+        async with get_redis().pipeline(transaction=False) as pipe:
+            for scope in scopes:
+                # Outlives any request that read the previous generation
+                pipe.incr(_generation_key(scope))
+                pipe.expire(_generation_key(scope), settings.HTTP_CACHE_VALIDATOR_TTL_SECONDS)
+            pipe.delete(*(_scope_key(scope) for scope in scopes))
+            await pipe.execute()
+    except Exception as e:
+        print(f"ETag validator cache unavailable: {e}")
@@ -0,0 +1,238 @@
+"""
+Idempotency-Key support for POST endpoints that spend money or send things
+
+A client that retries a request after a timeout sends the same
+Idempotency-Key header each time. The first request with a key claims it
+in Redis as "processing" and runs; its response is stored under the key
+for IDEMPOTENCY_TTL_SECONDS and replayed, with an Idempotent-Replayed
+header, to every later request with that key. A duplicate that arrives
+while the first is still running waits for it instead of running again,
+and gets 409 only if it waits longer than IDEMPOTENCY_WAIT_SECONDS.
+
+Keys are scoped per endpoint and per user, and bound to the request they
+were first used with: reusing one for a different body or path is a 422.
+Only successful responses are stored. If the first request fails, its
+claim is dropped and the next retry runs afresh; if its worker dies, the
+claim expires after IDEMPOTENCY_LOCK_SECONDS.
+
+An endpoint takes the `idempotent(scope)` dependency and returns
+`idempotency.replay` when it is set, else `await idempotency.respond(...)`.
+FastAPI drops cookies set on the injected response when an endpoint
+returns its own, so `respond` copies them over, e.g. the read-your-writes
+cookie get_db sets on commit.
+"""
+
+import asyncio
+import hashlib
+import time
+from typing import Annotated, Any, AsyncIterator
+from uuid import uuid4
+
+import orjson
+from fastapi import Depends, HTTPException, Request, Response, status
+from pydantic import BaseModel
+
+from app.api.deps import get_current_active_user
+from app.config.redis import get_redis
+from app.config.settings import settings
+from app.models.user import User
+from app.utils.metrics import IDEMPOTENT_REQUESTS
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+
+# Replace or delete the key only while it still holds the caller's claim
+_IF_OWNER = """
+local current = redis.call('GET', KEYS[1])
+if not current or cjson.decode(current)['token'] ~= ARGV[1] then
+    return 0
+end
+if ARGV[2] == '' then
+    return redis.call('DEL', KEYS[1])
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+
+
+class IdempotencyStore:
+    """Idempotency records in Redis, one JSON value per key"""
+
+    async def claim(self, key: str, record: bytes, ttl: int) -> bytes | None:
+        """
+        Store `record` under `key` unless it is taken
+
+        Returns:
+            None if the claim succeeded, else the record already stored
+        """
+        redis = get_redis()
+        if await redis.set(key, record, nx=True, ex=ttl):
+            return None
+        existing = await redis.get(key)
+        # Expired between the two calls: try again
+        return existing if existing is not None else await self.claim(key, record, ttl)
+
+    async def get(self, key: str) -> bytes | None:
+        return await get_redis().get(key)
+
+    async def complete(self, key: str, token: str, record: bytes, ttl: int) -> None:
+        await get_redis().eval(_IF_OWNER, 1, key, token, record, ttl)
+
+    async def release(self, key: str, token: str) -> None:
+        await get_redis().eval(_IF_OWNER, 1, key, token, "", 0)
+
+
+store = IdempotencyStore()
+
+
+def _route(request: Request) -> str:
+    route = request.scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class IdempotentRequest:
+    """Handed to the endpoint by `idempotent`; stores its response for replay"""
+
+    def __init__(self, request: Request, response: Response, key: str | None = None,
+                 fingerprint: str | None = None):
+        self.request = request
+        self.response = response
+        self.key = key
+        self.fingerprint = fingerprint
+        self.token = uuid4().hex
+        self.replay: Response | None = None
+        self.claimed = False
+
+    async def begin(self) -> None:
+        """Claim the key, or wait for the request holding it and set `replay` from its response"""
+        processing = orjson.dumps({"state": "processing", "token": self.token, "fingerprint": self.fingerprint})
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+        waited = False
+        try:
+            existing = await store.claim(self.key, processing, settings.IDEMPOTENCY_LOCK_SECONDS)
+            while existing is not None:
+                record = orjson.loads(existing)
+                if record["fingerprint"] != self.fingerprint:
+                    IDEMPOTENT_REQUESTS.labels(_route(self.request), "mismatch").inc()
+                    raise HTTPException(
+                        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                        detail=f"{HEADER} was already used for a different request",
+                    )
+                if record["state"] == "completed":
+                    IDEMPOTENT_REQUESTS.labels(_route(self.request), "waited" if waited else "replayed").inc()
+                    self.replay = Response(
+                        record["body"].encode(),
+                        status_code=record["status_code"],
+                        media_type="application/json",
+                        headers={"Idempotent-Replayed": "true"},
+                    )
+                    return
+                if time.monotonic() >= deadline:
+                    IDEMPOTENT_REQUESTS.labels(_route(self.request), "conflict").inc()
+                    raise HTTPException(
+                        status_code=status.HTTP_409_CONFLICT,
+                        detail=f"A request with this {HEADER} is still being processed",
+                        headers={"Retry-After": "1"},
+                    )
+
+                waited = True
+                await asyncio.sleep(settings.IDEMPOTENCY_POLL_SECONDS)
+                existing = await store.get(self.key)
+                if existing is None:
+                    # The first request failed and let go: this one runs instead
+                    existing = await store.claim(self.key, processing, settings.IDEMPOTENCY_LOCK_SECONDS)
+        except HTTPException:
+            raise
+        except Exception as e:
+            print(f"Idempotency store unavailable: {e}")
+            return
+
+        self.claimed = True
+        IDEMPOTENT_REQUESTS.labels(_route(self.request), "executed").inc()
+
+    async def respond(self, content: Any, status_code: int = status.HTTP_200_OK) -> Response:
+        """
+        JSON response for the endpoint's result, stored for replay under the key
+
+        Args:
+            content: Pydantic model or JSON-serializable data
+            status_code: Status of this and every replayed response
+        """
+        if isinstance(content, BaseModel):
+            body = content.model_dump_json().encode()
+        else:
+            body = orjson.dumps(content)
+
+        if self.claimed:
+            record = orjson.dumps({
+                "state": "completed",
+                "token": self.token,
+                "fingerprint": self.fingerprint,
+                "status_code": status_code,
+                "body": body.decode(),
+            })
+            try:
+                await store.complete(self.key, self.token, record, settings.IDEMPOTENCY_TTL_SECONDS)
+                self.claimed = False
+            except Exception as e:
+                print(f"Idempotency store unavailable: {e}")
+
+        reply = Response(body, status_code=status_code, media_type="application/json")
+        for cookie in self.response.headers.getlist("set-cookie"):
+            reply.headers.append("set-cookie", cookie)
+        return reply
+
+    async def release(self) -> None:
+        """Give the key up without a stored response, so a retry runs again"""
+        if not self.claimed:
+            return
+        self.claimed = False
+        try:
+            await store.release(self.key, self.token)
+        except Exception as e:
+            print(f"Idempotency store unavailable: {e}")
+
+
+def idempotent(scope: str):
+    """
+    Dependency honouring the Idempotency-Key header on a POST endpoint
+
+    Requests without the header run as usual, with `replay` unset.
+
+    Args:
+        scope: Key namespace, e.g. "messages:generate"
+    """
+
+    async def dependency(
+        request: Request,
+        response: Response,
+        current_user: Annotated[User, Depends(get_current_active_user)],
+    ) -> AsyncIterator[IdempotentRequest]:
+        key = request.headers.get(HEADER)
+        if not settings.IDEMPOTENCY_ENABLED or key is None:
+            yield IdempotentRequest(request, response)
+            return
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"{HEADER} must be 1-{MAX_KEY_LENGTH} characters",
+            )
+
+        digest = hashlib.blake2b(digest_size=16)
+        for part in (request.method.encode(), request.url.path.encode(), await request.body()):
+            digest.update(part + b"\0")
+        idempotency = IdempotentRequest(
+            request,
+            response,
+            f"idempotency:{scope}:{current_user.id}:{hashlib.sha256(key.encode()).hexdigest()}",
+            digest.hexdigest(),
+        )
+        await idempotency.begin()
+
+        try:
+            yield idempotency
+        finally:
+            # Still claimed: the endpoint failed before responding
+            await idempotency.release()
+
+    return dependency
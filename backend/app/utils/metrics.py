@@ -0,0 +1,312 @@
+"""Prometheus metrics and the instrumentation that feeds them"""
+
+import asyncio
+import time
+from contextvars import ContextVar
+
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, HistogramMetricFamily
+from sqlalchemy import event, select, func
+
+from app.models.campaign import Campaign, CampaignStatus
+from app.models.message import Message, MessageStatus
+
+# Requests
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being processed",
+    ["method"],
+)
+
+# Conditional GETs
+HTTP_CONDITIONAL_REQUESTS = Counter(
+    "http_conditional_requests_total",
+    "ETagged GET responses: full, not_modified, or not_modified_cached (answered before any query)",
+    ["route", "outcome"],
+)
+HTTP_CACHE_BYTES_SAVED = Counter(
+    "http_cache_bytes_saved_total",
+    "Response body bytes not sent thanks to 304 Not Modified, where the body was computed",
+    ["route"],
+)
+
+# Idempotency keys
+IDEMPOTENT_REQUESTS = Counter(
+    "idempotent_requests_total",
+    "Requests carrying an Idempotency-Key: executed, replayed, waited (then replayed), conflict or mismatch",
+    ["route", "outcome"],
+)
+
+# Database work per request
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request",
+    "SQL statements executed per HTTP request",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+DB_TIME_PER_REQUEST = Histogram(
+    "db_time_per_request_seconds",
+    "Time spent executing SQL per HTTP request",
+    ["route"],
+)
+
+# OpenAI
+OPENAI_REQUEST_DURATION = Histogram(
+    "openai_request_duration_seconds",
+    "OpenAI chat completion latency",
+    ["model", "outcome"],
+    buckets=(0.25, 0.5, 1, 2, 3, 5, 8, 13, 21, 34, 60),
+)
+OPENAI_TOKENS = Counter(
+    "openai_tokens_total",
+    "Tokens consumed by OpenAI calls; kind=cached is the prompt-cache share of kind=prompt",
+    ["model", "kind"],
+)
+OPENAI_ERRORS = Counter(
+    "openai_errors_total",
+    "Failed OpenAI calls by exception type",
+    ["model", "error_type"],
+)
+AI_ROUTE_DURATION = Histogram(
+    "ai_route_duration_seconds",
+    "Generation call latency by routing decision",
+    ["route", "model", "outcome"],
+    buckets=(0.25, 0.5, 1, 2, 3, 5, 8, 13, 21, 34, 60),
+)
+AI_ROUTE_COST = Counter(
+    "ai_route_cost_usd_total",
+    "Estimated generation spend by routing decision, from AI_MODEL_PRICING",
+    ["route", "model"],
+)
+AI_ROUTE_DOWNGRADES = Counter(
+    "ai_route_downgrades_total",
+    "Calls moved to a cheaper route under quota pressure",
+    ["route", "downgraded_to"],
+)
+
+GENERATION_QUEUE_WAIT = Histogram(
+    "generation_queue_wait_seconds",
+    "Time a generation call waited for a slot, by lane",
+    ["lane"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+GENERATION_QUEUE_DEPTH = Gauge(
+    "generation_queue_depth",
+    "Generation calls waiting for a slot, by lane",
+    ["lane"],
+)
+GENERATION_IN_FLIGHT = Gauge(
+    "generation_in_flight",
+    "Generation calls holding a slot, by lane",
+    ["lane"],
+)
+AI_CIRCUIT_STATE = Gauge(
+    "ai_circuit_state",
+    "Generation circuit breaker: 0 closed, 1 half-open, 2 open",
+)
+AI_CIRCUIT_REJECTED = Counter(
+    "ai_circuit_rejected_total",
+    "Generation calls failed fast because the circuit was open",
+)
+AI_HEDGED_REQUESTS = Counter(
+    "ai_hedged_requests_total",
+    "Generation calls that got a hedge, by which call answered: primary_won, hedge_won or both_failed",
+    ["outcome"],
+)
+COALESCED_CALLS = Counter(
+    "coalesced_calls_total",
+    "Calls saved by sharing an identical in-flight call, in this worker or another",
+    ["flight", "scope"],
+)
+GENERATION_CANDIDATES = Histogram(
+    "generation_candidates",
+    "Candidates requested per generate call",
+    buckets=(1, 2, 3, 4, 5, 8),
+)
+MESSAGE_VARIANT_SWAPS = Counter(
+    "message_variant_swaps_total",
+    "Reviewers switching to another stored candidate: each one a regeneration call not made",
+)
+PREGENERATED_MESSAGES = Counter(
+    "pregenerated_messages_total",
+    "Messages generated ahead of their birthday or holiday, off-peak",
+    ["occasion_type"],
+)
+MESSAGE_VARIANT_WAIT_SAVED = Counter(
+    "message_variant_wait_saved_seconds_total",
+    "Generation latency a regeneration would have cost the reviewer, summed over variant swaps",
+)
+
+# Pipelines, sampled in the background
+MESSAGE_QUEUE_DEPTH = Gauge(
+    "crm_message_queue_depth",
+    "Messages waiting in each workflow stage",
+    ["stage"],
+)
+CAMPAIGN_PIPELINE_DEPTH = Gauge(
+    "crm_campaign_pipeline_depth",
+    "Campaigns in each pipeline status",
+    ["status"],
+)
+
+# Real-time event streams
+EVENTS_SUBSCRIBERS = Gauge(
+    "events_subscribers",
+    "Event streams connected to this worker",
+)
+EVENTS_PUBLISHED = Counter(
+    "events_published_total",
+    "Events published to the real-time channel",
+)
+EVENTS_DROPPED_SUBSCRIBERS = Counter(
+    "events_dropped_subscribers_total",
+    "Event streams disconnected with a resync, by reason",
+    ["reason"],
+)
+
+# Event loop
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds",
+    "Delay between when a timer should fire and when the loop ran it",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+
+# [query count, query seconds] for the request being handled
+_request_db_stats: ContextVar[list | None] = ContextVar("request_db_stats", default=None)
+
+
+class PrometheusMiddleware:
+    """
+    ASGI middleware recording latency, in-flight requests and DB work per route
+
+    Routes are labeled with their template (/api/contacts/{contact_id}), never
+    the raw path, so label cardinality is bounded by the number of routes.
+    """
+
+    def __init__(self, app, excluded_paths: tuple[str, ...] = ("/metrics",)):
+        self.app = app
+        self.excluded_paths = excluded_paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.excluded_paths:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        db_stats = [0, 0.0]
+        token = _request_db_stats.set(db_stats)
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_flight = HTTP_REQUESTS_IN_FLIGHT.labels(method)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            in_flight.dec()
+            _request_db_stats.reset(token)
+
+            route = scope.get("route")
+            route_template = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUEST_DURATION.labels(method, route_template, str(status_code)).observe(duration)
+            DB_QUERIES_PER_REQUEST.labels(route_template).observe(db_stats[0])
+            DB_TIME_PER_REQUEST.labels(route_template).observe(db_stats[1])
+
+
+def track_queries(engine) -> None:
+    """Count statements and their execution time against the current request"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        stats = _request_db_stats.get()
+        if stats is not None:
+            stats[0] += 1
+            stats[1] += elapsed
+
+
+class PoolMetricsCollector:
+    """Exposes PoolMetrics snapshots from app.config.pool_metrics to Prometheus"""
+
+    def __init__(self, pool_metrics):
+        self.pool_metrics = [metrics for metrics in pool_metrics if metrics is not None]
+
+    def collect(self):
+        checked_out = GaugeMetricFamily("db_pool_checked_out", "Connections in use", labels=["pool"])
+        overflow = GaugeMetricFamily("db_pool_overflow", "Overflow connections open", labels=["pool"])
+        checkouts = CounterMetricFamily("db_pool_checkouts", "Connection checkouts", labels=["pool"])
+        timeouts = CounterMetricFamily("db_pool_timeouts", "Checkouts that timed out", labels=["pool"])
+        wait = HistogramMetricFamily("db_pool_wait_seconds", "Time waiting for a connection", labels=["pool"])
+
+        for metrics in self.pool_metrics:
+            snapshot = metrics.snapshot()
+            name = snapshot["pool"]
+            checked_out.add_metric([name], snapshot.get("checked_out", 0))
+            overflow.add_metric([name], snapshot.get("overflow", 0))
+            checkouts.add_metric([name], snapshot["checkouts"])
+            timeouts.add_metric([name], snapshot["timeouts"])
+            wait_snapshot = snapshot["wait_seconds"]
+            wait.add_metric([name], list(wait_snapshot["buckets"].items()), wait_snapshot["sum"])
+
+        yield from (checked_out, overflow, checkouts, timeouts, wait)
+
+
+def register_pool_metrics(*pool_metrics) -> None:
+    """Register the connection pool collector with the default registry"""
+    REGISTRY.register(PoolMetricsCollector(pool_metrics))
+
+
+async def monitor_event_loop_lag(interval: float) -> None:
+    """Measure how late a periodic timer fires; runs until cancelled"""
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(loop.time() - expected, 0.0))
+
+
+async def sample_queue_depths(session_factory, interval: float) -> None:
+    """Periodically refresh approval/outbound queue and campaign pipeline gauges"""
+    stages = {
+        MessageStatus.PENDING_APPROVAL: "pending_approval",
+        MessageStatus.APPROVED: "outbound",
+    }
+
+    while True:
+        try:
+            async with session_factory() as session:
+                message_counts = dict((await session.execute(
+                    select(Message.status, func.count(Message.id))
+                    .where(Message.status.in_(list(stages)))
+                    .group_by(Message.status)
+                )).all())
+                campaign_counts = dict((await session.execute(
+                    select(Campaign.status, func.count(Campaign.id))
+                    .where(Campaign.status.in_([CampaignStatus.ACTIVE, CampaignStatus.PAUSED]))
+                    .group_by(Campaign.status)
+                )).all())
+        except Exception as e:
+            print(f"Queue depth sampling failed: {e}")
+        else:
+            for status, stage in stages.items():
+                MESSAGE_QUEUE_DEPTH.labels(stage).set(message_counts.get(status, 0))
+            for status in (CampaignStatus.ACTIVE, CampaignStatus.PAUSED):
+                CAMPAIGN_PIPELINE_DEPTH.labels(status.value).set(campaign_counts.get(status, 0))
+
+        await asyncio.sleep(interval)
@@ -1,5 +1,7 @@
 """Prompt templates for AI message generation"""
 
+from functools import lru_cache
+
 from app.models.message import OccasionType
 from app.models.contact import Language
 
@@ -46,6 +48,101 @@ To'g'ri murojaat qiling va madaniy kontekstni hisobga oling."""
     return prompts.get(language, prompts["ru"])
 
 
+# Occasion descriptions
+OCCASION_DESCRIPTIONS = {
+    OccasionType.BIRTHDAY: {
+        "ru": "день рождения",
+        "en": "birthday",
+        "uz": "tug'ilgan kun"
+    },
+    OccasionType.NEW_YEAR: {
+        "ru": "Новый год",
+        "en": "New Year",
+        "uz": "Yangi yil"
+    },
+    OccasionType.HOLIDAY: {
+        "ru": "праздник",
+        "en": "holiday",
+        "uz": "bayram"
+    },
+    OccasionType.PROMOTION: {
+        "ru": "специальное предложение",
+        "en": "special offer",
+        "uz": "maxsus taklif"
+    },
+    OccasionType.CUSTOM: {
+        "ru": "особый случай",
+        "en": "special occasion",
+        "uz": "maxsus holat"
+    }
+}
+
+# Tone descriptions
+TONE_DESCRIPTIONS = {
+    "professional_friendly": {
+        "ru": "профессионально-дружелюбный",
+        "en": "professional-friendly",
+        "uz": "professional-do'stona"
+    },
+    "formal": {
+        "ru": "формальный",
+        "en": "formal",
+        "uz": "rasmiy"
+    },
+    "casual": {
+        "ru": "неформальный",
+        "en": "casual",
+        "uz": "norasmiy"
+    },
+    "warm": {
+        "ru": "теплый",
+        "en": "warm",
+        "uz": "issiq"
+    }
+}
+
+
+@lru_cache(maxsize=256)
+def build_prompt_prefix(occasion_type: OccasionType, tone: str = "professional_friendly", lang_code: str = "ru") -> str:
+    """
+    Static head of the user prompt for a (language, occasion, tone)
+
+    Everything that does not depend on the contact comes first, so every
+    prompt of a campaign starts with the same system prompt and prefix and
+    the provider can serve that part from its prompt cache.
+    """
+    occasion_text = OCCASION_DESCRIPTIONS[occasion_type].get(lang_code, "special occasion")
+    tone_text = TONE_DESCRIPTIONS.get(tone, {}).get(lang_code, "professional-friendly")
+
+    if lang_code == "ru":
+        return f"""<task>
+Создай персонализированное поздравительное сообщение по случаю: {occasion_text}
+Тон сообщения: {tone_text}
+</task>
+
+<instructions>
+Напиши только текст сообщения, без каких-либо дополнительных пояснений или форматирования. Сообщение должно быть готово к отправке как есть.
+</instructions>"""
+    elif lang_code == "en":
+        return f"""<task>
+Create a personalized greeting message for: {occasion_text}
+Message tone: {tone_text}
+</task>
+
+<instructions>
+Write only the message text, without any additional explanations or formatting. The message should be ready to send as is.
+</instructions>"""
+    else:  # uz
+        return f"""<task>
+Quyidagi holat uchun shaxsiylashtirilgan tabrik xabari yarating: {occasion_text}
+Xabar ohangi: {tone_text}
+</task>
+
+<instructions>
+Faqat xabar matnini yozing, hech qanday qo'shimcha tushuntirishlar yoki formatlash bo'lmasa. Xabar shunday holda yuborishga tayyor bo'lishi kerak.
+</instructions>"""
+
+
 def build_message_prompt(
     contact_name: str,
     occasion_type: OccasionType,
@@ -55,64 +152,9 @@ def build_message_prompt(
     tone: str = "professional_friendly",
     language: Language = Language.RU
 ) -> str:
-    """Build the user prompt for message generation"""
-
-    # Occasion descriptions
-    occasion_descriptions = {
-        OccasionType.BIRTHDAY: {
-            "ru": "день рождения",
-            "en": "birthday",
-            "uz": "tug'ilgan kun"
-        },
-        OccasionType.NEW_YEAR: {
-            "ru": "Новый год",
-            "en": "New Year",
-            "uz": "Yangi yil"
-        },
-        OccasionType.HOLIDAY: {
-            "ru": "праздник",
-            "en": "holiday",
-            "uz": "bayram"
-        },
-        OccasionType.PROMOTION: {
-            "ru": "специальное предложение",
-            "en": "special offer",
-            "uz": "maxsus taklif"
-        },
-        OccasionType.CUSTOM: {
-            "ru": "особый случай",
-            "en": "special occasion",
-            "uz": "maxsus holat"
-        }
-    }
-
-    # Tone descriptions
-    tone_descriptions = {
-        "professional_friendly": {
-            "ru": "профессионально-дружелюбный",
-            "en": "professional-friendly",
-            "uz": "professional-do'stona"
-        },
-        "formal": {
-            "ru": "формальный",
-            "en": "formal",
-            "uz": "rasmiy"
-        },
-        "casual": {
-            "ru": "неформальный",
-            "en": "casual",
-            "uz": "norasmiy"
-        },
-        "warm": {
-            "ru": "теплый",
-            "en": "warm",
-            "uz": "issiq"
-        }
-    }
+    """Build the user prompt for message generation: the static prefix, then the contact"""
 
     lang_code = language.value if isinstance(language, Language) else language
-    occasion_text = occasion_descriptions[occasion_type].get(lang_code, "special occasion")
-    tone_text = tone_descriptions.get(tone, {}).get(lang_code, "professional-friendly")
 
     # Build contact context
     contact_context_parts = [f"Имя: {contact_name}"]
@@ -123,34 +165,7 @@ def build_message_prompt(
 
     contact_context = "\n".join(contact_context_parts)
 
-    # Build the prompt
-    if lang_code == "ru":
-        prompt = f"""<contact>
-{contact_context}
-</contact>
-
-<task>
-Создай персонализированное поздравительное сообщение по случаю: {occasion_text}
-Тон сообщения: {tone_text}
-</task>"""
-    elif lang_code == "en":
-        prompt = f"""<contact>
-{contact_context}
-</contact>
-
-<task>
-Create a personalized greeting message for: {occasion_text}
-Message tone: {tone_text}
-</task>"""
-    else:  # uz
-        prompt = f"""<contact>
-{contact_context}
-</contact>
-
-<task>
-Quyidagi holat uchun shaxsiylashtirilgan tabrik xabari yarating: {occasion_text}
-Xabar ohangi: {tone_text}
-</task>"""
+    prompt = f"{build_prompt_prefix(occasion_type, tone, lang_code)}\n\n<contact>\n{contact_context}\n</contact>"
 
     if custom_context:
         if lang_code == "ru":
@@ -160,11 +175,4 @@ Xabar ohangi: {tone_text}
         else:
             prompt += f"\n\n<additional_context>\nQo'shimcha kontekst: {custom_context}\n</additional_context>"
 
-    if lang_code == "ru":
-        prompt += "\n\n<instructions>\nНапиши только текст сообщения, без каких-либо дополнительных пояснений или форматирования. Сообщение должно быть готово к отправке как есть.\n</instructions>"
-    elif lang_code == "en":
-        prompt += "\n\n<instructions>\nWrite only the message text, without any additional explanations or formatting. The message should be ready to send as is.\n</instructions>"
-    else:
-        prompt += "\n\n<instructions>\nFaqat xabar matnini yozing, hech qanday qo'shimcha tushuntirishlar yoki formatlash bo'lmasa. Xabar shunday holda yuborishga tayyor bo'lishi kerak.\n</instructions>"
-
     return prompt
@@ -0,0 +1,157 @@
+"""Per-request SQL profiling: statement counts, N+1 detection and slow-query capture"""
+
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List
+
+from sqlalchemy import event
+
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+_PLACEHOLDER_LIST = re.compile(r"(?:\$\d+|%\(\w+\)s|\?)(?:\s*,\s*(?:\$\d+|%\(\w+\)s|\?))*")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """Normalize a statement so executions differing only in bind values compare equal"""
+    return _WHITESPACE.sub(" ", _PLACEHOLDER_LIST.sub("?", statement)).strip()
+
+
+def parameter_shape(parameters: Any) -> Any:
+    """Describe bind parameters by type, so logs never contain the values themselves"""
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [parameter_shape(value) if isinstance(value, (list, tuple, dict)) else type(value).__name__
+                for value in parameters]
+    return type(parameters).__name__
+
+
+@dataclass
+class QueryRecord:
+    """One executed statement"""
+    shape: str
+    duration: float
+    parameters: Any
+
+
+@dataclass
+class QueryProfile:
+    """Statements executed while a profile was active"""
+    queries: List[QueryRecord] = field(default_factory=list)
+
+    @property
+    def count(self) -> int:
+        return len(self.queries)
+
+    @property
+    def total_time(self) -> float:
+        return sum(query.duration for query in self.queries)
+
+    def repeated_shapes(self, threshold: int | None = None) -> Dict[str, int]:
+        """SELECT shapes executed at least `threshold` times, the usual N+1 signature"""
+        threshold = threshold or settings.SQL_N_PLUS_ONE_THRESHOLD
+        counts = Counter(query.shape for query in self.queries if query.shape.upper().startswith("SELECT"))
+        return {shape: count for shape, count in counts.items() if count >= threshold}
+
+
+_current_profile: ContextVar[QueryProfile | None] = ContextVar("sql_query_profile", default=None)
+
+
+@contextmanager
+def profile_queries() -> Iterator[QueryProfile]:
+    """Collect every statement executed in the current context"""
+    profile = QueryProfile()
+    token = _current_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _current_profile.reset(token)
+
+
+def _explain(conn, statement: str, parameters: Any) -> str | None:
+    """Re-run a slow SELECT under EXPLAIN (ANALYZE, BUFFERS) on the same connection"""
+    if conn.info.get("explaining") or not statement.lstrip().upper().startswith("SELECT"):
+        return None
+
+    conn.info["explaining"] = True
+    try:
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {statement}", parameters)
+            return "\n".join(row[0] for row in cursor.fetchall())
+        finally:
+            cursor.close()
+    except Exception as e:
+        return f"EXPLAIN failed: {e}"
+    finally:
+        conn.info["explaining"] = False
+
+
+def install_profiler(engine) -> None:
+    """
+    Attach profiling hooks to an engine
+
+    The hooks are cheap no-ops unless a profile is active, which happens per
+    request under SQLProfilerMiddleware (SQL_PROFILING_ENABLED) and inside
+    profile_queries(), e.g. from the query_budget pytest fixture.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if _current_profile.get() is not None and not conn.info.get("explaining"):
+            conn.info.setdefault("profile_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        profile = _current_profile.get()
+        if profile is None or conn.info.get("explaining") or not conn.info.get("profile_start"):
+            return
+
+        duration = time.perf_counter() - conn.info["profile_start"].pop()
+        record = QueryRecord(statement_shape(statement), duration, parameter_shape(parameters))
+        profile.queries.append(record)
+
+        if duration * 1000 >= settings.SLOW_QUERY_MS:
+            plan = _explain(conn, statement, parameters) if settings.SQL_EXPLAIN_SLOW_QUERIES else None
+            logger.warning(
+                "Slow query (%.1f ms): %s | params: %s%s",
+                duration * 1000,
+                record.shape,
+                record.parameters,
+                f"\n{plan}" if plan else "",
+            )
+
+
+class SQLProfilerMiddleware:
+    """ASGI middleware that profiles every request and reports suspected N+1 access"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with profile_queries() as profile:
+            await self.app(scope, receive, send)
+
+        route = getattr(scope.get("route"), "path", scope["path"])
+        repeated = profile.repeated_shapes()
+        for shape, count in repeated.items():
+            logger.warning("Possible N+1 on %s %s: %d x %s", scope["method"], route, count, shape)
+        logger.debug(
+            "%s %s ran %d statements in %.1f ms",
+            scope["method"],
+            route,
+            profile.count,
+            profile.total_time * 1000,
+        )
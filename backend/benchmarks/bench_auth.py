@@ -0,0 +1,21 @@
+"""Token handling and password verification on the authentication path"""
+
+from app.utils.auth import create_access_token, decode_token, get_password_hash, verify_password
+
+CLAIMS = {"sub": "0d6e4f0e-7c1b-4b53-9a55-2b1d8f0b7e11", "email": "admin@example.com", "role": "admin"}
+
+
+def bench_create_access_token(benchmark):
+    benchmark(create_access_token, CLAIMS)
+
+
+def bench_decode_token(benchmark):
+    token = create_access_token(CLAIMS)
+    payload = benchmark(decode_token, token)
+    assert payload["sub"] == CLAIMS["sub"]
+
+
+def bench_verify_password(benchmark):
+    # bcrypt is deliberately slow; a few rounds are enough to see regressions in cost factor
+    hashed = get_password_hash("password123")
+    assert benchmark.pedantic(verify_password, args=("password123", hashed), rounds=5, iterations=1)
@@ -0,0 +1,27 @@
+"""Prompt construction for each language and occasion"""
+
+import pytest
+
+from app.models.contact import Language
+from app.models.message import OccasionType
+from app.utils.prompts import get_system_prompt, build_message_prompt
+
+
+@pytest.mark.parametrize("language", list(Language), ids=lambda language: language.value)
+def bench_system_prompt(benchmark, language):
+    benchmark(get_system_prompt, language.value)
+
+
+@pytest.mark.parametrize("occasion_type", list(OccasionType), ids=lambda occasion: occasion.value)
+@pytest.mark.parametrize("language", list(Language), ids=lambda language: language.value)
+def bench_message_prompt(benchmark, language, occasion_type):
+    benchmark(
+        build_message_prompt,
+        contact_name="Азиз Каримов",
+        occasion_type=occasion_type,
+        contact_company="CROWE Uzbekistan",
+        contact_position="CFO",
+        custom_context="Long-standing audit client since 2015",
+        tone="professional_friendly",
+        language=language,
+    )
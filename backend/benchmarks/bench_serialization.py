@@ -0,0 +1,29 @@
+"""List endpoint serialization: response_model path versus list_response"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi.utils import create_response_field
+
+from app.schemas.contact import ContactListResponse
+from benchmarks.serialization import make_rows, response_model_path, fast_path
+
+PAGE_SIZES = [20, 100, 1000]
+
+
+@pytest.mark.parametrize("size", PAGE_SIZES)
+def bench_list_response(benchmark, size):
+    rows = make_rows(size)
+    benchmark(fast_path, rows)
+
+
+@pytest.mark.parametrize("size", PAGE_SIZES)
+def bench_response_model(benchmark, size):
+    field = create_response_field(name="response", type_=ContactListResponse)
+    objects = [SimpleNamespace(**row) for row in make_rows(size)]
+    loop = asyncio.new_event_loop()
+    try:
+        benchmark(lambda: loop.run_until_complete(response_model_path(objects, field)))
+    finally:
+        loop.close()
@@ -0,0 +1,94 @@
+"""Bytes and latency saved by ETags on repeated reads
+
+Requests each read route against a running API (data from
+benchmarks.datagen) three ways: unconditionally, conditionally right after
+(validator cached in Redis, 304 before any query), and conditionally after
+the validator cache was cleared (body computed, then 304):
+
+    python -m benchmarks.conditional_get --base-url http://localhost:8000 --repeat 50
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Dict, List
+
+import httpx
+
+from app.config.redis import close_redis, get_redis
+
+
+async def timed(client: httpx.AsyncClient, path: str, repeat: int, headers: Dict[str, str] | None = None,
+                before=None) -> tuple[float, int, int]:
+    """Median latency, response body bytes and status code over `repeat` requests"""
+    samples: List[float] = []
+    response = None
+    for _ in range(repeat):
+        if before is not None:
+            await before()
+        start = time.perf_counter()
+        response = await client.get(path, headers=headers)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples), len(response.content), response.status_code
+
+
+async def main(args):
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=30) as client:
+        response = await client.post("/api/auth/login", json={"email": args.email, "password": args.password})
+        response.raise_for_status()
+        client.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+
+        contact = (await client.get("/api/contacts", params={"limit": 1})).json()["items"][0]
+        message = (await client.get("/api/messages", params={"limit": 1})).json()["items"][0]
+        campaigns = (await client.get("/api/campaigns", params={"limit": 1})).json()["items"]
+
+        routes = {
+            "/api/contacts?limit=50": "contacts",
+            f"/api/contacts/{contact['id']}": f"contacts:{contact['id']}",
+            "/api/messages?limit=50": "messages",
+            f"/api/messages/{message['id']}": f"messages:{message['id']}",
+            f"/api/messages/{message['id']}/history": f"messages:{message['id']}",
+            "/api/analytics/dashboard": "analytics",
+            "/api/analytics/campaign-performance": "analytics",
+            "/api/analytics/messages-timeline": "analytics",
+        }
+        if campaigns:
+            routes["/api/campaigns?limit=50"] = "campaigns"
+            routes[f"/api/campaigns/{campaigns[0]['id']}"] = f"campaigns:{campaigns[0]['id']}"
+
+        print(f"{'route':<48} {'200 ms':>8} {'bytes':>8} {'304 cached ms':>14} {'304 computed ms':>16} {'saved':>7}")
+        total_full = total_conditional = 0
+        for path, scope in routes.items():
+            full_ms, body_bytes, _ = await timed(client, path, args.repeat)
+            etag = (await client.get(path)).headers.get("etag")
+            if etag is None:
+                print(f"{path:<48} no ETag")
+                continue
+
+            headers = {"If-None-Match": etag}
+            cached_ms, cached_bytes, cached_status = await timed(client, path, args.repeat, headers)
+
+            async def forget(scope=scope):
+                await get_redis().delete(f"etag:{scope}")
+
+            computed_ms, computed_bytes, computed_status = await timed(client, path, args.repeat, headers, forget)
+
+            total_full += body_bytes
+            total_conditional += cached_bytes
+            print(f"{path[:48]:<48} {full_ms * 1000:>8.2f} {body_bytes:>8} "
+                  f"{cached_ms * 1000:>11.2f} {cached_status} {computed_ms * 1000:>13.2f} {computed_status} "
+                  f"{1 - cached_bytes / body_bytes if body_bytes else 0:>7.0%}")
+
+        print(f"\nBody bytes per round of requests: {total_full:,} unconditional, {total_conditional:,} revalidated")
+
+    await close_redis()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--email", default="bench@example.com")
+    parser.add_argument("--password", default="password123")
+    parser.add_argument("--repeat", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,257 @@
+"""High-speed synthetic data generator for scale benchmarks
+
+Loads contacts, messages and message history through binary COPY with
+realistic RU/EN/UZ distributions. Tables must already exist (DEBUG
+startup or alembic). Generation is deterministic for a given --seed:
+
+    python -m benchmarks.datagen --contacts 1000000 --messages-per-contact 5 --history-per-message 2
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import date, datetime, timedelta
+from uuid import UUID
+
+import asyncpg
+
+from app.config.settings import settings
+from app.services.partitions import ensure_partitions
+from app.utils.auth import get_password_hash
+
+# Language mix of the client base, and per-language name pools
+LANGUAGE_WEIGHTS = {"RU": 0.55, "UZ": 0.30, "EN": 0.15}
+
+NAMES = {
+    "RU": {
+        "male": ["Алексей", "Дмитрий", "Сергей", "Андрей", "Олег", "Игорь", "Михаил", "Владимир", "Павел", "Николай"],
+        "female": ["Мария", "Анна", "Елена", "Ольга", "Татьяна", "Наталья", "Ирина", "Светлана", "Юлия", "Екатерина"],
+        "surnames": ["Иванов", "Петров", "Смирнов", "Кузнецов", "Попов", "Соколов", "Лебедев", "Козлов", "Новиков", "Морозов"],
+        "female_suffix": "а",
+    },
+    "UZ": {
+        "male": ["Aziz", "Jasur", "Bekzod", "Sardor", "Otabek", "Rustam", "Sherzod", "Dilshod", "Ulugbek", "Timur"],
+        "female": ["Dilnoza", "Malika", "Aziza", "Nodira", "Gulnora", "Shahnoza", "Madina", "Zarina", "Feruza", "Kamola"],
+        "surnames": ["Karimov", "Rahimov", "Tursunov", "Aliyev", "Yusupov", "Nazarov", "Saidov", "Ismoilov", "Ergashev", "Qodirov"],
+        "female_suffix": "a",
+    },
+    "EN": {
+        "male": ["John", "Michael", "David", "James", "Robert", "William", "Thomas", "Daniel", "Paul", "Mark"],
+        "female": ["Anna", "Emily", "Sarah", "Laura", "Emma", "Olivia", "Sophie", "Kate", "Helen", "Grace"],
+        "surnames": ["Smith", "Johnson", "Brown", "Taylor", "Wilson", "Davies", "Evans", "Thomas", "Roberts", "Walker"],
+        "female_suffix": "",
+    },
+}
+
+COMPANIES = ["CROWE Uzbekistan", "Tech Innovations", "Global Finance", "Smith Consulting", "Silk Road Trading",
+             "Tashkent Logistics", "Samarkand Textiles", "Orient Bank", "Navoi Mining", "Fergana Agro"]
+POSITIONS = ["CEO", "CFO", "Director", "Manager", "Owner", "Partner", "Accountant", "Head of Sales"]
+TAGS = ["vip", "tashkent", "samarkand", "audit", "tax", "consulting", "newsletter", "event-2024"]
+
+SEGMENT_WEIGHTS = {"VIP": 0.05, "REGULAR": 0.60, "NEW_CLIENT": 0.25, "PARTNER": 0.10}
+OCCASION_WEIGHTS = {"BIRTHDAY": 0.45, "NEW_YEAR": 0.25, "HOLIDAY": 0.15, "PROMOTION": 0.10, "CUSTOM": 0.05}
+STATUS_WEIGHTS = {"SENT": 0.55, "APPROVED": 0.08, "PENDING_APPROVAL": 0.15, "DRAFT": 0.07, "REJECTED": 0.10, "FAILED": 0.05}
+
+CONTENT = {
+    "RU": "Уважаемый(ая) {name}! Поздравляем Вас и желаем успехов, здоровья и процветания!",
+    "UZ": "Hurmatli {name}! Sizni tabriklaymiz va omad, sog'lik va farovonlik tilaymiz!",
+    "EN": "Dear {name}! Congratulations, and best wishes for success, health and prosperity!",
+}
+
+# Generated timestamps fall in the history_days before this
+DATA_END = datetime(2026, 1, 1)
+
+CONTACT_COLUMNS = ["id", "name", "email", "phone", "segment", "birthday", "company", "position", "language",
+                   "tags", "custom_fields", "last_interaction_date", "created_by", "created_at", "updated_at"]
+MESSAGE_COLUMNS = ["id", "contact_id", "occasion_type", "content", "status", "generated_by", "created_by",
+                   "approved_by", "sent_at", "approved_at", "scheduled_for", "message_metadata",
+                   "created_at", "updated_at"]
+HISTORY_COLUMNS = ["id", "message_id", "action", "user_id", "old_content", "new_content", "created_at"]
+
+
+class SyntheticData:
+    """Deterministic row factory"""
+
+    def __init__(self, seed: int, user_id: UUID, history_days: int):
+        self.random = random.Random(seed)
+        self.user_id = user_id
+        self.now = DATA_END
+        self.history_days = history_days
+        self._languages = list(LANGUAGE_WEIGHTS), list(LANGUAGE_WEIGHTS.values())
+        self._segments = list(SEGMENT_WEIGHTS), list(SEGMENT_WEIGHTS.values())
+        self._occasions = list(OCCASION_WEIGHTS), list(OCCASION_WEIGHTS.values())
+        self._statuses = list(STATUS_WEIGHTS), list(STATUS_WEIGHTS.values())
+
+    def uuid(self) -> UUID:
+        return UUID(int=self.random.getrandbits(128), version=4)
+
+    def pick(self, choices) -> str:
+        return self.random.choices(choices[0], weights=choices[1])[0]
+
+    def past(self) -> datetime:
+        return self.now - timedelta(seconds=self.random.randrange(self.history_days * 86400))
+
+    def contact(self, index: int) -> tuple:
+        language = self.pick(self._languages)
+        pool = NAMES[language]
+        female = self.random.random() < 0.5
+        first = self.random.choice(pool["female" if female else "male"])
+        surname = self.random.choice(pool["surnames"]) + (pool["female_suffix"] if female else "")
+        created_at = self.past()
+        tags = self.random.sample(TAGS, self.random.choice((0, 0, 1, 2, 3)))
+        custom_fields = {"source": self.random.choice(("import", "web", "referral", "event"))}
+        if self.random.random() < 0.3:
+            custom_fields["revenue_band"] = self.random.choice(("S", "M", "L", "XL"))
+
+        return (
+            self.uuid(),
+            f"{first} {surname}",
+            f"contact{index}@bench.example.com",
+            f"+99890{self.random.randrange(10_000_000):07d}",
+            self.pick(self._segments),
+            date(self.random.randint(1960, 2002), self.random.randint(1, 12), self.random.randint(1, 28))
+            if self.random.random() < 0.85 else None,
+            self.random.choice(COMPANIES),
+            self.random.choice(POSITIONS),
+            language,
+            json.dumps(tags),
+            json.dumps(custom_fields),
+            created_at + timedelta(days=self.random.randrange(365)) if self.random.random() < 0.6 else None,
+            self.user_id,
+            created_at,
+            created_at,
+        )
+
+    def message(self, contact: tuple) -> tuple:
+        status = self.pick(self._statuses)
+        created_at = self.past()
+        approved = status in ("APPROVED", "SENT", "FAILED")
+        input_tokens = self.random.randint(180, 320)
+        output_tokens = self.random.randint(60, 160)
+        metadata = {
+            "model": "gpt-4o",
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+            "cost_usd": round(input_tokens / 1e6 * 2.5 + output_tokens / 1e6 * 10.0, 6),
+            "language": contact[8].lower(),
+        }
+        return (
+            self.uuid(),
+            contact[0],
+            self.pick(self._occasions),
+            CONTENT[contact[8]].format(name=contact[1]),
+            status,
+            "AI" if self.random.random() < 0.85 else "MANUAL",
+            self.user_id,
+            self.user_id if approved else None,
+            created_at + timedelta(hours=2) if status == "SENT" else None,
+            created_at + timedelta(hours=1) if approved else None,
+            created_at + timedelta(days=self.random.randrange(30)) if self.random.random() < 0.3 else None,
+            json.dumps(metadata),
+            created_at,
+            created_at,
+        )
+
+    def history(self, message: tuple, step: int) -> tuple:
+        action = ("created", "edited", "approved", "sent")[min(step, 3)]
+        return (
+            self.uuid(),
+            message[0],
+            action,
+            self.user_id,
+            None,
+            message[3] if action in ("created", "edited") else None,
+            message[12] + timedelta(minutes=30 * step),
+        )
+
+
+def create_history_partitions(start: datetime):
+    """Monthly partitions back to the oldest generated row, so nothing lands in the default partition"""
+    from app.config.database import sync_engine
+
+    with sync_engine.begin() as conn:
+        created = ensure_partitions(conn, start.date(), settings.PARTITION_PREMAKE_MONTHS)
+    print(f"Created {len(created)} partitions")
+
+
+async def ensure_bench_user(conn) -> UUID:
+    """Owner for all generated rows (bench@example.com / password123)"""
+    return await conn.fetchval(
+        """
+        INSERT INTO users (id, email, full_name, role, hashed_password, created_at, updated_at)
+        VALUES (gen_random_uuid(), 'bench@example.com', 'Benchmark User', 'ADMIN', $1, now(), now())
+        ON CONFLICT (email) DO UPDATE SET updated_at = now()
+        RETURNING id
+        """,
+        get_password_hash("password123"),
+    )
+
+
+async def generate(contacts: int, messages_per_contact: float, history_per_message: float,
+                   batch_size: int, seed: int, history_days: int):
+    data_start = DATA_END - timedelta(days=history_days)
+    await asyncio.to_thread(create_history_partitions, data_start)
+
+    conn = await asyncpg.connect(settings.DATABASE_URL)
+    try:
+        user_id = await ensure_bench_user(conn)
+        data = SyntheticData(seed, user_id, history_days)
+        totals = {"contacts": 0, "messages": 0, "message_history": 0}
+        started = time.perf_counter()
+
+        for batch_start in range(0, contacts, batch_size):
+            contact_rows = [data.contact(index) for index in range(batch_start, min(batch_start + batch_size, contacts))]
+            message_rows = []
+            history_rows = []
+            for contact in contact_rows:
+                for _ in range(_poisson_like(data.random, messages_per_contact)):
+                    message = data.message(contact)
+                    message_rows.append(message)
+                    for step in range(_poisson_like(data.random, history_per_message)):
+                        history_rows.append(data.history(message, step))
+
+            await conn.copy_records_to_table("contacts", records=contact_rows, columns=CONTACT_COLUMNS)
+            await conn.copy_records_to_table("messages", records=message_rows, columns=MESSAGE_COLUMNS)
+            await conn.copy_records_to_table("message_history", records=history_rows, columns=HISTORY_COLUMNS)
+
+            totals["contacts"] += len(contact_rows)
+            totals["messages"] += len(message_rows)
+            totals["message_history"] += len(history_rows)
+            elapsed = time.perf_counter() - started
+            rows = sum(totals.values())
+            print(f"  {totals['contacts']:>10,} contacts {totals['messages']:>12,} messages "
+                  f"{totals['message_history']:>12,} history  ({rows / elapsed:,.0f} rows/s)")
+
+        await conn.execute("ANALYZE contacts; ANALYZE messages; ANALYZE message_history")
+        print(f"✓ Loaded {sum(totals.values()):,} rows in {time.perf_counter() - started:.1f}s")
+    finally:
+        await conn.close()
+
+
+def _poisson_like(rng: random.Random, mean: float) -> int:
+    """Non-negative integer count averaging `mean`, spread by one either side"""
+    whole = int(mean)
+    return whole + (1 if rng.random() < mean - whole else 0) + rng.choice((-1, 0, 0, 1)) * (whole > 0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--contacts", type=int, default=100_000)
+    parser.add_argument("--messages-per-contact", type=float, default=5)
+    parser.add_argument("--history-per-message", type=float, default=2)
+    parser.add_argument("--batch-size", type=int, default=20_000)
+    parser.add_argument("--history-days", type=int, default=3 * 365)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    asyncio.run(generate(
+        contacts=args.contacts,
+        messages_per_contact=args.messages_per_contact,
+        history_per_message=args.history_per_message,
+        batch_size=args.batch_size,
+        seed=args.seed,
+        history_days=args.history_days,
+    ))
@@ -0,0 +1,77 @@
+"""Generation throughput and tail latency against the mock LLM backend
+
+Runs AIMessageGenerator at a fixed concurrency with no network or API key;
+every flag maps to a MOCK_LLM_* setting:
+
+    python -m benchmarks.generation_throughput --messages 2000 --concurrency 64 --rate-limit-rate 0.02
+"""
+
+import argparse
+import asyncio
+import time
+from collections import Counter
+from types import SimpleNamespace
+
+from app.models.contact import Language
+from app.models.message import OccasionType
+from app.services.ai_generator import AIMessageGenerator
+from app.services.llm_backends import MockLLMBackend
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    return sorted_values[min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)]
+
+
+async def main(args):
+    generator = AIMessageGenerator(MockLLMBackend(
+        latency_ms=args.latency_ms,
+        latency_distribution=args.distribution,
+        latency_sigma=args.sigma,
+        output_tokens=args.output_tokens,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        seed=args.seed,
+    ))
+    languages = list(Language)
+    contacts = [
+        SimpleNamespace(name=f"Contact {index}", language=languages[index % len(languages)],
+                        company="CROWE Uzbekistan", position="CFO")
+        for index in range(args.messages)
+    ]
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+    outcomes = Counter()
+
+    async def generate(contact):
+        async with semaphore:
+            start = time.perf_counter()
+            result = await generator.generate_personalized_message(contact, OccasionType.BIRTHDAY)
+            latencies.append(time.perf_counter() - start)
+            outcomes["ok" if result["success"] else result["metadata"]["exception"]] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(generate(contact) for contact in contacts))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"{args.messages} messages, concurrency {args.concurrency}, {args.distribution} "
+          f"median {args.latency_ms:g} ms sigma {args.sigma:g}")
+    print(f"  throughput {args.messages / elapsed:,.1f} msg/s over {elapsed:.2f}s")
+    print(f"  latency p50 {percentile(latencies, 0.5) * 1000:.0f} ms  p95 {percentile(latencies, 0.95) * 1000:.0f} ms  "
+          f"p99 {percentile(latencies, 0.99) * 1000:.0f} ms  max {latencies[-1] * 1000:.0f} ms")
+    print("  outcomes " + ", ".join(f"{name}={count}" for name, count in outcomes.most_common()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency-ms", type=float, default=800)
+    parser.add_argument("--distribution", default="lognormal", choices=MockLLMBackend.DISTRIBUTIONS)
+    parser.add_argument("--sigma", type=float, default=0.5)
+    parser.add_argument("--output-tokens", type=int, default=120)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,58 @@
+"""Import-time profile of app.main
+
+Runs a fresh interpreter under -X importtime and reports the slowest
+modules by self and cumulative time, plus totals per top-level package:
+
+    python -m benchmarks.import_profile --top 25
+"""
+
+import argparse
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def profile_imports(module: str = "app.main") -> list[tuple[str, int, int]]:
+    """(module, self µs, cumulative µs) for every module imported"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def main(module: str, top: int):
+    rows = profile_imports(module)
+    total = max(cumulative for _, _, cumulative in rows)
+    print(f"import {module}: {total / 1000:.1f} ms, {len(rows)} modules\n")
+
+    print(f"{'self ms':>9} {'cumul ms':>9}  module (slowest by self time)")
+    for name, self_us, cumulative_us in sorted(rows, key=lambda row: -row[1])[:top]:
+        print(f"{self_us / 1000:>9.1f} {cumulative_us / 1000:>9.1f}  {name}")
+
+    packages = defaultdict(int)
+    for name, self_us, _ in rows:
+        packages[name.split(".")[0]] += self_us
+    print(f"\n{'self ms':>9}  {'share':>6}  top-level package")
+    for package, self_us in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+        print(f"{self_us / 1000:>9.1f}  {self_us / total:>6.1%}  {package}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+    main(args.module, args.top)
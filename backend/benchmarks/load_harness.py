@@ -0,0 +1,222 @@
+"""HTTP load harness for the main API scenarios
+
+Runs each scenario at a fixed concurrency against a running API (local
+Postgres loaded by benchmarks.datagen, OpenAI pointed at
+benchmarks.openai_stub) and writes latency percentiles and throughput to
+benchmarks/results/ as JSON, tagged with the current commit:
+
+    python -m benchmarks.load_harness --base-url http://localhost:8000 --concurrency 32 --duration 20
+    python -m benchmarks.load_harness --compare benchmarks/results/a.json benchmarks/results/b.json
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List
+
+import httpx
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+Scenario = Callable[[httpx.AsyncClient, random.Random], Awaitable[httpx.Response]]
+
+
+class Fixtures:
+    """IDs sampled from the loaded dataset, shared by all scenarios"""
+
+    def __init__(self, email: str, password: str, contact_ids: List[str], message_ids: List[str]):
+        self.email = email
+        self.password = password
+        self.contact_ids = contact_ids
+        self.message_ids = message_ids
+
+
+def build_scenarios(fixtures: Fixtures) -> Dict[str, Scenario]:
+    async def login(client, rng):
+        return await client.post("/api/auth/login", json={"email": fixtures.email, "password": fixtures.password})
+
+    async def list_contacts(client, rng):
+        return await client.get("/api/contacts", params={"skip": rng.randrange(0, 1000), "limit": 50})
+
+    async def search_contacts(client, rng):
+        return await client.get("/api/contacts", params={"search": rng.choice(("Karim", "Иван", "Smith")), "limit": 20})
+
+    async def get_contact(client, rng):
+        return await client.get(f"/api/contacts/{rng.choice(fixtures.contact_ids)}")
+
+    async def list_messages(client, rng):
+        return await client.get("/api/messages", params={"status": "pending_approval", "limit": 50})
+
+    async def message_history(client, rng):
+        return await client.get(f"/api/messages/{rng.choice(fixtures.message_ids)}/history")
+
+    async def dashboard(client, rng):
+        return await client.get("/api/analytics/dashboard")
+
+    async def generate_message(client, rng):
+        return await client.post("/api/messages/generate", json={
+            "contact_id": rng.choice(fixtures.contact_ids),
+            "occasion_type": rng.choice(("birthday", "new_year", "holiday")),
+        })
+
+    return {
+        "login": login,
+        "list_contacts": list_contacts,
+        "search_contacts": search_contacts,
+        "get_contact": get_contact,
+        "list_messages": list_messages,
+        "message_history": message_history,
+        "dashboard": dashboard,
+        "generate_message": generate_message,
+    }
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+async def run_scenario(client: httpx.AsyncClient, scenario: Scenario, concurrency: int,
+                       duration: float, seed: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    status_counts: Dict[str, int] = {}
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker(worker_id: int):
+        nonlocal errors
+        rng = random.Random(seed + worker_id)
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                response = await scenario(client, rng)
+                status = str(response.status_code)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+            status_counts[status] = status_counts.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(index) for index in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "statuses": status_counts,
+        "rps": round(len(latencies) / elapsed, 2),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p90_ms": round(percentile(latencies, 0.90) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+    }
+
+
+async def load_fixtures(client: httpx.AsyncClient, email: str, password: str) -> Fixtures:
+    response = await client.post("/api/auth/login", json={"email": email, "password": password})
+    response.raise_for_status()
+    client.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+
+    contacts = (await client.get("/api/contacts", params={"limit": 200})).json()["items"]
+    messages = (await client.get("/api/messages", params={"limit": 200})).json()["items"]
+    if not contacts or not messages:
+        raise SystemExit("No data to load test against; run python -m benchmarks.datagen first")
+
+    return Fixtures(email, password, [c["id"] for c in contacts], [m["id"] for m in messages])
+
+
+def current_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def main(args) -> Path:
+    async with httpx.AsyncClient(
+        base_url=args.base_url,
+        timeout=args.timeout,
+        limits=httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency),
+    ) as client:
+        fixtures = await load_fixtures(client, args.email, args.password)
+        scenarios = build_scenarios(fixtures)
+        selected = args.scenarios.split(",") if args.scenarios else list(scenarios)
+
+        results = {}
+        for name in selected:
+            print(f"→ {name} ({args.concurrency} workers, {args.duration:g}s)")
+            results[name] = await run_scenario(client, scenarios[name], args.concurrency, args.duration, args.seed)
+            summary = results[name]
+            print(f"  {summary['rps']:>9.1f} req/s  p50 {summary['p50_ms']:.1f} ms  "
+                  f"p99 {summary['p99_ms']:.1f} ms  errors {summary['errors']}")
+
+    commit = current_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "base_url": args.base_url,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "seed": args.seed,
+        },
+        "scenarios": results,
+    }
+
+    RESULTS_DIR.mkdir(exist_ok=True)
+    path = RESULTS_DIR / f"load-{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{commit}.json"
+    path.write_text(json.dumps(report, indent=2))
+    print(f"✓ Results written to {path}")
+    return path
+
+
+def compare(baseline_path: str, candidate_path: str) -> None:
+    """Print per-scenario throughput and latency changes between two result files"""
+    baseline = json.loads(Path(baseline_path).read_text())
+    candidate = json.loads(Path(candidate_path).read_text())
+    print(f"{baseline['commit']} → {candidate['commit']}")
+    print(f"{'scenario':<18} {'rps':>20} {'p50 ms':>20} {'p99 ms':>20}")
+
+    def change(old: float, new: float) -> str:
+        delta = (new - old) / old * 100 if old else 0.0
+        return f"{old:.1f}→{new:.1f} ({delta:+.0f}%)"
+
+    for name, new in candidate["scenarios"].items():
+        old = baseline["scenarios"].get(name)
+        if old is None:
+            continue
+        print(f"{name:<18} {change(old['rps'], new['rps']):>20} "
+              f"{change(old['p50_ms'], new['p50_ms']):>20} {change(old['p99_ms'], new['p99_ms']):>20}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--email", default="bench@example.com")
+    parser.add_argument("--password", default="password123")
+    parser.add_argument("--scenarios", default="", help="Comma-separated subset; default runs all")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CANDIDATE"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+    else:
+        asyncio.run(main(args))
@@ -0,0 +1,76 @@
+"""Per-request overhead of PrometheusMiddleware
+
+Drives a minimal app in-process through raw ASGI calls, with and without
+the middleware, so only the instrumentation cost is measured:
+
+    python -m benchmarks.metrics_overhead --requests 20000
+"""
+
+import argparse
+import asyncio
+import time
+
+from fastapi import FastAPI
+
+from app.utils.metrics import PrometheusMiddleware
+
+
+def build_app(instrumented: bool) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/api/contacts/{contact_id}")
+    async def get_contact(contact_id: str):
+        return {"id": contact_id}
+
+    if instrumented:
+        app.add_middleware(PrometheusMiddleware)
+    return app
+
+
+async def drive(app, requests: int) -> float:
+    """Send `requests` GETs through the ASGI interface and return seconds per request"""
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    def scope(index: int) -> dict:
+        return {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": f"/api/contacts/{index}",
+            "raw_path": f"/api/contacts/{index}".encode(),
+            "query_string": b"",
+            "headers": [],
+            "client": ("127.0.0.1", 1234),
+            "server": ("testserver", 80),
+        }
+
+    # Warm up, and make sure the app has started its middleware stack
+    for index in range(200):
+        await app(scope(index), receive, send)
+
+    start = time.perf_counter()
+    for index in range(requests):
+        await app(scope(index), receive, send)
+    return (time.perf_counter() - start) / requests
+
+
+async def main(requests: int):
+    baseline = await drive(build_app(instrumented=False), requests)
+    instrumented = await drive(build_app(instrumented=True), requests)
+    print(f"baseline      {baseline * 1e6:8.1f} us/request")
+    print(f"instrumented  {instrumented * 1e6:8.1f} us/request")
+    print(f"overhead      {(instrumented - baseline) * 1e6:8.1f} us/request")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests))
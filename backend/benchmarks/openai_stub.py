@@ -0,0 +1,78 @@
+"""Stub OpenAI server for load tests
+
+Answers /v1/chat/completions with a canned greeting after a simulated
+latency, so load runs exercise the real client without spending tokens.
+Point the API at it with OPENAI_BASE_URL:
+
+    python -m benchmarks.openai_stub --port 8100 --latency-ms 800 --jitter-ms 300
+    OPENAI_BASE_URL=http://localhost:8100/v1 uvicorn app.main:app
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from uuid import uuid4
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+GREETING = "Уважаемый(ая) коллега! Поздравляем Вас и желаем успехов, здоровья и процветания!"
+
+
+def create_app(latency_ms: float, jitter_ms: float, error_rate: float, seed: int) -> FastAPI:
+    app = FastAPI(title="OpenAI stub")
+    rng = random.Random(seed)
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        await asyncio.sleep(max(rng.gauss(latency_ms, jitter_ms), 0) / 1000)
+
+        if rng.random() < error_rate:
+            return JSONResponse(
+                status_code=500,
+                content={"error": {"message": "Simulated upstream failure", "type": "server_error"}},
+            )
+
+        prompt_tokens = sum(len(message.get("content", "")) for message in body.get("messages", [])) // 4
+        completion_tokens = len(GREETING) // 4
+        return {
+            "id": f"chatcmpl-{uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": GREETING},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=800)
+    parser.add_argument("--jitter-ms", type=float, default=300)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    uvicorn.run(
+        create_app(args.latency_ms, args.jitter_ms, args.error_rate, args.seed),
+        host=args.host,
+        port=args.port,
+        log_level="warning",
+    )
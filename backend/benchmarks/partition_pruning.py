@@ -0,0 +1,142 @@
+"""Timeline and list queries on partitioned versus unpartitioned messages
+
+Builds two copies of a messages-shaped table in scratch schemas, one plain
+and one range-partitioned by month, loads identical rows server-side with
+generate_series, then times the analytics and list queries on both:
+
+    python -m benchmarks.partition_pruning --rows 50000000 --months 36
+    python -m benchmarks.partition_pruning --skip-load   # reuse loaded schemas
+"""
+
+import argparse
+import asyncio
+import re
+import statistics
+import time
+from datetime import datetime
+
+import asyncpg
+
+from app.config.settings import settings
+from app.services.partitions import add_months, month_start
+
+SCHEMAS = ("bench_plain", "bench_partitioned")
+
+COLUMNS = """
+    id uuid NOT NULL,
+    contact_id uuid NOT NULL,
+    status text NOT NULL,
+    occasion_type text NOT NULL,
+    content text NOT NULL,
+    created_at timestamp NOT NULL
+"""
+
+QUERIES = {
+    "timeline_30d": """
+        SELECT date(created_at), count(id) FROM messages
+        WHERE created_at >= now() - interval '30 days'
+        GROUP BY date(created_at) ORDER BY date(created_at)
+    """,
+    "this_month_count": """
+        SELECT count(id) FROM messages WHERE created_at >= date_trunc('month', now())
+    """,
+    "list_latest": """
+        SELECT * FROM messages ORDER BY created_at DESC LIMIT 50
+    """,
+    "list_pending_90d": """
+        SELECT * FROM messages
+        WHERE status = 'pending_approval' AND created_at >= now() - interval '90 days'
+        ORDER BY created_at DESC LIMIT 50
+    """,
+}
+
+
+async def create_schemas(conn, months: int) -> None:
+    first = add_months(month_start(datetime.utcnow().date()), -months + 1)
+    for schema in SCHEMAS:
+        await conn.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE; CREATE SCHEMA {schema}")
+
+    await conn.execute(f"CREATE TABLE bench_plain.messages ({COLUMNS}, PRIMARY KEY (id))")
+    await conn.execute(
+        f"CREATE TABLE bench_partitioned.messages ({COLUMNS}, PRIMARY KEY (id, created_at)) "
+        f"PARTITION BY RANGE (created_at)"
+    )
+    await conn.execute("CREATE TABLE bench_partitioned.messages_default PARTITION OF bench_partitioned.messages DEFAULT")
+    for offset in range(months + 3):
+        month = add_months(first, offset)
+        await conn.execute(
+            f"CREATE TABLE bench_partitioned.messages_p{month:%Y_%m} PARTITION OF bench_partitioned.messages "
+            f"FOR VALUES FROM ('{month}') TO ('{add_months(month, 1)}')"
+        )
+
+
+async def load(conn, rows: int, months: int, chunk: int) -> None:
+    days = months * 30
+    for schema in SCHEMAS:
+        started = time.perf_counter()
+        for offset in range(0, rows, chunk):
+            count = min(chunk, rows - offset)
+            # Deterministic content: row n always gets the same values in both schemas
+            await conn.execute(
+                f"""
+                INSERT INTO {schema}.messages
+                SELECT md5(n::text)::uuid,
+                       md5((n % 200000)::text)::uuid,
+                       (ARRAY['draft','pending_approval','approved','sent','sent','sent','failed','rejected'])[n % 8 + 1],
+                       (ARRAY['birthday','new_year','holiday','promotion','custom'])[n % 5 + 1],
+                       'Уважаемый клиент, поздравляем Вас! #' || n,
+                       now() - make_interval(secs => (n * 7919 % ({days} * 86400))::double precision)
+                FROM generate_series({offset}, {offset + count - 1}) AS n
+                """
+            )
+            print(f"  {schema}: {offset + count:>12,} rows ({(offset + count) / (time.perf_counter() - started):,.0f} rows/s)")
+
+        await conn.execute(f"CREATE INDEX ON {schema}.messages (created_at)")
+        await conn.execute(f"CREATE INDEX ON {schema}.messages (status)")
+        await conn.execute(f"ANALYZE {schema}.messages")
+
+
+async def partitions_scanned(conn, query: str) -> int:
+    plan = "\n".join(row[0] for row in await conn.fetch(f"EXPLAIN {query}"))
+    return len(set(re.findall(r"on (messages_\w+)", plan))) or 1
+
+
+async def time_query(conn, query: str, repeat: int) -> float:
+    await conn.fetch(query)  # Warm the cache
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await conn.fetch(query)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+async def main(args):
+    conn = await asyncpg.connect(settings.DATABASE_URL)
+    try:
+        if not args.skip_load:
+            await create_schemas(conn, args.months)
+            await load(conn, args.rows, args.months, args.chunk)
+
+        print(f"\n{'query':<18} {'plain ms':>10} {'partitioned ms':>15} {'speedup':>8} {'partitions':>11}")
+        for name, query in QUERIES.items():
+            results = {}
+            for schema in SCHEMAS:
+                await conn.execute(f"SET search_path TO {schema}")
+                results[schema] = await time_query(conn, query, args.repeat)
+            scanned = await partitions_scanned(conn, query)
+            plain, partitioned = results["bench_plain"], results["bench_partitioned"]
+            print(f"{name:<18} {plain * 1000:>10.1f} {partitioned * 1000:>15.1f} "
+                  f"{plain / partitioned:>7.1f}x {scanned:>11}")
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50_000_000)
+    parser.add_argument("--months", type=int, default=36)
+    parser.add_argument("--chunk", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--skip-load", action="store_true")
+    asyncio.run(main(parser.parse_args()))
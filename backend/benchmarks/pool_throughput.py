@@ -0,0 +1,90 @@
+"""Throughput curve across connection pool sizes under concurrent load
+
+Runs against the database in DATABASE_URL:
+
+    python -m benchmarks.pool_throughput --concurrency 64 --sizes 2,5,10,20,40
+"""
+
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.config.database import async_database_url, _asyncpg_connect_args
+from app.config.pool_metrics import PoolMetrics, InstrumentedAsyncQueuePool
+
+
+async def run_pool_size(pool_size: int, concurrency: int, duration: float, query_ms: float) -> dict:
+    """Hammer one pool size with `concurrency` workers for `duration` seconds"""
+    engine = create_async_engine(
+        async_database_url,
+        poolclass=InstrumentedAsyncQueuePool,
+        pool_size=pool_size,
+        max_overflow=0,
+        pool_timeout=60,
+        connect_args=_asyncpg_connect_args(),
+    )
+    metrics = PoolMetrics(f"bench-{pool_size}")
+    metrics.attach(engine.sync_engine.pool)
+
+    statement = text("SELECT pg_sleep(:seconds)")
+    seconds = query_ms / 1000
+    latencies = []
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            async with engine.connect() as conn:
+                await conn.execute(statement, {"seconds": seconds})
+            latencies.append(time.perf_counter() - start)
+
+    # Warm the pool so connection setup is not counted as throughput
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    await engine.dispose()
+
+    latencies.sort()
+    wait = metrics.wait_time
+    return {
+        "pool_size": pool_size,
+        "requests": len(latencies),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000, 2),
+        "avg_wait_ms": round(wait.sum / wait.count * 1000, 2) if wait.count else 0.0,
+        "timeouts": metrics.timeouts,
+    }
+
+
+async def main(sizes: list[int], concurrency: int, duration: float, query_ms: float):
+    print(f"Concurrency {concurrency}, {query_ms}ms per query, {duration}s per pool size")
+    print(f"{'pool':>6} {'req/s':>10} {'p50 ms':>10} {'p95 ms':>10} {'wait ms':>10} {'timeouts':>9}")
+    for size in sizes:
+        result = await run_pool_size(size, concurrency, duration, query_ms)
+        print(
+            f"{result['pool_size']:>6} {result['throughput_rps']:>10} {result['p50_ms']:>10} "
+            f"{result['p95_ms']:>10} {result['avg_wait_ms']:>10} {result['timeouts']:>9}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1,2,5,10,20,40")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--query-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    asyncio.run(main(
+        sizes=[int(size) for size in args.sizes.split(",")],
+        concurrency=args.concurrency,
+        duration=args.duration,
+        query_ms=args.query_ms,
+    ))
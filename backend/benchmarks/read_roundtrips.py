@@ -0,0 +1,90 @@
+"""Round-trips and latency of a read request: get_db versus get_read_db
+
+Simulates the query pattern of list_contacts (count + page) through both
+session factories and counts the protocol round-trips asyncpg makes:
+
+    python -m benchmarks.read_roundtrips --requests 500
+"""
+
+import argparse
+import asyncio
+import time
+
+import asyncpg
+from sqlalchemy import select, func
+
+from app.config.database import AsyncSessionLocal, ReadSessionLocal, async_engine, read_engine
+from app.models.contact import Contact
+
+
+class RoundTripCounter:
+    """Counts asyncpg calls that each cost one network round-trip"""
+
+    def __init__(self):
+        self.count = 0
+        self._originals = []
+
+    def _wrap(self, owner, name):
+        original = getattr(owner, name)
+        counter = self
+
+        async def wrapper(*args, **kwargs):
+            counter.count += 1
+            return await original(*args, **kwargs)
+
+        self._originals.append((owner, name, original))
+        setattr(owner, name, wrapper)
+
+    def __enter__(self):
+        # BEGIN/COMMIT/ROLLBACK go through Connection.execute, queries through
+        # prepared statements, pre-ping through Connection.fetchrow
+        self._wrap(asyncpg.connection.Connection, "execute")
+        self._wrap(asyncpg.connection.Connection, "prepare")
+        self._wrap(asyncpg.connection.Connection, "fetchrow")
+        self._wrap(asyncpg.prepared_stmt.PreparedStatement, "fetch")
+        return self
+
+    def __exit__(self, *exc):
+        for owner, name, original in reversed(self._originals):
+            setattr(owner, name, original)
+
+
+async def read_request(session_factory, commit: bool):
+    """One list_contacts-shaped request"""
+    async with session_factory() as session:
+        query = select(Contact)
+        await session.execute(select(func.count()).select_from(query.subquery()))
+        await session.execute(query.order_by(Contact.created_at.desc()).limit(20))
+        if commit:
+            await session.commit()
+
+
+async def measure(label: str, session_factory, commit: bool, requests: int) -> float:
+    # Warm the pool and the statement cache
+    for _ in range(5):
+        await read_request(session_factory, commit)
+
+    with RoundTripCounter() as counter:
+        start = time.perf_counter()
+        for _ in range(requests):
+            await read_request(session_factory, commit)
+        elapsed = time.perf_counter() - start
+
+    per_request = counter.count / requests
+    print(f"{label:<28} {per_request:>8.2f} round-trips/request {elapsed / requests * 1000:>8.3f} ms/request")
+    return per_request
+
+
+async def main(requests: int):
+    primary = await measure("get_db (BEGIN ... COMMIT)", AsyncSessionLocal, True, requests)
+    read_only = await measure("get_read_db (autocommit)", ReadSessionLocal, False, requests)
+    print(f"Saved {primary - read_only:.2f} round-trips per read request")
+    await async_engine.dispose()
+    await read_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests))
@@ -0,0 +1,100 @@
+"""Microbenchmark: response_model serialization versus the list_response fast path
+
+No database needed; rows are synthetic contacts:
+
+    python -m benchmarks.serialization --sizes 20,100,1000
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+from uuid import uuid4
+
+from fastapi.routing import serialize_response
+from fastapi.responses import JSONResponse
+from fastapi.utils import create_response_field
+
+from app.models.contact import ContactSegment, Language
+from app.schemas.contact import ContactResponse, ContactListResponse
+from app.utils.serialization import list_response
+
+
+def make_rows(count: int) -> list[dict]:
+    """Row mappings shaped like select(*CONTACT_RESPONSE_COLUMNS)"""
+    now = datetime.utcnow()
+    creator = uuid4()
+    segments = list(ContactSegment)
+    languages = list(Language)
+    return [
+        {
+            "id": uuid4(),
+            "name": f"Контакт {index}",
+            "email": f"contact{index}@example.com",
+            "phone": f"+99890{index:07d}",
+            "segment": segments[index % len(segments)],
+            "birthday": date(1980 + index % 30, 1 + index % 12, 1 + index % 28),
+            "company": f"Company {index % 50}",
+            "position": "Manager",
+            "language": languages[index % len(languages)],
+            "tags": ["vip", "tashkent"] if index % 3 == 0 else [],
+            "custom_fields": {"source": "import", "score": index % 100},
+            "last_interaction_date": now - timedelta(days=index % 365),
+            "created_by": creator,
+            "created_at": now - timedelta(minutes=index),
+            "updated_at": now,
+        }
+        for index in range(count)
+    ]
+
+
+async def response_model_path(objects: list, field) -> bytes:
+    """What list_contacts did before: model_validate per row, then response_model"""
+    content = ContactListResponse(
+        items=[ContactResponse.model_validate(obj) for obj in objects],
+        total=len(objects),
+        skip=0,
+        limit=len(objects),
+    )
+    serialized = await serialize_response(field=field, response_content=content, is_coroutine=True)
+    return JSONResponse(serialized).body
+
+
+def fast_path(rows: list[dict]) -> bytes:
+    return list_response(rows, total=len(rows), skip=0, limit=len(rows)).body
+
+
+def timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main(sizes: list[int], repeat: int):
+    field = create_response_field(name="response", type_=ContactListResponse)
+    loop = asyncio.new_event_loop()
+
+    print(f"{'page size':>10} {'response_model ms':>18} {'fast path ms':>14} {'speedup':>8}")
+    for size in sizes:
+        rows = make_rows(size)
+        objects = [SimpleNamespace(**row) for row in rows]
+
+        slow_body = loop.run_until_complete(response_model_path(objects, field))
+        assert json.loads(slow_body) == json.loads(fast_path(rows)), "payloads differ"
+
+        slow = timed(lambda: loop.run_until_complete(response_model_path(objects, field)), repeat)
+        fast = timed(lambda: fast_path(rows), repeat)
+        print(f"{size:>10} {slow * 1000:>18.3f} {fast * 1000:>14.3f} {slow / fast:>7.1f}x")
+
+    loop.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="20,100,1000")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    main([int(size) for size in args.sizes.split(",")], args.repeat)
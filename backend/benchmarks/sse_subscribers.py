@@ -0,0 +1,144 @@
+"""Concurrent event stream subscribers one API worker can hold
+
+Opens server-sent event streams against a single running worker in steps,
+and at each step publishes timestamped events straight to the Redis channel
+and measures how many subscribers receive them and how late:
+
+    uvicorn app.main:app --workers 1 --port 8000
+    python -m benchmarks.sse_subscribers --steps 500,1000,2000,5000 --pid $(pgrep -f "uvicorn app.main")
+
+The client side needs a file descriptor per stream too; run it from another
+machine, or several copies with --steps split between them, to push past a
+few thousand streams.
+"""
+
+import argparse
+import asyncio
+import resource
+import statistics
+import time
+from pathlib import Path
+from typing import List
+
+import httpx
+import orjson
+
+from app.config.redis import close_redis, get_redis
+from app.services.events import broker
+from benchmarks.load_harness import percentile
+
+
+class Subscriber:
+    """One open stream, recording the delivery delay of benchmark events"""
+
+    def __init__(self):
+        self.ready = asyncio.Event()
+        self.failed: str | None = None
+        self.latencies: List[float] = []
+
+    async def run(self, client: httpx.AsyncClient, token: str) -> None:
+        try:
+            async with client.stream(
+                "GET", "/api/events/stream", params={"access_token": token, "topics": "messages"}
+            ) as response:
+                if response.status_code != 200:
+                    self.failed = str(response.status_code)
+                    return
+                async for line in response.aiter_lines():
+                    if line.startswith("event: ready"):
+                        self.ready.set()
+                    elif line.startswith("data: ") and "bench_sent_at" in line:
+                        event = orjson.loads(line[6:])
+                        self.latencies.append(time.time() - event["bench_sent_at"])
+        except httpx.HTTPError as e:
+            self.failed = type(e).__name__
+        finally:
+            self.ready.set()
+
+
+def server_rss_mb(pid: int | None) -> float | None:
+    if pid is None:
+        return None
+    for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+        if line.startswith("VmRSS:"):
+            return int(line.split()[1]) / 1024
+    return None
+
+
+async def main(args):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    steps = [int(step) for step in args.steps.split(",")]
+    limits = httpx.Limits(max_connections=max(steps) + 10, max_keepalive_connections=0)
+    timeout = httpx.Timeout(args.timeout, read=None)
+
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=timeout) as client:
+        response = await client.post("/api/auth/login", json={"email": args.email, "password": args.password})
+        response.raise_for_status()
+        token = response.json()["access_token"]
+
+        subscribers: List[Subscriber] = []
+        tasks = []
+        print(f"{'streams':>8} {'failed':>7} {'connect s':>10} {'delivered':>10} "
+              f"{'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'rss MB':>8}")
+
+        for target in steps:
+            started = time.perf_counter()
+            while len(subscribers) < target:
+                subscriber = Subscriber()
+                subscribers.append(subscriber)
+                tasks.append(asyncio.create_task(subscriber.run(client, token)))
+                if len(subscribers) % args.connect_batch == 0:
+                    await asyncio.sleep(0)  # Let the batch start connecting
+            await asyncio.gather(*(subscriber.ready.wait() for subscriber in subscribers))
+            connect_seconds = time.perf_counter() - started
+
+            for subscriber in subscribers:
+                subscriber.latencies.clear()
+            live = [subscriber for subscriber in subscribers if subscriber.failed is None]
+
+            for sequence in range(args.events):
+                await get_redis().publish(broker.channel, orjson.dumps({
+                    "topic": "messages",
+                    "type": "bench.ping",
+                    "sequence": sequence,
+                    "bench_sent_at": time.time(),
+                }))
+                await asyncio.sleep(1 / args.rate)
+            await asyncio.sleep(args.settle)
+
+            latencies = sorted(latency for subscriber in live for latency in subscriber.latencies)
+            expected = len(live) * args.events
+            rss = server_rss_mb(args.pid)
+            print(f"{target:>8} {target - len(live):>7} {connect_seconds:>10.2f} "
+                  f"{len(latencies) / expected if expected else 0:>9.1%} "
+                  f"{percentile(latencies, 0.50) * 1000:>8.1f} {percentile(latencies, 0.99) * 1000:>8.1f} "
+                  f"{(latencies[-1] if latencies else 0) * 1000:>8.1f} "
+                  f"{rss if rss is not None else float('nan'):>8.1f}")
+
+            if latencies and statistics.median(latencies) > args.max_median_seconds:
+                print(f"Median delivery above {args.max_median_seconds:g}s; stopping")
+                break
+
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    await close_redis()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--email", default="bench@example.com")
+    parser.add_argument("--password", default="password123")
+    parser.add_argument("--steps", default="250,500,1000,2000,4000")
+    parser.add_argument("--events", type=int, default=20, help="Events published per step")
+    parser.add_argument("--rate", type=float, default=10, help="Events per second")
+    parser.add_argument("--settle", type=float, default=2.0, help="Seconds to wait for stragglers")
+    parser.add_argument("--connect-batch", type=int, default=100)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--max-median-seconds", type=float, default=1.0)
+    parser.add_argument("--pid", type=int, help="API worker pid, to report its memory")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,81 @@
+"""Worker cold-start time: importing app.main and running lifespan startup
+
+Each sample runs in a fresh interpreter, like a new worker process:
+
+    python -m benchmarks.startup --runs 5 --budget-seconds 2.0
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Libraries that must stay out of a worker's boot path; they are loaded on first use
+DEFERRED_MODULES = ("openai", "pandas", "openpyxl", "psycopg2")
+
+_CHILD = """
+import asyncio, json, resource, sys, time
+start = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+
+async def boot():
+    async with app.main.app.router.lifespan_context(app.main.app):
+        return time.perf_counter()
+
+started = asyncio.run(boot())
+print(json.dumps({
+    "import_seconds": imported - start,
+    "startup_seconds": started - start,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "modules": len(sys.modules),
+    "deferred_loaded": [name for name in %r if name in sys.modules],
+}))
+""" % (DEFERRED_MODULES,)
+
+
+def measure_startup() -> dict:
+    """Boot the app once in a fresh interpreter and report timings"""
+    result = subprocess.run(
+        [sys.executable, "-c", _CHILD],
+        cwd=BACKEND_DIR,
+        # Measure a production worker, which never runs create_all
+        env={**os.environ, "DB_CREATE_TABLES_ON_STARTUP": "false"},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # Lifespan prints progress lines; the report is the last line
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(runs: int, budget_seconds: float) -> int:
+    samples = [measure_startup() for _ in range(runs)]
+    for key in ("import_seconds", "startup_seconds", "max_rss_mb"):
+        values = [sample[key] for sample in samples]
+        print(f"{key:>16}: median {statistics.median(values):8.3f}  min {min(values):8.3f}  max {max(values):8.3f}")
+    print(f"{'modules':>16}: {samples[-1]['modules']}")
+
+    loaded = samples[-1]["deferred_loaded"]
+    fastest = min(sample["startup_seconds"] for sample in samples)
+    if loaded:
+        print(f"✗ Deferred modules imported at startup: {', '.join(loaded)}")
+    if fastest > budget_seconds:
+        print(f"✗ Startup {fastest:.3f}s exceeds the {budget_seconds:.3f}s budget")
+    if loaded or fastest > budget_seconds:
+        return 1
+    print(f"✓ Within the {budget_seconds:.3f}s startup budget")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-seconds", type=float, default=2.0)
+    args = parser.parse_args()
+    sys.exit(main(args.runs, args.budget_seconds))
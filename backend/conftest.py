@@ -0,0 +1,88 @@
+"""Shared pytest fixtures"""
+
+from contextlib import contextmanager
+from uuid import uuid4
+
+import pytest
+
+
+@pytest.fixture
+def query_budget():
+    """
+    Fail the test when a block issues more SQL statements than its budget
+
+        with query_budget(3):
+            client.get("/api/contacts", headers=auth_headers)
+
+    Repeated SELECT shapes (likely N+1 access) fail too, unless allowed.
+    """
+    from app.utils.sql_profiler import profile_queries
+
+    @contextmanager
+    def check(max_queries: int, allow_repeated: bool = False):
+        with profile_queries() as profile:
+            yield profile
+
+        statements = "\n".join(f"  {query.shape}" for query in profile.queries)
+        assert profile.count <= max_queries, (
+            f"{profile.count} SQL statements, budget is {max_queries}:\n{statements}"
+        )
+        if not allow_repeated:
+            repeated = profile.repeated_shapes()
+            assert not repeated, f"Possible N+1 access: {repeated}"
+
+    return check
+
+
+@pytest.fixture(scope="session")
+def postgres_db():
+    """The sync engine, with every table created; skips the test when PostgreSQL is unreachable"""
+    from sqlalchemy import text
+
+    from app.config.database import Base, sync_engine
+    from app.services import partitions  # noqa: F401  create_all partitions messages through its hook
+
+    try:
+        with sync_engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    except Exception:
+        pytest.skip("PostgreSQL is not reachable at DATABASE_URL")
+
+    Base.metadata.create_all(sync_engine)
+    return sync_engine
+
+
+@pytest.fixture(scope="module")
+def throwaway_user(postgres_db):
+    """
+    An admin owning a test module's rows
+
+    Its messages, history, campaigns and contacts are deleted with it after
+    the module, so fixtures building on it only create their own data.
+    """
+    from app.config.database import SyncSessionLocal
+    from app.models.campaign import Campaign
+    from app.models.contact import Contact
+    from app.models.message import Message, MessageHistory
+    from app.models.user import User, UserRole
+
+    with SyncSessionLocal() as db:
+        user = User(
+            email=f"test-{uuid4().hex}@example.com",
+            full_name="Test User",
+            role=UserRole.ADMIN,
+            hashed_password="not-used",
+        )
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+
+    yield user
+
+    with SyncSessionLocal() as db:
+        db.query(MessageHistory).filter(MessageHistory.user_id == user.id).delete()
+        db.query(Message).filter(Message.created_by == user.id).delete()
+        db.query(Campaign).filter(Campaign.created_by == user.id).delete()
+        db.query(Contact).filter(Contact.created_by == user.id).delete()
+        db.query(User).filter(User.id == user.id).delete()
+        db.commit()
@@ -0,0 +1,79 @@
+"""Audience previews agree with exact counts, whichever way they are computed"""
+
+import asyncio
+from uuid import uuid4
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.config.settings import settings
+from app.models.contact import Contact, ContactSegment, Language
+from app.services import audience
+
+CONTACTS_PER_LANGUAGE = {Language.RU: 30, Language.UZ: 20, Language.EN: 10}
+
+
+@pytest.fixture(scope="module")
+def tag(throwaway_user):
+    """Contacts carrying a unique tag, so filters on it see only them"""
+    from app.config.database import SyncSessionLocal
+
+    tag = f"preview-{uuid4().hex}"
+    with SyncSessionLocal() as db:
+        db.add_all([
+            Contact(
+                name=f"{language.value} {index}",
+                email=f"{tag}-{language.value}-{index}@example.com",
+                language=language,
+                segment=ContactSegment.VIP if index % 2 else ContactSegment.REGULAR,
+                tags=[tag],
+                created_by=throwaway_user.id,
+            )
+            for language, count in CONTACTS_PER_LANGUAGE.items()
+            for index in range(count)
+        ])
+        db.commit()
+    return tag
+
+
+def compute(segment_filter):
+    from app.config.database import async_database_url
+
+    async def main():
+        engine = create_async_engine(async_database_url)
+        try:
+            async with async_sessionmaker(engine)() as db:
+                return await audience.compute_preview(db, segment_filter)
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(main())
+
+
+def test_small_audience_is_counted_exactly(tag):
+    preview = compute({"tags": [tag], "segment": "VIP"})
+    assert preview["exact"] and preview["method"] == "exact"
+    assert preview["by_language"] == {"ru": 15, "uz": 10, "en": 5}
+    assert preview["total"] == 30
+    assert 0 < len(preview["sample"]) <= settings.AUDIENCE_PREVIEW_SAMPLE_SIZE
+    assert preview["estimated_cost_usd"] > 0
+
+
+def test_full_sample_matches_exact_counts(tag, monkeypatch):
+    # Every audience takes the sampling path, and the sample is the whole table
+    monkeypatch.setattr(settings, "AUDIENCE_PREVIEW_EXACT_THRESHOLD", 0)
+    monkeypatch.setattr(settings, "AUDIENCE_PREVIEW_SAMPLE_PERCENT", 100.0)
+    monkeypatch.setattr(settings, "AUDIENCE_PREVIEW_MIN_SAMPLE_MATCHES", 1)
+
+    preview = compute({"tags": [tag]})
+    assert preview["method"] == "sample" and not preview["exact"]
+    assert preview["by_language"] == {language.value: count for language, count in CONTACTS_PER_LANGUAGE.items()}
+
+
+def test_thin_sample_falls_back_to_exact(tag, monkeypatch):
+    monkeypatch.setattr(settings, "AUDIENCE_PREVIEW_EXACT_THRESHOLD", 0)
+    monkeypatch.setattr(settings, "AUDIENCE_PREVIEW_MIN_SAMPLE_MATCHES", 10 ** 9)
+
+    preview = compute({"tags": [tag], "language": "uz"})
+    assert preview["exact"]
+    assert preview["by_language"] == {"uz": 20}
@@ -0,0 +1,151 @@
+"""Campaign dry runs count tokens locally and simulate the rate limits, without calling the provider"""
+
+import os
+import random
+import time
+from uuid import uuid4
+
+import pytest
+
+from app.config.settings import settings
+from app.models.contact import ContactSegment, Language
+from app.models.message import OccasionType
+from app.services import campaign_estimate
+from app.services.campaign_estimate import (
+    PlannedCall,
+    TokenCounter,
+    cacheable_tokens,
+    plan_calls,
+    simulate,
+    summarize,
+)
+from app.services.model_routing import model_cost
+from app.utils.prompts import build_message_prompt, get_system_prompt
+
+BUDGET_SECONDS = float(os.environ.get("CAMPAIGN_ESTIMATE_BUDGET_SECONDS", "10"))
+
+
+def call(model="gpt-4o-mini", input_tokens=500, output_tokens=100, max_tokens=600, latency=2.0):
+    return PlannedCall(model, input_tokens, 0, output_tokens, max_tokens, latency)
+
+
+def test_prefix_is_counted_once_but_totals_match_full_prompts():
+    rows = [("Иван Петров", "Romashka", "CEO", Language.RU, ContactSegment.REGULAR),
+            ("Aziz Karimov", None, None, Language.UZ, ContactSegment.REGULAR),
+            ("Мария Смирнова", None, "CFO", Language.RU, ContactSegment.VIP)]
+    calls, tokenizers = plan_calls(rows, OccasionType.BIRTHDAY, "warm", "Клиент с 2015 года")
+
+    assert [c.model for c in calls] == ["gpt-4o-mini", "gpt-4o-mini", "gpt-4o"]
+    assert set(tokenizers) == {"gpt-4o-mini", "gpt-4o"}
+    for (name, company, position, language, _), planned in zip(rows, calls):
+        counter = TokenCounter(planned.model)
+        prompt = build_message_prompt(name, OccasionType.BIRTHDAY, company, position, "Клиент с 2015 года", "warm",
+                                      language)
+        full = counter.count(get_system_prompt(language.value)) + counter.count(prompt)
+        # Token boundaries may merge across the prefix split
+        assert abs(planned.input_tokens - 7 - full) <= 2
+        assert planned.output_tokens == settings.CAMPAIGN_ESTIMATE_OUTPUT_TOKENS
+
+
+def test_unloaded_encodings_count_approximately(monkeypatch):
+    monkeypatch.setattr(campaign_estimate, "_encodings", {})
+    counter = TokenCounter("gpt-4o")
+    assert counter.name == "approximate"
+    assert counter.count("x" * 400) == 100
+
+
+def test_route_history_replaces_the_defaults():
+    rows = [("Иван Петров", None, None, Language.RU, ContactSegment.REGULAR)]
+    [planned], _ = plan_calls(rows, OccasionType.BIRTHDAY, history={"standard": (80.4, 1.2)})
+    assert (planned.output_tokens, planned.latency_seconds) == (80, 1.2)
+
+
+def test_cached_prefix():
+    assert cacheable_tokens(1023) == 0
+    assert cacheable_tokens(1300) == 1280
+
+
+def test_concurrency_bounds_an_unlimited_run():
+    result = simulate([call(latency=2.0)] * 100, concurrency=10, rate_limits={})
+    assert result["duration_seconds"] == 20.0
+    assert result["limited_by"] == "concurrency"
+
+
+def test_requests_per_minute_are_respected():
+    result = simulate([call(latency=0.5)] * 600, concurrency=50, rate_limits={"gpt-4o-mini": (120, 10**9)})
+    # 120 a minute, refilled continuously from a second's burst
+    assert 290 <= result["duration_seconds"] <= 300.5
+    assert result["peak_rpm"] <= 120 + 2
+    assert result["limited_by"] == "gpt-4o-mini requests per minute"
+
+
+def test_tokens_per_minute_charge_max_tokens():
+    # Each call reserves 500 + 600 tokens: 100 calls a minute
+    result = simulate([call(latency=0.1)] * 300, concurrency=50, rate_limits={"gpt-4o-mini": (10**6, 110_000)})
+    assert 175 <= result["duration_seconds"] <= 181
+    assert result["peak_tpm"] <= 102 * 600
+    assert result["limited_by"] == "gpt-4o-mini tokens per minute"
+
+
+def test_hundred_thousand_contacts_in_seconds():
+    rng = random.Random(7)
+    segments, languages = list(ContactSegment), list(Language)
+    rows = [(f"Contact {index}", rng.choice([None, "Romashka LLC"]), rng.choice([None, "Director"]),
+             rng.choice(languages), rng.choice(segments)) for index in range(100_000)]
+
+    started = time.perf_counter()
+    calls, _ = plan_calls(rows, OccasionType.NEW_YEAR)
+    estimate = summarize(calls, concurrency=56)
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < BUDGET_SECONDS
+    assert estimate["contacts"] == 100_000
+    assert sum(model["calls"] for model in estimate["by_model"]) == 100_000
+    assert estimate["cost_usd"] == pytest.approx(sum(
+        model_cost(m["model"], m["input_tokens"], m["output_tokens"], m["cached_tokens"]) for m in estimate["by_model"]
+    ), abs=1e-3)
+    # 100k calls of 2.5s over 56 slots take over an hour
+    assert estimate["duration_seconds"] >= 100_000 * 2.5 / 56
+    assert estimate["peak_rpm"] <= 5000 + 100
+
+
+@pytest.fixture
+def campaign_with_audience(throwaway_user):
+    """A campaign targeting two tagged VIP contacts, owned by a throwaway user"""
+    from app.config.database import SyncSessionLocal
+    from app.models.campaign import Campaign
+    from app.models.contact import Contact
+
+    user = throwaway_user
+    suffix = uuid4().hex
+    with SyncSessionLocal() as db:
+        db.add_all([
+            Contact(name=f"Contact {index}", email=f"contact{index}-{suffix}@example.com", tags=[suffix],
+                    segment=ContactSegment.VIP, created_by=user.id)
+            for index in range(2)
+        ])
+        campaign = Campaign(name="Estimate", occasion_type=OccasionType.BIRTHDAY, created_by=user.id,
+                            segment_filter={"tags": [suffix]})
+        db.add(campaign)
+        db.commit()
+        return {"user": user.id, "campaign": campaign.id}
+
+
+def test_estimate_endpoint_reads_the_audience(campaign_with_audience):
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+    from app.utils.auth import create_access_token
+
+    # Through the real dependencies: the audience is read on an autocommit read session
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(campaign_with_audience['user'])})}"}
+    response = client.get(f"/api/campaigns/{campaign_with_audience['campaign']}/estimate", headers=headers)
+    missing = client.get(f"/api/campaigns/{uuid4()}/estimate", headers=headers)
+
+    assert response.status_code == 200, response.text
+    estimate = response.json()
+    assert estimate["contacts"] == 2
+    assert [model["model"] for model in estimate["by_model"]] == ["gpt-4o"]  # VIPs are routed to premium
+    assert estimate["input_tokens"] > 0 and estimate["cost_usd"] > 0
+    assert missing.status_code == 404
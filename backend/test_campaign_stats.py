@@ -0,0 +1,112 @@
+"""Campaign stat counters stay exact under concurrent writers"""
+
+import asyncio
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.models.campaign import Campaign
+from app.models.message import Message, MessageStatus, OccasionType
+from app.services import campaign_stats
+
+WRITERS = 64
+INCREMENTS_PER_WRITER = 25
+
+
+@pytest.fixture(scope="module")
+def campaign_ids(throwaway_user):
+    """Two campaigns owned by a throwaway user, plus one contact for messages"""
+    from app.config.database import SyncSessionLocal
+    from app.models.contact import Contact
+
+    with SyncSessionLocal() as db:
+        contact = Contact(name="Stats Contact", email=f"stats-{uuid4().hex}@example.com", created_by=throwaway_user.id)
+        campaigns = [
+            Campaign(name=f"Stats {index}", occasion_type=OccasionType.BIRTHDAY, created_by=throwaway_user.id)
+            for index in range(2)
+        ]
+        db.add_all([contact, *campaigns])
+        db.commit()
+        return {"user": throwaway_user.id, "contact": contact.id, "campaigns": [campaign.id for campaign in campaigns]}
+
+
+def run(coroutine_function):
+    """Run against a dedicated engine big enough for every writer to hold a connection"""
+    from app.config.database import async_database_url
+
+    async def main():
+        engine = create_async_engine(async_database_url, pool_size=WRITERS, max_overflow=0)
+        try:
+            return await coroutine_function(async_sessionmaker(engine, expire_on_commit=False))
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(main())
+
+
+def test_concurrent_increments_are_exact(campaign_ids):
+    campaign_id = campaign_ids["campaigns"][0]
+
+    async def scenario(sessionmaker):
+        async def writer():
+            for _ in range(INCREMENTS_PER_WRITER):
+                async with sessionmaker() as db:
+                    await campaign_stats.increment(db, campaign_id, {"generated_count": 1, "sent_count": 1})
+                    await db.commit()
+
+        await asyncio.gather(*(writer() for _ in range(WRITERS)))
+        async with sessionmaker() as db:
+            return (await campaign_stats.read_stats(db, [campaign_id]))[campaign_id]
+
+    stats = run(scenario)
+    assert stats == {
+        "generated_count": WRITERS * INCREMENTS_PER_WRITER,
+        "sent_count": WRITERS * INCREMENTS_PER_WRITER,
+        "failed_count": 0,
+    }
+
+
+def test_stats_expression_matches_read_stats(campaign_ids):
+    async def scenario(sessionmaker):
+        async with sessionmaker() as db:
+            rows = (await db.execute(
+                select(Campaign.id, campaign_stats.stats_expression().label("stats"))
+                .where(Campaign.id.in_(campaign_ids["campaigns"]))
+            )).all()
+            return {row.id: row.stats for row in rows}, await campaign_stats.read_stats(db, campaign_ids["campaigns"])
+
+    expressed, read = run(scenario)
+    assert expressed == read
+
+
+def test_reconcile_corrects_drift(campaign_ids):
+    campaign_id = campaign_ids["campaigns"][1]
+    statuses = [MessageStatus.SENT, MessageStatus.SENT, MessageStatus.FAILED, MessageStatus.DRAFT]
+
+    async def scenario(sessionmaker):
+        async with sessionmaker() as db:
+            db.add_all([
+                Message(
+                    contact_id=campaign_ids["contact"],
+                    campaign_id=campaign_id,
+                    occasion_type=OccasionType.BIRTHDAY,
+                    content="Поздравляем!",
+                    status=status,
+                    created_by=campaign_ids["user"],
+                )
+                for status in statuses
+            ])
+            # Counters that drifted: over-counted sends, a missed failure
+            await campaign_stats.increment(db, campaign_id, {"generated_count": 4, "sent_count": 7})
+            await db.commit()
+
+        async with sessionmaker() as db:
+            exact = await campaign_stats.reconcile(db, campaign_id)
+            await db.commit()
+        async with sessionmaker() as db:
+            return exact, (await campaign_stats.read_stats(db, [campaign_id]))[campaign_id]
+
+    exact, stats = run(scenario)
+    assert exact == stats == {"generated_count": 4, "sent_count": 2, "failed_count": 1}
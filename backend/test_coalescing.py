@@ -0,0 +1,170 @@
+"""Identical in-flight generations share one upstream call"""
+
+import asyncio
+from uuid import uuid4
+
+import pytest
+
+from app.config.settings import settings
+from app.models.contact import Contact, ContactSegment, Language
+from app.models.message import OccasionType
+from app.services.ai_generator import AIMessageGenerator
+from app.services.coalescing import CoalescedCallError, SingleFlight
+from app.services.generation_scheduler import BULK, INTERACTIVE
+from app.services.llm_backends import MockLLMBackend
+from app.utils.metrics import COALESCED_CALLS
+
+
+class CountingBackend(MockLLMBackend):
+    """Mock backend that counts the calls reaching it"""
+
+    def __init__(self, **kwargs):
+        super().__init__(latency_ms=100, latency_distribution="fixed", **kwargs)
+        self.calls = 0
+
+    async def complete(self, *args, **kwargs):
+        self.calls += 1
+        return await super().complete(*args, **kwargs)
+
+
+def contact(name="Иван Петров"):
+    return Contact(id=uuid4(), name=name, language=Language.RU, company="Romashka", position="CEO")
+
+
+def coalesced_total(scope):
+    return COALESCED_CALLS.labels("generation", scope)._value.get()
+
+
+def test_identical_generations_share_one_call():
+    generator = AIMessageGenerator(CountingBackend())
+    ivan = contact()
+    before = coalesced_total("worker")
+
+    async def main():
+        return await asyncio.gather(*(
+            generator.generate_personalized_message(ivan, OccasionType.BIRTHDAY) for _ in range(20)
+        ))
+
+    results = asyncio.run(main())
+    assert generator.backend.calls == 1
+    assert {result["content"] for result in results} == {results[0]["content"]}
+    assert sum(bool(result["metadata"].get("coalesced")) for result in results) == 19
+    assert coalesced_total("worker") - before == 19
+
+
+def test_different_prompts_and_later_calls_are_not_shared():
+    generator = AIMessageGenerator(CountingBackend())
+
+    async def main():
+        await asyncio.gather(
+            generator.generate_personalized_message(contact("Иван Петров"), OccasionType.BIRTHDAY),
+            generator.generate_personalized_message(contact("Мария Иванова"), OccasionType.BIRTHDAY),
+            generator.generate_personalized_message(contact("Иван Петров"), OccasionType.NEW_YEAR),
+        )
+        # Nothing is cached once the call has finished
+        await generator.generate_personalized_message(contact("Иван Петров"), OccasionType.BIRTHDAY)
+
+    asyncio.run(main())
+    assert generator.backend.calls == 4
+
+
+def test_lanes_do_not_share_calls():
+    generator = AIMessageGenerator(CountingBackend())
+    vip = Contact(id=uuid4(), name="Иван Петров", language=Language.RU, segment=ContactSegment.VIP)
+
+    async def main():
+        # Both route to premium; the interactive one must not wait in the bulk queue
+        return await asyncio.gather(
+            generator.generate_personalized_message(vip, OccasionType.BIRTHDAY, lane=BULK),
+            generator.generate_personalized_message(vip, OccasionType.BIRTHDAY, lane=INTERACTIVE),
+        )
+
+    bulk, interactive = asyncio.run(main())
+    assert generator.backend.calls == 2
+    assert not bulk["metadata"].get("coalesced") and not interactive["metadata"].get("coalesced")
+
+
+def test_waiters_share_the_failure():
+    generator = AIMessageGenerator(CountingBackend(error_rate=1.0))
+    ivan = contact()
+
+    async def main():
+        return await asyncio.gather(*(
+            generator.generate_personalized_message(ivan, OccasionType.BIRTHDAY) for _ in range(5)
+        ))
+
+    results = asyncio.run(main())
+    assert generator.backend.calls == 1
+    assert not any(result["success"] for result in results)
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_call():
+    calls = 0
+
+    async def slow_call():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.1)
+        return "done"
+
+    flights = SingleFlight("test", str, str)
+
+    async def main():
+        first = asyncio.create_task(flights.do("key", slow_call))
+        second = asyncio.create_task(flights.do("key", slow_call))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(main()) == ("done", True)
+    assert calls == 1
+
+
+def test_workers_share_one_call_through_redis(monkeypatch):
+    from app.config import redis as redis_config
+
+    async def ping():
+        try:
+            await redis_config.get_redis().ping()
+            return True
+        except Exception:
+            return False
+        finally:
+            await redis_config.close_redis()
+
+    if not asyncio.run(ping()):
+        pytest.skip("Redis is not reachable at REDIS_URL")
+    monkeypatch.setattr(settings, "GENERATION_COALESCING_REDIS", True)
+    monkeypatch.setattr(settings, "GENERATION_COALESCING_POLL_SECONDS", 0.01)
+
+    calls = 0
+
+    async def call():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.2)
+        return {"calls": calls}
+
+    # Separate SingleFlight instances stand in for separate workers
+    workers = [SingleFlight("test", dict, dict) for _ in range(3)]
+    failing = [SingleFlight("test", dict, dict) for _ in range(2)]
+    key = uuid4().hex
+
+    async def fail():
+        await asyncio.sleep(0.2)
+        raise RuntimeError("upstream down")
+
+    async def main():
+        try:
+            results = await asyncio.gather(*(worker.do(key, call) for worker in workers))
+            failures = await asyncio.gather(*(worker.do(f"{key}:fail", fail) for worker in failing),
+                                            return_exceptions=True)
+            return results, failures
+        finally:
+            await redis_config.close_redis()
+
+    results, failures = asyncio.run(main())
+    assert calls == 1
+    assert [result for result, _ in results] == [{"calls": 1}] * 3
+    assert sorted(shared for _, shared in results) == [False, True, True]
+    assert {type(failure) for failure in failures} == {RuntimeError, CoalescedCallError}
@@ -0,0 +1,198 @@
+"""Duplicate contacts are found across scripts and spellings, and merged without losing messages"""
+
+import asyncio
+import os
+import random
+import time
+from datetime import date, datetime, timedelta
+from uuid import uuid4
+
+import pytest
+
+from app.services.dedupe import (
+    DedupeRecord,
+    candidate_pairs,
+    find_clusters,
+    match_score,
+    name_tokens,
+    normalize_company,
+    normalize_email,
+    normalize_phone,
+)
+
+# Wall-clock allowance for clustering the synthetic contact table
+BUDGET_SECONDS = float(os.environ.get("DEDUPE_BENCHMARK_BUDGET_SECONDS", "20"))
+CONTACTS = 100_000
+
+
+def record(name, phone=None, email=None, company=None, birthday=None, created_at=None):
+    return DedupeRecord(
+        id=uuid4(),
+        name=" ".join(name_tokens(name)),
+        phone=normalize_phone(phone),
+        email=normalize_email(email),
+        company=normalize_company(company),
+        birthday=birthday,
+        created_at=created_at,
+    )
+
+
+@pytest.mark.parametrize("a,b", [
+    ("Иван Петров", "Ivan Petrov"),
+    ("Иван Петров", "Petrov Ivan"),
+    ("Юлия Смирнова", "Julia Smirnova"),
+    ("Yuliya Smirnova", "Julia Smirnova"),
+    ("Холматов Шухрат", "Xolmatov Shuxrat"),
+    ("Бахтиёр", "Bakhtiyor"),
+    ("Дмитрий", "Dmitry"),
+    ("Евгений", "Yevgeniy"),
+    ("Aleksandr", "Alexandr"),
+    ("Nodir O'g'li", "Nodir Ogli"),
+])
+def test_spellings_share_one_name(a, b):
+    assert name_tokens(a) == name_tokens(b)
+
+
+def test_contact_fields_normalize():
+    assert normalize_phone("+998 (90) 123-45-67") == normalize_phone("8 90 123 45 67") == "901234567"
+    assert normalize_phone("12-34") is None
+    assert normalize_email(" Ivan.Petrov+promo@Mail.RU ") == "ivan.petrov@mail.ru"
+    assert normalize_company("ООО «Ромашка»") == normalize_company("Romashka LLC") == "romashka"
+
+
+def test_match_score():
+    ivan = record("Иван Петров", phone="+998901234567", birthday=date(1990, 5, 1))
+    assert match_score(ivan, record("Petrov Ivan", phone="901234567")) == pytest.approx(0.95)
+    assert match_score(ivan, record("Petrov Ivan", phone="901234567", birthday=date(1990, 5, 1))) == 1.0
+    assert match_score(ivan, record("Ivan Petrova")) < match_score(ivan, record("Ivan Petrov"))
+    # The same name with another birthday is another person
+    assert match_score(ivan, record("Ivan Petrov", birthday=date(1991, 5, 1))) == 0.0
+
+
+def test_clusters_join_through_different_keys():
+    older = datetime(2020, 1, 1)
+    records = [
+        record("Иван Петров", phone="+998 90 123 45 67", created_at=older + timedelta(days=1)),
+        record("Petrov Ivan", phone="90-123-45-67", email="ivan@example.com", created_at=older),
+        # Shares only the email with the second
+        record("Ivan Petrov", email="IVAN+crm@example.com", created_at=older + timedelta(days=2)),
+        record("Aleksandr Volkov", company="ООО Ромашка"),
+        record("Alexander Volkov", company="Romashka LLC"),
+        record("Мария Иванова", phone="+998 91 000 00 00"),
+        record("Mariya Ivanova", phone="+998 91 000 00 00", birthday=date(1980, 1, 1)),
+        record("Mariya Ivanova", birthday=date(1985, 1, 1)),
+        record("Anna Sidorova", phone="+998 93 555 55 55"),
+    ]
+
+    clusters = find_clusters(records, threshold=0.8)
+    by_size = [{records.index(next(r for r in records if r.id == contact_id))
+                for contact_id in cluster["contact_ids"]} for cluster in clusters]
+    assert by_size == [{0, 1, 2}, {3, 4}, {5, 6}] or by_size == [{0, 1, 2}, {5, 6}, {3, 4}]
+    assert clusters[0]["suggested_primary"] == records[1].id
+    assert all(0.8 <= cluster["score"] <= 1.0 for cluster in clusters)
+
+
+def test_large_blocks_use_a_window():
+    # 500 contacts behind one switchboard number: all pairs would be 124,750
+    records = [record(f"Employee {index:03d}", phone="+998 71 200 00 00") for index in range(500)]
+    pairs = candidate_pairs(records, max_block_size=200, window=10)
+    assert len(pairs) <= 500 * 10
+    assert len(candidate_pairs(records[:200], max_block_size=200, window=10)) == 200 * 199 // 2
+
+
+SYLLABLES = ["ka", "ri", "mo", "shu", "to", "na", "li", "bek", "zo", "dil", "far", "ru", "sa", "nur", "ja", "lo"]
+
+
+def synthetic_contacts(count, duplicate_share=0.05):
+    """Distinct random people, plus respelled copies of some of them"""
+    rng = random.Random(42)
+    people = []
+    while len(people) < count * (1 - duplicate_share):
+        first = "".join(rng.choices(SYLLABLES, k=rng.randint(2, 3))).capitalize()
+        last = "".join(rng.choices(SYLLABLES, k=rng.randint(3, 4))).capitalize() + "ov"
+        phone = f"9{rng.randint(0, 9)}{rng.randint(0, 9999999):07d}"
+        people.append((first, last, phone))
+    records = [
+        record(f"{first} {last}", phone=f"+998 {phone}", email=f"{first}.{last}.{index}@example.com")
+        for index, (first, last, phone) in enumerate(people)
+    ]
+    # Reordered name and the same number, written another way
+    duplicates = [
+        record(f"{last} {first}", phone=f"8 {phone[:2]} {phone[2:]}")
+        for first, last, phone in rng.sample(people, count - len(people))
+    ]
+    return records + duplicates, len(duplicates)
+
+
+def test_clustering_scales_to_a_large_contact_table():
+    records, duplicates = synthetic_contacts(CONTACTS)
+
+    started = time.perf_counter()
+    clusters = find_clusters(records, threshold=0.8, max_block_size=200, window=10)
+    elapsed = time.perf_counter() - started
+
+    print(f"\n{len(clusters):,} clusters in {CONTACTS:,} contacts in {elapsed:.2f}s")
+    # Random names can collide, so a few extra clusters are real coincidences
+    found = sum(len(cluster["contact_ids"]) - 1 for cluster in clusters)
+    assert duplicates <= found <= duplicates * 1.05
+    assert elapsed < BUDGET_SECONDS
+
+
+@pytest.fixture
+def contacts(throwaway_user):
+    """A primary contact with one message and two duplicates with two more, owned by a throwaway user"""
+    from app.config.database import SyncSessionLocal
+    from app.models.contact import Contact
+    from app.models.message import Message, OccasionType
+
+    user = throwaway_user
+    suffix = uuid4().hex
+    with SyncSessionLocal() as db:
+        primary = Contact(name="Иван Петров", email=f"ivan-{suffix}@example.com", tags=["vip"],
+                          custom_fields={"city": "Tashkent"}, created_by=user.id)
+        first = Contact(name="Ivan Petrov", email=f"ivan.petrov-{suffix}@example.com", phone="+998901234567",
+                        tags=["vip", "tashkent"], custom_fields={"city": "Samarkand", "tier": "gold"},
+                        last_interaction_date=datetime(2026, 3, 1), created_by=user.id)
+        second = Contact(name="Petrov Ivan", email=f"petrov-{suffix}@example.com", company="Romashka",
+                         created_by=user.id)
+        db.add_all([primary, first, second])
+        db.flush()
+        db.add_all([
+            Message(contact_id=contact.id, occasion_type=OccasionType.CUSTOM, content="Hello", created_by=user.id)
+            for contact in (primary, first, second)
+        ])
+        db.commit()
+        return {"user": user.id, "primary": primary.id, "duplicates": [first.id, second.id]}
+
+
+def test_merge_moves_messages_and_fills_gaps(contacts):
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    from app.config.database import SyncSessionLocal, async_database_url
+    from app.models.contact import Contact
+    from app.models.message import Message
+    from app.services.dedupe import merge_contacts
+
+    async def main():
+        engine = create_async_engine(async_database_url)
+        try:
+            async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+                result = await merge_contacts(db, contacts["primary"], [*contacts["duplicates"], contacts["primary"]])
+                await db.commit()
+                return result
+        finally:
+            await engine.dispose()
+
+    primary, merged_ids, moved_ids = asyncio.run(main())
+    assert merged_ids == contacts["duplicates"]
+    assert len(moved_ids) == 2
+
+    with SyncSessionLocal() as db:
+        assert db.query(Contact).filter(Contact.id.in_(merged_ids)).count() == 0
+        assert db.query(Message).filter(Message.contact_id == contacts["primary"]).count() == 3
+        merged = db.get(Contact, contacts["primary"])
+        assert merged.phone == "+998901234567" and merged.company == "Romashka"
+        assert merged.tags == ["vip", "tashkent"]
+        assert merged.custom_fields["city"] == "Tashkent" and merged.custom_fields["tier"] == "gold"
+        assert len(merged.custom_fields["merged_emails"]) == 2
+        assert merged.last_interaction_date == datetime(2026, 3, 1)
@@ -0,0 +1,88 @@
+"""Event streams get the topics, campaign and messages they asked for, and slow ones are told to resync"""
+
+from uuid import uuid4
+
+import orjson
+import pytest
+
+from app.config.settings import settings
+from app.models.message import Message, MessageStatus, OccasionType
+from app.services.events import RESYNC_FRAME, EventBroker, campaign_progress_event, message_event
+from app.utils.metrics import EVENTS_DROPPED_SUBSCRIBERS
+
+
+def message(created_by, campaign_id=None):
+    return Message(id=uuid4(), contact_id=uuid4(), campaign_id=campaign_id, created_by=created_by,
+                   occasion_type=OccasionType.BIRTHDAY, status=MessageStatus.PENDING_APPROVAL)
+
+
+def frames(subscription):
+    """Frames queued for a subscription, emptying its queue"""
+    queued = []
+    while not subscription.queue.empty():
+        queued.append(subscription.queue.get_nowait())
+    return queued
+
+
+def types(subscription):
+    return [frame.split(b"\n", 1)[0].removeprefix(b"event: ").decode() for frame in frames(subscription)]
+
+
+def test_subscriptions_filter_by_topic_campaign_and_creator():
+    broker = EventBroker()
+    me, colleague, campaign = uuid4(), uuid4(), uuid4()
+    everything = broker.subscribe(me, frozenset({"messages", "campaigns"}))
+    messages_only = broker.subscribe(me, frozenset({"messages"}))
+    one_campaign = broker.subscribe(me, frozenset({"messages", "campaigns"}), campaign_id=campaign)
+    mine = broker.subscribe(me, frozenset({"messages"}), mine=True)
+
+    for event in (
+        message_event(message(me), "created"),
+        message_event(message(colleague, campaign), "created"),
+        campaign_progress_event(campaign, {"generated_count": 1}),
+        campaign_progress_event(uuid4(), {"generated_count": 1}),
+    ):
+        broker.dispatch(orjson.dumps(event))
+
+    assert types(everything) == ["message.created", "message.created", "campaign.progress", "campaign.progress"]
+    assert types(messages_only) == ["message.created", "message.created"]
+    assert types(one_campaign) == ["message.created", "campaign.progress"]
+    assert types(mine) == ["message.created"]
+
+
+def test_frames_carry_the_event():
+    broker = EventBroker()
+    subscription = broker.subscribe(uuid4(), frozenset({"messages"}))
+    event = message_event(message(uuid4()), "approved", MessageStatus.PENDING_APPROVAL)
+    broker.dispatch(orjson.dumps(event))
+
+    [frame] = frames(subscription)
+    assert frame == b"event: message.approved\ndata: " + orjson.dumps(event) + b"\n\n"
+
+
+@pytest.mark.parametrize("queue_size", [1, 3])
+def test_overflow_ends_the_stream_with_a_resync(monkeypatch, queue_size):
+    monkeypatch.setattr(settings, "EVENTS_QUEUE_SIZE", queue_size)
+    broker = EventBroker()
+    slow = broker.subscribe(uuid4(), frozenset({"messages"}))
+    fast = broker.subscribe(uuid4(), frozenset({"messages"}))
+    before = EVENTS_DROPPED_SUBSCRIBERS.labels("overflow")._value.get()
+
+    for _ in range(queue_size + 1):
+        broker.dispatch(orjson.dumps(message_event(message(uuid4()), "created")))
+        frames(fast)  # Keeps up
+
+    # Pending frames are dropped; only the resync and the end of the stream are left
+    assert frames(slow) == [RESYNC_FRAME, None]
+    assert slow not in broker.subscriptions and fast in broker.subscriptions
+    assert EVENTS_DROPPED_SUBSCRIBERS.labels("overflow")._value.get() - before == 1
+
+
+def test_resync_all_closes_every_stream():
+    broker = EventBroker()
+    subscriptions = [broker.subscribe(uuid4(), frozenset({"campaigns"})) for _ in range(3)]
+    broker.dispatch(orjson.dumps(campaign_progress_event(uuid4(), {"sent_count": 1})))
+    broker.resync_all()
+
+    assert all(frames(subscription) == [RESYNC_FRAME, None] for subscription in subscriptions)
+    assert not broker.subscriptions
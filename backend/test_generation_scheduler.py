@@ -0,0 +1,115 @@
+"""Interactive generations stay fast while campaigns saturate the provider, and campaigns share fairly"""
+
+import asyncio
+import time
+
+import pytest
+
+from app.services.generation_scheduler import BULK, INTERACTIVE, GenerationScheduler
+from app.utils.metrics import GENERATION_QUEUE_WAIT
+
+CALL_SECONDS = 0.02
+
+
+async def upstream_call(scheduler, lane, owner="", weight=1.0, log=None, seconds=CALL_SECONDS):
+    """A stand-in generation: hold a slot for `seconds`; returns how long it waited for the slot"""
+    queued = time.perf_counter()
+    async with scheduler.slot(lane, owner, weight):
+        waited = time.perf_counter() - queued
+        if log is not None:
+            log.append(owner)
+        await asyncio.sleep(seconds)
+    return waited
+
+
+def test_reserved_slots_keep_interactive_calls_from_waiting():
+    scheduler = GenerationScheduler(capacity=4, interactive_reserved=1)
+
+    async def main():
+        campaign = [asyncio.create_task(upstream_call(scheduler, BULK, "campaign")) for _ in range(200)]
+        await asyncio.sleep(CALL_SECONDS * 3)
+        assert scheduler.in_flight[BULK] == 3
+        waited = await upstream_call(scheduler, INTERACTIVE, "user")
+        await asyncio.gather(*campaign)
+        return waited
+
+    assert asyncio.run(main()) < CALL_SECONDS / 2
+
+
+def test_interactive_calls_jump_the_bulk_queue():
+    # No reserved slots: an interactive call waits for one bulk call to end, not for the queue
+    scheduler = GenerationScheduler(capacity=2, interactive_reserved=0)
+
+    async def main():
+        campaign = [asyncio.create_task(upstream_call(scheduler, BULK, "campaign")) for _ in range(100)]
+        await asyncio.sleep(CALL_SECONDS * 2.5)
+        waits = await asyncio.gather(*(upstream_call(scheduler, INTERACTIVE, f"user{index}") for index in range(3)))
+        remaining = len(scheduler.queues[BULK])
+        await asyncio.gather(*campaign)
+        return waits, remaining
+
+    waits, remaining = asyncio.run(main())
+    assert max(waits) < CALL_SECONDS * 2.5
+    assert remaining > 80
+
+
+def test_campaigns_share_the_bulk_lane_fairly():
+    scheduler = GenerationScheduler(capacity=2, interactive_reserved=0)
+    log = []
+
+    async def main():
+        big = [asyncio.create_task(upstream_call(scheduler, BULK, "big", log=log)) for _ in range(100)]
+        await asyncio.sleep(CALL_SECONDS)
+        small = [asyncio.create_task(upstream_call(scheduler, BULK, "small", log=log)) for _ in range(10)]
+        await asyncio.gather(*big, *small)
+
+    asyncio.run(main())
+    # The small campaign is interleaved with the big one, not queued behind it
+    last_small = max(index for index, owner in enumerate(log) if owner == "small")
+    assert last_small < 30
+
+
+def test_weights_set_the_share():
+    scheduler = GenerationScheduler(capacity=1, interactive_reserved=0)
+    log = []
+
+    async def main():
+        blocker = asyncio.create_task(upstream_call(scheduler, BULK, "blocker", log=log))
+        await asyncio.sleep(0)
+        calls = [
+            asyncio.create_task(upstream_call(scheduler, BULK, owner, weight, log=log, seconds=0.001))
+            for owner, weight in (("heavy", 2.0), ("light", 1.0))
+            for _ in range(30)
+        ]
+        await asyncio.gather(blocker, *calls)
+
+    asyncio.run(main())
+    first = log[1:31]
+    assert first.count("heavy") == pytest.approx(20, abs=1)
+
+
+def test_cancelled_waiters_give_their_slots_back():
+    scheduler = GenerationScheduler(capacity=2, interactive_reserved=0)
+
+    async def main():
+        tasks = [asyncio.create_task(upstream_call(scheduler, BULK, "campaign")) for _ in range(20)]
+        await asyncio.sleep(CALL_SECONDS / 2)
+        for task in tasks[5:]:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await upstream_call(scheduler, INTERACTIVE)
+
+    asyncio.run(main())
+    assert scheduler.in_flight == {INTERACTIVE: 0, BULK: 0}
+
+
+def test_queue_wait_is_measured_per_lane():
+    scheduler = GenerationScheduler(capacity=1, interactive_reserved=0)
+    before = GENERATION_QUEUE_WAIT.labels(BULK)._sum.get()
+
+    async def main():
+        await asyncio.gather(*(upstream_call(scheduler, BULK, "campaign") for _ in range(5)))
+
+    asyncio.run(main())
+    # Waits of 0, 1, 2, 3 and 4 call lengths
+    assert GENERATION_QUEUE_WAIT.labels(BULK)._sum.get() - before >= CALL_SECONDS * 9
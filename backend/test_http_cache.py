@@ -0,0 +1,166 @@
+"""Conditional GETs: ETags on 200s, and 304s from the remembered validator before the endpoint queries"""
+
+import asyncio
+from types import SimpleNamespace
+from typing import Annotated
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from app.utils import http_cache
+from app.utils.http_cache import ConditionalGet, conditional, invalidate
+
+
+class FakePipeline:
+    """Queues commands until execute, like a non-transactional redis pipeline"""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __getattr__(self, command):
+        return lambda *args: self.commands.append((getattr(self.redis, command), args))
+
+    async def execute(self):
+        return [await command(*args) for command, args in self.commands]
+
+
+class FakeRedis:
+    """The string, hash and script commands the validator cache uses"""
+
+    def __init__(self):
+        self.values = {}
+        self.hashes = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def incr(self, key):
+        self.values[key] = str(int(self.values.get(key, b"0")) + 1).encode()
+        return int(self.values[key])
+
+    async def expire(self, key, seconds):
+        return True
+
+    async def hget(self, key, field):
+        return self.hashes.get(key, {}).get(field)
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.values.pop(key, None)
+            self.hashes.pop(key, None)
+
+    async def eval(self, script, numkeys, generation_key, scope_key, generation, field, value, ttl):
+        assert script == http_cache._REMEMBER_IF_CURRENT
+        if (self.values.get(generation_key) or b"").decode() != generation:
+            return 0
+        self.hashes.setdefault(scope_key, {})[field] = value.encode()
+        return 1
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """An app with one conditional endpoint over a mutable body, counting the endpoint's queries"""
+    redis = FakeRedis()
+    clock = {"now": 1_000_000.0}
+    monkeypatch.setattr(http_cache, "get_redis", lambda: redis)
+    monkeypatch.setattr(http_cache, "time", SimpleNamespace(time=lambda: clock["now"]))
+    monkeypatch.setattr(http_cache.settings, "HTTP_CACHE_ENABLED", True)
+
+    app = FastAPI()
+    state = {"body": {"name": "Иван Петров"}, "queries": 0}
+
+    @app.get("/contacts/{contact_id}")
+    async def get_contact(contact_id: int,
+                          cache: Annotated[ConditionalGet, Depends(conditional("contacts:{contact_id}", ttl=60))]):
+        state["queries"] += 1
+        body = state["body"]
+        if "after_query" in state:
+            await state.pop("after_query")()
+        return await cache.respond(body)
+
+    test_client = TestClient(app)
+    test_client.state, test_client.clock = state, clock
+    return test_client
+
+
+def test_matching_etag_gets_a_304(client):
+    first = client.get("/contacts/1")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert first.json() == {"name": "Иван Петров"}
+    assert first.headers["Cache-Control"] == http_cache.REVALIDATE
+
+    again = client.get("/contacts/1", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.headers["ETag"] == etag
+    assert again.content == b""
+
+    assert client.get("/contacts/1", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_remembered_etag_answers_before_any_query(client):
+    etag = client.get("/contacts/1").headers["ETag"]
+    assert client.state["queries"] == 1
+
+    for _ in range(3):
+        assert client.get("/contacts/1", headers={"If-None-Match": etag}).status_code == 304
+    assert client.state["queries"] == 1
+    # Other resources have validators of their own: this one is queried, then found equal
+    assert client.get("/contacts/2", headers={"If-None-Match": etag}).status_code == 304
+    assert client.state["queries"] == 2
+
+
+def test_invalidate_recomputes_the_body(client):
+    etag = client.get("/contacts/1").headers["ETag"]
+    client.state["body"] = {"name": "Мария Иванова"}
+    # Without invalidation the stale validator still answers
+    assert client.get("/contacts/1", headers={"If-None-Match": etag}).status_code == 304
+
+    asyncio.run(invalidate("contacts:1"))
+    changed = client.get("/contacts/1", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json() == {"name": "Мария Иванова"}
+    assert changed.headers["ETag"] != etag
+    assert client.state["queries"] == 2
+
+
+def test_unchanged_body_is_still_a_304_after_invalidation(client):
+    etag = client.get("/contacts/1").headers["ETag"]
+    asyncio.run(invalidate("contacts:1"))
+    assert client.get("/contacts/1", headers={"If-None-Match": etag}).status_code == 304
+    # The endpoint ran and hashed the same body
+    assert client.state["queries"] == 2
+
+
+def test_body_read_before_an_invalidation_is_not_remembered(client):
+    async def write():
+        client.state["body"] = {"name": "Мария Иванова"}
+        await invalidate("contacts:1")
+
+    # The writer commits and invalidates while this request still holds the old row
+    client.state["after_query"] = write
+    stale = client.get("/contacts/1")
+    assert stale.json() == {"name": "Иван Петров"}
+
+    fresh = client.get("/contacts/1", headers={"If-None-Match": stale.headers["ETag"]})
+    assert fresh.status_code == 200
+    assert fresh.json() == {"name": "Мария Иванова"}
+    assert client.state["queries"] == 2
+
+
+def test_validators_expire(client):
+    etag = client.get("/contacts/1").headers["ETag"]
+    client.clock["now"] += 61
+    assert client.get("/contacts/1", headers={"If-None-Match": etag}).status_code == 304
+    assert client.state["queries"] == 2
@@ -0,0 +1,243 @@
+"""Idempotency-Key: duplicates wait for the first request and replay its response"""
+
+import asyncio
+import time
+from types import SimpleNamespace
+from typing import Annotated
+from uuid import uuid4
+
+import httpx
+import orjson
+import pytest
+from fastapi import Depends, FastAPI, HTTPException, Response
+
+from app.api.deps import get_current_active_user
+from app.config.settings import settings
+from app.utils import idempotency
+from app.utils.idempotency import IdempotentRequest, idempotent
+
+
+class MemoryStore(idempotency.IdempotencyStore):
+    """The Redis store's semantics in a dict, for one event loop"""
+
+    def __init__(self):
+        self.records = {}
+
+    def _live(self, key):
+        record = self.records.get(key)
+        if record is not None and record[1] < time.monotonic():
+            del self.records[key]
+            return None
+        return record
+
+    async def claim(self, key, record, ttl):
+        existing = self._live(key)
+        if existing is not None:
+            return existing[0]
+        self.records[key] = (record, time.monotonic() + ttl)
+        return None
+
+    async def get(self, key):
+        record = self._live(key)
+        return record[0] if record else None
+
+    def _owned(self, key, token):
+        record = self._live(key)
+        return record is not None and orjson.loads(record[0])["token"] == token
+
+    async def complete(self, key, token, record, ttl):
+        if self._owned(key, token):
+            self.records[key] = (record, time.monotonic() + ttl)
+
+    async def release(self, key, token):
+        if self._owned(key, token):
+            del self.records[key]
+
+
+def make_app():
+    """A POST endpoint that counts its executions, takes a while and can be told to fail"""
+    app = FastAPI()
+    app.state.calls = 0
+    user = SimpleNamespace(id=uuid4())
+    app.dependency_overrides[get_current_active_user] = lambda: user
+
+    @app.post("/charge", status_code=201)
+    async def charge(
+        payload: dict,
+        response: Response,
+        idempotency: Annotated[IdempotentRequest, Depends(idempotent("test:charge"))],
+    ):
+        if idempotency.replay is not None:
+            return idempotency.replay
+        app.state.calls += 1
+        await asyncio.sleep(payload.get("delay", 0.2))
+        if payload.get("fail"):
+            raise HTTPException(status_code=502, detail="Upstream failed")
+        if payload.get("cookie"):
+            # As get_db does when the request committed a write
+            response.set_cookie(payload["cookie"], "1")
+        return await idempotency.respond({"call": app.state.calls, "amount": payload["amount"]}, 201)
+
+    return app
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = MemoryStore()
+    monkeypatch.setattr(idempotency, "store", store)
+    monkeypatch.setattr(settings, "IDEMPOTENCY_POLL_SECONDS", 0.01)
+    return store
+
+
+def post_concurrently(app, requests):
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*(
+                client.post("/charge", json=body, headers=headers) for body, headers in requests
+            ))
+
+    return asyncio.run(main())
+
+
+def test_concurrent_duplicates_run_once(store):
+    app = make_app()
+    responses = post_concurrently(app, [({"amount": 10}, {"Idempotency-Key": "k1"})] * 20)
+
+    assert app.state.calls == 1
+    assert {response.status_code for response in responses} == {201}
+    assert {response.content for response in responses} == {b'{"call":1,"amount":10}'}
+    assert sum(response.headers.get("Idempotent-Replayed") == "true" for response in responses) == 19
+
+
+def test_later_retry_replays_without_running(store):
+    app = make_app()
+    first, = post_concurrently(app, [({"amount": 10, "delay": 0}, {"Idempotency-Key": "k1"})])
+    retry, = post_concurrently(app, [({"amount": 10, "delay": 0}, {"Idempotency-Key": "k1"})])
+
+    assert app.state.calls == 1
+    assert retry.status_code == 201 and retry.content == first.content
+    assert retry.headers["Idempotent-Replayed"] == "true"
+
+
+def test_distinct_keys_and_keyless_requests_all_run(store):
+    app = make_app()
+    post_concurrently(app, [
+        ({"amount": 10, "delay": 0}, {"Idempotency-Key": "a"}),
+        ({"amount": 10, "delay": 0}, {"Idempotency-Key": "b"}),
+        ({"amount": 10, "delay": 0}, {}),
+        ({"amount": 10, "delay": 0}, {}),
+    ])
+    assert app.state.calls == 4
+
+
+def test_key_reused_for_another_request_is_rejected(store):
+    app = make_app()
+    first, second = post_concurrently(app, [
+        ({"amount": 10}, {"Idempotency-Key": "k1"}),
+        ({"amount": 99}, {"Idempotency-Key": "k1"}),
+    ])
+    assert (first.status_code, second.status_code) == (201, 422)
+    assert app.state.calls == 1
+
+
+def test_failed_first_request_lets_a_waiting_duplicate_run(store):
+    app = make_app()
+    # Same body, so the same fingerprint; the second waits, then runs and fails the same way
+    responses = post_concurrently(app, [({"amount": 10, "fail": True}, {"Idempotency-Key": "k1"})] * 2)
+    assert [response.status_code for response in responses] == [502, 502]
+    assert app.state.calls == 2
+    assert not store.records
+
+    retry, = post_concurrently(app, [({"amount": 10, "delay": 0}, {"Idempotency-Key": "k2"})])
+    assert retry.status_code == 201
+
+
+def test_duplicate_waiting_too_long_gets_conflict(store, monkeypatch):
+    monkeypatch.setattr(settings, "IDEMPOTENCY_WAIT_SECONDS", 0.05)
+    app = make_app()
+    first, second = post_concurrently(app, [
+        ({"amount": 10, "delay": 0.5}, {"Idempotency-Key": "k1"}),
+        ({"amount": 10, "delay": 0.5}, {"Idempotency-Key": "k1"}),
+    ])
+    assert sorted([first.status_code, second.status_code]) == [201, 409]
+    assert app.state.calls == 1
+
+
+@pytest.mark.parametrize("headers", [{"Idempotency-Key": "k1"}, {}])
+def test_cookies_set_on_the_injected_response_are_kept(store, headers):
+    app = make_app()
+    first, = post_concurrently(app, [({"amount": 10, "delay": 0, "cookie": "crm_primary_until"}, headers)])
+    assert first.status_code == 201
+    assert "crm_primary_until" in first.cookies
+
+
+def test_redis_store_runs_concurrent_duplicates_once(monkeypatch):
+    from app.config import redis as redis_config
+
+    async def ping():
+        try:
+            await redis_config.get_redis().ping()
+            return True
+        except Exception:
+            return False
+        finally:
+            await redis_config.close_redis()
+
+    if not asyncio.run(ping()):
+        pytest.skip("Redis is not reachable at REDIS_URL")
+
+    monkeypatch.setattr(settings, "IDEMPOTENCY_POLL_SECONDS", 0.01)
+    app = make_app()
+    key = uuid4().hex
+
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await asyncio.gather(*(
+                    client.post("/charge", json={"amount": 10}, headers={"Idempotency-Key": key})
+                    for _ in range(10)
+                ))
+        finally:
+            await redis_config.close_redis()
+
+    responses = asyncio.run(main())
+    assert app.state.calls == 1
+    assert {response.status_code for response in responses} == {201}
+
+
+@pytest.fixture
+def contact_id(throwaway_user):
+    """A contact of the throwaway user"""
+    from app.config.database import SyncSessionLocal
+    from app.models.contact import Contact
+
+    with SyncSessionLocal() as db:
+        contact = Contact(name="Иван Петров", email=f"ivan-{uuid4().hex}@example.com", created_by=throwaway_user.id)
+        db.add(contact)
+        db.commit()
+        return contact.id
+
+
+def test_generated_message_pins_reads_to_the_primary(throwaway_user, contact_id, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from app.api import messages
+    from app.config.database import READ_YOUR_WRITES_COOKIE
+    from app.main import app
+    from app.utils.auth import create_access_token
+
+    async def generate_personalized_message(**kwargs):
+        return {"success": True, "content": "С днём рождения!", "metadata": {"model": "gpt-4o-mini"}}
+
+    monkeypatch.setattr(messages, "ai_generator", SimpleNamespace(
+        generate_personalized_message=generate_personalized_message))
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(throwaway_user.id)})}",
+               "Idempotency-Key": uuid4().hex}
+    response = client.post("/api/messages/generate", headers=headers,
+                           json={"contact_id": str(contact_id), "occasion_type": "birthday"})
+
+    assert response.status_code == 201, response.text
+    assert READ_YOUR_WRITES_COOKIE in response.cookies
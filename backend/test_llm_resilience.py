@@ -0,0 +1,218 @@
+"""The circuit breaker fails fast on a degraded provider, and hedged requests cut its tail latency"""
+
+import asyncio
+import time
+from uuid import uuid4
+
+import pytest
+
+from app.config.settings import settings
+from app.models.contact import Contact, Language
+from app.models.message import OccasionType
+from app.services.ai_generator import AIMessageGenerator
+from app.services.generation_scheduler import BULK, GenerationScheduler
+from app.services.llm_backends import Completion, GenerationBackend
+from app.services.llm_resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, ResilientBackend
+
+
+class StubBackend(GenerationBackend):
+    """Answers after an injected latency, or fails; the script is consumed one call at a time"""
+
+    name = "stub"
+
+    def __init__(self, script=None, latency=0.01):
+        self.script = list(script or [])
+        self.latency = latency
+        self.calls = 0
+
+    async def complete(self, system_prompt, user_prompt, model, max_tokens, temperature, n=1) -> Completion:
+        self.calls += 1
+        step = self.script.pop(0) if self.script else self.latency
+        if step == "error":
+            await asyncio.sleep(self.latency)
+            raise RuntimeError("provider failure")
+        await asyncio.sleep(step)
+        return Completion(content=f"reply after {step}s", model=model, input_tokens=10, output_tokens=5)
+
+
+def breaker(**overrides):
+    options = dict(window=10, min_calls=5, error_rate=0.5, slow_rate=0.5, slow_call_seconds=0.2, open_seconds=0.1)
+    return CircuitBreaker(**{**options, **overrides})
+
+
+def call(backend):
+    return backend.complete("system", "user", "gpt-4o", 100, 0.7)
+
+
+def run_calls(backend, count):
+    """Outcomes of `count` sequential calls: the completion or the exception"""
+    async def main():
+        outcomes = []
+        for _ in range(count):
+            try:
+                outcomes.append(await call(backend))
+            except Exception as e:
+                outcomes.append(e)
+        return outcomes
+
+    return asyncio.run(main())
+
+
+def test_errors_open_the_circuit_and_calls_then_fail_fast():
+    stub = StubBackend(["error"] * 5, latency=0.05)
+    backend = ResilientBackend(stub, breaker(), hedging=False)
+
+    outcomes = run_calls(backend, 5)
+    assert all(isinstance(outcome, RuntimeError) for outcome in outcomes)
+    assert backend.breaker.state == OPEN
+
+    started = time.perf_counter()
+    rejected = run_calls(backend, 20)
+    assert all(isinstance(outcome, CircuitOpenError) for outcome in rejected)
+    assert stub.calls == 5
+    assert time.perf_counter() - started < 0.05
+
+
+def test_slow_calls_open_the_circuit():
+    stub = StubBackend([0.3] * 3 + [0.01] * 2)
+    backend = ResilientBackend(stub, breaker(), hedging=False)
+    run_calls(backend, 5)
+    assert backend.breaker.state == OPEN
+
+
+def test_timeouts_count_as_failures(monkeypatch):
+    monkeypatch.setattr(settings, "AI_REQUEST_TIMEOUT_SECONDS", 0.05)
+    backend = ResilientBackend(StubBackend(latency=1.0), breaker(), hedging=False)
+
+    started = time.perf_counter()
+    outcomes = run_calls(backend, 5)
+    assert all(isinstance(outcome, asyncio.TimeoutError) for outcome in outcomes)
+    assert time.perf_counter() - started < 1.0
+    assert backend.breaker.state == OPEN
+
+
+def test_half_open_probe_closes_or_reopens_the_circuit():
+    backend = ResilientBackend(StubBackend(["error"] * 5 + ["error"]), breaker(), hedging=False)
+    run_calls(backend, 5)
+    assert backend.breaker.state == OPEN
+
+    time.sleep(0.12)
+    # The probe fails: open again, for another open_seconds
+    assert isinstance(run_calls(backend, 1)[0], RuntimeError)
+    assert backend.breaker.state == OPEN
+    assert isinstance(run_calls(backend, 1)[0], CircuitOpenError)
+
+    time.sleep(0.12)
+    assert isinstance(run_calls(backend, 1)[0], Completion)
+    assert backend.breaker.state == CLOSED
+
+
+def test_half_open_lets_one_probe_through_at_a_time():
+    circuit = breaker()
+    for _ in range(5):
+        circuit.record(failed=True, seconds=0.01)
+    time.sleep(0.12)
+    assert circuit.allow() and circuit.state == HALF_OPEN
+    assert not circuit.allow()
+    circuit.record(failed=False, seconds=0.01)
+    assert circuit.state == CLOSED and circuit.allow() and circuit.allow()
+
+
+def test_open_circuit_falls_back_in_the_generator():
+    backend = ResilientBackend(StubBackend(["error"] * 5), breaker(), hedging=False)
+    generator = AIMessageGenerator(backend)
+    contact = Contact(id=uuid4(), name="Иван Петров", language=Language.RU)
+
+    async def main():
+        return [await generator.generate_personalized_message(contact, OccasionType.BIRTHDAY) for _ in range(8)]
+
+    results = asyncio.run(main())
+    assert not any(result["success"] for result in results)
+    assert [result["metadata"]["exception"] for result in results[5:]] == ["CircuitOpenError"] * 3
+
+
+@pytest.fixture
+def hedging(monkeypatch):
+    monkeypatch.setattr(settings, "AI_HEDGE_MIN_SAMPLES", 20)
+    monkeypatch.setattr(settings, "AI_HEDGE_QUANTILE", 0.95)
+    monkeypatch.setattr(settings, "AI_HEDGE_BUDGET_PERCENT", 10.0)
+    monkeypatch.setattr(settings, "AI_HEDGE_BUDGET_WINDOW", 100)
+
+
+def test_hedge_answers_a_straggler(hedging):
+    # 20 calls warm the latency window at ~20ms, then one call stalls for 1s
+    stub = StubBackend([0.02] * 20 + [1.0, 0.02])
+    backend = ResilientBackend(stub, breaker(slow_call_seconds=5), hedging=True)
+    run_calls(backend, 20)
+
+    started = time.perf_counter()
+    completion, = run_calls(backend, 1)
+    elapsed = time.perf_counter() - started
+
+    assert completion.content == "reply after 0.02s"
+    assert stub.calls == 22
+    assert elapsed < 0.2
+
+
+def test_no_hedging_before_the_latency_window_fills(hedging):
+    stub = StubBackend([0.3])
+    backend = ResilientBackend(stub, breaker(slow_call_seconds=5), hedging=True)
+    run_calls(backend, 1)
+    assert stub.calls == 1
+
+
+def test_hedges_stay_within_budget(hedging):
+    # Warm up fast, then the provider slows down for good
+    stub = StubBackend([0.01] * 20, latency=0.05)
+    backend = ResilientBackend(stub, breaker(slow_call_seconds=5), hedging=True)
+    run_calls(backend, 20)
+    run_calls(backend, 40)
+
+    # Hedging stops at the budget, or earlier once the slow calls raise the observed p95
+    hedges = stub.calls - 60
+    assert 0 < hedges <= settings.AI_HEDGE_BUDGET_PERCENT / 100 * settings.AI_HEDGE_BUDGET_WINDOW
+
+
+def test_budget_counts_the_calls_recorded_so_far(hedging):
+    # Right after warm-up the window is far from full; 10% of 30 calls is 3 hedges
+    stub = StubBackend([0.01] * 20, latency=0.05)
+    backend = ResilientBackend(stub, breaker(slow_call_seconds=5), hedging=True)
+    run_calls(backend, 20)
+    run_calls(backend, 10)
+
+    assert stub.calls - 30 == sum(backend.hedged) <= 3
+
+
+def test_hedges_take_a_scheduler_slot(hedging):
+    stub = StubBackend([0.02] * 20 + [0.4, 0.2])
+    scheduler = GenerationScheduler(capacity=2, interactive_reserved=0)
+    backend = ResilientBackend(stub, breaker(slow_call_seconds=5), hedging=True, scheduler=scheduler)
+    run_calls(backend, 20)
+
+    async def straggler():
+        async with scheduler.slot(BULK):
+            in_flight = []
+            task = asyncio.ensure_future(call(backend))
+            await asyncio.sleep(0.1)
+            in_flight.append(sum(scheduler.in_flight.values()))
+            await task
+        return in_flight
+
+    # The hedge holds the second slot while it runs, and gives it back
+    assert asyncio.run(straggler()) == [2]
+    assert stub.calls == 22
+    assert scheduler.in_flight[BULK] == 0
+
+
+def test_no_hedge_without_a_free_slot(hedging):
+    stub = StubBackend([0.02] * 20 + [0.2])
+    scheduler = GenerationScheduler(capacity=1, interactive_reserved=0)
+    backend = ResilientBackend(stub, breaker(slow_call_seconds=5), hedging=True, scheduler=scheduler)
+    run_calls(backend, 20)
+
+    async def straggler():
+        async with scheduler.slot(BULK):
+            return await call(backend)
+
+    assert asyncio.run(straggler()).content == "reply after 0.2s"
+    assert stub.calls == 21
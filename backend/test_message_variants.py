@@ -0,0 +1,131 @@
+"""One generate call can return several candidates, and reviewers swap between them without another call"""
+
+import asyncio
+from uuid import uuid4
+
+import pytest
+from fastapi import HTTPException
+
+from app.models.contact import Contact, ContactSegment, Language
+from app.models.message import OccasionType
+from app.services.ai_generator import AIMessageGenerator
+from app.services.generation_scheduler import BULK
+from app.services.llm_backends import MockLLMBackend
+from app.services.model_routing import ModelRouter
+
+
+class CountingBackend(MockLLMBackend):
+    """Mock backend that counts the calls reaching it"""
+
+    def __init__(self):
+        super().__init__(latency_ms=0, latency_distribution="fixed")
+        self.calls = 0
+
+    async def complete(self, *args, **kwargs):
+        self.calls += 1
+        return await super().complete(*args, **kwargs)
+
+
+def contact():
+    return Contact(id=uuid4(), name="Иван Петров", language=Language.RU, segment=ContactSegment.REGULAR)
+
+
+def test_candidates_come_from_one_call():
+    backend = CountingBackend()
+    generator = AIMessageGenerator(backend)
+
+    result = asyncio.run(generator.generate_personalized_message(contact(), OccasionType.BIRTHDAY, candidates=3))
+    metadata = result["metadata"]
+    assert backend.calls == 1
+    assert len(set(metadata["variants"])) == 3
+    assert metadata["variants"][0] == result["content"]
+    assert metadata["active_variant"] == 0
+
+
+def test_single_candidate_stores_no_variants():
+    result = asyncio.run(AIMessageGenerator(CountingBackend()).generate_personalized_message(
+        contact(), OccasionType.BIRTHDAY
+    ))
+    assert "variants" not in result["metadata"]
+
+
+def test_candidates_share_the_input_tokens():
+    backend = MockLLMBackend(latency_ms=0, latency_distribution="fixed", output_tokens=100)
+
+    async def main():
+        return await backend.complete("system", "user", "gpt-4o-mini", 500, 0.7), \
+            await backend.complete("system", "user", "gpt-4o-mini", 500, 0.7, n=3)
+
+    one, three = asyncio.run(main())
+    assert three.input_tokens == one.input_tokens
+    assert three.output_tokens == 3 * one.output_tokens
+    assert len(three.alternates) == 2
+
+
+def test_candidate_count_is_part_of_the_coalescing_key():
+    generator = AIMessageGenerator(CountingBackend())
+    route = ModelRouter().route(lane=BULK)
+    assert generator.prompt_key("system", "user", route, 1) != generator.prompt_key("system", "user", route, 3)
+
+
+@pytest.fixture
+def message_with_variants(throwaway_user):
+    """An approved AI message with three candidates, owned by a throwaway user"""
+    from app.config.database import SyncSessionLocal
+    from app.models.message import GeneratedBy, Message, MessageStatus
+
+    user = throwaway_user
+    suffix = uuid4().hex
+    with SyncSessionLocal() as db:
+        person = Contact(name="Иван Петров", email=f"ivan-{suffix}@example.com", created_by=user.id)
+        db.add(person)
+        db.flush()
+        message = Message(
+            contact_id=person.id,
+            occasion_type=OccasionType.BIRTHDAY,
+            content="First candidate",
+            status=MessageStatus.APPROVED,
+            generated_by=GeneratedBy.AI,
+            created_by=user.id,
+            approved_by=user.id,
+            message_metadata={"variants": ["First candidate", "Second candidate", "Third candidate"],
+                              "active_variant": 0, "latency_ms": 1800},
+        )
+        db.add(message)
+        db.commit()
+        return {"user": user.id, "message": message.id}
+
+
+def test_selecting_a_variant_swaps_the_content(message_with_variants):
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    from app.api.messages import select_variant
+    from app.config.database import async_database_url
+    from app.models.message import MessageStatus
+    from app.models.user import User
+    from app.utils.metrics import MESSAGE_VARIANT_SWAPS
+
+    before = MESSAGE_VARIANT_SWAPS._value.get()
+
+    async def main():
+        engine = create_async_engine(async_database_url)
+        try:
+            async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+                user = await db.get(User, message_with_variants["user"])
+                unchanged = await select_variant(message_with_variants["message"], 0, db, user)
+                swapped = await select_variant(message_with_variants["message"], 2, db, user)
+                with pytest.raises(HTTPException) as missing:
+                    await select_variant(message_with_variants["message"], 3, db, user)
+                return unchanged, swapped, missing.value.status_code
+        finally:
+            await engine.dispose()
+
+    unchanged, swapped, missing_status = asyncio.run(main())
+    # Selecting the active variant changes nothing, and stays approved
+    assert unchanged.status == MessageStatus.APPROVED and "variant_swaps" not in unchanged.metadata
+    assert swapped.content == "Third candidate"
+    assert swapped.metadata["active_variant"] == 2 and swapped.metadata["variant_swaps"] == 1
+    # Changed content goes back for approval
+    assert swapped.status == MessageStatus.PENDING_APPROVAL and swapped.approved_by is None
+    assert missing_status == 404
+    assert MESSAGE_VARIANT_SWAPS._value.get() - before == 1
@@ -0,0 +1,79 @@
+"""The mock provider is reproducible per seed and injects errors and 429s at the configured rates"""
+
+import asyncio
+
+import openai
+import pytest
+
+from app.services.llm_backends import MockLLMBackend
+
+
+class RecordingMock(MockLLMBackend):
+    """Records each sampled latency and answers without sleeping"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.latencies = []
+
+    def sample_latency(self, rng):
+        self.latencies.append(super().sample_latency(rng))
+        return 0.0
+
+
+def run(backend, calls):
+    """Outcome of each call: (content, input, output tokens), or the exception type"""
+    async def main():
+        outcomes = []
+        for index in range(calls):
+            try:
+                completion = await backend.complete("system", f"Contact {index}", "gpt-4o-mini", 500, 0.7)
+                outcomes.append((completion.content, completion.input_tokens, completion.output_tokens))
+            except Exception as e:
+                outcomes.append(type(e))
+        return outcomes
+
+    return asyncio.run(main())
+
+
+def test_same_seed_same_run():
+    options = dict(latency_distribution="lognormal", error_rate=0.1, rate_limit_rate=0.1, seed=7)
+    first, second = RecordingMock(**options), RecordingMock(**options)
+
+    assert run(first, 50) == run(second, 50)
+    assert first.latencies == second.latencies
+    assert len(set(first.latencies)) > 1
+
+
+def test_other_seed_other_run():
+    first, second = RecordingMock(seed=1), RecordingMock(seed=2)
+    assert run(first, 20) != run(second, 20)
+    assert first.latencies != second.latencies
+
+
+def test_errors_and_rate_limits_at_their_rates():
+    backend = RecordingMock(error_rate=0.1, rate_limit_rate=0.05, seed=11)
+    outcomes = run(backend, 4000)
+
+    rate_limited = outcomes.count(openai.RateLimitError) / len(outcomes)
+    failed = outcomes.count(openai.InternalServerError) / len(outcomes)
+    assert rate_limited == pytest.approx(0.05, abs=0.015)
+    assert failed == pytest.approx(0.1, abs=0.02)
+    assert all(isinstance(outcome, tuple) for outcome in outcomes
+               if outcome not in (openai.RateLimitError, openai.InternalServerError))
+
+
+def test_injected_errors_carry_their_status():
+    async def main():
+        with pytest.raises(openai.RateLimitError) as limited:
+            await MockLLMBackend(latency_ms=0, latency_distribution="fixed", rate_limit_rate=1.0).complete(
+                "system", "user", "gpt-4o-mini", 100, 0.7)
+        with pytest.raises(openai.InternalServerError) as failed:
+            await MockLLMBackend(latency_ms=0, latency_distribution="fixed", error_rate=1.0).complete(
+                "system", "user", "gpt-4o-mini", 100, 0.7)
+        return limited.value.status_code, failed.value.status_code
+
+    assert asyncio.run(main()) == (429, 500)
+
+
+def test_no_injection_by_default():
+    assert all(isinstance(outcome, tuple) for outcome in run(RecordingMock(), 200))
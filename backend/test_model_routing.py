@@ -0,0 +1,146 @@
+"""Generations are routed to a model by segment, occasion and lane, and downgraded under quota pressure"""
+
+import asyncio
+from uuid import uuid4
+
+import pytest
+
+from app.config.settings import settings
+from app.models.contact import Contact, ContactSegment, Language
+from app.models.message import OccasionType
+from app.services.ai_generator import AIMessageGenerator
+from app.services.generation_scheduler import BULK, INTERACTIVE
+from app.services.llm_backends import Completion, GenerationBackend
+from app.services.model_routing import ModelRouter, model_cost
+from app.utils.metrics import AI_ROUTE_COST
+
+
+class RateLimitError(Exception):
+    """Named like the provider's 429 error"""
+
+
+class RecordingBackend(GenerationBackend):
+    """Answers at once and records the parameters of each call"""
+
+    name = "recording"
+
+    def __init__(self):
+        self.calls = []
+
+    async def complete(self, system_prompt, user_prompt, model, max_tokens, temperature, n=1) -> Completion:
+        self.calls.append((model, max_tokens, temperature))
+        return Completion(content="Поздравляем!", model=model, input_tokens=1000, output_tokens=200)
+
+
+class QueuedScheduler:
+    """Stands in for a GenerationScheduler with calls queued in each lane"""
+
+    def __init__(self, interactive=0, bulk=0):
+        self.queues = {INTERACTIVE: [None] * interactive, BULK: [None] * bulk}
+
+
+def contact(segment=ContactSegment.REGULAR):
+    return Contact(id=uuid4(), name="Иван Петров", language=Language.RU, segment=segment)
+
+
+def test_rules_pick_the_route():
+    router = ModelRouter()
+    assert router.route(ContactSegment.VIP, OccasionType.BIRTHDAY, BULK).name == "premium"
+    assert router.route(ContactSegment.PARTNER, OccasionType.HOLIDAY, BULK).name == "premium"
+    assert router.route(ContactSegment.REGULAR, OccasionType.BIRTHDAY, INTERACTIVE).name == "premium"
+
+    regular = router.route(ContactSegment.REGULAR, OccasionType.BIRTHDAY, BULK)
+    assert regular.name == settings.AI_DEFAULT_ROUTE == "standard"
+    assert regular.model == "gpt-4o-mini"
+    assert regular.downgraded_from is None
+
+
+def test_all_conditions_of_a_rule_must_match(monkeypatch):
+    monkeypatch.setattr(settings, "AI_ROUTING_RULES", [
+        {"segment": "new_client", "occasion": ["promotion"], "route": "premium"},
+    ])
+    router = ModelRouter()
+    assert router.route(ContactSegment.NEW_CLIENT, OccasionType.PROMOTION, BULK).name == "premium"
+    assert router.route(ContactSegment.NEW_CLIENT, OccasionType.BIRTHDAY, BULK).name == "standard"
+    assert router.route(ContactSegment.REGULAR, OccasionType.PROMOTION, BULK).name == "standard"
+
+
+def test_deep_interactive_queue_downgrades_unpinned_routes(monkeypatch):
+    monkeypatch.setattr(settings, "AI_ROUTING_PRESSURE_QUEUE_DEPTH", 10)
+    calm, busy = ModelRouter(QueuedScheduler(interactive=9)), ModelRouter(QueuedScheduler(interactive=10))
+
+    assert calm.route(ContactSegment.REGULAR, OccasionType.BIRTHDAY, INTERACTIVE).name == "premium"
+    downgraded = busy.route(ContactSegment.REGULAR, OccasionType.BIRTHDAY, INTERACTIVE)
+    assert (downgraded.name, downgraded.model, downgraded.downgraded_from) == ("standard", "gpt-4o-mini", "premium")
+
+    # The VIP rule is pinned
+    assert busy.route(ContactSegment.VIP, OccasionType.BIRTHDAY, BULK).name == "premium"
+
+
+def test_campaign_backlog_is_not_pressure(monkeypatch):
+    monkeypatch.setattr(settings, "AI_ROUTING_PRESSURE_QUEUE_DEPTH", 10)
+    # A campaign queues its whole audience at once
+    router = ModelRouter(QueuedScheduler(bulk=5000))
+    assert not router.under_pressure()
+    assert router.route(ContactSegment.REGULAR, OccasionType.BIRTHDAY, INTERACTIVE).name == "premium"
+
+
+def test_rate_limits_downgrade_for_a_while(monkeypatch):
+    monkeypatch.setattr(settings, "AI_ROUTING_PRESSURE_RATE_LIMITS", 3)
+    router = ModelRouter()
+    premium = router.build("premium")
+
+    for _ in range(2):
+        router.observe(premium, 0.1, error=RateLimitError())
+    router.observe(premium, 0.1, error=RuntimeError("not a rate limit"))
+    assert not router.under_pressure()
+
+    router.observe(premium, 0.1, error=RateLimitError())
+    assert router.route(lane=INTERACTIVE).downgraded_from == "premium"
+
+    router.rate_limited = type(router.rate_limited)(stamp - 61 for stamp in router.rate_limited)
+    assert router.route(lane=INTERACTIVE).name == "premium"
+
+
+def test_undefined_routes_are_rejected(monkeypatch):
+    monkeypatch.setattr(settings, "AI_ROUTE_DOWNGRADES", {"premium": "economy"})
+    with pytest.raises(ValueError, match="economy"):
+        ModelRouter()
+
+
+def test_model_cost_uses_the_pricing_table(monkeypatch):
+    assert model_cost("gpt-4o", 1_000_000, 100_000) == pytest.approx(2.5 + 1.0)
+    assert model_cost("gpt-4o-mini", 1_000_000, 1_000_000) == pytest.approx(0.75)
+    assert model_cost("unpriced-model", 1000, 1000) == 0.0
+
+    monkeypatch.setattr(settings, "AI_MODEL_PRICING", {"gpt-4o": (1.0, 2.0)})
+    assert model_cost("gpt-4o", 1_000_000, 1_000_000) == pytest.approx(3.0)
+
+
+def test_generator_uses_the_route_and_reports_it():
+    backend = RecordingBackend()
+    generator = AIMessageGenerator(backend)
+    before = AI_ROUTE_COST.labels("standard", "gpt-4o-mini")._value.get()
+
+    async def main():
+        return await asyncio.gather(
+            generator.generate_personalized_message(contact(ContactSegment.VIP), OccasionType.BIRTHDAY, lane=BULK),
+            generator.generate_personalized_message(contact(), OccasionType.BIRTHDAY, lane=BULK),
+        )
+
+    vip, regular = asyncio.run(main())
+    premium, standard = settings.AI_ROUTES["premium"], settings.AI_ROUTES["standard"]
+    assert sorted(backend.calls) == sorted([
+        (premium["model"], premium["max_tokens"], premium["temperature"]),
+        (standard["model"], standard["max_tokens"], standard["temperature"]),
+    ])
+
+    assert (vip["metadata"]["route"], vip["metadata"]["model"]) == ("premium", "gpt-4o")
+    assert vip["metadata"]["cost_usd"] == pytest.approx(model_cost("gpt-4o", 1000, 200))
+    assert (regular["metadata"]["route"], regular["metadata"]["model"]) == ("standard", "gpt-4o-mini")
+    assert regular["metadata"]["cost_usd"] == pytest.approx(model_cost("gpt-4o-mini", 1000, 200))
+    assert regular["metadata"]["latency_ms"] >= 0
+    assert "downgraded_from" not in regular["metadata"]
+    assert AI_ROUTE_COST.labels("standard", "gpt-4o-mini")._value.get() - before == pytest.approx(
+        model_cost("gpt-4o-mini", 1000, 200)
+    )
@@ -0,0 +1,188 @@
+"""Birthday and holiday messages are planned into off-peak hours ahead of their day, within the hourly quota"""
+
+import asyncio
+from datetime import date, datetime, timedelta
+from uuid import uuid4
+
+import pytest
+
+from app.config.settings import settings
+from app.models.contact import Language
+from app.models.message import OccasionType
+from app.services.pregeneration import (
+    BIRTHDAY,
+    Occasion,
+    Pregenerator,
+    birthday_keys,
+    holidays_on,
+    is_off_peak,
+    plan_generation,
+    send_time,
+    upcoming_occasions,
+    water_fill,
+)
+
+
+def occasion(day, count, language=Language.RU, name=BIRTHDAY, occasion_type=OccasionType.BIRTHDAY):
+    return Occasion(name, occasion_type, language, day, send_time(day), count=count)
+
+
+def test_water_fill_levels_the_least_loaded_hours_first():
+    assert water_fill([0, 0, 0], 7, 10) == [3, 2, 2]
+    assert water_fill([5, 0, 2], 6, 10) == [0, 4, 2]
+    # Full hours take nothing; what does not fit is left over
+    assert water_fill([10, 8, 9], 5, 10) == [0, 2, 1]
+    assert water_fill([], 5, 10) == []
+
+
+def test_calendars():
+    assert send_time(date(2027, 1, 1)) == datetime(2027, 1, 1, 4)  # 09:00 in Tashkent
+    assert birthday_keys(date(2027, 2, 28)) == (228, 229)
+    assert birthday_keys(date(2028, 2, 28)) == (228,)
+    assert [holiday.name for holiday in holidays_on(date(2027, 3, 21), ["UZ"])] == ["Navruz"]
+    assert holidays_on(date(2027, 3, 21), ["RU"]) == []
+    # One New Year however many calendars have it
+    assert len(holidays_on(date(2027, 1, 1), ["RU", "UZ"])) == 1
+
+
+def test_extra_holidays(monkeypatch):
+    monkeypatch.setattr(settings, "PREGENERATION_EXTRA_HOLIDAYS", [
+        {"date": "2027-03-10", "name": "Ramazon hayit", "calendar": "UZ"},
+    ])
+    assert [holiday.name for holiday in holidays_on(date(2027, 3, 10), ["UZ"])] == ["Ramazon hayit"]
+    assert holidays_on(date(2027, 3, 10), ["RU"]) == []
+
+
+def test_new_year_occasions_follow_each_languages_calendar():
+    occasions = upcoming_occasions(datetime(2026, 12, 31, 12), days=2)
+    new_year = {o.language for o in occasions if o.occasion_type == OccasionType.NEW_YEAR}
+    assert new_year == {Language.RU, Language.UZ}  # English contacts have no holiday calendar by default
+    assert {o.day for o in occasions if o.name == BIRTHDAY} == {date(2027, 1, 1), date(2027, 1, 2)}
+
+
+def test_new_year_spike_is_spread_over_off_peak_hours():
+    start = datetime(2026, 11, 20)
+    occasions = [
+        occasion(date(2027, 1, 1), 60_000, Language.UZ, "New Year", OccasionType.NEW_YEAR),
+        occasion(date(2027, 1, 1), 30_000, Language.RU, "New Year", OccasionType.NEW_YEAR),
+        occasion(date(2026, 12, 15), 500),
+    ]
+    plan = plan_generation(occasions, start, hourly_quota=2000)
+    report = plan.as_dict()
+
+    assert report["demand"] == report["scheduled"] == 90_500
+    assert report["late"] == report["unscheduled"] == 0
+    assert report["on_demand_peak"] == 90_000
+    assert report["peak_hour_load"] <= 2000
+
+    for hour, placed in plan.slots.items():
+        assert is_off_peak(hour)
+        for planned, _ in placed:
+            # Within PREGENERATION_MAX_ADVANCE_DAYS, and ready PREGENERATION_LEAD_DAYS ahead
+            assert planned.earliest <= hour < planned.ready_by
+
+    # Water-filling keeps the New Year hours level instead of front-loading them
+    new_year_loads = [plan.load(hour) for hour in plan.slots if hour >= occasions[0].earliest]
+    assert max(new_year_loads) - min(new_year_loads) <= 1
+
+
+def test_overflow_is_late_then_unscheduled():
+    day = date(2027, 1, 1)
+    start = send_time(day) - timedelta(days=4)
+    plan = plan_generation([occasion(day, 100_000)], start, hourly_quota=1000)
+    report = plan.as_dict()
+
+    # One night of off-peak hours before the deadline, then every hour up to the send time
+    assert 0 < report["late"] < report["scheduled"] < 100_000
+    assert report["unscheduled"] == 100_000 - report["scheduled"]
+    assert report["peak_hour_load"] == 1000
+    assert any(not point["off_peak"] and point["generations"] for point in report["load_curve"])
+
+
+def test_earliest_deadline_is_served_first():
+    start = datetime(2026, 12, 1)
+    sooner = occasion(date(2026, 12, 8), 5000)
+    later = occasion(date(2026, 12, 20), 5000)
+    plan = plan_generation([later, sooner], start, hourly_quota=500)
+    assert plan.scheduled(sooner) == 5000
+    first_hours = sorted(plan.slots)[:3]
+    assert all(placed[0][0] is sooner for placed in (plan.slots[hour] for hour in first_hours))
+
+
+class StubGenerator:
+    """Generates a greeting without calling a provider"""
+
+    async def batch_generate(self, contacts, occasion_type, custom_context=None, tone="professional_friendly",
+                             owner=""):
+        return [
+            {"success": True, "content": f"{custom_context or 'Happy birthday'}, {contact.name}!",
+             "metadata": {"language": contact.language.value}}
+            for contact in contacts
+        ]
+
+
+@pytest.fixture
+def birthday_contacts(throwaway_user):
+    """Three contacts with a birthday next week, owned by a throwaway user"""
+    from app.config.database import SyncSessionLocal
+    from app.models.contact import Contact
+
+    suffix = uuid4().hex
+    birthday = date.today() + timedelta(days=7)
+    with SyncSessionLocal() as db:
+        db.add_all([
+            Contact(name=f"Contact {index}", email=f"contact{index}-{suffix}@example.com", language=Language.UZ,
+                    birthday=birthday.replace(year=1980), created_by=throwaway_user.id)
+            for index in range(3)
+        ])
+        db.commit()
+    return {"user": throwaway_user.id, "email": throwaway_user.email, "birthday": birthday}
+
+
+def test_pregenerated_messages_wait_for_approval(birthday_contacts, monkeypatch):
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    from app.config.database import async_database_url
+    from app.models.message import Message, MessageStatus
+    from app.services.events import broker
+    from app.services.pregeneration import load_demand
+
+    monkeypatch.setattr(settings, "PREGENERATION_USER_EMAIL", birthday_contacts["email"])
+    published = []
+
+    async def publish(*events):
+        published.extend(events)
+
+    monkeypatch.setattr(broker, "publish", publish)
+    day = birthday_contacts["birthday"]
+
+    async def main():
+        engine = create_async_engine(async_database_url)
+        factory = async_sessionmaker(engine, expire_on_commit=False)
+        try:
+            async with factory() as db:
+                [target] = [o for o in await load_demand(db, datetime.utcnow(), days=10)
+                            if o.name == BIRTHDAY and o.day == day and o.language == Language.UZ]
+                before = target.count
+                user_id = await Pregenerator(factory, StubGenerator()).owner_id(db)
+
+            created = await Pregenerator(factory, StubGenerator()).generate(target, 2, user_id)
+            async with factory() as db:
+                [after] = [o for o in await load_demand(db, datetime.utcnow(), days=10)
+                           if o.name == BIRTHDAY and o.day == day and o.language == Language.UZ]
+                messages = list((await db.execute(
+                    Message.__table__.select().where(Message.created_by == user_id)
+                )).all())
+            return before, created, after.count, messages, target.send_at
+        finally:
+            await engine.dispose()
+
+    before, created, after, messages, send_at = asyncio.run(main())
+    assert created == 2
+    assert after == before - 2
+    assert {message.status for message in messages} == {MessageStatus.PENDING_APPROVAL}
+    assert {message.scheduled_for for message in messages} == {send_at}
+    assert all(message.message_metadata["pregenerated"] for message in messages)
+    # Event streams hear about the new approvals
+    assert sorted(event["message_id"] for event in published) == sorted(str(message.id) for message in messages)
+    assert {(event["type"], event["status"]) for event in published} == {("message.created", "pending_approval")}
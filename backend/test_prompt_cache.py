@@ -0,0 +1,94 @@
+"""Prompts start with a static prefix the provider can cache, and cached tokens are billed at their price"""
+
+import asyncio
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+
+from app.config.settings import settings
+from app.models.contact import Contact, ContactSegment, Language
+from app.models.message import OccasionType
+from app.services.ai_generator import AIMessageGenerator
+from app.services.generation_scheduler import BULK
+from app.services.llm_backends import Completion, GenerationBackend, MockLLMBackend, _cached_tokens
+from app.services.model_routing import model_cost
+from app.utils.prompts import build_message_prompt, build_prompt_prefix
+
+
+def prompt(name, company=None, **options):
+    options = {"occasion_type": OccasionType.BIRTHDAY, "tone": "warm", "language": Language.RU, **options}
+    return build_message_prompt(contact_name=name, contact_company=company, **options)
+
+
+def test_contact_details_follow_the_static_prefix():
+    prefix = build_prompt_prefix(OccasionType.BIRTHDAY, "warm", "ru")
+    ivan, aziz = prompt("Иван Петров", "Romashka"), prompt("Азиз Каримов", custom_context="Клиент с 2015 года")
+
+    assert ivan.startswith(prefix) and aziz.startswith(prefix)
+    assert "Иван Петров" not in prefix and "Romashka" not in prefix
+    assert ivan[len(prefix):].lstrip().startswith("<contact>")
+    assert aziz.endswith("</additional_context>")
+
+
+@pytest.mark.parametrize("options", [
+    {"occasion_type": OccasionType.NEW_YEAR},
+    {"tone": "formal"},
+    {"language": Language.EN},
+])
+def test_prefix_depends_on_occasion_tone_and_language(options):
+    assert build_prompt_prefix(OccasionType.BIRTHDAY, "warm", "ru") not in prompt("Иван Петров", **options)
+
+
+def test_cached_tokens_are_read_from_usage():
+    assert _cached_tokens(SimpleNamespace(prompt_tokens_details=SimpleNamespace(cached_tokens=1152))) == 1152
+    assert _cached_tokens(SimpleNamespace(prompt_tokens_details={"cached_tokens": 256})) == 256
+    assert _cached_tokens(SimpleNamespace(prompt_tokens_details=SimpleNamespace(cached_tokens=None))) == 0
+    assert _cached_tokens(SimpleNamespace(prompt_tokens=10)) == 0
+
+
+def test_mock_backend_caches_shared_prefixes():
+    backend = MockLLMBackend(latency_ms=0, latency_distribution="fixed")
+    static = "Static campaign instructions. " * 200  # ~1500 tokens
+
+    async def main():
+        return [
+            await backend.complete(static, f"Contact {index}", "gpt-4o-mini", 100, 0.7)
+            for index in range(3)
+        ] + [await backend.complete("Short prompt", "Contact", "gpt-4o-mini", 100, 0.7)] * 2
+
+    first, second, third, short, short_again = asyncio.run(main())
+    assert first.cached_tokens == 0
+    assert second.cached_tokens == third.cached_tokens
+    assert 1024 <= second.cached_tokens <= len(static) // 4
+    assert second.cached_tokens % MockLLMBackend.CACHE_BLOCK_TOKENS == 0
+    # Below the minimum prefix length nothing is cached
+    assert short.cached_tokens == short_again.cached_tokens == 0
+
+
+def test_cached_input_is_billed_at_the_cached_price():
+    assert model_cost("gpt-4o", 2_000_000, 0, cached_tokens=1_000_000) == pytest.approx(2.5 + 1.25)
+    assert model_cost("gpt-4o-mini", 1_000_000, 0, cached_tokens=1_000_000) == pytest.approx(0.075)
+
+
+def test_cached_price_defaults_to_the_input_price(monkeypatch):
+    monkeypatch.setattr(settings, "AI_MODEL_PRICING", {"gpt-4o": (2.0, 8.0)})
+    assert model_cost("gpt-4o", 1_000_000, 0, cached_tokens=500_000) == pytest.approx(2.0)
+
+
+class CachingBackend(GenerationBackend):
+    name = "caching"
+
+    async def complete(self, system_prompt, user_prompt, model, max_tokens, temperature, n=1) -> Completion:
+        return Completion(content="Поздравляем!", model=model, input_tokens=2000, output_tokens=100, cached_tokens=1536)
+
+
+def test_generator_records_cached_tokens():
+    generator = AIMessageGenerator(CachingBackend())
+    contact = Contact(id=uuid4(), name="Иван Петров", language=Language.RU, segment=ContactSegment.REGULAR)
+
+    result = asyncio.run(generator.generate_personalized_message(contact, OccasionType.BIRTHDAY, lane=BULK))
+    metadata = result["metadata"]
+    assert metadata["cached_tokens"] == 1536
+    assert metadata["cost_usd"] == pytest.approx(model_cost(metadata["model"], 2000, 100, 1536), abs=1e-6)
+    assert metadata["cost_usd"] < model_cost(metadata["model"], 2000, 100)
@@ -0,0 +1,62 @@
+"""Query budgets per endpoint, enforced with the query_budget fixture"""
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from app.utils.sql_profiler import install_profiler, profile_queries, statement_shape
+
+# Statements allowed per request, including the current-user lookup
+QUERY_BUDGETS = {
+    "/api/auth/me": 1,
+    "/api/contacts": 3,
+    "/api/messages": 3,
+    "/api/campaigns": 3,
+    "/api/analytics/dashboard": 8,
+    "/api/analytics/messages-by-status": 2,
+    "/api/analytics/messages-by-occasion": 2,
+    "/api/analytics/ai-usage-stats": 4,
+    "/api/analytics/campaign-performance": 2,
+    "/api/analytics/contacts-by-segment": 2,
+    "/api/analytics/messages-timeline": 2,
+}
+
+
+def test_statement_shape_collapses_bind_lists():
+    assert statement_shape("SELECT * FROM t WHERE id IN ($1, $2, $3)") == "SELECT * FROM t WHERE id IN (?)"
+    assert statement_shape("SELECT *\n  FROM t WHERE id = %(id_1)s") == "SELECT * FROM t WHERE id = ?"
+
+
+def test_repeated_selects_are_flagged(query_budget):
+    engine = create_engine("sqlite://")
+    install_profiler(engine)
+
+    with engine.connect() as conn:
+        with profile_queries() as profile:
+            for value in range(6):
+                conn.execute(text("SELECT :value"), {"value": value})
+
+    assert profile.count == 6
+    assert profile.repeated_shapes(threshold=5) == {"SELECT ?": 6}
+
+    with pytest.raises(AssertionError, match="budget is 2"):
+        with query_budget(2), engine.connect() as conn:
+            for value in range(3):
+                conn.execute(text("SELECT :value"), {"value": value})
+
+
+@pytest.fixture(scope="module")
+def auth_headers(throwaway_user):
+    from app.utils.auth import create_access_token
+
+    return {"Authorization": f"Bearer {create_access_token({'sub': str(throwaway_user.id)})}"}
+
+
+@pytest.mark.parametrize("path,budget", sorted(QUERY_BUDGETS.items()))
+def test_endpoint_query_budget(path, budget, auth_headers, query_budget):
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    client = TestClient(app)
+    with query_budget(budget):
+        response = client.get(path, headers=auth_headers)
+    assert response.status_code == 200, response.text
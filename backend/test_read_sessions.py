@@ -0,0 +1,34 @@
+"""The current-user lookup holds its read session only for the lookup"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+from app.api import deps
+
+
+def test_current_user_lookup_releases_its_read_session(monkeypatch):
+    sessions = []
+
+    @asynccontextmanager
+    async def read_session(request):
+        session = SimpleNamespace(closed=False)
+        sessions.append(session)
+        try:
+            yield session
+        finally:
+            session.closed = True
+
+    async def authenticate_token(token, db):
+        assert not db.closed
+        return SimpleNamespace(token=token)
+
+    monkeypatch.setattr(deps, "read_session", read_session)
+    monkeypatch.setattr(deps, "authenticate_token", authenticate_token)
+
+    user = asyncio.run(deps.get_current_user(None, SimpleNamespace(credentials="token")))
+    streaming = asyncio.run(deps.get_stream_user(None, None, access_token="query-token"))
+
+    assert (user.token, streaming.token) == ("token", "query-token")
+    # Closed before the endpoint runs, not when the response is done
+    assert [session.closed for session in sessions] == [True, True]
@@ -0,0 +1,225 @@
+"""Cron evaluation across timezones and DST, and the scheduler's year-long throughput"""
+
+import asyncio
+import os
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from types import SimpleNamespace
+from uuid import uuid4
+from zoneinfo import ZoneInfo
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.models.campaign import Campaign, CampaignRun, CampaignStatus, ScheduleType
+from app.services.cron import CronError, get_timezone, parse_cron
+from app.services.scheduler import CampaignScheduler, ScheduleHeap, schedule_entry
+
+CAMPAIGNS = 10_000
+YEAR_START = datetime(2027, 1, 1)
+YEAR_END = datetime(2028, 1, 1)
+TIMEZONES = ["UTC", "Europe/Berlin", "America/New_York", "Asia/Tashkent", "Asia/Kolkata"]
+# Rule templates, with the local days they fire on for the reference count
+RULES = {
+    "{minute} 9 * * *": lambda day: True,
+    "{minute} 8 * * MON-FRI": lambda day: day.weekday() < 5,
+    "{minute} 10 * * 1": lambda day: day.weekday() == 0,
+    "{minute} 12 1 * *": lambda day: day.day == 1,
+    "{minute} 0 1 1 *": lambda day: day.day == 1 and day.month == 1,
+}
+# Seconds for the simulation; raise on slow CI machines
+BUDGET_SECONDS = float(os.environ.get("SCHEDULER_SIMULATION_BUDGET_SECONDS", "5"))
+
+
+def fires(rule: str, tz: str, after: datetime, count: int):
+    iterator = parse_cron(rule).iter_fires(after, get_timezone(tz))
+    return [next(iterator) for _ in range(count)]
+
+
+def test_parse_cron():
+    rule = parse_cron("*/15 9-17 * JAN,jul MON-FRI")
+    assert rule.minutes == (0, 15, 30, 45)
+    assert rule.hours == tuple(range(9, 18))
+    assert rule.months == {1, 7}
+    assert rule.weekdays == {1, 2, 3, 4, 5}
+    assert parse_cron("0 0 * * 7").weekdays == {0}
+    assert parse_cron("5/20 * * * *").minutes == (5, 25, 45)
+    assert parse_cron("@weekly").weekdays == {0}
+
+    for invalid in ["* * * *", "60 * * * *", "0 0 32 * *", "0 0 * * FUNDAY", "*/0 * * * *", "5-1 * * * *"]:
+        with pytest.raises(CronError):
+            parse_cron(invalid)
+    with pytest.raises(CronError):
+        get_timezone("Mars/Olympus_Mons")
+
+
+def test_day_of_month_or_weekday():
+    # Both restricted: the 13th or any Friday (Vixie cron semantics)
+    assert fires("0 0 13 * FRI", "UTC", datetime(2027, 1, 31), 3) == [
+        datetime(2027, 2, 5), datetime(2027, 2, 12), datetime(2027, 2, 13),
+    ]
+
+
+def test_leap_day_and_never():
+    assert fires("0 9 29 2 *", "UTC", datetime(2027, 1, 1), 2) == [datetime(2028, 2, 29, 9), datetime(2032, 2, 29, 9)]
+    assert parse_cron("0 0 30 2 *").next_fire(datetime(2027, 1, 1), get_timezone("UTC")) is None
+
+
+def test_timezone_offset():
+    # 09:00 in Tashkent (UTC+5, no DST) is 04:00 UTC
+    assert fires("0 9 * * *", "Asia/Tashkent", datetime(2027, 6, 1), 2) == [
+        datetime(2027, 6, 1, 4), datetime(2027, 6, 2, 4),
+    ]
+
+
+def test_spring_forward_runs_skipped_time_once():
+    # Berlin skips 02:00-03:00 on 2027-03-28; 02:30 runs when the clocks jump, at 03:30 CEST
+    assert fires("30 2 * * *", "Europe/Berlin", datetime(2027, 3, 27, 12), 3) == [
+        datetime(2027, 3, 28, 1, 30), datetime(2027, 3, 29, 0, 30), datetime(2027, 3, 30, 0, 30),
+    ]
+
+
+def test_fall_back_runs_repeated_time_once():
+    # Berlin repeats 02:00-03:00 on 2027-10-31; 02:30 runs at its first occurrence (CEST) only
+    assert fires("30 2 * * *", "Europe/Berlin", datetime(2027, 10, 30, 12), 2) == [
+        datetime(2027, 10, 31, 0, 30), datetime(2027, 11, 1, 1, 30),
+    ]
+    # An hourly rule does not run the repeated hour twice
+    hourly = fires("0 * * * *", "Europe/Berlin", datetime(2027, 10, 30, 22, 30), 4)
+    assert hourly == [datetime(2027, 10, 30, 23), datetime(2027, 10, 31, 0), datetime(2027, 10, 31, 2),
+                      datetime(2027, 10, 31, 3)]
+
+
+def test_schedule_heap_replace_and_remove():
+    heap = ScheduleHeap()
+    campaign = SimpleNamespace(
+        id=uuid4(), status=CampaignStatus.ACTIVE, schedule_type=ScheduleType.RECURRING, scheduled_at=None,
+        recurrence_rule="0 9 * * *", timezone="UTC", updated_at=YEAR_START,
+    )
+    heap.schedule(schedule_entry(campaign, after=YEAR_START))
+    campaign.recurrence_rule = "0 18 * * *"
+    heap.schedule(schedule_entry(campaign, after=YEAR_START))
+    assert [fire for fire, _ in heap.pop_due(datetime(2027, 1, 2))] == [datetime(2027, 1, 1, 18)]
+
+    one_off = SimpleNamespace(
+        id=uuid4(), status=CampaignStatus.ACTIVE, schedule_type=ScheduleType.SCHEDULED,
+        scheduled_at=datetime(2027, 1, 3, 7), recurrence_rule=None, timezone="UTC", updated_at=YEAR_START,
+    )
+    heap.schedule(schedule_entry(one_off, after=YEAR_START))
+    heap.remove(campaign.id)
+    assert heap.next_fire_at() == datetime(2027, 1, 3, 7)
+    assert [entry.campaign_id for _, entry in heap.pop_due(YEAR_END)] == [one_off.id]
+    assert len(heap) == 0 and heap.next_fire_at() is None
+
+
+def expected_fires(rule: str, predicate, tz: str) -> int:
+    """Reference count through zoneinfo, one local day at a time"""
+    minute, hour = (int(value) for value in rule.split()[:2])
+    zone = ZoneInfo(tz)
+    count = 0
+    day = date(2026, 12, 30)
+    while day < date(2028, 1, 3):
+        if predicate(day):
+            fire = datetime(day.year, day.month, day.day, hour, minute, tzinfo=zone)
+            fire = fire.astimezone(timezone.utc).replace(tzinfo=None)
+            count += YEAR_START < fire <= YEAR_END
+        day += timedelta(days=1)
+    return count
+
+
+def test_year_of_fires_for_10k_campaigns():
+    campaigns = []
+    for index in range(CAMPAIGNS):
+        template = list(RULES)[index % len(RULES)]
+        campaigns.append(SimpleNamespace(
+            id=uuid4(),
+            status=CampaignStatus.ACTIVE,
+            schedule_type=ScheduleType.RECURRING,
+            scheduled_at=None,
+            recurrence_rule=template.format(minute=index // len(RULES) % 60),
+            timezone=TIMEZONES[index // len(RULES) // 60 % len(TIMEZONES)],
+            updated_at=YEAR_START,
+        ))
+
+    started = time.perf_counter()
+    heap = ScheduleHeap()
+    series = {}
+    for campaign in campaigns:
+        heap.schedule(schedule_entry(campaign, after=YEAR_START, series=series))
+
+    counts = Counter()
+    # Like CampaignScheduler.tick: wake at the next fire, take everything due
+    while (now := heap.next_fire_at()) is not None and now <= YEAR_END:
+        counts.update(entry for _, entry in heap.pop_due(now))
+    elapsed = time.perf_counter() - started
+    counts = {entry.campaign_id: count for entry, count in counts.items()}
+
+    reference = {}
+    for index, campaign in enumerate(campaigns):
+        key = (campaign.recurrence_rule, campaign.timezone)
+        if key not in reference:
+            predicate = list(RULES.values())[index % len(RULES)]
+            reference[key] = expected_fires(campaign.recurrence_rule, predicate, campaign.timezone)
+        assert counts[campaign.id] == reference[key], key
+
+    total = sum(counts.values())
+    print(f"\n{total:,} fires for {CAMPAIGNS:,} campaigns in {elapsed:.2f}s")
+    assert elapsed < BUDGET_SECONDS
+
+
+@pytest.fixture(scope="module")
+def campaign_id(throwaway_user):
+    """An active recurring campaign owned by a throwaway user"""
+    from app.config.database import SyncSessionLocal
+    from app.models.message import OccasionType
+
+    with SyncSessionLocal() as db:
+        campaign = Campaign(
+            name="Scheduled",
+            occasion_type=OccasionType.BIRTHDAY,
+            schedule_type=ScheduleType.RECURRING,
+            recurrence_rule="0 9 * * *",
+            timezone="Asia/Tashkent",
+            status=CampaignStatus.ACTIVE,
+            created_by=throwaway_user.id,
+        )
+        db.add(campaign)
+        db.commit()
+        return campaign.id
+
+
+def test_replicas_claim_each_fire_once(campaign_id):
+    from app.config.database import async_database_url
+
+    async def scenario():
+        engine = create_async_engine(async_database_url, pool_size=8, max_overflow=0)
+        sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+        try:
+            replicas = [CampaignScheduler(sessionmaker) for _ in range(8)]
+            for replica in replicas:
+                await replica.sync(full=True)
+            fire = datetime.utcnow() + timedelta(days=1)
+            claims = await asyncio.gather(*(
+                replica.claim([(fire, replica.heap.get(campaign_id))]) for replica in replicas
+            ))
+
+            # A replica that missed a rule change must not fire the old rule
+            stale = replicas[0].heap.get(campaign_id)
+            async with sessionmaker() as db:
+                campaign = await db.get(Campaign, campaign_id)
+                campaign.recurrence_rule = "0 10 * * *"
+                await db.commit()
+            stale_claim = await replicas[0].claim([(fire + timedelta(hours=1), stale)])
+
+            async with sessionmaker() as db:
+                runs = await db.scalar(select(func.count(CampaignRun.id)).where(CampaignRun.campaign_id == campaign_id))
+            return claims, stale_claim, runs
+        finally:
+            await engine.dispose()
+
+    claims, stale_claim, runs = asyncio.run(scenario())
+    assert sum(len(claim) for claim in claims) == 1
+    assert stale_claim == []
+    assert runs == 1
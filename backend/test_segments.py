@@ -0,0 +1,170 @@
+"""Segment filters compile to one index-driven query"""
+
+from datetime import date, datetime
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import select, text
+from sqlalchemy.dialects import postgresql
+
+from app.models.contact import Contact, ContactSegment, Language
+from app.services.segments import SegmentFilterError, audience_query, compile_segment_filter
+
+TODAY = date(2027, 12, 28)
+
+
+def sql(segment_filter) -> str:
+    return str(audience_query(segment_filter, Contact.id, today=TODAY).compile(dialect=postgresql.dialect()))
+
+
+def params(segment_filter) -> dict:
+    return audience_query(segment_filter, Contact.id, today=TODAY).compile(dialect=postgresql.dialect()).params
+
+
+def test_empty_filter_selects_everyone():
+    assert sql({}).endswith("WHERE true")
+    assert sql(None).endswith("WHERE true")
+
+
+def test_jsonb_predicates_use_index_operators():
+    statement = sql({"tags": ["vip", "tashkent"], "custom_fields": {"city": "Tashkent", "score": {"gte": 5}}})
+    assert "contacts.tags @> CAST(" in statement
+    assert "contacts.custom_fields @> CAST(" in statement
+    assert "contacts.custom_fields @? CAST(" in statement
+    assert '$."score" ? (@ >= 5)' in params({"custom_fields": {"score": {"gte": 5}}}).values()
+
+
+def test_birthday_window_wraps_the_year():
+    # Dec 28 + 7 days ends Jan 4: two ranges on the month-day expression
+    assert " OR " in sql({"birthday": {"within_days": 7}})
+    assert {1228, 104} <= set(params({"birthday": {"within_days": 7}}).values())
+    assert " OR " not in sql({"birthday": {"from": "03-01", "to": "03-31"}})
+
+
+def test_compiled_filters_are_cached():
+    first = compile_segment_filter({"segment": "VIP", "tags": ["a"]}, TODAY)
+    assert compile_segment_filter({"tags": ["a"], "segment": "VIP"}, TODAY) is first
+    assert compile_segment_filter({"segment": "VIP", "tags": ["a"]}, date(2027, 12, 29)) is not first
+
+
+@pytest.mark.parametrize("segment_filter", [
+    {"segmnt": "VIP"},
+    {"segment": "gold"},
+    {"tags": {"some": ["a"]}},
+    {"tags": [1]},
+    {"custom_fields": {"score": {"between": [1, 2]}}},
+    {"custom_fields": {"score": {"gt": True}}},
+    {"birthday": {"within_days": 400}},
+    {"birthday": {"from": "02-30", "to": "03-01"}},
+    {"birthday": {"month": 5, "within_days": 3}},
+    {"last_interaction": {"after": "yesterday"}},
+    {"any": []},
+])
+def test_invalid_filters_are_rejected(segment_filter):
+    with pytest.raises(SegmentFilterError):
+        compile_segment_filter(segment_filter, TODAY)
+
+
+CONTACTS = [
+    # name, segment, language, tags, custom fields, birthday, last interaction
+    ("a", ContactSegment.VIP, Language.RU, ["vip", "tashkent"], {"city": "Tashkent", "score": 9}, date(1990, 12, 30),
+     datetime(2027, 12, 20)),
+    ("b", ContactSegment.REGULAR, Language.UZ, ["tashkent"], {"city": "Samarkand", "score": "n/a"}, date(1985, 1, 3),
+     None),
+    ("c", ContactSegment.PARTNER, Language.EN, [], {"score": 4, "referrer": "b"}, date(1979, 6, 15),
+     datetime(2026, 1, 5)),
+    ("d", ContactSegment.VIP, Language.RU, None, None, None, datetime(2027, 12, 27)),
+    ("e", ContactSegment.NEW_CLIENT, Language.RU, ["spam"], {"tier": "gold"}, date(1996, 2, 29),
+     datetime(2027, 6, 1)),
+]
+
+AUDIENCES = [
+    ({}, "abcde"),
+    ({"segment": ["VIP", "partner"]}, "acd"),
+    ({"language": "ru", "tags": {"none": ["spam"]}}, "ad"),
+    ({"tags": {"any": ["vip", "spam"]}}, "ae"),
+    ({"tags": ["vip", "tashkent"]}, "a"),
+    ({"custom_fields": {"city": "Tashkent"}}, "a"),
+    ({"custom_fields": {"score": {"gte": 4, "lt": 9}}}, "c"),
+    ({"custom_fields": {"referrer": {"exists": True}}}, "c"),
+    ({"custom_fields": {"referrer": {"exists": False}}}, "abde"),
+    ({"custom_fields": {"tier": {"in": ["gold", "silver"]}}}, "e"),
+    ({"birthday": {"within_days": 7}}, "ab"),
+    ({"birthday": {"month": 2}}, "e"),
+    ({"birthday": {"from": "02-28", "to": "03-01"}}, "e"),
+    ({"last_interaction": {"within_days": 30}}, "ad"),
+    ({"last_interaction": {"older_than_days": 365}}, "c"),
+    ({"last_interaction": {"never": True}}, "b"),
+    ({"any": [{"segment": "partner"}, {"birthday": {"within_days": 7}}]}, "abc"),
+]
+
+# Filter -> index its query must be able to use
+INDEX_PLANS = [
+    ({"tags": ["vip"]}, "ix_contacts_tags"),
+    ({"tags": {"any": ["vip", "spam"]}}, "ix_contacts_tags"),
+    ({"custom_fields": {"city": "Tashkent"}}, "ix_contacts_custom_fields"),
+    ({"custom_fields": {"score": {"gte": 5}}}, "ix_contacts_custom_fields"),
+    ({"birthday": {"within_days": 7}}, "ix_contacts_birthday_month_day"),
+    ({"birthday": {"month": 5}}, "ix_contacts_birthday_month_day"),
+    ({"segment": "VIP"}, "ix_contacts_segment"),
+    ({"last_interaction": {"within_days": 30}}, "ix_contacts_last_interaction_date"),
+]
+
+
+@pytest.fixture(scope="module")
+def contacts(postgres_db, throwaway_user):
+    """The CONTACTS rows, keyed by name, owned by a throwaway user"""
+    from app.config.database import SyncSessionLocal
+
+    for index in Contact.__table__.indexes:
+        index.create(postgres_db, checkfirst=True)
+
+    with SyncSessionLocal() as db:
+        rows = {
+            name: Contact(
+                name=name,
+                email=f"segments-{name}-{uuid4().hex}@example.com",
+                segment=segment,
+                language=language,
+                tags=tags,
+                custom_fields=custom_fields,
+                birthday=birthday,
+                last_interaction_date=last_interaction,
+                created_by=throwaway_user.id,
+            )
+            for name, segment, language, tags, custom_fields, birthday, last_interaction in CONTACTS
+        }
+        db.add_all(rows.values())
+        db.commit()
+        return {"user": throwaway_user.id, "ids": {name: contact.id for name, contact in rows.items()}}
+
+
+@pytest.mark.parametrize("segment_filter,expected", AUDIENCES)
+def test_audience_matches(contacts, segment_filter, expected):
+    from app.config.database import SyncSessionLocal
+
+    names = {contact_id: name for name, contact_id in contacts["ids"].items()}
+    with SyncSessionLocal() as db:
+        query = audience_query(segment_filter, Contact.id, today=TODAY).where(Contact.created_by == contacts["user"])
+        selected = {names[contact_id] for contact_id in db.scalars(query)}
+    assert "".join(sorted(selected)) == expected
+
+
+@pytest.mark.parametrize("segment_filter,index", INDEX_PLANS)
+def test_audience_query_plan_uses_index(contacts, segment_filter, index):
+    """With sequential scans priced out, the planner must reach for the index"""
+    from app.config.database import sync_engine
+
+    with sync_engine.connect() as conn:
+        conn.execute(text("SET LOCAL enable_seqscan = off"))
+        plan = conn.execute(
+            audience_query(segment_filter, Contact.id, today=TODAY).prefix_with("EXPLAIN (FORMAT JSON)")
+        ).scalar()
+        conn.rollback()
+
+    def index_names(node):
+        yield node.get("Index Name")
+        for child in node.get("Plans", []):
+            yield from index_names(child)
+
+    assert index in set(index_names(plan[0]["Plan"])), plan
@@ -0,0 +1,22 @@
+"""Cold-start budget for API workers"""
+
+import os
+
+from benchmarks.startup import DEFERRED_MODULES, measure_startup
+
+# Fastest of a few fresh-interpreter boots; override on slow CI hardware
+STARTUP_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", "2.0"))
+
+
+def test_startup_within_budget():
+    samples = [measure_startup() for _ in range(3)]
+    fastest = min(sample["startup_seconds"] for sample in samples)
+    assert fastest <= STARTUP_BUDGET_SECONDS, (
+        f"app.main boot took {fastest:.3f}s, budget is {STARTUP_BUDGET_SECONDS:.3f}s; "
+        "run python -m benchmarks.import_profile to find the regression"
+    )
+
+
+def test_heavy_libraries_deferred():
+    loaded = measure_startup()["deferred_loaded"]
+    assert not loaded, f"{', '.join(loaded)} imported at startup; import on first use instead ({DEFERRED_MODULES})"